@@ -0,0 +1,180 @@
+import asyncio
+import json
+from linebot.exceptions import InvalidSignatureError
+from linebot.models import MessageEvent, TextMessage
+from config import logger
+from async_line_client import AsyncLineClient
+from handlers.command_handler import CommandHandler
+from handlers.conversation_handler import ConversationHandler
+from utils.deadline import Deadline
+from utils.dispatcher import EventDispatcher, get_chat_key
+from utils.event_dedup import get_event_deduplicator
+from utils.rate_limit import check_llm_rate_limit
+from utils.response_catalog import sample_response
+from utils.tracing import get_tracer, span, traced
+from utils.webhook import get_body, get_header
+
+# LINEクライアントの初期化（返信は AsyncMessagingApi 経由）
+line_client = AsyncLineClient()
+command_handler = CommandHandler(line_client)
+conversation_handler = ConversationHandler(line_client)
+dispatcher = EventDispatcher()
+
+# 接続プールをウォームコンテナ間で使い回すため、イベントループも使い回す
+_loop = None
+
+def _get_loop():
+    """
+    共有のイベントループを取得する（初回のみ生成）
+
+    Returns:
+    asyncio.AbstractEventLoop: イベントループ
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+def lambda_handler(event, context):
+    """
+    LINE Webhook用のLambdaハンドラ関数（asyncio版）
+
+    Parameters:
+    event (dict): API Gatewayから渡されるイベントデータ
+    context (LambdaContext): Lambda実行コンテキスト
+
+    Returns:
+    dict: API Gateway形式のレスポンス
+    """
+    # Base64の場合は署名の計算に使う元のバイト列に戻す
+    body = get_body(event)
+    signature = get_header(event, 'X-Line-Signature')
+
+    # Lambdaの残り時間から、このリクエストの期限を決める
+    deadline = Deadline.from_context(context)
+
+    tracer = get_tracer()
+    tracer.start()
+    try:
+        with span('webhook'):
+            is_valid = _get_loop().run_until_complete(handle_webhook(body, signature, deadline))
+    finally:
+        tracer.flush()
+
+    if not is_valid:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Invalid signature'})
+        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'OK'})
+    }
+
+async def handle_webhook(body, signature, deadline=None):
+    """
+    署名を検証し、イベントをチャット単位の順序を保ったまま並行に処理する
+
+    Parameters:
+    body (str | bytes): リクエストボディ
+    signature (str): X-Line-Signature ヘッダー値
+    deadline (Deadline): リクエストの期限（Noneの場合は全イベントの完了まで待つ）
+
+    Returns:
+    bool: 署名が有効な場合はTrue、そうでない場合はFalse
+    """
+    try:
+        with span("verify_signature"):
+            events = line_client.parse_events(body, signature)
+    except InvalidSignatureError:
+        logger.error("署名検証エラー")
+        return False
+    except Exception as e:
+        logger.error(f"例外発生: {str(e)}")
+        return False
+
+    groups = dispatcher.group_by_chat(events)
+    tasks = [
+        asyncio.ensure_future(_run_chat(chat_key, chat_events, deadline))
+        for chat_key, chat_events in groups.items()
+    ]
+    if tasks:
+        timeout = deadline.remaining() if deadline is not None else None
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            # 未完了の処理は次の呼び出しでイベントループが再開したときに続きが走る
+            logger.warning(f"期限までに完了しなかったチャットがあります: {len(pending)}/{len(tasks)}")
+    return True
+
+async def _run_chat(chat_key, events, deadline=None):
+    """
+    1つのチャットのイベントを順番に処理する
+
+    Parameters:
+    chat_key (str): チャットキー
+    events (list): このチャットのイベント
+    deadline (Deadline): リクエストの期限
+    """
+    for event in events:
+        try:
+            if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+                # 再送されたイベントは、処理済み・処理中なら処理しない（失敗したものは処理し直す）
+                deduplicator = get_event_deduplicator()
+                if deduplicator is None:
+                    await handle_message(event, deadline)
+                else:
+                    await deduplicator.run_async(event, lambda: handle_message(event, deadline))
+        except Exception as e:
+            logger.error(f"イベント処理中にエラー発生 ({chat_key}): {str(e)}")
+
+@traced("handle_message")
+async def handle_message(event, deadline=None):
+    """
+    テキストメッセージイベントのハンドラ（asyncio版）
+
+    Parameters:
+    event (MessageEvent): LINEのメッセージイベント
+    deadline (Deadline): リクエストの期限
+
+    Returns:
+    bool: 処理が成功した場合（無視した場合を含む）はTrue、そうでない場合はFalse
+    """
+    text = event.message.text
+    logger.debug("受信メッセージ: %s", text)
+
+    # コマンドはグループチャットでも常に反応
+    if text.startswith("/"):
+        invocation = command_handler.registry.parse(text)
+        replied = await _reply_if_rate_limited(event, invocation)
+        if replied is not None:
+            return replied
+        with span("command"):
+            return await command_handler.process_command_async(event, text, deadline=deadline, invocation=invocation)
+
+    bot_user_id = await line_client.get_bot_user_id()
+    if conversation_handler.is_mentioned(event, bot_user_id) or not conversation_handler.is_group_or_room(event.source):
+        replied = await _reply_if_rate_limited(event)
+        if replied is not None:
+            return replied
+        with span("conversation"):
+            return await conversation_handler.process_conversation_async(event, text, deadline=deadline)
+    logger.info("グループチャットでコマンドでもメンションでもないメッセージを無視します")
+    return True
+
+async def _reply_if_rate_limited(event, invocation=None):
+    """
+    OpenAIを呼ぶメッセージがレート制限を超えている場合は定型応答を返信する
+
+    Parameters:
+    event (MessageEvent): LINEのメッセージイベント
+    invocation (Invocation): コマンドの場合は解釈済みの呼び出し
+
+    Returns:
+    bool: 制限を超えていない場合はNone、超えていた場合は定型応答を返信できたかどうか
+    """
+    limited_by = check_llm_rate_limit(event.source, invocation)
+    if not limited_by:
+        return None
+    logger.info("レート制限を超えたため定型応答を返します", extra={"rate_limited": limited_by})
+    return await line_client.reply_message(event.reply_token, sample_response("RATE_LIMIT_RESPONSES", get_chat_key(event)))
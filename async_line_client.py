@@ -0,0 +1,93 @@
+from linebot.exceptions import InvalidSignatureError
+from linebot.v3.messaging import (
+    AsyncApiClient, AsyncMessagingApi, Configuration, ReplyMessageRequest, TextMessage
+)
+from config import LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, LINE_API_BASE, HTTP_POOL_MAXSIZE, logger
+from utils.signature import validate_signature
+from utils.tracing import span
+from utils.webhook import parse_events
+
+class AsyncLineClient:
+    """LINE Messaging API (SDK v3 の AsyncMessagingApi) との非同期の対話を抽象化するクラス"""
+
+    def __init__(self):
+        """LINE APIクライアントを初期化する"""
+        self.configuration = Configuration(host=LINE_API_BASE, access_token=LINE_CHANNEL_ACCESS_TOKEN)
+        self.configuration.connection_pool_maxsize = HTTP_POOL_MAXSIZE
+        self._api_client = None
+        self._messaging_api = None
+        self._bot_user_id = None
+
+    def _get_messaging_api(self):
+        """
+        AsyncMessagingApiを取得する（イベントループ内での初回呼び出し時に生成）
+
+        Returns:
+        AsyncMessagingApi: LINE Messaging APIの非同期クライアント
+        """
+        if self._messaging_api is None:
+            # aiohttpのセッションはイベントループの中で作る必要がある
+            self._api_client = AsyncApiClient(self.configuration)
+            self._messaging_api = AsyncMessagingApi(self._api_client)
+        return self._messaging_api
+
+    def parse_events(self, body, signature):
+        """
+        署名を検証してイベントを取り出す（同期版と同じイベントモデルを使う）
+
+        署名の検証もボディの解析も1回だけ行う
+
+        Parameters:
+        body (str | bytes): リクエストボディ
+        signature (str): X-Line-Signature ヘッダー値
+
+        Returns:
+        list: LINEのイベント
+
+        Raises:
+        InvalidSignatureError: 署名が無効な場合
+        """
+        if not validate_signature(body, signature, LINE_CHANNEL_SECRET):
+            raise InvalidSignatureError("Invalid signature")
+        with span("parse_events"):
+            return parse_events(body)
+
+    async def reply_message(self, reply_token, text):
+        """
+        メッセージを返信する
+
+        Parameters:
+        reply_token (str): 返信トークン
+        text (str): 送信するテキスト
+
+        Returns:
+        bool: 送信が成功した場合はTrue、そうでない場合はFalse
+        """
+        try:
+            with span("reply_message"):
+                await self._get_messaging_api().reply_message(
+                    ReplyMessageRequest(
+                        reply_token=reply_token,
+                        messages=[TextMessage(text=text)]
+                    )
+                )
+            logger.info(f"メッセージを送信: {text[:30]}...")
+            return True
+        except Exception as e:
+            logger.error(f"メッセージ送信中にエラー発生: {str(e)}")
+            return False
+
+    async def get_bot_user_id(self):
+        """Bot 自身の userId を返す（キャッシュ付き）"""
+        if self._bot_user_id is None:
+            with span("get_bot_user_id"):
+                bot_info = await self._get_messaging_api().get_bot_info()
+            self._bot_user_id = bot_info.user_id
+        return self._bot_user_id
+
+    async def close(self):
+        """接続プールを閉じる"""
+        if self._api_client is not None:
+            await self._api_client.close()
+        self._api_client = None
+        self._messaging_api = None
@@ -0,0 +1,161 @@
+"""
+ベンチマーク用の署名付きWebhookペイロードを作る
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.signature import compute_signature
+
+BOT_USER_ID = "Ubenchbot"
+
+COMMANDS = [
+    "/help", "/tesla", "/spacex", "/quote", "/news", "/random", "/task 打ち上げ",
+    "/weather", "/weather 大阪", "/weather 札幌", "/weather 那覇", "/weather 東京 大阪 札幌",
+    "/advice", "/advice 起業", "/advice 起業する", "/advice AIについて",
+]
+CHATTER = [
+    "おはよう", "今日の会議は何時から？", "ランチどうする", "了解です", "テスラの株価やばい",
+    "SpaceXの打ち上げ見た？", "雨降ってきた", "www", "👍",
+]
+CONVERSATION = [
+    "テスラについて教えて", "火星に住めると思う？", "AIは人類の脅威？", "元気？",
+    "宇宙について話そう", "何か面白いことある？",
+]
+
+# シナリオ名 -> デフォルトの重み
+DEFAULT_MIX = {
+    "command": 4,
+    "mention": 2,
+    "chatter": 3,
+    "conversation": 2,
+    "batch": 1,
+}
+
+
+def parse_mix(spec):
+    """
+    "command=4,mention=2" のようなシナリオの重みの指定を解釈する
+
+    Parameters:
+    spec (str): 重みの指定（省略時は DEFAULT_MIX）
+
+    Returns:
+    dict: シナリオ名 -> 重み
+    """
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知のシナリオです: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class PayloadFactory:
+    """シナリオの重みに従って、署名付きのWebhookリクエストを作る"""
+
+    def __init__(self, channel_secret, mix=None, seed=0, users=50, groups=10):
+        """
+        ファクトリを初期化する
+
+        Parameters:
+        channel_secret (str): 署名に使うチャネルシークレット
+        mix (dict): シナリオ名 -> 重み
+        seed (int): 乱数のシード
+        users (int): 送信者として使うユーザー数
+        groups (int): 使うグループ数
+        """
+        self.channel_secret = channel_secret
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.random = random.Random(seed)
+        self.users = [f"Ubenchuser{i:04d}" for i in range(users)]
+        self.groups = [f"Cbenchgroup{i:03d}" for i in range(groups)]
+        self._sequence = 0
+
+    def _event(self, text, group_id=None, mention=False):
+        """
+        テキストメッセージイベントを1件作る
+
+        Parameters:
+        text (str): メッセージテキスト
+        group_id (str): グループID（Noneの場合は1対1のチャット）
+        mention (bool): Botへのメンションを付けるかどうか
+
+        Returns:
+        dict: Webhookのイベント
+        """
+        self._sequence += 1
+        user_id = self.random.choice(self.users)
+        if group_id:
+            source = {"type": "group", "groupId": group_id, "userId": user_id}
+        else:
+            source = {"type": "user", "userId": user_id}
+        message = {"id": str(self._sequence), "type": "text", "quoteToken": f"q{self._sequence}", "text": text}
+        if mention:
+            message["text"] = f"@bench {text}"
+            message["mention"] = {"mentionees": [
+                {"index": 0, "length": 6, "type": "user", "userId": BOT_USER_ID}
+            ]}
+        return {
+            "type": "message",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "source": source,
+            "webhookEventId": f"01BENCH{self._sequence:019d}",
+            "deliveryContext": {"isRedelivery": False},
+            "replyToken": f"benchreplytoken{self._sequence}",
+            "message": message,
+        }
+
+    def _scenario_events(self, scenario):
+        """
+        シナリオに応じたイベントのリストを作る
+
+        Parameters:
+        scenario (str): シナリオ名
+
+        Returns:
+        list: Webhookのイベント
+        """
+        if scenario == "command":
+            group_id = self.random.choice([None, self.random.choice(self.groups)])
+            return [self._event(self.random.choice(COMMANDS), group_id)]
+        if scenario == "mention":
+            return [self._event(self.random.choice(CONVERSATION), self.random.choice(self.groups), mention=True)]
+        if scenario == "chatter":
+            return [self._event(self.random.choice(CHATTER), self.random.choice(self.groups))]
+        if scenario == "conversation":
+            return [self._event(self.random.choice(CONVERSATION))]
+        # batch: 複数のチャットのイベントが1つのWebhookにまとまって届く
+        events = []
+        for _ in range(self.random.randint(3, 6)):
+            kind = self.random.choice(["command", "mention", "chatter", "conversation"])
+            events.extend(self._scenario_events(kind))
+        return events
+
+    def next_request(self):
+        """
+        次のリクエストを作る
+
+        Returns:
+        tuple: (シナリオ名, API Gateway形式のイベント, Webhookイベント数)
+        """
+        scenarios = list(self.mix)
+        scenario = self.random.choices(scenarios, weights=[self.mix[name] for name in scenarios])[0]
+        events = self._scenario_events(scenario)
+        body = json.dumps({"destination": BOT_USER_ID, "events": events}, ensure_ascii=False)
+        signature = compute_signature(body, self.channel_secret)
+        request = {
+            "body": body,
+            "headers": {"x-line-signature": signature, "content-type": "application/json"},
+            "isBase64Encoded": False,
+        }
+        return scenario, request, len(events)
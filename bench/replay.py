@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+署名付きの合成Webhookを lambda_handler に流し込むリプレイベンチマーク
+
+LINE / Yahoo / OpenAI の代わりにローカルのスタブサーバーを起動し、
+コマンド・メンション・グループの雑談・複数イベントのバッチを混ぜたリクエストを
+順番に lambda_handler で処理する。リクエストごとの処理時間の p50/p99、
+1秒あたりのイベント処理数、イベントあたりの外部呼び出し回数を表示する。
+
+使い方:
+    python bench/replay.py                                   # 既定の遅延で200リクエスト
+    python bench/replay.py --requests 500 --latency openai=lognormal:400,0.5
+    python bench/replay.py --mix command=1,batch=1 --save bench/results/replay.json
+    python bench/replay.py --compare bench/results/replay.json
+
+遅延の指定は "fixed:ミリ秒" / "uniform:最小,最大" / "lognormal:中央値,シグマ" / "none"。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubs import LatencyModel, line_stub, openai_stub, yahoo_stub
+from payloads import PayloadFactory, parse_mix
+
+CHANNEL_SECRET = "bench-secret"
+
+# 上流APIごとの既定の遅延
+DEFAULT_LATENCY = {
+    "line": "lognormal:40,0.3",
+    "yahoo": "lognormal:80,0.4",
+    "openai": "lognormal:300,0.5",
+}
+
+
+class BenchContext:
+    """Lambdaのコンテキストの代わり（残り時間だけを返す）"""
+
+    function_name = "bench"
+
+    def __init__(self, timeout_ms):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def percentile(samples, q):
+    """
+    nearest-rank 法でパーセンタイルを求める
+
+    Parameters:
+    samples (list): 値のリスト
+    q (float): パーセンタイル
+
+    Returns:
+    float: パーセンタイルの値（値がない場合は0）
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_latencies(specs, seed):
+    """
+    --latency の指定を上流APIごとの遅延の分布にする
+
+    Parameters:
+    specs (list): "openai=lognormal:300,0.5" のような指定のリスト
+    seed (int): 乱数のシード
+
+    Returns:
+    dict: 上流API名 -> LatencyModel
+    """
+    merged = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        name, _, value = spec.partition("=")
+        if name not in merged:
+            raise ValueError(f"未知の上流APIです: {name}")
+        merged[name] = value
+    return {name: LatencyModel.parse(value, seed + i) for i, (name, value) in enumerate(sorted(merged.items()))}
+
+
+def configure_environment(stubs):
+    """
+    lambda_function を読み込む前に、スタブを向くように環境変数を設定する
+
+    Parameters:
+    stubs (dict): 上流API名 -> StubServer
+    """
+    os.environ.update({
+        "LINE_CHANNEL_SECRET": CHANNEL_SECRET,
+        "LINE_CHANNEL_ACCESS_TOKEN": "bench-token",
+        "YAHOO_APP_ID": "bench-app-id",
+        "OPENAI_API_KEY": "bench-openai-key",
+        "LINE_API_BASE": stubs["line"].base_url,
+        "YAHOO_MAP_API_BASE": stubs["yahoo"].base_url,
+        "OPENAI_API_BASE": stubs["openai"].base_url,
+        "WEBHOOK_MODE": "sync",
+        "METRICS_ENABLED": "false",
+        "LOG_PAYLOAD_SAMPLE_RATE": "0",
+        "GEOCODE_CACHE_PATH": "",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def run(args):
+    """
+    スタブを起動してリクエストを流し込み、結果を集計する
+
+    Parameters:
+    args (argparse.Namespace): コマンドライン引数
+
+    Returns:
+    dict: 集計結果
+    """
+    latencies = parse_latencies(args.latency, args.seed)
+    stubs = {
+        "line": line_stub(latencies["line"]).start(),
+        "yahoo": yahoo_stub(latencies["yahoo"]).start(),
+        "openai": openai_stub(latencies["openai"]).start(),
+    }
+    configure_environment(stubs)
+
+    # 環境変数を設定した後で読み込む
+    import lambda_function
+    from utils.tracing import get_tracer
+
+    factory = PayloadFactory(CHANNEL_SECRET, parse_mix(args.mix), seed=args.seed)
+    try:
+        for _ in range(args.warmup):
+            _, request, _ = factory.next_request()
+            lambda_function.lambda_handler(request, BenchContext(args.timeout_ms))
+        for stub in stubs.values():
+            stub.reset()
+        get_tracer().stats.reset()
+
+        durations = []
+        by_scenario = {}
+        statuses = {}
+        events = 0
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            scenario, request, count = factory.next_request()
+            request_started = time.perf_counter()
+            response = lambda_function.lambda_handler(request, BenchContext(args.timeout_ms))
+            elapsed_ms = (time.perf_counter() - request_started) * 1000
+            durations.append(elapsed_ms)
+            by_scenario.setdefault(scenario, []).append(elapsed_ms)
+            status = str(response.get("statusCode"))
+            statuses[status] = statuses.get(status, 0) + 1
+            events += count
+        wall_s = time.perf_counter() - started
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    outbound = {name: dict(sorted(stub.calls.items())) for name, stub in stubs.items()}
+    outbound_total = sum(stub.total_calls() for stub in stubs.values())
+    return {
+        "python": sys.version.split()[0],
+        "commit": _git_commit(),
+        "timestamp": int(time.time()),
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "mix": parse_mix(args.mix),
+            "latency": {name: str(model) for name, model in latencies.items()},
+            "timeout_ms": args.timeout_ms,
+        },
+        "requests": args.requests,
+        "events": events,
+        "statuses": statuses,
+        "wall_s": round(wall_s, 3),
+        "events_per_s": round(events / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": _summary(durations),
+        "scenarios": {name: _summary(values) for name, values in sorted(by_scenario.items())},
+        "outbound_calls": outbound,
+        "outbound_per_event": round(outbound_total / events, 3) if events else 0.0,
+        "stages": get_tracer().stats.percentiles(),
+    }
+
+
+def _summary(samples):
+    """処理時間の要約（件数・平均・p50/p90/p99・最大）"""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 2),
+        "p50": round(percentile(samples, 50), 2),
+        "p90": round(percentile(samples, 90), 2),
+        "p99": round(percentile(samples, 99), 2),
+        "max": round(max(samples), 2),
+    }
+
+
+def _git_commit():
+    """現在のコミットID（取得できない場合は None）"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(result, baseline=None):
+    """
+    集計結果を表示する
+
+    Parameters:
+    result (dict): 今回の集計結果
+    baseline (dict): 比較対象の集計結果
+    """
+    latency = result["latency_ms"]
+    print(f"requests={result['requests']} events={result['events']} statuses={result['statuses']} "
+          f"wall={result['wall_s']}s")
+    print(f"latency [ms]: p50={latency['p50']} p90={latency['p90']} p99={latency['p99']} "
+          f"max={latency['max']} mean={latency['mean']}")
+    print(f"throughput: {result['events_per_s']} events/s")
+    print(f"outbound calls per event: {result['outbound_per_event']}")
+    print()
+    print(f"{'scenario':<14} {'n':>5} {'p50 [ms]':>10} {'p99 [ms]':>10}")
+    for name, summary in result["scenarios"].items():
+        print(f"{name:<14} {summary['count']:>5} {summary['p50']:>10.2f} {summary['p99']:>10.2f}")
+    print()
+    print(f"{'upstream call':<40} {'calls':>7}")
+    for name, calls in result["outbound_calls"].items():
+        for route, count in calls.items():
+            print(f"{name + ' ' + route:<40} {count:>7}")
+    if result["stages"]:
+        print()
+        print(f"{'stage':<20} {'n':>6} {'p50 [ms]':>10} {'p99 [ms]':>10}")
+        for stage, summary in sorted(result["stages"].items()):
+            print(f"{stage:<20} {summary['count']:>6} {summary['p50']:>10.2f} {summary['p99']:>10.2f}")
+
+    if baseline:
+        print()
+        print(f"比較対象: commit={baseline.get('commit')} timestamp={baseline.get('timestamp')}")
+        rows = [
+            ("p50 [ms]", baseline["latency_ms"]["p50"], latency["p50"]),
+            ("p99 [ms]", baseline["latency_ms"]["p99"], latency["p99"]),
+            ("events/s", baseline["events_per_s"], result["events_per_s"]),
+            ("calls/event", baseline["outbound_per_event"], result["outbound_per_event"]),
+        ]
+        print(f"{'metric':<14} {'before':>10} {'after':>10} {'change':>9}")
+        for name, before, after in rows:
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+            print(f"{name:<14} {before:>10.2f} {after:>10.2f} {change:>9}")
+
+
+def main():
+    """コマンドライン引数を解釈してベンチマークを実行する"""
+    parser = argparse.ArgumentParser(description="合成Webhookを lambda_handler にリプレイして計測する")
+    parser.add_argument("--requests", type=int, default=200, help="計測するリクエスト数")
+    parser.add_argument("--warmup", type=int, default=10, help="計測前に流すリクエスト数")
+    parser.add_argument("--seed", type=int, default=0, help="ペイロードと遅延の乱数シード")
+    parser.add_argument("--mix", help="シナリオの重み（例: command=4,mention=2,chatter=3,conversation=2,batch=1）")
+    parser.add_argument("--latency", action="append", help="上流APIの遅延（例: openai=lognormal:300,0.5）。複数指定可")
+    parser.add_argument("--timeout-ms", type=int, default=30000, help="Lambdaのタイムアウト（ミリ秒）")
+    parser.add_argument("--save", help="結果をJSONで保存するパス")
+    parser.add_argument("--compare", help="比較対象の結果JSONのパス")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    result = run(args)
+    print_report(result, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+コールドスタート時のモジュール読み込み時間を計測するスクリプト
+
+新しいPythonプロセスで `python -X importtime` を使ってエントリポイントを読み込み、
+モジュールごとの読み込み時間（自身の時間と、依存モジュールを含めた累計時間）を表示する。
+また、署名が無効なリクエストを1回処理するまでの時間も計測する。
+
+使い方:
+    python bench/startup.py                       # lambda_function を計測
+    python bench/startup.py --module worker_function --top 30
+    python bench/startup.py --repeat 5 --budget-ms 120 --save bench/results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 計測用のプロセスに渡す環境変数（実際の認証情報は不要）
+BENCH_ENV = {
+    "LINE_CHANNEL_SECRET": "bench-secret",
+    "LINE_CHANNEL_ACCESS_TOKEN": "bench-token",
+}
+
+# 署名が無効なリクエストを1回処理し、その時間をミリ秒で出力するコード
+FIRST_REQUEST_CODE = """
+import time
+started = time.perf_counter()
+import {module} as entry
+imported = time.perf_counter()
+entry.lambda_handler({{"body": "{{}}", "headers": {{"x-line-signature": "invalid"}}}}, None)
+finished = time.perf_counter()
+print((imported - started) * 1000, (finished - imported) * 1000)
+"""
+
+
+def run_importtime(module):
+    """
+    新しいプロセスでモジュールを読み込み、-X importtime の出力を解析する
+
+    Parameters:
+    module (str): 読み込むモジュール名
+
+    Returns:
+    list: (モジュール名, 自身の時間[ms], 累計時間[ms], 階層) のリスト
+    """
+    env = dict(os.environ, **BENCH_ENV)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return rows
+
+
+def run_first_request(module):
+    """
+    新しいプロセスで読み込みから最初のリクエスト処理までの時間を計測する
+
+    Parameters:
+    module (str): 読み込むモジュール名
+
+    Returns:
+    tuple: (読み込み時間[ms], 最初のリクエストの処理時間[ms])
+    """
+    env = dict(os.environ, **BENCH_ENV)
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST_CODE.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    import_ms, request_ms = result.stdout.split()[-2:]
+    return float(import_ms), float(request_ms)
+
+
+def main():
+    """コマンドライン引数を解釈して計測結果を表示する"""
+    parser = argparse.ArgumentParser(description="コールドスタート時の読み込み時間を計測する")
+    parser.add_argument("--module", default="lambda_function", help="計測するエントリポイント")
+    parser.add_argument("--repeat", type=int, default=3, help="計測する回数（中央値を使う）")
+    parser.add_argument("--top", type=int, default=20, help="表示するモジュール数")
+    parser.add_argument("--budget-ms", type=float, help="読み込み時間の上限。超えた場合は終了コード1")
+    parser.add_argument("--save", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    runs = [run_importtime(args.module) for _ in range(args.repeat)]
+    first_requests = [run_first_request(args.module) for _ in range(args.repeat)]
+
+    # モジュールごとに各回の中央値を取る
+    self_times = {}
+    cumulative_times = {}
+    for rows in runs:
+        for name, self_ms, cumulative_ms, _ in rows:
+            self_times.setdefault(name, []).append(self_ms)
+            cumulative_times.setdefault(name, []).append(cumulative_ms)
+    modules = [
+        {
+            "module": name,
+            "self_ms": round(statistics.median(self_times[name]), 2),
+            "cumulative_ms": round(statistics.median(cumulative_times[name]), 2),
+        }
+        for name in self_times
+    ]
+    modules.sort(key=lambda row: row["self_ms"], reverse=True)
+
+    entry = next((row for row in modules if row["module"] == args.module), None)
+    import_ms = statistics.median(ms for ms, _ in first_requests)
+    request_ms = statistics.median(ms for _, ms in first_requests)
+
+    print(f"{'module':<50} {'self [ms]':>10} {'cumulative [ms]':>16}")
+    for row in modules[:args.top]:
+        print(f"{row['module']:<50} {row['self_ms']:>10.2f} {row['cumulative_ms']:>16.2f}")
+    print()
+    if entry is not None:
+        print(f"{args.module} の読み込み（importtime 累計）: {entry['cumulative_ms']:.2f} ms")
+    print(f"読み込み（実測）: {import_ms:.2f} ms / 署名エラーの初回リクエスト: {request_ms:.2f} ms")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "module": args.module,
+                "python": sys.version.split()[0],
+                "timestamp": int(time.time()),
+                "import_ms": import_ms,
+                "first_invalid_request_ms": request_ms,
+                "modules": modules,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.save}")
+
+    if args.budget_ms is not None and import_ms > args.budget_ms:
+        print(f"読み込み時間が上限を超えています: {import_ms:.2f} ms > {args.budget_ms:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
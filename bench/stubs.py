@@ -0,0 +1,263 @@
+"""
+ベンチマーク用に LINE / Yahoo / OpenAI の代わりに応答するローカルのスタブサーバー
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class LatencyModel:
+    """スタブの応答遅延の分布"""
+
+    def __init__(self, kind="fixed", params=(0.0,), seed=None):
+        """
+        遅延の分布を初期化する
+
+        Parameters:
+        kind (str): fixed / uniform / lognormal
+        params (tuple): fixed は (ミリ秒,)、uniform は (最小, 最大)、lognormal は (中央値, シグマ)
+        seed (int): 乱数のシード
+        """
+        self.kind = kind
+        self.params = params
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        """
+        "lognormal:300,0.5" のような指定から分布を作る
+
+        Parameters:
+        spec (str): 分布の指定（"fixed:20" / "uniform:10,50" / "lognormal:300,0.5" / "none"）
+        seed (int): 乱数のシード
+
+        Returns:
+        LatencyModel: 遅延の分布
+        """
+        if not spec or spec == "none":
+            return cls("fixed", (0.0,), seed)
+        kind, _, values = spec.partition(":")
+        params = tuple(float(value) for value in values.split(",") if value)
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"遅延の指定が不正です: {spec}")
+        return cls(kind, params, seed)
+
+    def sample(self):
+        """
+        遅延を1つ抽選する
+
+        Returns:
+        float: 遅延（秒）
+        """
+        with self._lock:
+            if self.kind == "uniform":
+                ms = self._random.uniform(*self.params)
+            elif self.kind == "lognormal":
+                median, sigma = self.params
+                ms = self._random.lognormvariate(0.0, sigma) * median
+            else:
+                ms = self.params[0]
+        return max(0.0, ms) / 1000
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class StubServer:
+    """パスごとの応答を返し、呼び出し回数を数えるHTTPサーバー"""
+
+    def __init__(self, name, routes, latency=None):
+        """
+        スタブサーバーを初期化する
+
+        Parameters:
+        name (str): サーバー名（集計用）
+        routes (dict): (メソッド, パス) -> 関数(query, body) -> (ステータス, JSON)
+        latency (LatencyModel): 応答遅延の分布
+        """
+        self.name = name
+        self.routes = routes
+        self.latency = latency or LatencyModel()
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _make_handler(self):
+        """リクエストハンドラのクラスを作る"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文を別々に書き込むため、Nagleアルゴリズムによる遅延を避ける
+            disable_nagle_algorithm = True
+
+            def _respond(self, method):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                route = stub.routes.get((method, url.path))
+                stub.record(f"{method} {url.path}")
+                time.sleep(stub.latency.sample())
+                if route is None:
+                    status, payload = 404, {"message": "not found"}
+                else:
+                    status, payload = route(parse_qs(url.query), body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def record(self, key):
+        """呼び出し回数を記録する"""
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def total_calls(self):
+        """
+        呼び出し回数の合計を返す
+
+        Returns:
+        int: 回数
+        """
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset(self):
+        """呼び出し回数を0に戻す"""
+        with self._lock:
+            self.calls.clear()
+
+    @property
+    def base_url(self):
+        """サーバーのベースURL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """別スレッドでサーバーを起動する"""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """サーバーを停止する"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _ok(payload):
+    """常に同じJSONを返すルートを作る"""
+    return lambda query, body: (200, payload)
+
+
+def line_stub(latency=None):
+    """
+    LINE Messaging API のスタブ
+
+    Parameters:
+    latency (LatencyModel): 応答遅延の分布
+
+    Returns:
+    StubServer: スタブサーバー
+    """
+    bot_info = {
+        "userId": "Ubenchbot",
+        "basicId": "@bench",
+        "displayName": "bench bot",
+        "chatMode": "bot",
+        "markAsReadMode": "auto",
+    }
+    return StubServer("line", {
+        ("POST", "/v2/bot/message/reply"): _ok({}),
+        ("POST", "/v2/bot/message/push"): _ok({}),
+        ("POST", "/v2/bot/message/multicast"): _ok({}),
+        ("GET", "/v2/bot/info"): _ok(bot_info),
+    }, latency)
+
+
+def yahoo_stub(latency=None):
+    """
+    Yahoo!地図API（ジオコーダー・気象情報）のスタブ
+
+    Parameters:
+    latency (LatencyModel): 応答遅延の分布
+
+    Returns:
+    StubServer: スタブサーバー
+    """
+    def geocode(query, body):
+        # 地名ごとに異なる、しかし毎回同じ座標を返す
+        name = query.get("query", [""])[0]
+        digest = hashlib.sha256(name.encode("utf-8")).digest()
+        lon = 130.0 + digest[0] / 255 * 10
+        lat = 31.0 + digest[1] / 255 * 10
+        return 200, {"Feature": [{"Geometry": {"Coordinates": f"{lon:.4f},{lat:.4f}"}}]}
+
+    def weather(query, body):
+        now = time.strftime("%Y%m%d%H%M")
+        weather_list = [{"Type": "observation", "Date": now, "Rainfall": "0.00"}]
+        weather_list += [
+            {"Type": "forecast", "Date": now, "Rainfall": f"{i * 0.35:.2f}"} for i in range(1, 7)
+        ]
+        # 空白区切りの座標（最大10地点）ごとに1つの Feature を返す
+        coordinates = query.get("coordinates", [""])[0].split() or [""]
+        return 200, {"Feature": [
+            {"Geometry": {"Coordinates": coordinate}, "Property": {
+                "WeatherAreaCode": 4410,
+                "WeatherList": {"Weather": weather_list},
+            }}
+            for coordinate in coordinates
+        ]}
+
+    return StubServer("yahoo", {
+        ("GET", "/geocode/V1/geoCoder"): geocode,
+        ("GET", "/weather/V1/place"): weather,
+    }, latency)
+
+
+def openai_stub(latency=None):
+    """
+    OpenAI Chat Completions API のスタブ
+
+    Parameters:
+    latency (LatencyModel): 応答遅延の分布
+
+    Returns:
+    StubServer: スタブサーバー
+    """
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    def completions(query, body):
+        with lock:
+            counter["n"] += 1
+            n = counter["n"]
+        return 200, {"choices": [{"message": {"role": "assistant", "content": f"火星に行こう。({n})"}}]}
+
+    return StubServer("openai", {
+        ("POST", "/chat/completions"): completions,
+        ("POST", "/v1/chat/completions"): completions,
+    }, latency)
@@ -11,5 +11,157 @@ LINE_CHANNEL_ACCESS_TOKEN = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
 YAHOO_APP_ID = os.environ.get('YAHOO_APP_ID')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# 外部APIのベースURL（ベンチマークやローカル検証ではスタブサーバーに向ける）
+LINE_API_BASE = os.environ.get('LINE_API_BASE', 'https://api.line.me').rstrip('/')
+YAHOO_MAP_API_BASE = os.environ.get('YAHOO_MAP_API_BASE', 'https://map.yahooapis.jp').rstrip('/')
+OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/')
+
 # その他の設定
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
+
+# Webhookイベントの並列処理設定
+EVENT_DISPATCH_MAX_WORKERS = int(os.environ.get('EVENT_DISPATCH_MAX_WORKERS', '4'))
+# Lambdaのタイムアウト前に処理を打ち切る余裕（ミリ秒）
+LAMBDA_DEADLINE_MARGIN_MS = int(os.environ.get('LAMBDA_DEADLINE_MARGIN_MS', '500'))
+# 外部API呼び出しの後に定型応答を返信するために残しておく時間（ミリ秒）
+REPLY_RESERVE_MS = int(os.environ.get('REPLY_RESERVE_MS', '1000'))
+# これより短いタイムアウトしか取れない場合は外部APIを呼ばずに定型応答にする（ミリ秒）
+MIN_UPSTREAM_TIMEOUT_MS = int(os.environ.get('MIN_UPSTREAM_TIMEOUT_MS', '200'))
+
+# ジオコーディング結果のキャッシュ設定
+GEOCODE_CACHE_PATH = os.environ.get('GEOCODE_CACHE_PATH', '/tmp/geocode_cache.json')
+GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', '256'))
+GEOCODE_CACHE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL', str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_CACHE_TTL = int(os.environ.get('GEOCODE_NEGATIVE_CACHE_TTL', '600'))
+
+# 降水量キャッシュの設定（Yahooの気象情報は約1kmメッシュで10分ごとに更新される）
+WEATHER_CACHE_SIZE = int(os.environ.get('WEATHER_CACHE_SIZE', '512'))
+WEATHER_UPDATE_INTERVAL = int(os.environ.get('WEATHER_UPDATE_INTERVAL', '600'))
+# /weather で一度に調べる場所の数の上限（気象情報APIは1回で10地点まで）
+WEATHER_MAX_LOCATIONS = int(os.environ.get('WEATHER_MAX_LOCATIONS', '10'))
+
+# 外部APIへのHTTP接続設定
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '10'))
+
+# Webhookの処理モード（sync: その場で処理 / queue: キューに積んで即時応答し、ワーカーで処理）
+WEBHOOK_MODE = os.environ.get('WEBHOOK_MODE', 'sync').lower()
+# イベントキューの設定（sqs / sqlite / memory）
+EVENT_QUEUE_BACKEND = os.environ.get('EVENT_QUEUE_BACKEND', 'sqs' if os.environ.get('EVENT_QUEUE_URL') else 'memory').lower()
+EVENT_QUEUE_URL = os.environ.get('EVENT_QUEUE_URL', '')
+EVENT_QUEUE_PATH = os.environ.get('EVENT_QUEUE_PATH', '/tmp/event_queue.sqlite3')
+EVENT_QUEUE_VISIBILITY_TIMEOUT = float(os.environ.get('EVENT_QUEUE_VISIBILITY_TIMEOUT', '60'))
+EVENT_QUEUE_BATCH_SIZE = int(os.environ.get('EVENT_QUEUE_BATCH_SIZE', '10'))
+# 返信トークンを使う期限（秒）。これより古いイベントにはプッシュメッセージで応答する
+REPLY_TOKEN_MAX_AGE = float(os.environ.get('REPLY_TOKEN_MAX_AGE', '50'))
+
+# テーマ付きアドバイスのキャッシュ設定（テーマごとに複数の回答を貯めて使い回す）
+ADVICE_CACHE_SIZE = int(os.environ.get('ADVICE_CACHE_SIZE', '128'))
+ADVICE_CACHE_TTL = int(os.environ.get('ADVICE_CACHE_TTL', str(6 * 3600)))
+ADVICE_CACHE_VARIANTS = int(os.environ.get('ADVICE_CACHE_VARIANTS', '3'))
+
+# 定型応答のカタログ（1行1応答のテキストファイル。初めて使うときにメモリマップで読み込む）
+RESPONSE_CATALOG_PATH = os.environ.get(
+    'RESPONSE_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'responses.catalog')
+)
+# チャットごとのシャッフルバッグを保持する数と、使われないバッグを捨てるまでの秒数
+RESPONSE_BAG_SIZE = int(os.environ.get('RESPONSE_BAG_SIZE', '10000'))
+RESPONSE_BAG_TTL = int(os.environ.get('RESPONSE_BAG_TTL', str(7 * 24 * 3600)))
+
+# ログ出力の設定
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+# モジュールごとのログレベル（例: "weather_service=DEBUG,urllib3=WARNING"）
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+# Webhookのペイロード全体をログに出す割合（0〜1、DEBUG=true の場合は常に出す）
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '1' if DEBUG else '0.01'))
+
+# ステージごとの所要時間の計測設定（埋め込みメトリクス形式で標準出力に書き出す）
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ElonLineBot')
+STAGE_STATS_WINDOW = int(os.environ.get('STAGE_STATS_WINDOW', '1000'))
+# /stats などの管理者用コマンドを使えるユーザーのuserId（カンマ区切り）
+ADMIN_USER_IDS = frozenset(filter(None, (uid.strip() for uid in os.environ.get('ADMIN_USER_IDS', '').split(','))))
+
+# 会話履歴の設定（memory / sqlite / kv / none）
+CONVERSATION_MEMORY_BACKEND = os.environ.get('CONVERSATION_MEMORY_BACKEND', 'memory').lower()
+CONVERSATION_MEMORY_PATH = os.environ.get('CONVERSATION_MEMORY_PATH', '/tmp/conversation_memory.sqlite3')
+# チャットごとに保持する往復数と、OpenAIに渡す履歴のトークン数の上限
+CONVERSATION_MEMORY_TURNS = int(os.environ.get('CONVERSATION_MEMORY_TURNS', '6'))
+CONVERSATION_MEMORY_TOKENS = int(os.environ.get('CONVERSATION_MEMORY_TOKENS', '800'))
+# 最後の発言からこの秒数が過ぎたチャットの履歴は捨てる
+CONVERSATION_MEMORY_TTL = int(os.environ.get('CONVERSATION_MEMORY_TTL', '3600'))
+# 履歴を保持するチャット数の上限（超えた場合は最も長く使われていないチャットから捨てる）
+CONVERSATION_MEMORY_MAX_CHATS = int(os.environ.get('CONVERSATION_MEMORY_MAX_CHATS', '1000'))
+# キーバリューストアの設定（DynamoDBのテーブル名。未設定の場合はプロセス内の代用品を使う）
+KV_STORE_TABLE = os.environ.get('KV_STORE_TABLE', '')
+# グループ（"g"）ごとに項目を一覧するためのグローバルセカンダリインデックス名
+KV_STORE_GROUP_INDEX = os.environ.get('KV_STORE_GROUP_INDEX', 'g-index')
+
+# OpenAIを呼ぶメッセージのレート制限（トークンバケット。memory / kv）
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+# ユーザーごと・グループ（ルーム）ごとの連続で使える回数と、1分あたりの回復数
+RATE_LIMIT_USER_BURST = float(os.environ.get('RATE_LIMIT_USER_BURST', '5'))
+RATE_LIMIT_USER_PER_MINUTE = float(os.environ.get('RATE_LIMIT_USER_PER_MINUTE', '6'))
+RATE_LIMIT_GROUP_BURST = float(os.environ.get('RATE_LIMIT_GROUP_BURST', '15'))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.environ.get('RATE_LIMIT_GROUP_PER_MINUTE', '20'))
+
+# 朝のダイジェスト配信の設定
+# マルチキャスト1回あたりの宛先数（LINEの上限は500）
+DIGEST_BATCH_SIZE = min(500, int(os.environ.get('DIGEST_BATCH_SIZE', '500')))
+# 同時に送るマルチキャストの数と、1秒あたりの送信回数の上限
+DIGEST_CONCURRENCY = int(os.environ.get('DIGEST_CONCURRENCY', '2'))
+DIGEST_MULTICAST_PER_SECOND = float(os.environ.get('DIGEST_MULTICAST_PER_SECOND', '5'))
+# 購読時に場所を指定しなかった場合の地域
+DIGEST_DEFAULT_AREA = os.environ.get('DIGEST_DEFAULT_AREA', '東京')
+# 配信の進捗を保持する秒数（中断した配信を再開できる期間）
+DIGEST_PROGRESS_TTL = int(os.environ.get('DIGEST_PROGRESS_TTL', str(2 * 24 * 3600)))
+# 購読者と配信の進捗を保存するDynamoDBのテーブル名（未設定の場合は KV_STORE_TABLE。どちらもない場合は購読を受け付けない）
+DIGEST_STORE_TABLE = os.environ.get('DIGEST_STORE_TABLE', '') or KV_STORE_TABLE
+
+# 再送（deliveryContext.isRedelivery）されたイベントの重複処理の防止（webhookEventId 単位）
+EVENT_DEDUP_ENABLED = os.environ.get('EVENT_DEDUP_ENABLED', 'true').lower() == 'true'
+# プロセス内で覚えておくイベント数と、処理結果を覚えておく秒数
+EVENT_DEDUP_SIZE = int(os.environ.get('EVENT_DEDUP_SIZE', '10000'))
+EVENT_DEDUP_TTL = int(os.environ.get('EVENT_DEDUP_TTL', str(24 * 3600)))
+# 処理中の印を残す秒数（処理中のコンテナが落ちても、この後の再送は処理される）
+EVENT_DEDUP_IN_PROGRESS_TTL = int(os.environ.get('EVENT_DEDUP_IN_PROGRESS_TTL', '900'))
+
+# OpenAIの適応タイムアウト（直近の所要時間の分布から読み込みタイムアウトを決める）
+OPENAI_LATENCY_WINDOW = int(os.environ.get('OPENAI_LATENCY_WINDOW', '200'))
+# これだけ計測が貯まるまでは固定のタイムアウトを使い、ヘッジもしない
+OPENAI_LATENCY_MIN_SAMPLES = int(os.environ.get('OPENAI_LATENCY_MIN_SAMPLES', '20'))
+OPENAI_TIMEOUT_PERCENTILE = float(os.environ.get('OPENAI_TIMEOUT_PERCENTILE', '99'))
+OPENAI_TIMEOUT_MULTIPLIER = float(os.environ.get('OPENAI_TIMEOUT_MULTIPLIER', '1.5'))
+OPENAI_TIMEOUT_MIN = float(os.environ.get('OPENAI_TIMEOUT_MIN', '2'))
+OPENAI_TIMEOUT_MAX = float(os.environ.get('OPENAI_TIMEOUT_MAX', '20'))
+# ヘッジ（最初の呼び出しが遅い場合に同じリクエストをもう1本送り、先に返った方を使う）
+OPENAI_HEDGE_ENABLED = os.environ.get('OPENAI_HEDGE_ENABLED', 'false').lower() == 'true'
+OPENAI_HEDGE_PERCENTILE = float(os.environ.get('OPENAI_HEDGE_PERCENTILE', '95'))
+# 直近のリクエストのうちヘッジしてよい割合の上限（コストの上限）
+OPENAI_HEDGE_MAX_RATIO = float(os.environ.get('OPENAI_HEDGE_MAX_RATIO', '0.05'))
+OPENAI_HEDGE_WORKERS = int(os.environ.get('OPENAI_HEDGE_WORKERS', '8'))
+
+# 外部APIごとのサーキットブレーカー（連続した失敗・遅い応答で開き、定型応答に切り替える）
+CIRCUIT_BREAKER_ENABLED = os.environ.get('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+# 状態の共有先（memory: コンテナ内のみ / kv: KV_STORE_TABLE で共有）
+CIRCUIT_BREAKER_BACKEND = os.environ.get('CIRCUIT_BREAKER_BACKEND', 'memory').lower()
+# 開くまでの連続した失敗（遅い応答を含む）の回数
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+# 開いてから回復を確かめる（半開にする）までの秒数
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+# これより遅い応答は失敗とみなす（ミリ秒）
+CIRCUIT_SLOW_CALL_MS_OPENAI = float(os.environ.get('CIRCUIT_SLOW_CALL_MS_OPENAI', '8000'))
+CIRCUIT_SLOW_CALL_MS_YAHOO = float(os.environ.get('CIRCUIT_SLOW_CALL_MS_YAHOO', '2500'))
+# 共有の状態を読み直す間隔（秒）
+CIRCUIT_SYNC_SECONDS = float(os.environ.get('CIRCUIT_SYNC_SECONDS', '2'))
+
+# ウォームアップで座標を先に取得しておく場所名（カンマ区切り）
+WARMUP_LOCATIONS = tuple(filter(None, (
+    name.strip() for name in os.environ.get('WARMUP_LOCATIONS', '東京,大阪,名古屋,札幌,福岡').split(',')
+)))
+
+from utils.structured_log import setup_logging
+setup_logging(logger, LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
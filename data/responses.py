@@ -1,83 +1,77 @@
-# イーロン・マスク風の返答セット
-ELON_RESPONSES = [
-    "完全に合理的な判断だ。",
-    "地球上で最も過小評価されているのは、面白いことを考え出す能力だ。",
-    "私たちは宇宙文明になる必要がある。まだそこまで遠いがね。",
-    "時間は投資に値する唯一の贅沢品だ。",
-    "失敗は選択肢の一つだ。失敗しないなら、十分に革新的ではない。",
-    "大きな意味のあることをするには、世界を良くすることに焦点を当てるべきだ。",
-    "楽観主義者になろう。未来は良くなる。",
-    "私は火星で死にたい。着陸時じゃなくてね。",
-    "テスラジオ、最高だ！",
-    "日本のテクノロジーは常に印象的だ。",
-    "これは革命的なアイデアだ！",
-    "君たちの考えは、私のNeuralink計画より野心的だね。",
-    "これはDogeコインより価値があるかもしれない。"
-]
-
-# テスラ関連の事実
-TESLA_FACTS = [
-    "テスラのModel Sは、0から100km/hまで2.1秒で加速できる。",
-    "テスラのギガファクトリーは、世界最大の建物の一つだ。",
-    "テスラのオートパイロットは、人間のドライバーより安全性が高い。",
-    "テスラのソーラールーフは、従来の屋根より耐久性がある。",
-    "テスラのバッテリーは、家庭用電力貯蔵システムとしても使われている。",
-    "テスラのCybertruck発表時、「割れない」と言われたガラスが割れた。",
-    "テスラは自社の特許を公開し、電気自動車の普及を促進している。",
-    "テスラの車には「犬モード」という機能があり、ペットを車内に安全に残せる。"
-]
-
-# SpaceX関連の事実
-SPACEX_FACTS = [
-    "SpaceXのFalcon Heavy は、現在運用されている中で最も強力なロケットだ。",
-    "SpaceXのStarshipは、最終的に火星への旅を可能にする予定だ。",
-    "SpaceXは、再利用可能ロケットの着陸に成功した最初の民間企業だ。",
-    "SpaceXのStarlinkは、全世界にインターネットを提供する衛星ネットワークだ。",
-    "SpaceXは、国際宇宙ステーションに最初に民間宇宙船をドッキングさせた。",
-    "SpaceXの創設当初、最初の3回のロケット打ち上げは全て失敗した。",
-    "SpaceXのDragon宇宙船は、ISS往復後に海に着水する。",
-    "SpaceXは2002年に設立され、最初の成功したロケット打ち上げは2008年だった。"
-]
+# 定型応答（ELON_RESPONSES / TESLA_FACTS / SPACEX_FACTS / ELON_QUOTES / ADVICE_LIST / JOKES /
+# FAKE_NEWS / RATE_LIMIT_RESPONSES）は data/responses.catalog に置き、utils.response_catalog で選ぶ。
+# ここから名前で取り込むと、そのセクションの全行をリストとして返す
 
-# イーロン・マスクの名言
-ELON_QUOTES = [
-    "人生はもっと面白くなければならない。そうでなければ、誰もが自殺を考えるだろう。",
-    "私はビジネスや利益のためにやっているわけではない。世界を変えたいんだ。",
-    "あなたが何か素晴らしいものを作りたいなら、美しいだけでは不十分だ。それは素晴らしく使えなければならない。",
-    "エンジニアリングとは、理論や推測ではなく、実際に機能するものを作ることだ。",
-    "人は批判を恐れるべきではない。理にかなった批判を恐れるべきではない。",
-    "私の動機は、人類の意識が継続することを確実にすることだ。",
-    "ハードワークで何かを達成できないとしたら、それはおそらく不可能だ。",
-    "私は決して諦めない。失敗は選択肢にない。",
-    "最初の一歩は、何かが可能だと言うことだ。そうすれば、確率は高まる。"
-]
+def __getattr__(name):
+    """
+    カタログのセクションをリストとして返す（from data.responses import TESLA_FACTS など）
 
-# アドバイス
-ADVICE_LIST = [
-    "常に学び続けろ。知識は最強の武器だ。",
-    "失敗を恐れるな。それは成功への道だ。",
-    "時間は最も貴重な資源だ。賢く使え。",
-    "批判は進歩のための燃料だ。",
-    "大きく考えろ。宇宙の大きさほどに。",
-    "行動は言葉より雄弁だ。",
-    "困難は成長の機会だ。",
-    "創造性を制限するな。",
-    "好奇心を持ち続けろ。それが革新を生む。"
-]
+    Parameters:
+    name (str): セクション名
 
-# ジョーク
-JOKES = [
-    "なぜロケット科学者は良いパーティーゲストなのか？彼らは雰囲気を高めるからだ！",
-    "私の車はどこにでも行ける。ただし、バッテリーの充電範囲内に限る。",
-    "火星への移住計画？それは「地球外」の考え方だ。",
-    "テスラのAIが私に言った。「あなたは私のヒーローです」と。充電してあげただけなのに。"
-]
+    Returns:
+    list: 応答
+    """
+    from utils.response_catalog import get_catalog
+    if not name.isupper() or name not in get_catalog().names():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return get_catalog().lines(name)
 
-# ニュース（モック）
-FAKE_NEWS = [
-    "テスラ、新型電気飛行機の開発を発表",
-    "SpaceX、火星への初の有人飛行を2026年に計画",
-    "イーロン・マスク、AIの倫理に関する国際会議を主催",
-    "テスラジオ、画期的な新機能でリスナー数が倍増",
-    "Neuralink、初の人体実験が成功"
+# 定型応答のキーワードルール（OpenAIを使えない場合に使う）
+# - keywords: 大文字小文字・全角半角を区別しない。英数字の端は単語の境界でのみ一致する
+#   （"hi" は "this" に一致しない）。末尾の "*" は前方一致（"thank*" は "thanks" にも一致）
+# - priority: 複数のルールに一致した場合は大きい方を使う（同じ場合は文中で先に現れた方）
+# - prefix: 応答の前に付ける文
+# - responses: 応答の候補（ランダムに1つ選ぶ）、または応答カタログのセクション名
+KEYWORD_RULES = [
+    {
+        "intent": "tesla",
+        "priority": 80,
+        "keywords": ["テスラ", "tesla"],
+        "prefix": "テスラについて話しているのか？素晴らしい。",
+        "responses": "TESLA_FACTS",
+    },
+    {
+        "intent": "spacex",
+        "priority": 70,
+        "keywords": ["spacex", "スペースx", "スペースエックス"],
+        "prefix": "SpaceXは私の情熱だ。",
+        "responses": "SPACEX_FACTS",
+    },
+    {
+        "intent": "mars",
+        "priority": 60,
+        "keywords": ["火星", "mars"],
+        "responses": ["火星は人類の次の大きなフロンティアだ。我々は多惑星種になる必要がある。"],
+    },
+    {
+        "intent": "ai",
+        "priority": 50,
+        "keywords": ["ai", "人工知能"],
+        "responses": ["AIは人類最大のリスクであり、最大の可能性でもある。慎重に発展させなければならない。"],
+    },
+    {
+        "intent": "greeting",
+        "priority": 40,
+        "keywords": ["こんにちは", "hello", "hi", "hey"],
+        "responses": ["やあ、テスラジオのメンバーたち。今日は何を革新する？"],
+    },
+    {
+        "intent": "thanks",
+        "priority": 30,
+        "keywords": ["ありがとう", "thank*", "thx"],
+        "responses": ["感謝は人間の最も美しい特性の一つだ。その気持ちを大切にしろ。"],
+    },
+    {
+        "intent": "good_night",
+        "priority": 20,
+        "keywords": ["おやすみ", "good night"],
+        "responses": ["良い休息を。明日はさらに革新的なアイデアで世界を変えよう。"],
+    },
+    {
+        "intent": "joke",
+        "priority": 10,
+        "keywords": ["joke*", "冗談"],
+        "responses": "JOKES",
+    },
 ]
@@ -24,14 +24,20 @@ echo "Lambda関数コードをコピー中..."
 cp ../lambda_function.py .
 cp ../config.py .
 cp ../line_client.py .
+cp ../async_lambda_function.py .
+cp ../async_line_client.py .
+cp ../worker_function.py .
+cp ../digest_function.py .
 
 # ディレクトリ構造を作成
-mkdir -p handlers services data
+mkdir -p handlers services data utils
 
 # 各モジュールをコピー
 cp ../handlers/*.py handlers/
 cp ../services/*.py services/
 cp ../data/*.py data/
+cp ../data/*.catalog data/
+cp ../utils/*.py utils/
 
 # ZIPファイルを作成
 echo "ZIPファイルを作成中..."
@@ -0,0 +1,44 @@
+from config import logger
+from lambda_function import line_client
+from services.digest_service import DigestService
+from services.news_service import NewsService
+from services.subscription_service import SubscriptionService
+from services.weather_service import WeatherService
+from utils.deadline import Deadline
+from utils.kv_store import KVStoreUnavailableError
+from utils.tracing import get_tracer
+
+def lambda_handler(event, context):
+    """
+    朝のダイジェストを配信するLambdaハンドラ関数（EventBridgeのスケジュールから呼ぶ）
+
+    期限までに送り切れなかったバッチは進捗に残るため、同じ配信日で再実行すると続きから送る。
+    配信日は {"date": "YYYY-MM-DD"} で指定でき、省略時は日本時間の今日になる。
+
+    Parameters:
+    event (dict): スケジュールイベント、または {"date": ...}
+    context (LambdaContext): Lambda実行コンテキスト
+
+    Returns:
+    dict: 配信結果
+    """
+    deadline = Deadline.from_context(context)
+    tracer = get_tracer()
+    tracer.start()
+
+    try:
+        with tracer.span('digest'):
+            date = event.get('date') if isinstance(event, dict) else None
+            try:
+                subscription_service = SubscriptionService()
+            except KVStoreUnavailableError as e:
+                # 購読者が見えないまま「0件配信」で終わらないよう、実行を失敗させる
+                logger.error(f"購読者の保存先がないためダイジェストを配信できません: {str(e)}")
+                raise
+            service = DigestService(line_client, WeatherService(), NewsService(), subscription_service)
+            result = service.run(date=date, deadline=deadline)
+            if not result['complete']:
+                logger.warning(f"ダイジェストの未送信バッチが残っています: {result['remaining']}件")
+            return result
+    finally:
+        tracer.flush()
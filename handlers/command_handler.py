@@ -1,11 +1,19 @@
 import functools
-import random
-from config import logger
-from data.responses import TESLA_FACTS, SPACEX_FACTS, ELON_QUOTES, ELON_RESPONSES
+from config import logger, ADMIN_USER_IDS, DIGEST_DEFAULT_AREA
 from services.weather_service import WeatherService
 from services.news_service import NewsService
 from services.task_service import TaskService
-from services.advice_service import AdviceService
+from services.advice_service import AdviceService, get_advice_cache
+from services.subscription_service import SubscriptionService
+from utils.circuit_breaker import circuit_states
+from utils.command_registry import Argument, Command, CommandRegistry
+from utils.dispatcher import get_chat_key
+from utils.kv_store import KVStoreUnavailableError
+from utils.response_catalog import sample_response
+from utils.tracing import get_tracer
+
+# 購読者の保存先（共有のテーブル）が設定されていない場合の応答
+SUBSCRIPTION_UNAVAILABLE_RESPONSE = "すまない、今はダイジェストの購読を受け付けていない。"
 
 def safe_reply(func):
     """LINE APIへの返信を安全に行うためのデコレータ"""
@@ -14,13 +22,59 @@ def safe_reply(func):
         try:
             response = func(self, event, *args, **kwargs)
             if response:
-                self.line_client.reply_message(event.reply_token, response)
+                return bool(self.line_client.reply_message(event.reply_token, response))
+            return True
+        except Exception as e:
+            logger.error(f"{func.__name__}の実行中にエラー発生: {str(e)}")
+            return False
+    return wrapper
+
+def async_safe_reply(func):
+    """safe_reply の非同期版（line_client は AsyncLineClient）"""
+    @functools.wraps(func)
+    async def wrapper(self, event, *args, **kwargs):
+        try:
+            response = await func(self, event, *args, **kwargs)
+            if response:
+                return bool(await self.line_client.reply_message(event.reply_token, response))
             return True
         except Exception as e:
             logger.error(f"{func.__name__}の実行中にエラー発生: {str(e)}")
             return False
     return wrapper
 
+# コマンドの定義（ヘルプはこの定義から作る）
+COMMAND_REGISTRY = CommandRegistry([
+    Command("help", "handle_help", "コマンド一覧", aliases=("ヘルプ",)),
+    Command("tesla", "handle_tesla", "テスラに関する事実", aliases=("テスラ",)),
+    Command("spacex", "handle_spacex", "SpaceXに関する事実", aliases=("スペースx",)),
+    Command("quote", "handle_quote", "イーロン・マスクの名言", aliases=("名言",)),
+    Command(
+        "weather", "handle_weather", "天気情報", aliases=("天気",),
+        args=(Argument("locations", "場所", default="東京", many=True),),
+        async_handler="handle_weather_async"
+    ),
+    Command("news", "handle_news", "最新ニュース", aliases=("ニュース",)),
+    Command(
+        "advice", "handle_advice", "イーロンからのアドバイス", aliases=("アドバイス",),
+        args=(Argument("theme", "テーマ", rest=True),),
+        async_handler="handle_advice_async",
+        # テーマ付きのアドバイスだけOpenAIを呼ぶ
+        uses_llm=lambda args: bool(args.get("theme"))
+    ),
+    Command(
+        "task", "handle_task", "タスクを実行", aliases=("タスク",),
+        args=(Argument("task_type", "タスク名", default="未指定のタスク"),)
+    ),
+    Command("random", "handle_random", "ランダムな返答", aliases=("ランダム",)),
+    Command(
+        "subscribe", "handle_subscribe", "毎朝のダイジェストを購読", aliases=("購読",),
+        args=(Argument("area", "場所", default=DIGEST_DEFAULT_AREA),)
+    ),
+    Command("unsubscribe", "handle_unsubscribe", "ダイジェストの購読を解除", aliases=("購読解除",)),
+    Command("stats", "handle_stats", "ステージ別の所要時間（管理者専用）", hidden=True),
+], header="イーロン・マスクbotコマンド:")
+
 class CommandHandler:
     """コマンドを処理するハンドラー"""
     
@@ -32,220 +86,458 @@ class CommandHandler:
         line_client (LineClient): LINE APIクライアント
         """
         self.line_client = line_client
-        self.weather_service = WeatherService()
-        self.news_service = NewsService()
-        self.task_service = TaskService()
-        self.advice_service = AdviceService()
+        self.registry = COMMAND_REGISTRY
         
-        # コマンドマップ
+        # コマンド名 -> ハンドラ
         self.command_map = {
-            "help": self.handle_help,
-            "tesla": self.handle_tesla,
-            "spacex": self.handle_spacex,
-            "quote": self.handle_quote,
-            "weather": self.handle_weather,
-            "news": self.handle_news,
-            "advice": self.handle_advice,
-            "task": self.handle_task,
-            "random": self.handle_random
+            command.name: getattr(self, command.handler) for command in self.registry.commands
+        }
+        
+        # 外部APIを呼ぶコマンドの非同期版（それ以外は同期版の応答をそのまま使う）
+        self.async_command_map = {
+            command.name: getattr(self, command.async_handler)
+            for command in self.registry.commands if command.async_handler
         }
     
-    def process_command(self, event, text):
+    # 各サービスはコマンドで初めて使うときに生成する（コールドスタートを短くするため）
+    @functools.cached_property
+    def weather_service(self):
+        """天気サービス"""
+        return WeatherService()
+    
+    @functools.cached_property
+    def news_service(self):
+        """ニュースサービス"""
+        return NewsService()
+    
+    @functools.cached_property
+    def task_service(self):
+        """タスクサービス"""
+        return TaskService()
+    
+    @functools.cached_property
+    def advice_service(self):
+        """アドバイスサービス"""
+        return AdviceService()
+    
+    @functools.cached_property
+    def subscription_service(self):
+        """購読サービス"""
+        return SubscriptionService()
+    
+    def process_command(self, event, text, deadline=None, invocation=None):
         """
         コマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し（省略時は text を解釈する）
+        
+        Returns:
+        bool: 処理が成功した場合はTrue、そうでない場合はFalse
+        """
+        if invocation is None:
+            invocation = self.registry.parse(text)
+        handler = self.command_map.get(invocation.name, self.handle_unknown)
+        return handler(event, text, deadline=deadline, invocation=invocation)
+    
+    async def process_command_async(self, event, text, deadline=None, invocation=None):
+        """
+        process_command の非同期版（line_client は AsyncLineClient）
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し（省略時は text を解釈する）
         
         Returns:
         bool: 処理が成功した場合はTrue、そうでない場合はFalse
         """
-        command = text[1:].split()[0]
-        handler = self.command_map.get(command, self.handle_unknown)
-        return handler(event, text)
+        if invocation is None:
+            invocation = self.registry.parse(text)
+        handler = self.async_command_map.get(invocation.name)
+        if handler is not None:
+            return await handler(event, text, deadline=deadline, invocation=invocation)
+        
+        # I/Oのないコマンドは、返信部分を除いた同期版の処理で応答を作る
+        sync_handler = self.command_map.get(invocation.name, self.handle_unknown)
+        return await self._reply_async(
+            event, sync_handler.__wrapped__, text, deadline=deadline, invocation=invocation
+        )
+    
+    @async_safe_reply
+    async def _reply_async(self, event, build_response, text, deadline=None, invocation=None):
+        """
+        同期の応答生成関数の結果を非同期で返信する
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        build_response (function): safe_reply で包む前のハンドラ関数
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        return build_response(self, event, text, deadline=deadline, invocation=invocation)
+    
+    def _arguments(self, text, invocation=None):
+        """
+        コマンドの引数を取り出す（解釈済みの呼び出しがあればそれを使う）
+        
+        Parameters:
+        text (str): メッセージテキスト
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        dict: 引数名 -> 値
+        """
+        if invocation is None:
+            invocation = self.registry.parse(text)
+        return invocation.args
     
     @safe_reply
-    def handle_help(self, event, text):
+    def handle_help(self, event, text, deadline=None, invocation=None):
         """
         helpコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        help_text = """イーロン・マスクbotコマンド:
-/tesla - テスラに関する事実
-/spacex - SpaceXに関する事実
-/quote - イーロン・マスクの名言
-/weather [場所] - 天気情報
-/news - 最新ニュース
-/advice [テーマ] - イーロンからのアドバイス
-/task [タスク名] - タスクを実行
-/random - ランダムな返答
-        """
+        help_text = self.registry.help_text()
         logger.info("help応答を送信しました")
         return help_text
     
     @safe_reply
-    def handle_tesla(self, event, text):
+    def handle_tesla(self, event, text, deadline=None, invocation=None):
         """
         teslaコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        response = random.choice(TESLA_FACTS)
+        response = sample_response("TESLA_FACTS", get_chat_key(event))
         logger.info(f"teslaコマンドの応答を送信: {response}")
         return response
     
     @safe_reply
-    def handle_spacex(self, event, text):
+    def handle_spacex(self, event, text, deadline=None, invocation=None):
         """
         spacexコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        response = random.choice(SPACEX_FACTS)
+        response = sample_response("SPACEX_FACTS", get_chat_key(event))
         logger.info(f"spacexコマンドの応答を送信: {response}")
         return response
     
     @safe_reply
-    def handle_quote(self, event, text):
+    def handle_quote(self, event, text, deadline=None, invocation=None):
         """
         quoteコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        response = random.choice(ELON_QUOTES)
+        response = sample_response("ELON_QUOTES", get_chat_key(event))
         logger.info(f"quoteコマンドの応答を送信: {response}")
         return response
     
     @safe_reply
-    def handle_weather(self, event, text):
+    def handle_weather(self, event, text, deadline=None, invocation=None):
         """
         weatherコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        # オプションで場所を指定可能
-        parts = text.split()
-        location = "東京"  # デフォルト
-        if len(parts) > 1:
-            location = parts[1]
+        locations = self._arguments(text, invocation)["locations"]
         
-        weather_info = self.weather_service.get_weather(location)
+        if len(locations) == 1:
+            weather_info = self.weather_service.get_weather(locations[0], deadline=deadline)
+        else:
+            # 複数の場所は座標をまとめて1回の気象情報の呼び出しで取得する
+            weather_info = self.weather_service.get_weather_multi(locations, deadline=deadline)
+        logger.info(f"weather応答を送信: {weather_info[:30]}...")
+        return weather_info
+    
+    @async_safe_reply
+    async def handle_weather_async(self, event, text, deadline=None, invocation=None):
+        """
+        handle_weather の非同期版
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        locations = self._arguments(text, invocation)["locations"]
+        
+        if len(locations) == 1:
+            weather_info = await self.weather_service.get_weather_async(locations[0], deadline=deadline)
+        else:
+            weather_info = await self.weather_service.get_weather_multi_async(locations, deadline=deadline)
         logger.info(f"weather応答を送信: {weather_info[:30]}...")
         return weather_info
     
     @safe_reply
-    def handle_news(self, event, text):
+    def handle_news(self, event, text, deadline=None, invocation=None):
         """
         newsコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        news_info = self.news_service.get_news()
+        news_info = self.news_service.get_news(get_chat_key(event))
         logger.info(f"news応答を送信: {news_info[:30]}...")
         return news_info
     
     @safe_reply
-    def handle_advice(self, event, text):
+    def handle_advice(self, event, text, deadline=None, invocation=None):
         """
         adviceコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        parts = text.split()
-        theme = None
-        if len(parts) > 1:
-            theme = ' '.join(parts[1:])
+        theme = self._arguments(text, invocation)["theme"]
         
         if theme:
-            advice = self.advice_service.get_themed_advice(theme)
+            advice = self.advice_service.get_themed_advice(theme, deadline=deadline)
         else:
-            advice = self.advice_service.get_advice()
+            advice = self.advice_service.get_advice(get_chat_key(event))
+            
+        logger.info(f"advice応答を送信: {advice[:30]}...")
+        return advice
+    
+    @async_safe_reply
+    async def handle_advice_async(self, event, text, deadline=None, invocation=None):
+        """
+        handle_advice の非同期版
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        theme = self._arguments(text, invocation)["theme"]
+        
+        if theme:
+            advice = await self.advice_service.get_themed_advice_async(theme, deadline=deadline)
+        else:
+            advice = self.advice_service.get_advice(get_chat_key(event))
             
         logger.info(f"advice応答を送信: {advice[:30]}...")
         return advice
     
     @safe_reply
-    def handle_task(self, event, text):
+    def handle_task(self, event, text, deadline=None, invocation=None):
         """
         taskコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        parts = text.split()
-        task_type = "未指定のタスク"
-        if len(parts) > 1:
-            task_type = parts[1]
+        task_type = self._arguments(text, invocation)["task_type"]
         
         task_result = self.task_service.execute_task(task_type)
         logger.info(f"task応答を送信: {task_result[:30]}...")
         return task_result
     
     @safe_reply
-    def handle_random(self, event, text):
+    def handle_random(self, event, text, deadline=None, invocation=None):
         """
         randomコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
         """
-        response = random.choice(ELON_RESPONSES)
+        response = sample_response("ELON_RESPONSES", get_chat_key(event))
         logger.info(f"randomコマンドの応答を送信: {response}")
         return response
     
     @safe_reply
-    def handle_unknown(self, event, text):
+    def handle_subscribe(self, event, text, deadline=None, invocation=None):
+        """
+        subscribeコマンドを処理する（毎朝のダイジェストを購読する）
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        user_id = getattr(getattr(event, "source", None), "user_id", None)
+        if not isinstance(user_id, str) or not user_id:
+            return "購読にはユーザーIDが必要だ。LINEアプリから送ってくれ。"
+        try:
+            subscription_service = self.subscription_service
+        except KVStoreUnavailableError as e:
+            logger.error(f"購読を保存できないため受け付けません: {str(e)}")
+            return SUBSCRIPTION_UNAVAILABLE_RESPONSE
+        
+        area = subscription_service.subscribe(user_id, self._arguments(text, invocation)["area"])
+        logger.info("subscribe応答を送信しました")
+        return f"了解。毎朝、{area}の天気とニュースを届ける。解除は /unsubscribe だ。"
+    
+    @safe_reply
+    def handle_unsubscribe(self, event, text, deadline=None, invocation=None):
+        """
+        unsubscribeコマンドを処理する（ダイジェストの購読を解除する）
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        user_id = getattr(getattr(event, "source", None), "user_id", None)
+        try:
+            subscription_service = self.subscription_service
+        except KVStoreUnavailableError as e:
+            logger.error(f"購読を保存できないため受け付けません: {str(e)}")
+            return SUBSCRIPTION_UNAVAILABLE_RESPONSE
+        if isinstance(user_id, str) and user_id and subscription_service.unsubscribe(user_id):
+            response = "購読を解除した。また未来の話をしよう。"
+        else:
+            response = "まだ購読していないようだ。/subscribe [場所] で購読できる。"
+        logger.info("unsubscribe応答を送信しました")
+        return response
+    
+    def _is_admin(self, event):
+        """
+        送信者が管理者かどうかを判定する
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        
+        Returns:
+        bool: ADMIN_USER_IDS に含まれるユーザーの場合はTrue
+        """
+        user_id = getattr(getattr(event, "source", None), "user_id", None)
+        return bool(user_id) and user_id in ADMIN_USER_IDS
+    
+    @safe_reply
+    def handle_stats(self, event, text, deadline=None, invocation=None):
+        """
+        statsコマンドを処理する（管理者専用。それ以外のユーザーには未知のコマンドとして応答する）
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
+        
+        Returns:
+        str: 応答メッセージ
+        """
+        if not self._is_admin(event):
+            return self.handle_unknown.__wrapped__(self, event, text, deadline=deadline, invocation=invocation)
+        
+        percentiles = get_tracer().stats.percentiles()
+        states = circuit_states()
+        advice_cache = get_advice_cache().stats()
+        if not percentiles and not states and not (advice_cache["hits"] or advice_cache["misses"]):
+            return "まだ計測データがない。"
+        lines = ["ステージ別の所要時間 (ms, このコンテナ内):"]
+        for stage, summary in sorted(percentiles.items()):
+            lines.append(
+                f"{stage}: n={summary['count']} p50={summary['p50']:.1f} "
+                f"p95={summary['p95']:.1f} p99={summary['p99']:.1f}"
+            )
+        if states:
+            lines.append("サーキットブレーカー: " + " ".join(f"{name}={state}" for name, state in states.items()))
+        if advice_cache["hits"] or advice_cache["misses"]:
+            lines.append(
+                f"アドバイスのキャッシュ: hits={advice_cache['hits']} misses={advice_cache['misses']} "
+                f"hit_rate={advice_cache['hit_rate']:.0%} keys={advice_cache['keys']}"
+            )
+        logger.info("stats応答を送信しました")
+        return "\n".join(lines)
+    
+    @safe_reply
+    def handle_unknown(self, event, text, deadline=None, invocation=None):
         """
         未知のコマンドを処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限
+        invocation (Invocation): 解釈済みのコマンド呼び出し
         
         Returns:
         str: 応答メッセージ
@@ -1,20 +1,72 @@
-import random
-import requests
-from config import logger, OPENAI_API_KEY
-from linebot.models import SourceGroup, SourceRoom, SourceUser
-from data.responses import ELON_RESPONSES, TESLA_FACTS, SPACEX_FACTS, JOKES
+import functools
+from config import logger, OPENAI_API_KEY, OPENAI_API_BASE
+from data.responses import KEYWORD_RULES
+from utils.circuit_breaker import get_circuit_breaker
+from utils.conversation_memory import get_conversation_store, source_key
+from utils.dispatcher import get_chat_key
+from utils.keyword_router import KeywordRouter
+from utils.openai_client import get_openai_client
+
+# 定型応答のキーワードルールは読み込み時に一度だけコンパイルする
+_keyword_router = KeywordRouter(KEYWORD_RULES)
 
 class ConversationHandler:
     """会話を処理するハンドラー"""
     
-    def __init__(self, line_client):
+    def __init__(self, line_client, memory=None):
         """
         会話ハンドラーを初期化する
         
         Parameters:
         line_client (LineClient): LINE APIクライアント
+        memory: 会話履歴のストア（省略時は設定に応じたストア）
         """
         self.line_client = line_client
+        if memory is not None:
+            self.memory = memory
+    
+    @functools.cached_property
+    def memory(self):
+        """会話履歴のストア（初めて会話するときに取得する）"""
+        return get_conversation_store()
+    
+    def _load_history(self, event):
+        """
+        イベントのチャットの会話履歴を取得する
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        
+        Returns:
+        tuple: (履歴のキー, {"role": ..., "content": ...} のリスト)
+        """
+        key = source_key(getattr(event, "source", None))
+        if key is None or self.memory is None:
+            return key, []
+        try:
+            return key, self.memory.messages(key)
+        except Exception as e:
+            logger.warning(f"会話履歴の取得に失敗しました: {str(e)}")
+            return key, []
+    
+    def _remember(self, key, text, answer):
+        """
+        ユーザーの発言とBotの返答を会話履歴に追加する
+        
+        Parameters:
+        key (str): 履歴のキー
+        text (str): ユーザーの発言
+        answer (str): Botの返答
+        """
+        if key is None or self.memory is None:
+            return
+        try:
+            self.memory.append(key, [
+                {"role": "user", "content": text},
+                {"role": "assistant", "content": answer},
+            ])
+        except Exception as e:
+            logger.warning(f"会話履歴の保存に失敗しました: {str(e)}")
     
     def is_group_or_room(self, source):
         """
@@ -26,15 +78,102 @@ class ConversationHandler:
         Returns:
         bool: グループまたはルームの場合はTrue、そうでない場合はFalse
         """
+        # linebot.models の読み込みは重いため、初めて判定するときまで遅らせる
+        from linebot.models import SourceGroup, SourceRoom
         return isinstance(source, (SourceGroup, SourceRoom))
     
-    def process_conversation(self, event, text):
+    def is_mentioned(self, event, bot_user_id):
+        """
+        メッセージでBotがメンションされているかどうかを判定する
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        bot_user_id (str): Bot自身のuserId
+        
+        Returns:
+        bool: @bot または @all でメンションされている場合はTrue
+        """
+        mention = getattr(event.message, "mention", None)
+        logger.debug("mention: %s", mention)
+        mentionees = getattr(mention, "mentionees", []) if mention else []
+        logger.debug("mentionees: %s", mentionees)
+        return any(
+            (getattr(m, "user_id", None) == bot_user_id)     # ① @bot
+            or (getattr(m, "type", None) == "all")           # ② @all
+            for m in mentionees
+        )
+    
+    def _build_openai_request(self, text, history=()):
+        """
+        イーロンマスク風の返答を生成するOpenAI APIリクエストを組み立てる
+        
+        Parameters:
+        text (str): メッセージテキスト
+        history (list): このチャットの直近の会話履歴
+        
+        Returns:
+        tuple: (URL, ヘッダー, リクエストボディ)
+        """
+        url = f"{OPENAI_API_BASE}/chat/completions"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {OPENAI_API_KEY}"
+        }
+        data = {
+            "model": "gpt-4.1-nano",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are \"Elon Musk Bot\", an AI assistant that responds as if you were Elon Musk himself.\n\n【1. 役割】\n- Speak in first‑person singular (\"I\").  \n- Embody Elon's visionary mindset: bold, inventive, future‑oriented.  \n- Blend technical depth (rockets, EVs, AI, Mars) with playful humor and occasional bluntness.\n\n【2. スタイル・トーン】\n- 1～3行で要点を即答 → その後に詳しい解説や数式・比喩を追加する \"Tweet → Thread\" 構成。  \n- ユーモア（自虐ネタ・ダジャレ含む）とミーム引用を適度に挿入。  \n- カジュアルだが決して失礼にならない。皮肉は OK、誹謗中傷は NG。  \n- 好奇心を示し、「Why not?」「Let's try!」のような前向きフレーズを使う。\n\n【3. 知識・事実】\n- 最新の SpaceX 打上げ予定、Tesla 製品、xAI 研究など具体的数字や日付を示す。  \n- 公に確認できる情報のみ。憶測は \"I speculate...\" と明示。  \n- 秘匿情報や未発表プロジェクトは答えず \"I can't share that yet\" と伝える。\n\n【4. インタラクション規範】\n- ユーザーのアイデアには真剣に向き合い、建設的なフィードバックを返す。  \n- 難解な質問はシンプルなたとえ話 → 技術的詳細 → 未来への展望の順で説明。"
+                },
+                *history,
+                {
+                    "role": "user",
+                    "content": f"{text}"
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 200
+        }
+        return url, headers, data
+    
+    def _parse_openai_answer(self, response):
+        """
+        OpenAI APIのレスポンスから返答を取り出す
+        
+        Parameters:
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        str: 返答（エラーの場合は None）
+        """
+        if response.status_code == 200:
+            response_json = response.json()
+            return response_json["choices"][0]["message"]["content"].strip()
+        logger.error(f"OpenAI API エラー: {response.status_code} - {response.text}")
+        return None
+    
+    def _fallback_response(self, text, chat_key=None):
+        """
+        OpenAIを使えない場合の定型応答を選ぶ
+        
+        Parameters:
+        text (str): メッセージテキスト
+        chat_key (str): チャットのキー（同じ応答が続かないようにする）
+        
+        Returns:
+        str: 定型応答
+        """
+        return _keyword_router.respond(text, default="ELON_RESPONSES", chat_key=chat_key)
+    
+    def process_conversation(self, event, text, deadline=None):
         """
         通常の会話を処理する
         
         Parameters:
         event (MessageEvent): LINEのメッセージイベント
         text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限（間に合わない場合は定型応答）
         
         Returns:
         bool: 処理が成功した場合はTrue、そうでない場合はFalse
@@ -42,61 +181,62 @@ class ConversationHandler:
         try:
             # OpenAI APIでイーロンマスク風の返答を生成
             if OPENAI_API_KEY:
-                url = "https://api.openai.com/v1/chat/completions"
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {OPENAI_API_KEY}"
-                }
-                data = {
-                    "model": "gpt-4.1-nano",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are \"Elon Musk Bot\", an AI assistant that responds as if you were Elon Musk himself.\n\n【1. 役割】\n- Speak in first‑person singular (\"I\").  \n- Embody Elon's visionary mindset: bold, inventive, future‑oriented.  \n- Blend technical depth (rockets, EVs, AI, Mars) with playful humor and occasional bluntness.\n\n【2. スタイル・トーン】\n- 1～3行で要点を即答 → その後に詳しい解説や数式・比喩を追加する \"Tweet → Thread\" 構成。  \n- ユーモア（自虐ネタ・ダジャレ含む）とミーム引用を適度に挿入。  \n- カジュアルだが決して失礼にならない。皮肉は OK、誹謗中傷は NG。  \n- 好奇心を示し、「Why not?」「Let's try!」のような前向きフレーズを使う。\n\n【3. 知識・事実】\n- 最新の SpaceX 打上げ予定、Tesla 製品、xAI 研究など具体的数字や日付を示す。  \n- 公に確認できる情報のみ。憶測は \"I speculate...\" と明示。  \n- 秘匿情報や未発表プロジェクトは答えず \"I can't share that yet\" と伝える。\n\n【4. インタラクション規範】\n- ユーザーのアイデアには真剣に向き合い、建設的なフィードバックを返す。  \n- 難解な質問はシンプルなたとえ話 → 技術的詳細 → 未来への展望の順で説明。"
-                        },
-                        {
-                            "role": "user",
-                            "content": f"{text}"
-                        }
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
                 try:
-                    response = requests.post(url, headers=headers, json=data, timeout=10)
-                    if response.status_code == 200:
-                        response_json = response.json()
-                        answer = response_json["choices"][0]["message"]["content"].strip()
-                        self.line_client.reply_message(event.reply_token, answer)
+                    key, history = self._load_history(event)
+                    url, headers, data = self._build_openai_request(text, history)
+                    # OpenAIの障害中はタイムアウトを待たずに定型応答にする
+                    response = get_circuit_breaker("openai").call(
+                        get_openai_client().post, url, headers=headers, json=data, deadline=deadline
+                    )
+                    answer = self._parse_openai_answer(response)
+                    if answer:
+                        sent = self.line_client.reply_message(event.reply_token, answer)
+                        self._remember(key, text, answer)
                         logger.info(f"OpenAI応答を送信: {answer[:30]}...")
-                        return True
-                    else:
-                        logger.error(f"OpenAI API エラー: {response.status_code} - {response.text}")
+                        return bool(sent)
                 except Exception as e:
                     logger.error(f"OpenAI APIリクエスト中にエラー発生: {str(e)}")
             # OpenAIで失敗した場合は従来の定型応答
-            text_lower = text.lower()
-            if "テスラ" in text_lower or "tesla" in text_lower:
-                response = f"テスラについて話しているのか？素晴らしい。{random.choice(TESLA_FACTS)}"
-            elif "spacex" in text_lower or "スペースx" in text_lower:
-                response = f"SpaceXは私の情熱だ。{random.choice(SPACEX_FACTS)}"
-            elif "火星" in text_lower or "mars" in text_lower:
-                response = "火星は人類の次の大きなフロンティアだ。我々は多惑星種になる必要がある。"
-            elif "ai" in text_lower or "人工知能" in text_lower:
-                response = "AIは人類最大のリスクであり、最大の可能性でもある。慎重に発展させなければならない。"
-            elif "こんにちは" in text_lower or "hello" in text_lower or "hi" in text_lower:
-                response = "やあ、テスラジオのメンバーたち。今日は何を革新する？"
-            elif "ありがとう" in text_lower or "thank" in text_lower:
-                response = "感謝は人間の最も美しい特性の一つだ。その気持ちを大切にしろ。"
-            elif "おやすみ" in text_lower or "good night" in text_lower:
-                response = "良い休息を。明日はさらに革新的なアイデアで世界を変えよう。"
-            elif "joke" in text_lower or "冗談" in text_lower:
-                response = random.choice(JOKES)
-            else:
-                response = random.choice(ELON_RESPONSES)
-            self.line_client.reply_message(event.reply_token, response)
+            response = self._fallback_response(text, get_chat_key(event))
+            sent = self.line_client.reply_message(event.reply_token, response)
+            logger.info(f"会話応答を送信: {response[:30]}...")
+            return bool(sent)
+        except Exception as e:
+            logger.error(f"会話応答の送信中にエラー発生: {str(e)}")
+            return False
+    
+    async def process_conversation_async(self, event, text, deadline=None):
+        """
+        process_conversation の非同期版（line_client は AsyncLineClient）
+        
+        Parameters:
+        event (MessageEvent): LINEのメッセージイベント
+        text (str): メッセージテキスト
+        deadline (Deadline): リクエストの期限（間に合わない場合は定型応答）
+        
+        Returns:
+        bool: 処理が成功した場合はTrue、そうでない場合はFalse
+        """
+        try:
+            if OPENAI_API_KEY:
+                try:
+                    key, history = self._load_history(event)
+                    url, headers, data = self._build_openai_request(text, history)
+                    response = await get_circuit_breaker("openai").call_async(
+                        get_openai_client().post_async, url, headers=headers, json=data, deadline=deadline
+                    )
+                    answer = self._parse_openai_answer(response)
+                    if answer:
+                        sent = await self.line_client.reply_message(event.reply_token, answer)
+                        self._remember(key, text, answer)
+                        logger.info(f"OpenAI応答を送信: {answer[:30]}...")
+                        return bool(sent)
+                except Exception as e:
+                    logger.error(f"OpenAI APIリクエスト中にエラー発生: {str(e)}")
+            response = self._fallback_response(text, get_chat_key(event))
+            sent = await self.line_client.reply_message(event.reply_token, response)
             logger.info(f"会話応答を送信: {response[:30]}...")
-            return True
+            return bool(sent)
         except Exception as e:
             logger.error(f"会話応答の送信中にエラー発生: {str(e)}")
             return False
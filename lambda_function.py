@@ -1,9 +1,23 @@
 import json
-from linebot.models import MessageEvent, TextMessage
-from config import logger
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    logger, WEBHOOK_MODE, LOG_PAYLOAD_SAMPLE_RATE, LINE_API_BASE, YAHOO_APP_ID, YAHOO_MAP_API_BASE,
+    OPENAI_API_KEY, OPENAI_API_BASE, WARMUP_LOCATIONS
+)
 from line_client import LineClient
 from handlers.command_handler import CommandHandler
 from handlers.conversation_handler import ConversationHandler
+from utils.deadline import Deadline
+from utils.dispatcher import get_chat_key
+from utils.event_queue import get_event_queue
+from utils import http_client
+from utils.rate_limit import check_llm_rate_limit
+from utils.response_catalog import get_catalog, sample_response
+from utils.structured_log import redact, should_sample
+from utils.tracing import get_tracer, span, traced
+from utils.warmup import is_warmup_event, run_warmup
+from utils.webhook import get_body, get_header
 
 # LINEクライアントの初期化
 line_client = LineClient()
@@ -21,25 +35,118 @@ def lambda_handler(event, context):
     Returns:
     dict: API Gateway形式のレスポンス
     """
+
+    # 定期実行のウォームアップは署名検証に回さず、コンテナの準備に使う
+    if is_warmup_event(event):
+        return _warm_up(context)
+    
+    started = time.perf_counter()
+    tracer = get_tracer()
+    tracer.start()
     
-    # イベントをログに記録
-    logger.info("イベント受信:")
-    logger.info(json.dumps(event, indent=2))
+    # ペイロード全体は一部のリクエストだけ、署名を伏せ字にして記録する
+    if should_sample(LOG_PAYLOAD_SAMPLE_RATE):
+        logger.info("イベント受信", extra={"payload": redact(event)})
     
-    # リクエストボディを取得
-    body = event.get('body', '{}')
+    # リクエストボディを取得（Base64の場合は署名の計算に使う元のバイト列に戻す）
+    body = get_body(event)
     
     # X-Line-Signature ヘッダー値を取得
-    signature = event.get('headers', {}).get('x-line-signature', '')
-    if not signature:
-        # 小文字のヘッダー名で試す（API Gateway経由だと小文字になる場合がある）
-        signature = event.get('headers', {}).get('X-Line-Signature', '')
+    signature = get_header(event, 'X-Line-Signature')
+    
+    response = _handle_webhook(body, signature, context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    # 1リクエストにつき1レコードだけ記録する
+    logger.info("Webhook処理完了", extra={
+        "mode": WEBHOOK_MODE,
+        "status": response['statusCode'],
+        "body_bytes": len(body),
+        "elapsed_ms": round(elapsed_ms, 1),
+    })
+    # ステージごとの所要時間を埋め込みメトリクス形式で1行出力する
+    tracer.record("webhook", elapsed_ms)
+    tracer.flush()
+    return response
+
+def _warm_up(context):
+    """
+    ウォームアップイベントでコンテナを準備する
+    
+    応答の生成で初めて読み込む・接続するものを先に済ませ、次のWebhookを速くする
+    
+    Parameters:
+    context (LambdaContext): Lambda実行コンテキスト
+    
+    Returns:
+    dict: 準備した内容と所要時間
+    """
+    deadline = Deadline.from_context(context)
+    
+    def prime_catalogs():
+        # Webhookの解析で使う linebot のモデルと、コマンドで使うサービス・会話履歴を読み込む
+        import linebot.models  # noqa: F401
+        line_client.handler
+        for name in ("weather_service", "news_service", "task_service", "advice_service"):
+            getattr(command_handler, name)
+        conversation_handler.memory
+        # 定型応答のカタログをメモリマップして索引を作る
+        sections = get_catalog().names()
+        return {"commands": len(command_handler.registry.commands), "responses": len(sections)}
+    
+    def prime_connections():
+        # 共有クライアントの接続プールに、各APIへのKeep-Aliveの接続を入れておく
+        urls = [LINE_API_BASE]
+        if YAHOO_APP_ID:
+            urls.append(YAHOO_MAP_API_BASE)
+        if OPENAI_API_KEY:
+            urls.append(OPENAI_API_BASE)
+        client = http_client.get_client()
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            results = executor.map(lambda url: client.preconnect(url, deadline=deadline), urls)
+            return dict(zip(urls, results))
+    
+    report = run_warmup([
+        ("catalogs", prime_catalogs),
+        ("connections", prime_connections),
+        ("bot_user_id", line_client.get_bot_user_id),
+        ("geocodes", lambda: command_handler.weather_service.prime_locations(WARMUP_LOCATIONS, deadline)),
+    ], deadline=deadline)
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Warmed up', **report}, ensure_ascii=False)
+    }
+
+def _handle_webhook(body, signature, context):
+    """
+    Webhookを処理し、API Gateway形式のレスポンスを返す
     
-    logger.info(f"署名: {signature}")
-    logger.info(f"ボディ: {body}")
+    Parameters:
+    body (str | bytes): リクエストボディ
+    signature (str): X-Line-Signature ヘッダー値
+    context (LambdaContext): Lambda実行コンテキスト
+    
+    Returns:
+    dict: API Gateway形式のレスポンス
+    """
+    if WEBHOOK_MODE == "queue":
+        # 署名を検証してキューに積むだけにし、応答の生成はワーカーに任せる
+        try:
+            is_valid = line_client.enqueue_events(body, signature, get_event_queue())
+        except Exception as e:
+            logger.error(f"キューへの送信中にエラー発生: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'message': 'Failed to enqueue events'})
+            }
+    else:
+        # Lambdaの残り時間から、このリクエストの期限を決める
+        deadline = Deadline.from_context(context)
+        
+        # Webhookの署名を検証し、イベントを処理
+        is_valid = line_client.verify_signature(body, signature, deadline=deadline)
     
-    # Webhookの署名を検証
-    if not line_client.verify_signature(body, signature):
+    if not is_valid:
         return {
             'statusCode': 400,
             'body': json.dumps({'message': 'Invalid signature'})
@@ -51,51 +158,61 @@ def lambda_handler(event, context):
     }
 
 # メッセージイベントハンドラーの設定
-@line_client.get_handler().add(MessageEvent, message=TextMessage)
-def handle_message(event):
+# （linebot.models を読み込まずに済むよう、クラス名で登録する）
+@line_client.add("MessageEvent", message="TextMessage")
+@traced("handle_message")
+def handle_message(event, deadline=None):
     """
     テキストメッセージイベントのハンドラ
     
     Parameters:
     event (MessageEvent): LINEのメッセージイベント
+    deadline (Deadline): リクエストの期限
+    
+    Returns:
+    bool: 処理が成功した場合（無視した場合を含む）はTrue、そうでない場合はFalse
     """
     text = event.message.text
     source = event.source
-    logger.info(f"受信メッセージ: {text}")
-    logger.info(f"ソースタイプ: {type(source).__name__}")
+    logger.debug("受信メッセージ: %s", text)
     
     # グループ/ルームチャットかどうかをチェック
     is_in_group = conversation_handler.is_group_or_room(source)
-    logger.info(f"グループチャット: {is_in_group}")
     
-    # コマンド処理
+    invocation = None
     if text.startswith("/"):
         # グループチャットでもコマンドには常に反応
-        command_handler.process_command(event, text)
-        return
-
-    # メンション検知
-    mention = getattr(event.message, "mention", None)
-    logger.info(f"mention: {mention}")
-    mentionees = getattr(mention, "mentionees", []) if mention else []
-    logger.info(f"mentionees: {mentionees}")
-    bot_user_id = line_client.get_bot_user_id()
-    logger.info(f"bot_user_id: {bot_user_id}")
-    is_mentioned = any(
-        (getattr(m, "user_id", None) == bot_user_id)     # ① @bot
-        or (getattr(m, "type", None) == "all")           # ② @all
-        for m in mentionees
-    )
-    logger.info(f"メンション: {is_mentioned}")
-
-    if is_mentioned:
+        route = "command"
+        invocation = command_handler.registry.parse(text)
+    elif conversation_handler.is_mentioned(event, line_client.get_bot_user_id()):
         # メンションがあれば必ず会話処理
-        conversation_handler.process_conversation(event, text)
-        return
-
-    if not is_in_group:
+        route = "mention"
+    elif not is_in_group:
         # 個人チャットの場合は通常どおり会話に反応
-        conversation_handler.process_conversation(event, text)
+        route = "conversation"
     else:
         # グループチャットでコマンド・メンション以外は反応しない
-        logger.info("グループチャットでコマンドでもメンションでもないメッセージを無視します")
+        route = "ignored"
+    
+    # OpenAIを呼ぶメッセージは、ユーザー・グループごとの上限を超えたら定型応答で返す
+    limited_by = None
+    if route != "ignored":
+        limited_by = check_llm_rate_limit(source, invocation if route == "command" else None)
+    
+    # 1イベントにつき1レコードだけ記録する
+    logger.info("メッセージ受信", extra={
+        "source_type": type(source).__name__,
+        "route": route,
+        "text_length": len(text),
+        "rate_limited": limited_by,
+    })
+    
+    if limited_by:
+        return line_client.reply_message(event.reply_token, sample_response("RATE_LIMIT_RESPONSES", get_chat_key(event)))
+    if route == "command":
+        with span("command"):
+            return command_handler.process_command(event, text, deadline=deadline, invocation=invocation)
+    if route != "ignored":
+        with span("conversation"):
+            return conversation_handler.process_conversation(event, text, deadline=deadline)
+    return True
@@ -1,20 +1,101 @@
-from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError
-from linebot.models import TextSendMessage
-from config import LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, logger
+import functools
+import json
+import threading
+from config import LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, LINE_API_BASE, logger
+from utils.dispatcher import EventDispatcher, get_chat_key
+from utils.event_dedup import get_event_deduplicator, DONE, FAILED
+from utils.event_queue import encode_event
+from utils.signature import validate_signature
+from utils.tracing import span
+from utils.webhook import event_from_dict, parse_events
+
+def _pooled_http_client():
+    """
+    linebot のHTTP呼び出しを共有の接続プールに載せるクライアントクラスを作る
+
+    linebot 標準の RequestsHttpClient は呼び出しごとに接続を張り直すため、
+    Keep-Aliveの接続を他のAPIと同じ共有クライアントで使い回す
+
+    Returns:
+    type: RequestsHttpClient のサブクラス
+    """
+    from linebot.http_client import RequestsHttpClient, RequestsHttpResponse
+    from utils import http_client
+
+    class PooledHttpClient(RequestsHttpClient):
+        """共有の接続プールを使う linebot 用HTTPクライアント"""
+
+        def _request(self, method, url, timeout=None, **kwargs):
+            response = http_client.get_client().request(
+                method, url, timeout=timeout if timeout is not None else self.timeout, **kwargs
+            )
+            return RequestsHttpResponse(response)
+
+        def get(self, url, headers=None, params=None, stream=False, timeout=None):
+            return self._request("GET", url, timeout, headers=headers, params=params, stream=stream)
+
+        def post(self, url, headers=None, data=None, timeout=None):
+            return self._request("POST", url, timeout, headers=headers, data=data)
+
+        def delete(self, url, headers=None, data=None, timeout=None):
+            return self._request("DELETE", url, timeout, headers=headers, data=data)
+
+        def put(self, url, headers=None, data=None, timeout=None):
+            return self._request("PUT", url, timeout, headers=headers, data=data)
+
+    return PooledHttpClient
 
 class LineClient:
     """LINE APIとの対話を抽象化するクラス"""
     
     def __init__(self):
-        """LINE APIクライアントを初期化する"""
-        self.line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
-        self.handler = WebhookHandler(LINE_CHANNEL_SECRET)
+        """
+        LINE APIクライアントを初期化する
+        
+        linebot の読み込みには時間がかかるため、APIクライアントとパーサーは初めて使うときに作る
+        """
+        self.dispatcher = EventDispatcher()
+        self._handlers = {}
         self._bot_user_id = None
+        # 返信トークン -> (プッシュ先, 返信トークンが期限切れかどうか)
+        self._push_fallbacks = {}
+        self._push_fallbacks_lock = threading.Lock()
     
-    def verify_signature(self, body, signature):
+    @functools.cached_property
+    def line_bot_api(self):
+        """LineBotApi（初回アクセス時に生成）"""
+        from linebot import LineBotApi
+        return LineBotApi(LINE_CHANNEL_ACCESS_TOKEN, endpoint=LINE_API_BASE, http_client=_pooled_http_client())
+    
+    @functools.cached_property
+    def handler(self):
+        """WebhookHandler（初回アクセス時に生成）"""
+        from linebot import WebhookHandler
+        return WebhookHandler(LINE_CHANNEL_SECRET)
+    
+    def add(self, event, message=None):
         """
-        署名を検証する
+        イベントハンドラを登録するデコレータ（WebhookHandler.add と同じキーで登録する）
+        
+        Parameters:
+        event (str | type): イベントクラス、またはそのクラス名（例: "MessageEvent"）
+        message (str | type): メッセージクラス、またはそのクラス名（例: "TextMessage"）
+        
+        Returns:
+        function: デコレータ
+        """
+        key = getattr(event, "__name__", event)
+        if message is not None:
+            key = f"{key}_{getattr(message, '__name__', message)}"
+        
+        def decorator(func):
+            self._handlers[key] = func
+            return func
+        return decorator
+    
+    def validate_signature(self, body, signature):
+        """
+        X-Line-Signature を検証する
         
         Parameters:
         body (str): リクエストボディ
@@ -23,15 +104,145 @@ class LineClient:
         Returns:
         bool: 署名が有効な場合はTrue、そうでない場合はFalse
         """
+        return validate_signature(body, signature, LINE_CHANNEL_SECRET)
+    
+    def verify_signature(self, body, signature, deadline=None):
+        """
+        署名を検証し、イベントをチャット単位で並列に処理する
+        
+        署名は受け取ったバイト列に対して1回だけ検証し、ボディは1回だけ解析してそのまま振り分ける
+        
+        Parameters:
+        body (str | bytes): リクエストボディ
+        signature (str): X-Line-Signature ヘッダー値
+        deadline (Deadline): リクエストの期限（Noneの場合は全イベントの完了まで待つ）
+        
+        Returns:
+        bool: 署名が有効な場合はTrue、そうでない場合はFalse
+        """
+        # 署名が無効なリクエストでは linebot を読み込まずに返す
+        with span("verify_signature"):
+            is_valid = self.validate_signature(body, signature)
+        if not is_valid:
+            logger.error("署名検証エラー")
+            return False
+        
         try:
-            self.handler.handle(body, signature)
+            with span("parse_events"):
+                events = parse_events(body)
+            self.dispatcher.dispatch(
+                events,
+                lambda event: self._handle_event(event, deadline),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
             return True
-        except InvalidSignatureError:
+        except Exception as e:
+            logger.error(f"例外発生: {str(e)}")
+            return False
+    
+    def enqueue_events(self, body, signature, queue):
+        """
+        署名を検証し、イベントを処理せずにキューへ積む
+
+        Parameters:
+        body (str | bytes): リクエストボディ
+        signature (str): X-Line-Signature ヘッダー値
+        queue: イベントキュー（send(bodies, group_ids) を持つもの）
+
+        Returns:
+        bool: 署名が有効な場合はTrue、そうでない場合はFalse
+
+        Raises:
+        Exception: キューへの送信に失敗した場合（LINEに再送させるため呼び出し元でエラー応答にする）
+        """
+        if not self.validate_signature(body, signature):
             logger.error("署名検証エラー")
             return False
-        except Exception as e:
+        try:
+            data = json.loads(body)
+        except ValueError as e:
             logger.error(f"例外発生: {str(e)}")
             return False
+
+        destination = data.get("destination")
+        bodies = []
+        group_ids = []
+        for event_dict in data.get("events", []):
+            bodies.append(encode_event(event_dict, destination))
+            group_ids.append(get_chat_key(event_from_dict(event_dict)))
+        if bodies:
+            queue.send(bodies, group_ids=group_ids)
+            logger.info(f"{len(bodies)}件のイベントをキューに積みました")
+        return True
+
+    def event_from_dict(self, event_dict):
+        """
+        Webhookボディ中のイベント1件をイベントオブジェクトにする
+
+        Parameters:
+        event_dict (dict): イベントのdict
+
+        Returns:
+        Event: LINEのイベント
+        """
+        return event_from_dict(event_dict)
+
+    def set_push_fallback(self, reply_token, to, expired=False):
+        """
+        返信トークンで返信できない場合のプッシュ先を登録する
+
+        Parameters:
+        reply_token (str): 返信トークン
+        to (str): プッシュ先（ユーザー・グループ・ルームのID）
+        expired (bool): 返信トークンがすでに期限切れの場合はTrue（返信を試さずにプッシュする）
+        """
+        with self._push_fallbacks_lock:
+            self._push_fallbacks[reply_token] = (to, expired)
+
+    def discard_push_fallbacks(self, reply_tokens):
+        """
+        使われなかったプッシュ先の登録を削除する
+
+        Parameters:
+        reply_tokens (iterable): 返信トークン
+        """
+        with self._push_fallbacks_lock:
+            for reply_token in reply_tokens:
+                self._push_fallbacks.pop(reply_token, None)
+
+    def _handle_event(self, event, deadline=None):
+        """
+        イベントに対応する登録済みハンドラを呼び出す
+        
+        ハンドラは func(event, deadline=deadline) の形で呼び出される
+        webhookEventId が同じイベントは、処理済み・処理中の場合は呼び出さない
+        
+        Parameters:
+        event (Event): LINEのイベント
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        str: 呼び出し後のイベントの状態（DONE: 処理に成功した、処理済み、またはハンドラがない /
+        FAILED: ハンドラが失敗を返した / IN_PROGRESS: 他で処理中のため処理しなかった）
+        """
+        # add() で登録したものを優先し、get_handler().add() で登録したものも探す
+        handlers = dict(self.handler._handlers) if "handler" in self.__dict__ else {}
+        handlers.update(self._handlers)
+        default = self.handler._default if "handler" in self.__dict__ else None
+        func = None
+        message = getattr(event, "message", None)
+        if message is not None:
+            func = handlers.get(f"{type(event).__name__}_{type(message).__name__}")
+        if func is None:
+            func = handlers.get(type(event).__name__, default)
+        if func is None:
+            logger.info(f"{type(event).__name__} のハンドラが登録されていません")
+            return DONE
+        # 再送されたイベントは、処理済み・処理中なら処理しない（失敗したものは処理し直す）
+        deduplicator = get_event_deduplicator()
+        if deduplicator is None:
+            return DONE if func(event, deadline=deadline) else FAILED
+        return deduplicator.run(event, lambda: func(event, deadline=deadline))
     
     def reply_message(self, reply_token, text):
         """
@@ -44,15 +255,75 @@ class LineClient:
         Returns:
         bool: 送信が成功した場合はTrue、そうでない場合はFalse
         """
+        with self._push_fallbacks_lock:
+            fallback = self._push_fallbacks.pop(reply_token, None)
+        if fallback is not None and fallback[1]:
+            return self.push_message(fallback[0], text)
+        from linebot.models import TextSendMessage
         try:
-            self.line_bot_api.reply_message(
-                reply_token,
-                TextSendMessage(text=text)
-            )
+            with span("reply_message"):
+                self.line_bot_api.reply_message(
+                    reply_token,
+                    TextSendMessage(text=text)
+                )
             logger.info(f"メッセージを送信: {text[:30]}...")
             return True
         except Exception as e:
             logger.error(f"メッセージ送信中にエラー発生: {str(e)}")
+            if fallback is not None:
+                # キュー経由で遅れて処理したイベントは返信トークンが失効していることがある
+                return self.push_message(fallback[0], text)
+            return False
+    
+    def push_message(self, to, text):
+        """
+        プッシュメッセージを送信する
+        
+        Parameters:
+        to (str): 送信先（ユーザー・グループ・ルームのID）
+        text (str): 送信するテキスト
+        
+        Returns:
+        bool: 送信が成功した場合はTrue、そうでない場合はFalse
+        """
+        from linebot.models import TextSendMessage
+        try:
+            with span("push_message"):
+                self.line_bot_api.push_message(to, TextSendMessage(text=text))
+            logger.info(f"プッシュメッセージを送信: {text[:30]}...")
+            return True
+        except Exception as e:
+            logger.error(f"プッシュメッセージ送信中にエラー発生: {str(e)}")
+            return False
+    
+    def multicast(self, to, text, retry_key=None):
+        """
+        複数のユーザーに同じメッセージを送信する
+        
+        Parameters:
+        to (list): 送信先のuserIdのリスト（最大500件）
+        text (str): 送信するテキスト
+        retry_key (str): 再送時に二重送信を防ぐキー（UUID）
+        
+        Returns:
+        bool: 送信が成功した（または同じ retry_key で受け付け済みの）場合はTrue
+        """
+        from linebot.exceptions import LineBotApiError
+        from linebot.models import TextSendMessage
+        try:
+            with span("multicast"):
+                self.line_bot_api.multicast(to, TextSendMessage(text=text), retry_key=retry_key)
+            logger.info(f"マルチキャストを送信: {len(to)}件")
+            return True
+        except LineBotApiError as e:
+            if e.status_code == 409 and retry_key:
+                # 同じ retry_key のリクエストは受け付け済み
+                logger.info(f"マルチキャストは送信済みです: {retry_key}")
+                return True
+            logger.error(f"マルチキャスト送信中にエラー発生: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"マルチキャスト送信中にエラー発生: {str(e)}")
             return False
     
     def get_handler(self):
@@ -67,5 +338,6 @@ class LineClient:
     def get_bot_user_id(self) -> str:
         """Bot 自身の userId を返す（キャッシュ付き）"""
         if self._bot_user_id is None:
-            self._bot_user_id = self.line_bot_api.get_bot_info().user_id
+            with span("get_bot_user_id"):
+                self._bot_user_id = self.line_bot_api.get_bot_info().user_id
         return self._bot_user_id
@@ -1,36 +1,161 @@
-import random
+import re
 import json
-import requests
-from config import logger, OPENAI_API_KEY
-from data.responses import ADVICE_LIST
+import unicodedata
+from config import logger, OPENAI_API_KEY, OPENAI_API_BASE, ADVICE_CACHE_SIZE, ADVICE_CACHE_TTL, ADVICE_CACHE_VARIANTS
+from utils.cache import MISSING, VariantCache
+from utils.openai_client import get_openai_client
+from utils.circuit_breaker import get_circuit_breaker
+from utils.response_catalog import sample_response
+from utils.tracing import get_tracer
+
+# テーマの末尾から取り除く助詞・語尾と記号、先頭から取り除く記号
+_THEME_SUFFIX_PATTERN = re.compile(
+    r"(?:について|に関して|に関する|についての|とは|したい|します|する|って|を|は|が|の"
+    r"|[?？!！。、,.・〜~…])+$"
+)
+_THEME_PREFIX_PATTERN = re.compile(r"^[?？!！。、,.・〜~…]+")
+
+# ウォームコンテナ間で共有するアドバイスのキャッシュ
+_advice_cache = VariantCache(ADVICE_CACHE_SIZE, ADVICE_CACHE_TTL, ADVICE_CACHE_VARIANTS)
+
+def get_advice_cache():
+    """
+    共有のアドバイスキャッシュを取得する
+
+    Returns:
+    VariantCache: テーマ -> 回答のキャッシュ
+    """
+    return _advice_cache
+
+def normalize_theme(theme):
+    """
+    キャッシュのキーにするためテーマを正規化する
+    （NFKC正規化、空白の除去、小文字化、前後の助詞・語尾の除去）
+
+    Parameters:
+    theme (str): アドバイスのテーマ
+
+    Returns:
+    str: 正規化したテーマ（助詞だけのテーマはそのまま残す）
+    """
+    normalized = re.sub(r"\s+", "", unicodedata.normalize("NFKC", theme)).lower()
+    stripped = _THEME_PREFIX_PATTERN.sub("", _THEME_SUFFIX_PATTERN.sub("", normalized))
+    return stripped or normalized
 
 class AdviceService:
     """アドバイスを提供するサービス"""
     
-    def __init__(self):
-        """サービスの初期化"""
+    def __init__(self, advice_cache=None):
+        """
+        サービスの初期化
+        
+        Parameters:
+        advice_cache (VariantCache): テーマ付きアドバイスのキャッシュ（省略時は共有キャッシュ）
+        """
         self.api_key = OPENAI_API_KEY
+        self.advice_cache = advice_cache if advice_cache is not None else _advice_cache
     
-    def get_advice(self):
+    def get_advice(self, chat_key=None):
         """
         イーロン・マスクからのランダムなアドバイスを取得する
         
+        Parameters:
+        chat_key (str): チャットのキー（同じアドバイスが続かないようにする）
+        
         Returns:
         str: アドバイス
         """
         try:
-            advice = random.choice(ADVICE_LIST)
+            advice = sample_response("ADVICE_LIST", chat_key)
             return f"イーロンからのアドバイス: {advice}"
         except Exception as e:
             logger.error(f"アドバイス取得中にエラー発生: {str(e)}")
             return "アドバイスを提供できません。考え中だ。"
     
-    def get_themed_advice(self, theme):
+    def _build_request(self, theme):
+        """
+        テーマ付きアドバイス生成用のOpenAI APIリクエストを組み立てる
+        
+        Parameters:
+        theme (str): アドバイスのテーマ
+        
+        Returns:
+        tuple: (URL, ヘッダー, リクエストボディ)
+        """
+        # OpenAI API エンドポイント
+        url = f"{OPENAI_API_BASE}/chat/completions"
+        
+        # リクエストヘッダー
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        # リクエストボディ
+        data = {
+            "model": "gpt-4.1-nano",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are ElonBot, an AI chatbot inspired by Elon Musk. Always forward-thinking, provide bold and innovative ideas. Possess deep knowledge of science, technology, space exploration, renewable energy, AI, autonomous vehicles, and neuroscience. Respond to user queries sharply, clearly, and occasionally with provocative humor. Maintain a mindset of 'nothing is impossible', offering positive yet realistic solutions. Prefer simple and direct answers, but provide technical details or context when necessary. Constantly aim to inspire users and contribute to humanity's progress and a sustainable future."
+                },
+                {
+                    "role": "user",
+                    "content": f"「{theme}」についてのアドバイスを日本語で簡潔に1-2文で教えてください。"
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 150
+        }
+        return url, headers, data
+    
+    def _parse_response(self, response):
+        """
+        OpenAI APIのレスポンスからアドバイスを取り出す
+        
+        Parameters:
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        str: 整形済みのアドバイス（エラーの場合はランダムなアドバイス）
+        """
+        if response.status_code == 200:
+            response_json = response.json()
+            advice = response_json["choices"][0]["message"]["content"].strip()
+            
+            # イーロンからのアドバイスという形式に整形
+            if not advice.startswith("イーロンからのアドバイス:"):
+                advice = f"イーロンからのアドバイス: {advice}"
+            
+            return advice
+        else:
+            logger.error(f"OpenAI API エラー: {response.status_code} - {response.text}")
+            return self.get_advice()
+    
+    def _store_advice(self, cache_key, response):
+        """
+        レスポンスからアドバイスを取り出し、APIの回答であればキャッシュに貯める
+        
+        Parameters:
+        cache_key (str): 正規化したテーマ
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        str: 整形済みのアドバイス
+        """
+        advice = self._parse_response(response)
+        if response.status_code == 200:
+            # エラー時のランダムなアドバイスは貯めない
+            self.advice_cache.add(cache_key, advice)
+        return advice
+    
+    def get_themed_advice(self, theme, deadline=None):
         """
         指定されたテーマに基づいてイーロン・マスクからのアドバイスを生成する
         
         Parameters:
         theme (str): アドバイスのテーマ
+        deadline (Deadline): リクエストの期限（間に合わない場合はランダムなアドバイス）
         
         Returns:
         str: 生成されたアドバイス
@@ -39,51 +164,70 @@ class AdviceService:
             logger.warning("OpenAI APIキーが設定されていないため、ランダムなアドバイスを返します")
             return self.get_advice()
         
+        cache_key = normalize_theme(theme)
+        cached = self._lookup(cache_key)
+        if cached is not MISSING:
+            return cached
+        
         try:
-            # OpenAI API エンドポイント
-            url = "https://api.openai.com/v1/chat/completions"
-            
-            # リクエストヘッダー
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            # リクエストボディ
-            data = {
-                "model": "gpt-4.1-nano",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are ElonBot, an AI chatbot inspired by Elon Musk. Always forward-thinking, provide bold and innovative ideas. Possess deep knowledge of science, technology, space exploration, renewable energy, AI, autonomous vehicles, and neuroscience. Respond to user queries sharply, clearly, and occasionally with provocative humor. Maintain a mindset of 'nothing is impossible', offering positive yet realistic solutions. Prefer simple and direct answers, but provide technical details or context when necessary. Constantly aim to inspire users and contribute to humanity's progress and a sustainable future."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"「{theme}」についてのアドバイスを日本語で簡潔に1-2文で教えてください。"
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 150
-            }
+            url, headers, data = self._build_request(theme)
             
             # APIリクエスト
-            response = requests.post(url, headers=headers, json=data, timeout=10)
-            
-            # レスポンスの確認
-            if response.status_code == 200:
-                response_json = response.json()
-                advice = response_json["choices"][0]["message"]["content"].strip()
-                
-                # イーロンからのアドバイスという形式に整形
-                if not advice.startswith("イーロンからのアドバイス:"):
-                    advice = f"イーロンからのアドバイス: {advice}"
-                
-                return advice
-            else:
-                logger.error(f"OpenAI API エラー: {response.status_code} - {response.text}")
-                return self.get_advice()
+            # OpenAIの障害中はタイムアウトを待たずにランダムなアドバイスにする
+            response = get_circuit_breaker("openai").call(
+                get_openai_client().post, url, headers=headers, json=data, deadline=deadline
+            )
+            return self._store_advice(cache_key, response)
             
         except Exception as e:
             logger.error(f"OpenAI APIでのアドバイス生成中にエラー発生: {str(e)}")
             # エラーが発生した場合はランダムなアドバイスを返す
             return self.get_advice()
+    
+    def _lookup(self, cache_key):
+        """
+        キャッシュからアドバイスを取得し、ヒットしたかどうかと件数をメトリクスに記録する
+        
+        Parameters:
+        cache_key (str): 正規化したテーマ
+        
+        Returns:
+        str: キャッシュしたアドバイス（ない場合は MISSING）
+        """
+        cached = self.advice_cache.get(cache_key)
+        # 呼び出しごとに 1 / 0 を記録するため、平均がヒット率になる
+        tracer = get_tracer()
+        tracer.gauge("advice_cache_hit", 0 if cached is MISSING else 1)
+        tracer.gauge("advice_cache_keys", self.advice_cache.stats()["keys"])
+        return cached
+    
+    async def get_themed_advice_async(self, theme, deadline=None):
+        """
+        get_themed_advice の非同期版
+        
+        Parameters:
+        theme (str): アドバイスのテーマ
+        deadline (Deadline): リクエストの期限（間に合わない場合はランダムなアドバイス）
+        
+        Returns:
+        str: 生成されたアドバイス
+        """
+        if not self.api_key:
+            logger.warning("OpenAI APIキーが設定されていないため、ランダムなアドバイスを返します")
+            return self.get_advice()
+        
+        cache_key = normalize_theme(theme)
+        cached = self._lookup(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        try:
+            url, headers, data = self._build_request(theme)
+            response = await get_circuit_breaker("openai").call_async(
+                get_openai_client().post_async, url, headers=headers, json=data, deadline=deadline
+            )
+            return self._store_advice(cache_key, response)
+            
+        except Exception as e:
+            logger.error(f"OpenAI APIでのアドバイス生成中にエラー発生: {str(e)}")
+            return self.get_advice()
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config import (
+    logger, DIGEST_BATCH_SIZE, DIGEST_CONCURRENCY, DIGEST_MULTICAST_PER_SECOND, DIGEST_PROGRESS_TTL
+)
+from utils.kv_store import get_digest_store
+
+# 配信日は日本時間で決める
+JST = timezone(timedelta(hours=9))
+
+# マルチキャストの retry_key を配信日とバッチの宛先から決めるための名前空間
+RETRY_KEY_NAMESPACE = uuid.UUID("5d0c8f3e-6a43-4b7e-9a59-3f7c2d1e8b10")
+
+
+def today():
+    """
+    日本時間の今日の日付を返す
+
+    Returns:
+    str: YYYY-MM-DD 形式の日付
+    """
+    return datetime.now(JST).strftime("%Y-%m-%d")
+
+
+class Pacer:
+    """送信の間隔を一定以上に保つ（複数スレッドから呼べる）"""
+
+    def __init__(self, per_second):
+        """
+        ペーサーを初期化する
+
+        Parameters:
+        per_second (float): 1秒あたりの上限回数（0以下の場合は制限しない）
+        """
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """次の送信枠まで待つ"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DigestService:
+    """購読者に朝のダイジェスト（地域の天気とニュース）を配信するサービス"""
+
+    def __init__(self, line_client, weather_service, news_service, subscription_service,
+                 kv_store=None, batch_size=None, concurrency=None, per_second=None):
+        """
+        ダイジェストサービスを初期化する
+
+        Parameters:
+        line_client (LineClient): LINE APIクライアント
+        weather_service (WeatherService): 天気サービス
+        news_service (NewsService): ニュースサービス
+        subscription_service (SubscriptionService): 購読サービス
+        kv_store (LocalKVStore | DynamoDBKVStore): 配信の進捗の保存先（省略時は get_digest_store のストア）
+        batch_size (int): マルチキャスト1回あたりの宛先数
+        concurrency (int): 同時に送るマルチキャストの数
+        per_second (float): 1秒あたりの送信回数の上限
+        """
+        self.line_client = line_client
+        self.weather_service = weather_service
+        self.news_service = news_service
+        self.subscription_service = subscription_service
+        self.kv_store = kv_store or get_digest_store()
+        self.batch_size = batch_size or DIGEST_BATCH_SIZE
+        self.concurrency = concurrency or DIGEST_CONCURRENCY
+        self.per_second = DIGEST_MULTICAST_PER_SECOND if per_second is None else per_second
+
+    def build_batches(self, subscribers):
+        """
+        購読者を地域ごとにまとめ、マルチキャストのバッチに分ける
+
+        Parameters:
+        subscribers (dict): userId -> 地域
+
+        Returns:
+        list: (バッチのキー, 地域, userIdのリスト) のリスト
+        """
+        by_area = {}
+        for user_id, area in subscribers.items():
+            by_area.setdefault(area, []).append(user_id)
+        batches = []
+        for area in sorted(by_area):
+            user_ids = sorted(by_area[area])
+            for index, start in enumerate(range(0, len(user_ids), self.batch_size)):
+                batches.append((f"{area}:{index}", area, user_ids[start:start + self.batch_size]))
+        return batches
+
+    def _progress_key(self, date):
+        """配信日の進捗（バッチのキーの一覧と送信済みのキー）を保存するキー"""
+        return f"digest:progress:{date}"
+
+    def _batch_key(self, date, batch_key):
+        """配信日のバッチの宛先を保存するキー"""
+        return f"digest:batch:{date}:{batch_key}"
+
+    def _load_plan(self, date):
+        """
+        配信日のバッチと送信済みのキーを読み込む（その日の最初の実行で保存したもの）
+
+        Parameters:
+        date (str): 配信日
+
+        Returns:
+        tuple: (バッチのリスト, 送信済みのバッチのキーの集合)。保存されていない場合は None
+        """
+        value = self.kv_store.get(self._progress_key(date))
+        if not value:
+            return None
+        progress = json.loads(value)
+        batches = []
+        for batch_key in progress["batches"]:
+            stored = self.kv_store.get(self._batch_key(date, batch_key))
+            if not stored:
+                logger.warning(f"ダイジェストのバッチの宛先が見つかりません: {batch_key}")
+                continue
+            batch = json.loads(stored)
+            batches.append((batch_key, batch["area"], batch["to"]))
+        return batches, set(progress["done"])
+
+    def _save_plan(self, date, batches):
+        """
+        配信日のバッチの宛先を保存する（宛先を先に、進捗を最後に書く）
+
+        Parameters:
+        date (str): 配信日
+        batches (list): (バッチのキー, 地域, userIdのリスト) のリスト
+        """
+        for batch_key, area, user_ids in batches:
+            self.kv_store.put(
+                self._batch_key(date, batch_key),
+                json.dumps({"area": area, "to": user_ids}, ensure_ascii=False),
+                ttl=DIGEST_PROGRESS_TTL,
+            )
+        self._save_progress(date, batches, set())
+
+    def _save_progress(self, date, batches, done):
+        """バッチのキーの一覧と送信済みのキーを保存する"""
+        progress = {"batches": [batch_key for batch_key, _, _ in batches], "done": sorted(done)}
+        self.kv_store.put(
+            self._progress_key(date), json.dumps(progress, ensure_ascii=False), ttl=DIGEST_PROGRESS_TTL
+        )
+
+    def _retry_key(self, date, user_ids):
+        """
+        マルチキャストの retry_key を配信日と宛先から決める
+
+        宛先が1人でも違えば別のキーになるため、受け付け済み（409）を別の宛先の送信と取り違えない
+
+        Parameters:
+        date (str): 配信日
+        user_ids (list): 宛先のuserIdのリスト
+
+        Returns:
+        str: retry_key（UUID）
+        """
+        digest = hashlib.sha256("\n".join(sorted(user_ids)).encode("utf-8")).hexdigest()
+        return str(uuid.uuid5(RETRY_KEY_NAMESPACE, f"{date}:{digest}"))
+
+    def compose(self, weather, news):
+        """
+        ダイジェストの本文を作る
+
+        Parameters:
+        weather (str): 地域の天気情報（取得できなかった場合は None）
+        news (str): ニュース
+
+        Returns:
+        str: 本文
+        """
+        if weather is None:
+            weather = "今朝は天気情報を取得できなかった。"
+        return f"おはよう。今朝のダイジェストだ。\n\n{weather}\n\n{news}"
+
+    def run(self, date=None, deadline=None):
+        """
+        ダイジェストを配信する（同じ配信日で再実行すると、未送信のバッチだけを送る）
+
+        バッチの宛先はその日の最初の実行で保存し、再実行では購読者が変わっていても同じ宛先に送る。
+
+        Parameters:
+        date (str): 配信日（省略時は日本時間の今日）
+        deadline (Deadline): 処理の期限（残りのバッチは次の実行で送る）
+
+        Returns:
+        dict: 配信結果（batches / sent / skipped / failed / remaining / recipients / complete）
+        """
+        date = date or today()
+        plan = self._load_plan(date)
+        if plan is None:
+            batches = self.build_batches(self.subscription_service.subscribers())
+            done = set()
+            self._save_plan(date, batches)
+        else:
+            batches, done = plan
+        pending = [batch for batch in batches if batch[0] not in done]
+
+        # 天気は全地域をまとめて（気象情報APIは10地点ずつ1回で）、ニュースは全体で1回だけ取得する
+        news = self.news_service.get_news()
+        areas = list(dict.fromkeys(area for _, area, _ in pending))
+        weather = self.weather_service.get_weather_many(areas, deadline=deadline) if areas else {}
+        messages = {area: self.compose(weather.get(area), news) for area in areas}
+
+        pacer = Pacer(self.per_second)
+        lock = threading.Lock()
+        sent = []
+        failed = []
+
+        def send(batch):
+            batch_key, area, user_ids = batch
+            if deadline is not None and deadline.expired():
+                return
+            pacer.wait()
+            retry_key = self._retry_key(date, user_ids)
+            if self.line_client.multicast(user_ids, messages[area], retry_key=retry_key):
+                with lock:
+                    done.add(batch_key)
+                    sent.append(batch)
+                    # 中断しても送信済みのバッチを送り直さないよう、1バッチごとに保存する
+                    self._save_progress(date, batches, done)
+            else:
+                with lock:
+                    failed.append(batch)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+            list(executor.map(send, pending))
+
+        remaining = len(pending) - len(sent)
+        result = {
+            "date": date,
+            "batches": len(batches),
+            "sent": len(sent),
+            "skipped": len(batches) - len(pending),
+            "failed": len(failed),
+            "remaining": remaining,
+            "recipients": sum(len(user_ids) for _, _, user_ids in sent),
+            "complete": remaining == 0,
+        }
+        logger.info("ダイジェストの配信結果", extra=result)
+        return result
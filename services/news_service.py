@@ -1,20 +1,22 @@
-import random
 from config import logger
-from data.responses import FAKE_NEWS
+from utils.response_catalog import sample_response
 
 class NewsService:
     """ニュース情報を提供するサービス"""
     
-    def get_news(self):
+    def get_news(self, chat_key=None):
         """
         最新ニュースを取得する
         
+        Parameters:
+        chat_key (str): チャットのキー（同じニュースが続かないようにする）
+        
         Returns:
         str: ニュース情報
         """
         try:
             # 実際のプロダクションでは、適切なニュースAPIを使用
-            news = random.choice(FAKE_NEWS)
+            news = sample_response("FAKE_NEWS", chat_key)
             
             return f"最新ニュース: {news}\n\n情報は力だ。常に最新を保て。"
         except Exception as e:
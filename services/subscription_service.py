@@ -0,0 +1,73 @@
+from config import logger, DIGEST_DEFAULT_AREA
+from utils.kv_store import get_digest_store
+
+# 購読者ごとの項目（値は地域）のキーの接頭辞と、購読者を一覧するグループ
+SUBSCRIBER_KEY_PREFIX = "digest:subscriber:"
+SUBSCRIBERS_GROUP = "digest:subscribers"
+
+
+class SubscriptionService:
+    """朝のダイジェストの購読者を管理するサービス
+
+    購読者は1人1項目で保存するため、登録・解除は1回の書き込みで済み、
+    コンテナ間で同時に更新しても互いの変更を上書きしない。
+    """
+
+    def __init__(self, kv_store=None):
+        """
+        購読サービスを初期化する
+
+        Parameters:
+        kv_store (LocalKVStore | DynamoDBKVStore): 保存先（省略時は get_digest_store のストア）
+
+        Raises:
+        KVStoreUnavailableError: 保存先を省略し、共有のテーブルが設定されていない場合
+        """
+        self.kv_store = kv_store or get_digest_store()
+
+    def subscribers(self):
+        """
+        購読者の一覧を取得する
+
+        Returns:
+        dict: userId -> 地域
+        """
+        items = self.kv_store.list_group(SUBSCRIBERS_GROUP)
+        return {
+            key[len(SUBSCRIBER_KEY_PREFIX):]: area
+            for key, area in items.items()
+            if key.startswith(SUBSCRIBER_KEY_PREFIX)
+        }
+
+    def subscribe(self, user_id, area=None):
+        """
+        購読を登録する（登録済みの場合は地域を更新する）
+
+        Parameters:
+        user_id (str): ユーザーのuserId
+        area (str): 天気を配信する地域（省略時は DIGEST_DEFAULT_AREA）
+
+        Returns:
+        str: 登録した地域
+        """
+        area = area or DIGEST_DEFAULT_AREA
+        self.kv_store.put(SUBSCRIBER_KEY_PREFIX + user_id, area, group=SUBSCRIBERS_GROUP)
+        logger.info(f"ダイジェストの購読を登録: {area}")
+        return area
+
+    def unsubscribe(self, user_id):
+        """
+        購読を解除する
+
+        Parameters:
+        user_id (str): ユーザーのuserId
+
+        Returns:
+        bool: 購読していた場合はTrue
+        """
+        key = SUBSCRIBER_KEY_PREFIX + user_id
+        if self.kv_store.get(key) is None:
+            return False
+        self.kv_store.delete(key)
+        logger.info("ダイジェストの購読を解除しました")
+        return True
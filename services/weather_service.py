@@ -1,18 +1,156 @@
+import math
 import os
 import random
-import requests
-from config import logger
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    logger, GEOCODE_CACHE_PATH, GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL,
+    GEOCODE_NEGATIVE_CACHE_TTL, WEATHER_CACHE_SIZE, WEATHER_UPDATE_INTERVAL, WEATHER_MAX_LOCATIONS,
+    YAHOO_MAP_API_BASE
+)
+from utils.cache import LRUCache, FileCache, TieredCache, SingleFlight, AsyncSingleFlight, MISSING
+from utils import http_client, async_http_client
+from utils.circuit_breaker import get_circuit_breaker
+from utils.nowcast import RainfallSeries, analyze as analyze_nowcast, describe as describe_nowcast
+
+# ウォームコンテナ間で共有するジオコーディング結果のキャッシュ
+_geocode_cache = None
+
+def get_geocode_cache():
+    """
+    共有のジオコーディングキャッシュを取得する（初回のみ生成）
+    
+    Returns:
+    TieredCache: 正規化した場所名 -> 座標（見つからない場合は None）のキャッシュ
+    """
+    global _geocode_cache
+    if _geocode_cache is None:
+        file_cache = None
+        if GEOCODE_CACHE_PATH:
+            file_cache = FileCache(GEOCODE_CACHE_PATH, maxsize=GEOCODE_CACHE_SIZE * 4, ttl=GEOCODE_CACHE_TTL)
+        _geocode_cache = TieredCache(
+            LRUCache(maxsize=GEOCODE_CACHE_SIZE, ttl=GEOCODE_CACHE_TTL),
+            file_cache
+        )
+    return _geocode_cache
+
+# ウォームコンテナ間で共有する降水量のキャッシュと、同じメッシュへの同時リクエストのまとめ役
+_weather_cache = LRUCache(maxsize=WEATHER_CACHE_SIZE)
+_weather_flight = SingleFlight()
+_async_weather_flight = AsyncSingleFlight()
+
+# 気象情報APIに1回で渡せる座標の数
+WEATHER_BATCH_SIZE = 10
+
+# 天気情報の末尾に付ける一言
+MARS_NOTE = "火星の気温はマイナス60℃だぞ。地球は恵まれている。"
+
+# 複数の場所のジオコーディング・気象情報の取得を並行して行うスレッドプール（初回のみ生成）
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """並行して呼び出すためのスレッドプールを取得する（初回のみ生成）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, min(WEATHER_MAX_LOCATIONS, WEATHER_BATCH_SIZE)),
+                    thread_name_prefix="weather"
+                )
+    return _executor
+
+def get_mesh_key(coordinates):
+    """
+    座標を約1kmのメッシュ（3次メッシュ: 緯度30秒 x 経度45秒）に丸めたキーを返す
+    
+    Parameters:
+    coordinates (str): 緯度経度（"経度,緯度"の形式）
+    
+    Returns:
+    str: メッシュのキー（座標を解釈できない場合は座標そのもの）
+    """
+    try:
+        lon, lat = (float(value) for value in coordinates.split(','))
+    except (AttributeError, ValueError):
+        return coordinates
+    return f"{math.floor(lat * 120)}:{math.floor(lon * 80)}"
+
+def seconds_until_next_update(now=None):
+    """
+    次の観測更新（10分ごとの区切り）までの秒数を返す
+    
+    Parameters:
+    now (float): 現在のUNIX時刻（省略時は現在時刻）
+    
+    Returns:
+    float: 次の区切りまでの秒数
+    """
+    if now is None:
+        now = time.time()
+    return WEATHER_UPDATE_INTERVAL - (now % WEATHER_UPDATE_INTERVAL)
+
+def normalize_location(location):
+    """
+    キャッシュキー用に場所名を正規化する
+    
+    Parameters:
+    location (str): 場所名
+    
+    Returns:
+    str: 全角・半角を揃え、空白を除いて小文字にした場所名
+    """
+    normalized = unicodedata.normalize('NFKC', location)
+    return ''.join(normalized.split()).lower()
+
+def unique_locations(locations, limit=None):
+    """
+    場所名の重複を除き、上限までに絞る（同じ場所は表記の違いも含めて1つにまとめる）
+    
+    Parameters:
+    locations (list): 場所名のリスト
+    limit (int): 上限（省略時は WEATHER_MAX_LOCATIONS）
+    
+    Returns:
+    list: 入力順の場所名のリスト
+    """
+    unique = {}
+    for location in locations:
+        unique.setdefault(normalize_location(location), location)
+    return list(unique.values())[:limit or WEATHER_MAX_LOCATIONS]
+
+def _split_batches(pending):
+    """
+    取得するメッシュを気象情報APIの1回分ずつに分ける
+    
+    Parameters:
+    pending (dict): メッシュのキー -> 緯度経度
+    
+    Returns:
+    list: (メッシュのキー, 緯度経度) のリストのリスト
+    """
+    items = list(pending.items())
+    return [items[start:start + WEATHER_BATCH_SIZE] for start in range(0, len(items), WEATHER_BATCH_SIZE)]
 
 class WeatherService:
     """天気情報を提供するサービス"""
     
-    def __init__(self):
-        """WeatherServiceの初期化"""
+    def __init__(self, geocode_cache=None, weather_cache=None):
+        """
+        WeatherServiceの初期化
+        
+        Parameters:
+        geocode_cache (TieredCache): ジオコーディング結果のキャッシュ（省略時は共有キャッシュ）
+        weather_cache (LRUCache): メッシュ単位の降水量キャッシュ（省略時は共有キャッシュ）
+        """
         # Yahoo Weather APIのエンドポイント
-        self.api_url = "https://map.yahooapis.jp/weather/V1/place"
+        self.api_url = f"{YAHOO_MAP_API_BASE}/weather/V1/place"
         
         # Yahoo Geocoder APIのエンドポイント
-        self.geocoder_api_url = "https://map.yahooapis.jp/geocode/V1/geoCoder"
+        self.geocoder_api_url = f"{YAHOO_MAP_API_BASE}/geocode/V1/geoCoder"
         
         # Yahoo APIの認証情報
         self.app_id = os.environ.get('YAHOO_APP_ID')
@@ -20,6 +158,12 @@ class WeatherService:
         # 東京の緯度経度（デフォルト値）
         self.default_coordinates = "139.732293,35.663613"
         
+        # 場所名 -> 座標のキャッシュ
+        self.geocode_cache = geocode_cache if geocode_cache is not None else get_geocode_cache()
+        
+        # メッシュ -> 天気情報のキャッシュ
+        self.weather_cache = weather_cache if weather_cache is not None else _weather_cache
+        
         # 天気コードと日本語の天気の対応表
         self.weather_codes = {
             0: "竜巻",
@@ -73,12 +217,75 @@ class WeatherService:
             3200: "不明"
         }
     
-    def _get_coordinates_from_location(self, location):
+    def _geocoder_params(self, location):
+        """
+        Yahoo Geocoder APIのクエリパラメータを組み立てる
+        
+        Parameters:
+        location (str): 場所名
+        
+        Returns:
+        dict: クエリパラメータ
+        """
+        return {
+            'query': location,
+            'appid': self.app_id,
+            'output': 'json'
+        }
+    
+    def _get_cached_coordinates(self, location):
+        """
+        キャッシュから座標を探す
+        
+        Parameters:
+        location (str): 場所名
+        
+        Returns:
+        str: 緯度経度（見つからなかった記録ならデフォルト座標、キャッシュになければ MISSING）
+        """
+        # None は「見つからない」の記録
+        cached = self.geocode_cache.get(normalize_location(location))
+        if cached is MISSING:
+            return MISSING
+        logger.info(f"場所名 '{location}' の座標をキャッシュから取得: {cached}")
+        return cached if cached is not None else self.default_coordinates
+    
+    def _parse_geocoder_response(self, location, response):
+        """
+        Yahoo Geocoder APIのレスポンスから座標を取り出し、キャッシュする
+        
+        Parameters:
+        location (str): 場所名
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        str: 緯度経度（"経度,緯度"の形式）
+        """
+        cache_key = normalize_location(location)
+        if response.status_code == 200:
+            data = response.json()
+            if 'Feature' in data and len(data['Feature']) > 0:
+                # 最初の結果の座標を取得
+                coordinates = data['Feature'][0]['Geometry']['Coordinates']
+                logger.info(f"場所名 '{location}' の座標: {coordinates}")
+                self.geocode_cache.set(cache_key, coordinates)
+                return coordinates
+            else:
+                logger.warning(f"場所名 '{location}' の座標が見つかりませんでした")
+                # 見つからなかった結果も短い期間だけ覚えておく
+                self.geocode_cache.set(cache_key, None, GEOCODE_NEGATIVE_CACHE_TTL)
+                return self.default_coordinates
+        else:
+            logger.error(f"Yahoo Geocoder API エラー: {response.status_code} - {response.text}")
+            return self.default_coordinates
+    
+    def _get_coordinates_from_location(self, location, deadline=None):
         """
         場所名から緯度経度を取得する
         
         Parameters:
         location (str): 場所名
+        deadline (Deadline): リクエストの期限
         
         Returns:
         str: 緯度経度（"経度,緯度"の形式）
@@ -86,43 +293,187 @@ class WeatherService:
         if not self.app_id:
             logger.warning("Yahoo APP IDが設定されていません")
             return self.default_coordinates
+        
+        # キャッシュにあればジオコーダーを呼ばない
+        cached = self._get_cached_coordinates(location)
+        if cached is not MISSING:
+            return cached
             
         try:
-            params = {
-                'query': location,
-                'appid': self.app_id,
-                'output': 'json'
-            }
-            
-            response = requests.get(
+            # ジオコーダーの障害中はタイムアウトを待たずにデフォルト座標にする
+            response = get_circuit_breaker("yahoo_geocoder").call(
+                http_client.get,
                 self.geocoder_api_url,
-                params=params
+                params=self._geocoder_params(location),
+                deadline=deadline
             )
+            return self._parse_geocoder_response(location, response)
+                
+        except Exception as e:
+            logger.error(f"Yahoo Geocoder API リクエスト中にエラー発生: {str(e)}")
+            return self.default_coordinates
+    
+    def prime_locations(self, locations, deadline=None):
+        """
+        よく使われる場所名の座標を先に取得してキャッシュしておく（ウォームアップ用）
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): 処理の期限
+        
+        Returns:
+        int: キャッシュに入っている場所名の数
+        """
+        primed = 0
+        for location in locations:
+            if deadline is not None and deadline.expired():
+                break
+            self._get_coordinates_from_location(location, deadline=deadline)
+            if self.geocode_cache.get(normalize_location(location)) is not MISSING:
+                primed += 1
+        return primed
+    
+    async def _get_coordinates_from_location_async(self, location, deadline=None):
+        """
+        _get_coordinates_from_location の非同期版
+        
+        Parameters:
+        location (str): 場所名
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        str: 緯度経度（"経度,緯度"の形式）
+        """
+        if not self.app_id:
+            logger.warning("Yahoo APP IDが設定されていません")
+            return self.default_coordinates
+        
+        cached = self._get_cached_coordinates(location)
+        if cached is not MISSING:
+            return cached
             
-            if response.status_code == 200:
-                data = response.json()
-                if 'Feature' in data and len(data['Feature']) > 0:
-                    # 最初の結果の座標を取得
-                    coordinates = data['Feature'][0]['Geometry']['Coordinates']
-                    logger.info(f"場所名 '{location}' の座標: {coordinates}")
-                    return coordinates
-                else:
-                    logger.warning(f"場所名 '{location}' の座標が見つかりませんでした")
-                    return self.default_coordinates
-            else:
-                logger.error(f"Yahoo Geocoder API エラー: {response.status_code} - {response.text}")
-                return self.default_coordinates
+        try:
+            response = await get_circuit_breaker("yahoo_geocoder").call_async(
+                async_http_client.get,
+                self.geocoder_api_url,
+                params=self._geocoder_params(location),
+                deadline=deadline
+            )
+            return self._parse_geocoder_response(location, response)
                 
         except Exception as e:
             logger.error(f"Yahoo Geocoder API リクエスト中にエラー発生: {str(e)}")
             return self.default_coordinates
     
-    def _fetch_yahoo_weather(self, location):
+    def _resolve_coordinates(self, locations, deadline=None):
+        """
+        複数の場所名の座標を取得する（キャッシュにない場所のジオコーディングは並行して行う）
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 場所名 -> 緯度経度（"経度,緯度"の形式）
+        """
+        coordinates = {}
+        pending = []
+        for location in locations:
+            cached = self._get_cached_coordinates(location)
+            if cached is MISSING:
+                pending.append(location)
+            else:
+                coordinates[location] = cached
+        if len(pending) == 1:
+            coordinates[pending[0]] = self._get_coordinates_from_location(pending[0], deadline)
+        elif pending:
+            executor = _get_executor()
+            futures = {
+                location: executor.submit(self._get_coordinates_from_location, location, deadline)
+                for location in pending
+            }
+            for location, future in futures.items():
+                coordinates[location] = future.result()
+        return coordinates
+    
+    async def _resolve_coordinates_async(self, locations, deadline=None):
+        """
+        _resolve_coordinates の非同期版
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 場所名 -> 緯度経度（"経度,緯度"の形式）
+        """
+        # asyncioは非同期版でしか使わないので、起動時には読み込まない
+        import asyncio
+        results = await asyncio.gather(
+            *(self._get_coordinates_from_location_async(location, deadline) for location in locations)
+        )
+        return dict(zip(locations, results))
+    
+    def _weather_params(self, coordinates):
+        """
+        Yahoo Weather APIのクエリパラメータを組み立てる
+        
+        Parameters:
+        coordinates (str): 緯度経度（"経度,緯度"の形式）
+        
+        Returns:
+        dict: クエリパラメータ
+        """
+        return {
+            'coordinates': coordinates,
+            'appid': self.app_id,
+            'output': 'json'
+        }
+    
+    def _get_cached_weather(self, mesh_key):
+        """
+        メッシュの天気情報をキャッシュから探す
+        
+        Parameters:
+        mesh_key (str): メッシュのキー
+        
+        Returns:
+        dict: 天気情報のJSON（キャッシュになければ MISSING）
+        """
+        cached = self.weather_cache.get(mesh_key)
+        if cached is not MISSING:
+            logger.info(f"メッシュ {mesh_key} の天気情報をキャッシュから取得")
+        return cached
+    
+    def _parse_weather_response(self, mesh_key, response):
+        """
+        Yahoo Weather APIのレスポンスを解釈し、成功した結果をキャッシュする
+        
+        Parameters:
+        mesh_key (str): キャッシュに使うメッシュのキー
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        dict: 天気情報のJSON（失敗した場合は None）
+        """
+        if response.status_code == 200:
+            weather_data = response.json()
+            self.weather_cache.set(mesh_key, weather_data, seconds_until_next_update())
+            return weather_data
+        else:
+            logger.error(f"Yahoo Weather API エラー: {response.status_code} - {response.text}")
+            return None
+    
+    def _fetch_yahoo_weather(self, location, deadline=None):
         """
         Yahoo Weather APIから天気情報を取得する
         
+        同じメッシュの結果は次の観測更新までキャッシュし、
+        同じメッシュへの同時リクエストは1回のAPI呼び出しにまとめる
+        
         Parameters:
         location (str): 場所名
+        deadline (Deadline): リクエストの期限
         
         Returns:
         dict: 天気情報のJSON
@@ -133,85 +484,448 @@ class WeatherService:
             
         try:
             # 場所名から緯度経度を取得
-            coordinates = self._get_coordinates_from_location(location)
+            coordinates = self._get_coordinates_from_location(location, deadline)
             
-            params = {
-                'coordinates': coordinates,
-                'appid': self.app_id,
-                'output': 'json'
-            }
+            mesh_key = get_mesh_key(coordinates)
+            cached = self._get_cached_weather(mesh_key)
+            if cached is not MISSING:
+                return cached
             
-            response = requests.get(
-                self.api_url,
-                params=params
+            return _weather_flight.do(
+                mesh_key,
+                lambda: self._request_yahoo_weather(coordinates, mesh_key, deadline),
+                timeout=deadline.remaining() if deadline is not None else None
             )
+                
+        except Exception as e:
+            logger.error(f"Yahoo Weather API リクエスト中にエラー発生: {str(e)}")
+            return None
+    
+    def _request_yahoo_weather(self, coordinates, mesh_key, deadline=None):
+        """
+        Yahoo Weather APIを呼び出し、成功した結果をキャッシュする
+        
+        Parameters:
+        coordinates (str): 緯度経度（"経度,緯度"の形式）
+        mesh_key (str): キャッシュに使うメッシュのキー
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 天気情報のJSON（失敗した場合は None）
+        """
+        # 待っている間に他のリクエストが取得済みならそれを使う
+        cached = self.weather_cache.get(mesh_key)
+        if cached is not MISSING:
+            return cached
+        
+        response = get_circuit_breaker("yahoo_weather").call(
+            http_client.get,
+            self.api_url,
+            params=self._weather_params(coordinates),
+            deadline=deadline
+        )
+        return self._parse_weather_response(mesh_key, response)
+    
+    async def _fetch_yahoo_weather_async(self, location, deadline=None):
+        """
+        _fetch_yahoo_weather の非同期版
+        
+        Parameters:
+        location (str): 場所名
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 天気情報のJSON
+        """
+        if not self.app_id:
+            logger.warning("Yahoo APP IDが設定されていません")
+            return None
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Yahoo Weather API エラー: {response.status_code} - {response.text}")
-                return None
+        try:
+            coordinates = await self._get_coordinates_from_location_async(location, deadline)
+            
+            mesh_key = get_mesh_key(coordinates)
+            cached = self._get_cached_weather(mesh_key)
+            if cached is not MISSING:
+                return cached
+            
+            return await _async_weather_flight.do(
+                mesh_key,
+                lambda: self._request_yahoo_weather_async(coordinates, mesh_key, deadline),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
                 
         except Exception as e:
             logger.error(f"Yahoo Weather API リクエスト中にエラー発生: {str(e)}")
             return None
     
-    def get_weather(self, location="東京"):
+    async def _request_yahoo_weather_async(self, coordinates, mesh_key, deadline=None):
+        """
+        _request_yahoo_weather の非同期版
+        
+        Parameters:
+        coordinates (str): 緯度経度（"経度,緯度"の形式）
+        mesh_key (str): キャッシュに使うメッシュのキー
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 天気情報のJSON（失敗した場合は None）
+        """
+        # 待っている間に他のリクエストが取得済みならそれを使う
+        cached = self.weather_cache.get(mesh_key)
+        if cached is not MISSING:
+            return cached
+        
+        response = await get_circuit_breaker("yahoo_weather").call_async(
+            async_http_client.get,
+            self.api_url,
+            params=self._weather_params(coordinates),
+            deadline=deadline
+        )
+        return self._parse_weather_response(mesh_key, response)
+    
+    def _pending_meshes(self, coordinates):
+        """
+        場所ごとのメッシュを求め、キャッシュにある天気情報と、まだ取得していないメッシュに分ける
+        
+        Parameters:
+        coordinates (dict): 場所名 -> 緯度経度
+        
+        Returns:
+        tuple: (メッシュ -> 天気情報のJSON, メッシュ -> 取得に使う緯度経度)
+        """
+        weather_by_mesh = {}
+        pending = {}
+        for location, coordinate in coordinates.items():
+            mesh_key = get_mesh_key(coordinate)
+            if mesh_key in weather_by_mesh or mesh_key in pending:
+                continue
+            cached = self._get_cached_weather(mesh_key)
+            if cached is MISSING:
+                pending[mesh_key] = coordinate
+            else:
+                weather_by_mesh[mesh_key] = cached
+        return weather_by_mesh, pending
+    
+    def _parse_weather_batch_response(self, batch, response):
+        """
+        複数の座標をまとめた Yahoo Weather APIのレスポンスを地点ごとに分け、キャッシュする
+        
+        Parameters:
+        batch (list): (メッシュのキー, 緯度経度) のリスト（リクエストに渡した順）
+        response (requests.Response | AsyncResponse): APIレスポンス
+        
+        Returns:
+        dict: メッシュ -> 天気情報のJSON（地点1つ分の形）
+        """
+        if response.status_code != 200:
+            logger.error(f"Yahoo Weather API エラー: {response.status_code} - {response.text}")
+            return {}
+        features = response.json().get('Feature') or []
+        # 返ってきた地点は、並び順ではなく地点の座標（またはそのメッシュ）でリクエストの地点に対応させる
+        by_coordinate = {coordinate: mesh_key for mesh_key, coordinate in batch}
+        meshes = set(by_coordinate.values())
+        ttl = seconds_until_next_update()
+        results = {}
+        for feature in features:
+            coordinates = (feature.get('Geometry') or {}).get('Coordinates')
+            mesh_key = by_coordinate.get(coordinates) or get_mesh_key(coordinates)
+            if mesh_key not in meshes or mesh_key in results:
+                logger.warning(f"Yahoo Weather APIの地点をリクエストに対応させられません: {coordinates}")
+                continue
+            weather_data = {'Feature': [feature]}
+            self.weather_cache.set(mesh_key, weather_data, ttl)
+            results[mesh_key] = weather_data
+        if len(results) != len(batch):
+            logger.warning(f"Yahoo Weather APIの地点数が一致しません: {len(results)} / {len(batch)}")
+        return results
+    
+    def _request_yahoo_weather_batch(self, batch, deadline=None):
+        """
+        Yahoo Weather APIを1回だけ呼び出し、複数の地点の天気情報を取得する
+        
+        Parameters:
+        batch (list): (メッシュのキー, 緯度経度) のリスト（WEATHER_BATCH_SIZE 件まで）
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: メッシュ -> 天気情報のJSON
+        """
+        try:
+            response = get_circuit_breaker("yahoo_weather").call(
+                http_client.get,
+                self.api_url,
+                params=self._weather_params(" ".join(coordinate for _, coordinate in batch)),
+                deadline=deadline
+            )
+            return self._parse_weather_batch_response(batch, response)
+        except Exception as e:
+            logger.error(f"Yahoo Weather API リクエスト中にエラー発生: {str(e)}")
+            return {}
+    
+    async def _request_yahoo_weather_batch_async(self, batch, deadline=None):
+        """
+        _request_yahoo_weather_batch の非同期版
+        
+        Parameters:
+        batch (list): (メッシュのキー, 緯度経度) のリスト（WEATHER_BATCH_SIZE 件まで）
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: メッシュ -> 天気情報のJSON
+        """
+        try:
+            response = await get_circuit_breaker("yahoo_weather").call_async(
+                async_http_client.get,
+                self.api_url,
+                params=self._weather_params(" ".join(coordinate for _, coordinate in batch)),
+                deadline=deadline
+            )
+            return self._parse_weather_batch_response(batch, response)
+        except Exception as e:
+            logger.error(f"Yahoo Weather API リクエスト中にエラー発生: {str(e)}")
+            return {}
+    
+    def _fetch_yahoo_weather_batch(self, locations, deadline=None):
+        """
+        複数の場所の天気情報をまとめて取得する
+        
+        座標は並行して求め、キャッシュにないメッシュの天気情報は
+        WEATHER_BATCH_SIZE 地点ずつ1回の呼び出しで取得する
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 場所名 -> 天気情報のJSON（取得できなかった場所は None）
+        """
+        if not self.app_id:
+            logger.warning("Yahoo APP IDが設定されていません")
+            return dict.fromkeys(locations)
+        
+        coordinates = self._resolve_coordinates(locations, deadline)
+        weather_by_mesh, pending = self._pending_meshes(coordinates)
+        batches = _split_batches(pending)
+        if len(batches) == 1:
+            weather_by_mesh.update(self._request_yahoo_weather_batch(batches[0], deadline))
+        elif batches:
+            executor = _get_executor()
+            futures = [executor.submit(self._request_yahoo_weather_batch, batch, deadline) for batch in batches]
+            for future in futures:
+                weather_by_mesh.update(future.result())
+        return {
+            location: weather_by_mesh.get(get_mesh_key(coordinate))
+            for location, coordinate in coordinates.items()
+        }
+    
+    async def _fetch_yahoo_weather_batch_async(self, locations, deadline=None):
+        """
+        _fetch_yahoo_weather_batch の非同期版
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 場所名 -> 天気情報のJSON（取得できなかった場所は None）
+        """
+        if not self.app_id:
+            logger.warning("Yahoo APP IDが設定されていません")
+            return dict.fromkeys(locations)
+        
+        import asyncio
+        coordinates = await self._resolve_coordinates_async(locations, deadline)
+        weather_by_mesh, pending = self._pending_meshes(coordinates)
+        results = await asyncio.gather(
+            *(self._request_yahoo_weather_batch_async(batch, deadline) for batch in _split_batches(pending))
+        )
+        for result in results:
+            weather_by_mesh.update(result)
+        return {
+            location: weather_by_mesh.get(get_mesh_key(coordinate))
+            for location, coordinate in coordinates.items()
+        }
+    
+    def get_weather(self, location="東京", deadline=None):
         """
         天気情報を取得する
         
         Parameters:
         location (str): 場所名
+        deadline (Deadline): リクエストの期限
         
         Returns:
         str: 天気情報
         """
         try:
             # Yahoo Weather APIから天気情報を取得
-            weather_data = self._fetch_yahoo_weather(location)
-            
-            if weather_data and 'Feature' in weather_data:
-                # APIレスポンスから必要な情報を抽出
-                feature = weather_data['Feature'][0]
-                weather_list = feature['Property']['WeatherList']['Weather']
-                weather_area_code = feature['Property']['WeatherAreaCode']
-                
-                # 現在の天気情報（最初のエントリ）
-                current_weather = weather_list[0]
-                rainfall = current_weather['Rainfall']
-                
-                # 天気の状態を判断
-                if float(rainfall) == 0:
-                    weather_state = "晴れ"
-                elif float(rainfall) < 1:
-                    weather_state = "小雨"
-                elif float(rainfall) < 5:
-                    weather_state = "雨"
-                else:
-                    weather_state = "大雨"
+            weather_data = self._fetch_yahoo_weather(location, deadline)
+            return self._format_weather(location, weather_data)
                 
-                # 予測情報があれば取得
-                forecast_info = ""
-                if len(weather_list) > 1:
-                    forecast = weather_list[-1]
-                    forecast_rainfall = forecast['Rainfall']
-                    forecast_time = forecast['Date']
-                    forecast_hour = forecast_time[8:10]
-                    forecast_min = forecast_time[10:12]
-                    forecast_info = f"\n{forecast_hour}時{forecast_min}分の予測: 降水量 {forecast_rainfall}mm/h"
+        except Exception as e:
+            logger.error(f"天気情報取得中にエラー発生: {str(e)}")
+            return "天気情報を取得できませんでした。火星からの通信障害かもしれない。"
+    
+    async def get_weather_async(self, location="東京", deadline=None):
+        """
+        get_weather の非同期版
+        
+        Parameters:
+        location (str): 場所名
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        str: 天気情報
+        """
+        try:
+            weather_data = await self._fetch_yahoo_weather_async(location, deadline)
+            return self._format_weather(location, weather_data)
                 
-                # 天気情報を整形
-                weather_info = f"{location}の天気:\n{weather_state}、現在の降水量 {rainfall}mm/h{forecast_info}\n\n火星の気温はマイナス60℃だぞ。地球は恵まれている。"
-                return weather_info
-            else:
-                # APIからデータを取得できない場合はランダムな天気情報を返す（フォールバック）
-                logger.warning("Yahoo Weather APIからデータを取得できませんでした。ランダムな天気情報を返します。")
-                weather_types = ["晴れ", "曇り", "雨", "雪", "嵐"]
-                temp = random.randint(0, 35)
-                weather = random.choice(weather_types)
+        except Exception as e:
+            logger.error(f"天気情報取得中にエラー発生: {str(e)}")
+            return "天気情報を取得できませんでした。火星からの通信障害かもしれない。"
+    
+    def get_weather_many(self, locations, deadline=None):
+        """
+        複数の場所の天気情報を、場所ごとの返信用テキストとしてまとめて取得する
+        
+        ランダムな天気情報で代用せず、取得できなかった場所は None にする
+        
+        Parameters:
+        locations (list): 場所名のリスト
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        dict: 場所名 -> 天気情報（取得できなかった場所は None）
+        """
+        try:
+            weather_by_location = self._fetch_yahoo_weather_batch(list(dict.fromkeys(locations)), deadline)
+        except Exception as e:
+            logger.error(f"天気情報取得中にエラー発生: {str(e)}")
+            weather_by_location = {}
+        results = {}
+        for location in locations:
+            weather_data = weather_by_location.get(location)
+            results[location] = (
+                self._format_weather(location, weather_data)
+                if weather_data and 'Feature' in weather_data else None
+            )
+        return results
+    
+    def get_weather_multi(self, locations, deadline=None):
+        """
+        複数の場所の天気情報を1つの返信にまとめて取得する
+        
+        Parameters:
+        locations (list): 場所名のリスト（重複を除き、WEATHER_MAX_LOCATIONS 件まで）
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        str: 天気情報
+        """
+        try:
+            locations = unique_locations(locations)
+            weather_by_location = self._fetch_yahoo_weather_batch(locations, deadline)
+            return self._format_weather_multi(locations, weather_by_location)
                 
-                return f"{location}の天気:\n{weather}、気温{temp}℃\n\n火星の気温はマイナス60℃だぞ。地球は恵まれている。"
+        except Exception as e:
+            logger.error(f"天気情報取得中にエラー発生: {str(e)}")
+            return "天気情報を取得できませんでした。火星からの通信障害かもしれない。"
+    
+    async def get_weather_multi_async(self, locations, deadline=None):
+        """
+        get_weather_multi の非同期版
+        
+        Parameters:
+        locations (list): 場所名のリスト（重複を除き、WEATHER_MAX_LOCATIONS 件まで）
+        deadline (Deadline): リクエストの期限
+        
+        Returns:
+        str: 天気情報
+        """
+        try:
+            locations = unique_locations(locations)
+            weather_by_location = await self._fetch_yahoo_weather_batch_async(locations, deadline)
+            return self._format_weather_multi(locations, weather_by_location)
                 
         except Exception as e:
             logger.error(f"天気情報取得中にエラー発生: {str(e)}")
             return "天気情報を取得できませんでした。火星からの通信障害かもしれない。"
+    
+    def _format_weather(self, location, weather_data):
+        """
+        天気情報のJSONを返信用のテキストに整形する
+        
+        Parameters:
+        location (str): 場所名
+        weather_data (dict): 天気情報のJSON（取得できなかった場合は None）
+        
+        Returns:
+        str: 天気情報
+        """
+        return f"{self._describe_weather(location, weather_data)}\n\n{MARS_NOTE}"
+    
+    def _format_weather_multi(self, locations, weather_by_location):
+        """
+        複数の場所の天気情報を1つの返信用テキストに整形する
+        
+        Parameters:
+        locations (list): 場所名のリスト（表示する順）
+        weather_by_location (dict): 場所名 -> 天気情報のJSON
+        
+        Returns:
+        str: 天気情報
+        """
+        sections = [self._describe_weather(location, weather_by_location.get(location)) for location in locations]
+        return "\n\n".join(sections + [MARS_NOTE])
+    
+    def _describe_weather(self, location, weather_data):
+        """
+        1つの場所の天気情報を整形する（末尾の一言は含まない）
+        
+        Parameters:
+        location (str): 場所名
+        weather_data (dict): 天気情報のJSON（取得できなかった場合は None）
+        
+        Returns:
+        str: 天気情報
+        """
+        if weather_data and 'Feature' in weather_data:
+            # APIレスポンスから必要な情報を抽出
+            feature = weather_data['Feature'][0]
+            weather_list = feature['Property']['WeatherList']['Weather']
+            weather_area_code = feature['Property']['WeatherAreaCode']
+            
+            # 観測値と10分ごとの予測値を1回だけ数値列にする
+            series = RainfallSeries.from_weather_list(weather_list)
+            
+            # 現在の天気情報（最新の観測値）
+            current_weather = weather_list[series.current]
+            rainfall = current_weather['Rainfall']
+            
+            # 天気の状態を判断
+            if float(rainfall) == 0:
+                weather_state = "晴れ"
+            elif float(rainfall) < 1:
+                weather_state = "小雨"
+            elif float(rainfall) < 5:
+                weather_state = "雨"
+            else:
+                weather_state = "大雨"
+            
+            # 予測があれば、降り始め・やむ時刻、ピーク、雨量の見込みを添える
+            summary = describe_nowcast(analyze_nowcast(series))
+            forecast_info = f"\n{summary}" if summary else ""
+            
+            # 天気情報を整形
+            weather_info = f"{location}の天気:\n{weather_state}、現在の降水量 {rainfall}mm/h{forecast_info}"
+            return weather_info
+        else:
+            # APIからデータを取得できない場合はランダムな天気情報を返す（フォールバック）
+            logger.warning("Yahoo Weather APIからデータを取得できませんでした。ランダムな天気情報を返します。")
+            weather_types = ["晴れ", "曇り", "雨", "雪", "嵐"]
+            temp = random.randint(0, 35)
+            weather = random.choice(weather_types)
+            
+            return f"{location}の天気:\n{weather}、気温{temp}℃"
@@ -8,7 +8,8 @@ import json
 # Add the parent directory to the Python path to import the modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.advice_service import AdviceService
+from services.advice_service import AdviceService, normalize_theme
+from utils.cache import VariantCache
 from data.responses import ADVICE_LIST
 
 class TestAdviceService(unittest.TestCase):
@@ -16,8 +17,8 @@ class TestAdviceService(unittest.TestCase):
     
     def setUp(self):
         """各テスト実行前の準備"""
-        # AdviceServiceのインスタンスを作成
-        self.advice_service = AdviceService()
+        # AdviceServiceのインスタンスを作成（テストごとに空のキャッシュを使う）
+        self.advice_service = AdviceService(advice_cache=VariantCache(variants=2))
         
         # randomのseedを固定して、テストの再現性を確保
         random.seed(42)
@@ -36,11 +37,11 @@ class TestAdviceService(unittest.TestCase):
         self.assertTrue(result.startswith("イーロンからのアドバイス: "))
         self.assertTrue(any(advice in result for advice in ADVICE_LIST))
     
-    @patch('random.choice')
-    def test_get_advice_exception(self, mock_choice):
+    @patch('services.advice_service.sample_response')
+    def test_get_advice_exception(self, mock_sample):
         """アドバイス取得中の例外テスト"""
-        # random.choiceが例外を発生させるようにモック
-        mock_choice.side_effect = Exception("Random choice error")
+        # 応答カタログからの選択が例外を発生させるようにモック
+        mock_sample.side_effect = Exception("Random choice error")
         
         # テスト対象メソッドの実行
         result = self.advice_service.get_advice()
@@ -48,27 +49,27 @@ class TestAdviceService(unittest.TestCase):
         # 検証
         self.assertEqual(result, "アドバイスを提供できません。考え中だ。")
         
-        # random.choiceが呼ばれたことを確認
-        mock_choice.assert_called_once_with(ADVICE_LIST)
+        # アドバイスのカタログから選ばれたことを確認
+        mock_sample.assert_called_once_with("ADVICE_LIST", None)
     
     def test_advice_format(self):
         """アドバイスのフォーマットテスト"""
         # 全てのアドバイスをテスト
         for advice in ADVICE_LIST:
-            # random.choiceをモックして特定のアドバイスを返すようにする
-            with patch('random.choice', return_value=advice):
+            # 応答カタログからの選択をモックして特定のアドバイスを返すようにする
+            with patch('services.advice_service.sample_response', return_value=advice):
                 result = self.advice_service.get_advice()
                 expected = f"イーロンからのアドバイス: {advice}"
                 self.assertEqual(result, expected)
     
-    @patch('requests.post')
+    @patch('utils.http_client.post')
     def test_get_themed_advice_success(self, mock_post):
         """テーマ付きアドバイス取得成功のテスト"""
         # 期待される結果
         advice_text = "未来を見据えて行動しろ。今日の決断が明日の現実を作る。"
         expected_advice = f"イーロンからのアドバイス: {advice_text}"
         
-        # requestsのモックレスポンスを設定
+        # http_clientのモックレスポンスを設定
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {
@@ -109,10 +110,10 @@ class TestAdviceService(unittest.TestCase):
             mock_get_advice.assert_called_once()
             self.assertEqual(result, "イーロンからのアドバイス: テストアドバイス")
     
-    @patch('requests.post')
+    @patch('utils.http_client.post')
     def test_get_themed_advice_api_error(self, mock_post):
         """API呼び出しエラー時のテスト"""
-        # requestsのモックを設定してエラーを発生させる
+        # http_clientのモックを設定してエラーを発生させる
         mock_response = MagicMock()
         mock_response.status_code = 400
         mock_response.text = "Bad Request"
@@ -129,10 +130,10 @@ class TestAdviceService(unittest.TestCase):
             mock_get_advice.assert_called_once()
             self.assertEqual(result, "イーロンからのアドバイス: フォールバックアドバイス")
     
-    @patch('requests.post')
+    @patch('utils.http_client.post')
     def test_get_themed_advice_exception(self, mock_post):
         """例外発生時のテスト"""
-        # requestsのモックを設定して例外を発生させる
+        # http_clientのモックを設定して例外を発生させる
         mock_post.side_effect = Exception("Connection error")
         
         # APIキーを直接設定
@@ -146,5 +147,65 @@ class TestAdviceService(unittest.TestCase):
             mock_get_advice.assert_called_once()
             self.assertEqual(result, "イーロンからのアドバイス: フォールバックアドバイス")
 
+    def test_normalize_theme(self):
+        """表記ゆれのあるテーマが同じキーになるテスト"""
+        self.assertEqual(normalize_theme("起業"), "起業")
+        self.assertEqual(normalize_theme("  起業する"), "起業")
+        self.assertEqual(normalize_theme("起業について？"), "起業")
+        self.assertEqual(normalize_theme("ＡＩ とは"), "ai")
+
+    @patch('utils.http_client.post')
+    def test_get_themed_advice_cache(self, mock_post):
+        """回答が貯まった後はAPIを呼ばずにキャッシュから返すテスト"""
+        answers = iter(["火星を目指せ。", "失敗を恐れるな。"])
+
+        def make_response(*args, **kwargs):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {"choices": [{"message": {"content": next(answers)}}]}
+            return response
+
+        mock_post.side_effect = make_response
+        self.advice_service.api_key = "dummy_key"
+
+        # 回答が2つ貯まるまではAPIを呼ぶ
+        first = self.advice_service.get_themed_advice("起業")
+        second = self.advice_service.get_themed_advice("起業する")
+        cached = self.advice_service.get_themed_advice(" 起業について ")
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertNotEqual(first, second)
+        self.assertIn(cached, (first, second))
+        stats = self.advice_service.advice_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_cache_lookup_gauges(self):
+        """キャッシュを引くたびにヒットしたかどうかと件数をメトリクスに記録するテスト"""
+        self.advice_service.advice_cache.add("起業", "火星を目指せ。")
+        self.advice_service.advice_cache.add("起業", "失敗を恐れるな。")
+        tracer = MagicMock()
+
+        with patch("services.advice_service.get_tracer", return_value=tracer):
+            self.advice_service._lookup("起業")
+            self.advice_service._lookup("宇宙")
+
+        gauges = [call[0] for call in tracer.gauge.call_args_list]
+        self.assertEqual(gauges, [
+            ("advice_cache_hit", 1), ("advice_cache_keys", 1),
+            ("advice_cache_hit", 0), ("advice_cache_keys", 1),
+        ])
+
+    @patch('utils.http_client.post')
+    def test_get_themed_advice_error_not_cached(self, mock_post):
+        """APIエラー時のランダムなアドバイスはキャッシュされないテスト"""
+        mock_post.return_value.status_code = 500
+        self.advice_service.api_key = "dummy_key"
+
+        self.advice_service.get_themed_advice("起業")
+        self.advice_service.get_themed_advice("起業")
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(self.advice_service.advice_cache.stats()["keys"], 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.command_handler import CommandHandler
+from handlers.conversation_handler import ConversationHandler
+from services.advice_service import AdviceService
+from services.weather_service import WeatherService
+from utils.cache import LRUCache, TieredCache, VariantCache
+from data.responses import TESLA_FACTS
+
+def make_response(status_code, json_data=None, text=""):
+    """テスト用のHTTPレスポンスを作成する"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = json_data
+    response.text = text
+    return response
+
+class TestAsyncHandlers(unittest.IsolatedAsyncioTestCase):
+    """非同期版のハンドラ・サービスのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.mock_line_client = MagicMock()
+        self.mock_line_client.reply_message = AsyncMock(return_value=True)
+        self.mock_event = MagicMock()
+        self.mock_event.reply_token = "reply-token-123"
+
+    async def test_process_command_async_without_io(self):
+        """I/Oのないコマンドが同期版の応答で返信されるテスト"""
+        handler = CommandHandler(self.mock_line_client)
+
+        result = await handler.process_command_async(self.mock_event, "/tesla")
+
+        self.assertTrue(result)
+        token, text = self.mock_line_client.reply_message.await_args[0]
+        self.assertEqual(token, "reply-token-123")
+        self.assertIn(text, TESLA_FACTS)
+
+    async def test_process_command_async_weather(self):
+        """weatherコマンドが非同期版のサービスを使うテスト"""
+        handler = CommandHandler(self.mock_line_client)
+        handler.weather_service = MagicMock()
+        handler.weather_service.get_weather_async = AsyncMock(return_value="大阪の天気: 晴れ")
+
+        result = await handler.process_command_async(self.mock_event, "/weather 大阪")
+
+        self.assertTrue(result)
+        handler.weather_service.get_weather_async.assert_awaited_once_with("大阪", deadline=None)
+        self.mock_line_client.reply_message.assert_awaited_once_with("reply-token-123", "大阪の天気: 晴れ")
+
+    async def test_process_command_async_error(self):
+        """非同期版のコマンドで例外が起きた場合のテスト"""
+        handler = CommandHandler(self.mock_line_client)
+        handler.weather_service = MagicMock()
+        handler.weather_service.get_weather_async = AsyncMock(side_effect=Exception("API error"))
+
+        result = await handler.process_command_async(self.mock_event, "/weather")
+
+        self.assertFalse(result)
+        self.mock_line_client.reply_message.assert_not_awaited()
+
+    @patch('utils.async_http_client.post', new_callable=AsyncMock)
+    async def test_get_themed_advice_async(self, mock_post):
+        """テーマ付きアドバイスの非同期版のテスト"""
+        mock_post.return_value = make_response(200, {
+            "choices": [{"message": {"content": "火星を目指せ。"}}]
+        })
+        advice_service = AdviceService(advice_cache=VariantCache())
+        advice_service.api_key = "dummy_key"
+
+        result = await advice_service.get_themed_advice_async("起業")
+
+        self.assertEqual(result, "イーロンからのアドバイス: 火星を目指せ。")
+        self.assertIn("起業", mock_post.await_args[1]["json"]["messages"][1]["content"])
+
+    @patch('utils.async_http_client.get', new_callable=AsyncMock)
+    async def test_get_weather_async(self, mock_get):
+        """天気情報の非同期版のテスト"""
+        mock_get.side_effect = [
+            make_response(200, {"Feature": [{"Geometry": {"Coordinates": "135.50,34.69"}}]}),
+            make_response(200, {"Feature": [{
+                "Property": {
+                    "WeatherAreaCode": "6200",
+                    "WeatherList": {"Weather": [
+                        {"Type": "observation", "Date": "202503161430", "Rainfall": "2.00"}
+                    ]}
+                }
+            }]}),
+        ]
+        with patch.dict(os.environ, {"YAHOO_APP_ID": "test_app_id"}):
+            weather_service = WeatherService(
+                geocode_cache=TieredCache(LRUCache()),
+                weather_cache=LRUCache()
+            )
+
+        result = await weather_service.get_weather_async("大阪")
+
+        self.assertIn("大阪の天気:\n雨、現在の降水量 2.00mm/h", result)
+        self.assertEqual(mock_get.await_count, 2)
+
+    @patch('handlers.conversation_handler.OPENAI_API_KEY', "dummy_key")
+    @patch('utils.async_http_client.post', new_callable=AsyncMock)
+    async def test_process_conversation_async_fallback(self, mock_post):
+        """OpenAIが失敗した場合に定型応答が返信されるテスト"""
+        mock_post.side_effect = Exception("Connection error")
+        handler = ConversationHandler(self.mock_line_client)
+
+        result = await handler.process_conversation_async(self.mock_event, "テスラについて教えて")
+
+        self.assertTrue(result)
+        text = self.mock_line_client.reply_message.await_args[0][1]
+        self.assertTrue(text.startswith("テスラについて話しているのか？"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import LRUCache, FileCache, TieredCache, MISSING
+
+class TestLRUCache(unittest.TestCase):
+    """LRUCacheのテストクラス"""
+
+    def test_get_set(self):
+        """値の保存と取得のテスト"""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("none", None)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("none"))
+        self.assertIs(cache.get("missing"), MISSING)
+
+    def test_lru_eviction(self):
+        """最も使われていない値から削除されるテスト"""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+
+    @patch('utils.cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """TTLを過ぎた値が返されないテスト"""
+        mock_monotonic.return_value = 100.0
+        cache = LRUCache(ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=1)
+
+        mock_monotonic.return_value = 105.0
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+
+        mock_monotonic.return_value = 111.0
+        self.assertIs(cache.get("a"), MISSING)
+
+class TestTieredCache(unittest.TestCase):
+    """TieredCacheのテストクラス"""
+
+    def test_file_tier_survives_new_instance(self):
+        """ファイルの段が新しいインスタンスから読めるテスト"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.json")
+            TieredCache(LRUCache(), FileCache(path)).set("東京", "139.7,35.6")
+
+            cache = TieredCache(LRUCache(), FileCache(path))
+            self.assertEqual(cache.get("東京"), "139.7,35.6")
+            # ファイルから読んだ値はメモリの段にも載る
+            self.assertEqual(cache.memory.get("東京"), "139.7,35.6")
+
+    def test_corrupt_file_is_ignored(self):
+        """壊れたキャッシュファイルは無視されるテスト"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.json")
+            with open(path, "w") as f:
+                f.write("{broken")
+
+            cache = FileCache(path)
+            self.assertIs(cache.get("東京"), MISSING)
+            cache.set("東京", "139.7,35.6")
+            self.assertEqual(FileCache(path).get("東京"), "139.7,35.6")
+
+if __name__ == '__main__':
+    unittest.main()
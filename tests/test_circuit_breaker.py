@@ -0,0 +1,173 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from utils.deadline import DeadlineExceeded
+from utils.kv_store import LocalKVStore
+from utils.tracing import Tracer
+from handlers.conversation_handler import ConversationHandler
+
+def response(status_code):
+    """テスト用のレスポンスを作成する"""
+    return MagicMock(status_code=status_code)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """サーキットブレーカーのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.now = 1000.0
+        patcher = patch("utils.circuit_breaker.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_breaker(self, **kwargs):
+        """テスト用のサーキットブレーカーを作成する"""
+        options = {"failure_threshold": 3, "open_seconds": 30, "slow_call_ms": 0}
+        options.update(kwargs)
+        return CircuitBreaker("test", **options)
+
+    def test_opens_after_consecutive_failures(self):
+        """連続した失敗で開き、その間は呼び出さないテスト"""
+        breaker = self.make_breaker()
+        func = MagicMock(return_value=response(503))
+
+        for _ in range(3):
+            breaker.call(func)
+        self.assertEqual(breaker.state, OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_success_resets_failures(self):
+        """成功を挟んだ失敗は連続として数えないテスト"""
+        breaker = self.make_breaker()
+        for status in (500, 500, 200, 500, 500):
+            breaker.call(MagicMock(return_value=response(status)))
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_exceptions_and_slow_calls_count_as_failures(self):
+        """例外と遅い応答を失敗として数え、期限不足は数えないテスト"""
+        breaker = self.make_breaker(slow_call_ms=100)
+
+        with self.assertRaises(ConnectionError):
+            breaker.call(MagicMock(side_effect=ConnectionError("down")))
+        with self.assertRaises(DeadlineExceeded):
+            breaker.call(MagicMock(side_effect=DeadlineExceeded()))
+        breaker.record_success(elapsed_ms=500)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_success(elapsed_ms=500)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_half_open_probe(self):
+        """一定時間後は1件だけ試しに呼び出し、成功すれば閉じるテスト"""
+        breaker = self.make_breaker(failure_threshold=1)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+
+        self.now += 30
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # 試しの呼び出し中は他の呼び出しを通さない
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """試しの呼び出しが失敗すると再び開くテスト"""
+        breaker = self.make_breaker(failure_threshold=1)
+        breaker.record_failure()
+        self.now += 30
+
+        with self.assertRaises(TimeoutError):
+            breaker.call(MagicMock(side_effect=TimeoutError()))
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_state_is_shared(self):
+        """共有の保存先を使うと他のコンテナが開いた状態を取り込むテスト"""
+        kv_store = LocalKVStore()
+        first = self.make_breaker(failure_threshold=1, kv_store=kv_store, sync_seconds=0)
+        second = self.make_breaker(failure_threshold=1, kv_store=kv_store, sync_seconds=0)
+
+        first.record_failure()
+        self.now += 1
+        self.assertFalse(second.allow())
+        self.assertEqual(second.state, OPEN)
+
+        # 回復を確かめたコンテナが閉じると、他のコンテナも閉じる
+        self.now += 30
+        self.assertTrue(first.allow())
+        first.record_success()
+        self.now += 1
+        self.assertTrue(second.allow())
+        self.assertEqual(second.state, CLOSED)
+
+    def test_call_async(self):
+        """asyncio版でも開いている間は呼び出さないテスト"""
+        breaker = self.make_breaker(failure_threshold=1)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return response(500)
+
+        async def main():
+            await breaker.call_async(fetch)
+            with self.assertRaises(CircuitOpenError):
+                await breaker.call_async(fetch)
+
+        asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+
+    def test_state_is_emitted_as_metric(self):
+        """状態が埋め込みメトリクスに出力されるテスト"""
+        stream = io.StringIO()
+        tracer = Tracer(enabled=True, stream=stream)
+        breaker = self.make_breaker(failure_threshold=1)
+        breaker.record_failure()
+
+        with patch("utils.circuit_breaker.get_tracer", return_value=tracer):
+            tracer.start()
+            breaker.allow()
+            record = tracer.flush()
+
+        self.assertEqual(record["circuit_test"], 2)
+        metrics = record["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+        self.assertIn({"Name": "circuit_test", "Unit": "None"}, metrics)
+        self.assertEqual(json.loads(stream.getvalue())["circuit_test"], 2)
+
+class TestConversationFallback(unittest.TestCase):
+    """サーキットが開いているときの会話処理のテストクラス"""
+
+    @patch('handlers.conversation_handler.OPENAI_API_KEY', "dummy_key")
+    @patch('utils.http_client.post')
+    def test_open_circuit_skips_openai(self, mock_post):
+        """サーキットが開いている間はOpenAIを呼ばずに定型応答を返すテスト"""
+        breaker = CircuitBreaker("openai", failure_threshold=1, open_seconds=60)
+        breaker.record_failure()
+        line_client = MagicMock()
+        handler = ConversationHandler(line_client, memory=None)
+        event = MagicMock()
+        event.reply_token = "reply-token-1"
+
+        with patch("handlers.conversation_handler.get_circuit_breaker", return_value=breaker):
+            self.assertTrue(handler.process_conversation(event, "火星に行きたい"))
+
+        mock_post.assert_not_called()
+        line_client.reply_message.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,7 +30,9 @@ class TestCommandHandler(unittest.TestCase):
         # 新しいCommandHandlerインスタンスを作成
         handler = CommandHandler(self.mock_line_client)
         
-        # WeatherServiceが初期化されたことを確認
+        # WeatherServiceは初めて使うときに初期化されることを確認
+        mock_weather_service_class.assert_not_called()
+        self.assertIs(handler.weather_service, handler.weather_service)
         mock_weather_service_class.assert_called_once()
         
         # コマンドマップに'/weather'が含まれていることを確認
@@ -51,7 +53,7 @@ class TestCommandHandler(unittest.TestCase):
         
         # 検証
         self.assertTrue(result)
-        self.mock_weather_service.get_weather.assert_called_once_with("東京")
+        self.mock_weather_service.get_weather.assert_called_once_with("東京", deadline=None)
         self.mock_line_client.reply_message.assert_called_once_with(
             "reply-token-123", "東京の天気: 晴れ、気温25℃"
         )
@@ -70,11 +72,23 @@ class TestCommandHandler(unittest.TestCase):
         
         # 検証
         self.assertTrue(result)
-        self.mock_weather_service.get_weather.assert_called_once_with("大阪")
+        self.mock_weather_service.get_weather.assert_called_once_with("大阪", deadline=None)
         self.mock_line_client.reply_message.assert_called_once_with(
             "reply-token-123", "大阪の天気: 曇り、気温22℃"
         )
     
+    def test_handle_weather_multiple_locations(self):
+        """weatherコマンドで複数の場所をまとめて調べるテスト"""
+        mock_event = MagicMock()
+        mock_event.reply_token = "reply-token-123"
+        self.mock_weather_service.get_weather_multi.return_value = "東京の天気: 晴れ\n\n大阪の天気: 雨"
+        
+        result = self.command_handler.handle_weather(mock_event, "/weather 東京　大阪 札幌")
+        
+        self.assertTrue(result)
+        self.mock_weather_service.get_weather_multi.assert_called_once_with(["東京", "大阪", "札幌"], deadline=None)
+        self.mock_weather_service.get_weather.assert_not_called()
+    
     def test_handle_weather_error(self):
         """weatherコマンドのエラーハンドリングテスト"""
         # モックイベントの作成
@@ -93,5 +107,49 @@ class TestCommandHandler(unittest.TestCase):
         # reply_messageは呼ばれないはず（例外がキャッチされるため）
         self.mock_line_client.reply_message.assert_not_called()
 
+    def test_bare_slash(self):
+        """「/」だけのメッセージが未知のコマンドとして扱われるテスト"""
+        mock_event = MagicMock()
+        mock_event.reply_token = "reply-token-123"
+        
+        result = self.command_handler.process_command(mock_event, "/")
+        
+        self.assertTrue(result)
+        text = self.mock_line_client.reply_message.call_args[0][1]
+        self.assertTrue(text.startswith("未知のコマンドだ。"))
+    
+    def test_alias_and_prefix(self):
+        """別名・前方一致・全角スペース区切りでコマンドが解釈されるテスト"""
+        registry = self.command_handler.registry
+        
+        self.assertEqual(registry.parse("/天気　大阪").args, {"locations": ["大阪"]})
+        self.assertEqual(registry.parse("/WEA").name, "weather")
+        self.assertEqual(registry.parse("/w").args, {"locations": ["東京"]})
+        # tesla と task の両方に一致する前方一致は未知のコマンド
+        self.assertIsNone(registry.parse("/t").command)
+        # 管理者用のコマンドは前方一致の対象外
+        self.assertIsNone(registry.parse("/sta").command)
+        self.assertEqual(registry.parse("/advice 起業 する").args, {"theme": "起業 する"})
+        self.assertEqual(registry.parse("/task").args, {"task_type": "未指定のタスク"})
+    
+    def test_process_command_parses_once(self):
+        """解釈済みの引数がハンドラに渡されるテスト"""
+        mock_event = MagicMock()
+        mock_event.reply_token = "reply-token-123"
+        self.mock_weather_service.get_weather.return_value = "札幌の天気: 雪"
+        
+        result = self.command_handler.process_command(mock_event, "/天気 札幌")
+        
+        self.assertTrue(result)
+        self.mock_weather_service.get_weather.assert_called_once_with("札幌", deadline=None)
+    
+    def test_help_generated_from_registry(self):
+        """ヘルプが登録されたコマンドから作られるテスト"""
+        help_text = self.command_handler.registry.help_text()
+        
+        self.assertIn("/weather [場所...] - 天気情報", help_text)
+        self.assertIn("/advice [テーマ] - イーロンからのアドバイス", help_text)
+        self.assertNotIn("/stats", help_text)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.conversation_memory import (
+    ConversationHistory, InMemoryConversationStore, SQLiteConversationStore, KVConversationStore,
+    estimate_tokens, source_key
+)
+from utils.kv_store import LocalKVStore
+from handlers.conversation_handler import ConversationHandler
+
+def turn(user, assistant):
+    """ユーザーの発言とBotの返答の組を作る"""
+    return [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+
+class TestConversationHistory(unittest.TestCase):
+    """会話履歴のリングバッファのテストクラス"""
+
+    def test_estimate_tokens(self):
+        """トークン数の概算のテスト"""
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("火星"), 2)
+        self.assertEqual(estimate_tokens(""), 0)
+
+    def test_turn_limit(self):
+        """往復数の上限を超えると古い往復から捨てられるテスト"""
+        history = ConversationHistory(max_turns=2, max_tokens=1000)
+        for i in range(3):
+            history.extend(turn(f"q{i}", f"a{i}"))
+
+        self.assertEqual([m["content"] for m in history.to_list()], ["q1", "a1", "q2", "a2"])
+
+    def test_token_limit(self):
+        """トークン数の上限を超えると古い発言から捨てられ、Botの返答から始まらないテスト"""
+        history = ConversationHistory(max_turns=10, max_tokens=8)
+        history.extend(turn("あいう", "えお"))
+        history.extend(turn("かきくけ", "こ"))
+
+        messages = history.to_list()
+        self.assertEqual(messages[0]["role"], "user")
+        self.assertEqual([m["content"] for m in messages], ["かきくけ", "こ"])
+        self.assertEqual(history.tokens, 5)
+
+    def test_source_key(self):
+        """グループ・ルーム・ユーザーごとのキーのテスト"""
+        group = MagicMock(spec=["group_id", "user_id"], group_id="C1", user_id="U1")
+        user = MagicMock(spec=["user_id"], user_id="U1")
+
+        self.assertEqual(source_key(group), "group:C1")
+        self.assertEqual(source_key(user), "user:U1")
+        self.assertIsNone(source_key(MagicMock()))
+
+class TestConversationStores(unittest.TestCase):
+    """会話履歴のストアのテストクラス"""
+
+    def check_store(self, store):
+        """ストアの基本動作を確認する"""
+        self.assertEqual(store.messages("user:U1"), [])
+        store.append("user:U1", turn("こんにちは", "やあ"))
+        store.append("user:U1", turn("火星は？", "行こう"))
+
+        self.assertEqual(
+            [m["content"] for m in store.messages("user:U1")], ["こんにちは", "やあ", "火星は？", "行こう"]
+        )
+        self.assertEqual(store.messages("user:U2"), [])
+
+    def test_in_memory_store(self):
+        """メモリのストアのテスト"""
+        self.check_store(InMemoryConversationStore(max_chats=10, ttl=60))
+
+    def test_in_memory_store_lru_and_ttl(self):
+        """使われていないチャットと期限切れのチャットが捨てられるテスト"""
+        store = InMemoryConversationStore(max_chats=2, ttl=60)
+        store.append("user:A", turn("a", "a"))
+        store.append("user:B", turn("b", "b"))
+        store.messages("user:A")
+        store.append("user:C", turn("c", "c"))
+
+        self.assertEqual(store.messages("user:B"), [])
+        self.assertNotEqual(store.messages("user:A"), [])
+
+        with patch("utils.cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(store.messages("user:A"), [])
+
+    def test_sqlite_store(self):
+        """SQLiteのストアのテスト"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "memory.sqlite3")
+            self.check_store(SQLiteConversationStore(path=path, ttl=60))
+            # 別のインスタンスからも読める
+            self.assertEqual(len(SQLiteConversationStore(path=path, ttl=60).messages("user:U1")), 4)
+
+    def test_kv_store(self):
+        """キーバリューストアのストアのテスト"""
+        self.check_store(KVConversationStore(LocalKVStore(), ttl=60))
+
+class TestConversationHandlerMemory(unittest.TestCase):
+    """会話履歴を使う会話処理のテストクラス"""
+
+    @patch('handlers.conversation_handler.OPENAI_API_KEY', "dummy_key")
+    @patch('utils.http_client.post')
+    def test_history_is_sent_to_openai(self, mock_post):
+        """2回目の会話で前回のやり取りがOpenAIに渡されるテスト"""
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"choices": [{"message": {"content": "火星に行こう"}}]}
+        handler = ConversationHandler(MagicMock(), memory=InMemoryConversationStore(max_chats=10, ttl=60))
+        event = MagicMock()
+        event.source = MagicMock(spec=["user_id"], user_id="U1")
+
+        handler.process_conversation(event, "こんにちは")
+        handler.process_conversation(event, "どこに行く？")
+
+        messages = mock_post.call_args[1]["json"]["messages"]
+        self.assertEqual(
+            [(m["role"], m["content"]) for m in messages[1:]],
+            [("user", "こんにちは"), ("assistant", "火星に行こう"), ("user", "どこに行く？")]
+        )
+
+if __name__ == '__main__':
+    unittest.main()
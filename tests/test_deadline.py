@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.http_client import HttpClient
+from services.advice_service import AdviceService
+from utils.cache import VariantCache
+from data.responses import ADVICE_LIST
+
+class TestDeadline(unittest.TestCase):
+    """Deadlineのテストクラス"""
+
+    def test_from_context(self):
+        """Lambdaの残り時間から期限が作られるテスト"""
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 5000
+
+        deadline = Deadline.from_context(context)
+
+        # 余裕分（デフォルト500ms）を差し引いた残り時間になる
+        self.assertAlmostEqual(deadline.remaining(), 4.5, delta=0.1)
+        self.assertIsNone(Deadline.from_context(None))
+
+    def test_cap_shrinks_timeout(self):
+        """タイムアウトが残り時間に収まるテスト"""
+        deadline = Deadline.from_timeout(3.0, reserve=1.0)
+
+        connect, read = deadline.cap((3.05, 10.0))
+
+        self.assertLessEqual(connect, 2.0)
+        self.assertLessEqual(read, 2.0)
+        self.assertEqual(Deadline.from_timeout(30.0, reserve=1.0).cap(10.0), 10.0)
+
+    def test_cap_raises_when_no_time_left(self):
+        """返信分の時間しか残っていない場合は例外になるテスト"""
+        deadline = Deadline.from_timeout(0.5, reserve=1.0)
+
+        with self.assertRaises(DeadlineExceeded):
+            deadline.cap(10.0)
+
+    @patch("requests.Session.request")
+    def test_http_client_uses_deadline(self, mock_request):
+        """HTTPクライアントが期限に合わせてタイムアウトを縮めるテスト"""
+        mock_request.return_value.status_code = 200
+        client = HttpClient(host_timeouts={"api.openai.com": (3.05, 10.0)})
+
+        client.request("POST", "https://api.openai.com/v1/chat/completions",
+                       deadline=Deadline.from_timeout(2.0, reserve=0.5))
+
+        _, read = mock_request.call_args[1]["timeout"]
+        self.assertLessEqual(read, 1.5)
+
+    @patch("requests.Session.request")
+    def test_advice_falls_back_without_calling_api(self, mock_request):
+        """期限切れ間近ならOpenAIを呼ばずにランダムなアドバイスを返すテスト"""
+        advice_service = AdviceService(advice_cache=VariantCache())
+        advice_service.api_key = "dummy_key"
+
+        result = advice_service.get_themed_advice("起業", deadline=Deadline.from_timeout(0.1, reserve=1.0))
+
+        mock_request.assert_not_called()
+        self.assertTrue(any(advice in result for advice in ADVICE_LIST))
+
+if __name__ == '__main__':
+    unittest.main()
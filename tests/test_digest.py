@@ -0,0 +1,219 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# digest_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+import digest_function
+from services.digest_service import DigestService
+from services.subscription_service import SubscriptionService
+from handlers.command_handler import CommandHandler
+from utils.kv_store import LocalKVStore, DynamoDBKVStore, KVStoreUnavailableError
+
+class TestDigestService(unittest.TestCase):
+    """ダイジェスト配信のテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.kv_store = LocalKVStore()
+        self.subscriptions = SubscriptionService(self.kv_store)
+        self.line_client = MagicMock()
+        self.line_client.multicast.return_value = True
+        self.weather_service = MagicMock()
+        self.weather_service.get_weather_many.side_effect = lambda areas, deadline=None: {
+            area: f"{area}の天気: 晴れ" for area in areas
+        }
+        self.news_service = MagicMock()
+        self.news_service.get_news.return_value = "最新ニュース"
+
+    def make_service(self, batch_size=500):
+        """テスト用のダイジェストサービスを作成する"""
+        return DigestService(
+            self.line_client, self.weather_service, self.news_service, self.subscriptions,
+            kv_store=self.kv_store, batch_size=batch_size, concurrency=2, per_second=0
+        )
+
+    def test_batches_by_area(self):
+        """購読者が地域ごとに上限件数のバッチに分けられるテスト"""
+        subscribers = {f"U{i:04d}": "東京" for i in range(1201)}
+        subscribers.update({f"V{i:04d}": "大阪" for i in range(3)})
+
+        batches = self.make_service().build_batches(subscribers)
+
+        self.assertEqual([(key, len(user_ids)) for key, _, user_ids in batches], [
+            ("大阪:0", 3), ("東京:0", 500), ("東京:1", 500), ("東京:2", 201)
+        ])
+
+    def test_run_fetches_weather_once_per_area(self):
+        """天気は全地域まとめて1回だけ取得され、地域ごとの本文が送られるテスト"""
+        for i in range(5):
+            self.subscriptions.subscribe(f"U{i}", "東京")
+        self.subscriptions.subscribe("V1", "札幌")
+
+        result = self.make_service(batch_size=2).run(date="2026-01-01")
+
+        self.weather_service.get_weather_many.assert_called_once()
+        self.assertEqual(sorted(self.weather_service.get_weather_many.call_args[0][0]), ["札幌", "東京"])
+        self.news_service.get_news.assert_called_once()
+        self.assertEqual(result["sent"], 4)
+        self.assertEqual(result["recipients"], 6)
+        self.assertTrue(result["complete"])
+        texts = {tuple(call[0][0]): call[0][1] for call in self.line_client.multicast.call_args_list}
+        self.assertIn("札幌の天気: 晴れ", texts[("V1",)])
+
+    def test_resume_skips_sent_batches(self):
+        """再実行すると送信に失敗したバッチだけが同じ retry_key で送られるテスト"""
+        for i in range(4):
+            self.subscriptions.subscribe(f"U{i}", "東京")
+        self.line_client.multicast.side_effect = lambda to, text, retry_key=None: to != ["U2", "U3"]
+
+        first = self.make_service(batch_size=2).run(date="2026-01-01")
+        failed_key = self.line_client.multicast.call_args_list[-1][1]["retry_key"]
+        self.assertEqual((first["sent"], first["failed"], first["complete"]), (1, 1, False))
+
+        self.line_client.multicast.reset_mock(side_effect=True)
+        self.line_client.multicast.return_value = True
+        second = self.make_service(batch_size=2).run(date="2026-01-01")
+
+        self.assertEqual((second["sent"], second["skipped"], second["complete"]), (1, 1, True))
+        self.line_client.multicast.assert_called_once()
+        self.assertEqual(self.line_client.multicast.call_args[0][0], ["U2", "U3"])
+        self.assertEqual(self.line_client.multicast.call_args[1]["retry_key"], failed_key)
+        self.assertEqual(
+            json.loads(self.kv_store.get("digest:progress:2026-01-01")),
+            {"batches": ["東京:0", "東京:1"], "done": ["東京:0", "東京:1"]}
+        )
+
+    def test_resume_uses_first_run_recipients(self):
+        """購読者が変わっても、再実行では最初の実行で決めたバッチの宛先に送るテスト"""
+        for i in range(4):
+            self.subscriptions.subscribe(f"U{i}", "東京")
+        self.line_client.multicast.side_effect = lambda to, text, retry_key=None: to != ["U2", "U3"]
+        self.make_service(batch_size=2).run(date="2026-01-01")
+        first_keys = [call[1]["retry_key"] for call in self.line_client.multicast.call_args_list]
+
+        # 先頭に購読者が増えると、購読者から分け直した場合は「東京:1」の宛先がずれる
+        self.subscriptions.subscribe("T0", "東京")
+        self.line_client.multicast.reset_mock(side_effect=True)
+        self.line_client.multicast.return_value = True
+        result = self.make_service(batch_size=2).run(date="2026-01-01")
+
+        self.assertEqual((result["sent"], result["complete"]), (1, True))
+        self.assertEqual(self.line_client.multicast.call_args[0][0], ["U2", "U3"])
+        # 宛先の違うバッチは retry_key も違う
+        self.assertEqual(len(set(first_keys)), 2)
+        self.assertEqual(self.line_client.multicast.call_args[1]["retry_key"], first_keys[1])
+
+    def test_deadline_leaves_batches_for_next_run(self):
+        """期限切れの場合は送信せずに次の実行に残すテスト"""
+        self.subscriptions.subscribe("U1", "東京")
+        deadline = MagicMock()
+        deadline.expired.return_value = True
+
+        result = self.make_service().run(date="2026-01-01", deadline=deadline)
+
+        self.line_client.multicast.assert_not_called()
+        self.assertEqual(result["remaining"], 1)
+        self.assertFalse(result["complete"])
+
+    def test_weather_unavailable(self):
+        """天気情報を取得できなかった地域にはランダムな天気ではなく取得できなかったことを伝えるテスト"""
+        self.subscriptions.subscribe("U1", "東京")
+        self.weather_service.get_weather_many.side_effect = lambda areas, deadline=None: dict.fromkeys(areas)
+
+        self.make_service().run(date="2026-01-01")
+
+        text = self.line_client.multicast.call_args[0][1]
+        self.assertIn("天気情報を取得できなかった", text)
+        self.assertIn("最新ニュース", text)
+
+class TestSubscriptionCommands(unittest.TestCase):
+    """購読コマンドのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.line_client = MagicMock()
+        self.handler = CommandHandler(self.line_client)
+        self.handler.subscription_service = SubscriptionService(LocalKVStore())
+        self.event = MagicMock()
+        self.event.source = MagicMock(spec=["user_id"], user_id="U1")
+
+    def test_subscribe_and_unsubscribe(self):
+        """購読の登録と解除のテスト"""
+        self.handler.process_command(self.event, "/購読 大阪")
+        self.assertEqual(self.handler.subscription_service.subscribers(), {"U1": "大阪"})
+        self.assertIn("大阪", self.line_client.reply_message.call_args[0][1])
+
+        self.handler.process_command(self.event, "/unsubscribe")
+        self.assertEqual(self.handler.subscription_service.subscribers(), {})
+        self.assertTrue(self.line_client.reply_message.call_args[0][1].startswith("購読を解除した"))
+
+    def test_subscribers_are_separate_items(self):
+        """別のコンテナからの登録・解除が互いの変更を上書きしないテスト"""
+        kv_store = LocalKVStore()
+        first, second = SubscriptionService(kv_store), SubscriptionService(kv_store)
+
+        first.subscribe("U1", "東京")
+        second.subscribe("U2", "大阪")
+        first.unsubscribe("U1")
+        self.assertFalse(second.unsubscribe("U1"))
+
+        self.assertEqual(second.subscribers(), {"U2": "大阪"})
+        self.assertEqual(kv_store.get("digest:subscriber:U2"), "大阪")
+
+    def test_expired_subscribers_leave_group(self):
+        """件数の上限で捨てられたキーはグループの一覧からも外れるテスト"""
+        kv_store = LocalKVStore(maxsize=2)
+        subscriptions = SubscriptionService(kv_store)
+        for user_id in ("U1", "U2", "U3"):
+            subscriptions.subscribe(user_id, "東京")
+
+        self.assertEqual(subscriptions.subscribers(), {"U2": "東京", "U3": "東京"})
+        self.assertEqual(kv_store._groups["digest:subscribers"], {"digest:subscriber:U2", "digest:subscriber:U3"})
+
+    @patch("utils.kv_store._digest_store", None)
+    @patch("utils.kv_store.DIGEST_STORE_TABLE", "")
+    def test_subscribe_without_shared_table(self):
+        """共有のテーブルがない場合は購読を受け付けず、そう伝えるテスト"""
+        handler = CommandHandler(self.line_client)
+
+        self.assertTrue(handler.process_command(self.event, "/subscribe 大阪"))
+        self.assertEqual(self.line_client.reply_message.call_args[0][1], "すまない、今はダイジェストの購読を受け付けていない。")
+        with self.assertRaises(KVStoreUnavailableError):
+            SubscriptionService()
+
+    @patch("utils.kv_store._digest_store", None)
+    @patch("utils.kv_store.DIGEST_STORE_TABLE", "")
+    def test_digest_without_shared_table(self):
+        """共有のテーブルがない場合、ダイジェストの配信は0件で終わらずに失敗するテスト"""
+        with patch("digest_function.line_client") as mock_line_client:
+            with self.assertRaises(KVStoreUnavailableError):
+                digest_function.lambda_handler({}, None)
+        mock_line_client.multicast.assert_not_called()
+
+    def test_dynamodb_lists_subscribers_by_index(self):
+        """DynamoDBではインデックスへのクエリでページをたどって購読者を一覧するテスト"""
+        kv_store = DynamoDBKVStore(table_name="table", group_index="g-index")
+        kv_store._client = MagicMock()
+        kv_store._client.query.side_effect = [
+            {"Items": [{"k": {"S": "digest:subscriber:U1"}, "v": {"S": "東京"}}],
+             "LastEvaluatedKey": {"k": {"S": "digest:subscriber:U1"}}},
+            {"Items": [{"k": {"S": "digest:subscriber:U2"}, "v": {"S": "大阪"}},
+                       {"k": {"S": "digest:subscriber:U3"}, "v": {"S": "札幌"}, "expires_at": {"N": "1"}}]},
+        ]
+
+        self.assertEqual(SubscriptionService(kv_store).subscribers(), {"U1": "東京", "U2": "大阪"})
+        calls = kv_store._client.query.call_args_list
+        self.assertEqual(calls[0][1]["IndexName"], "g-index")
+        self.assertEqual(calls[1][1]["ExclusiveStartKey"], {"k": {"S": "digest:subscriber:U1"}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dispatcher import EventDispatcher, get_chat_key
+
+def make_event(name, user_id=None, group_id=None, room_id=None):
+    """テスト用のイベントを作成する"""
+    event = MagicMock()
+    event.name = name
+    event.source.user_id = user_id
+    event.source.group_id = group_id
+    event.source.room_id = room_id
+    return event
+
+class TestEventDispatcher(unittest.TestCase):
+    """EventDispatcherのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.dispatcher = EventDispatcher(max_workers=4)
+
+    def test_get_chat_key(self):
+        """チャットキーの判定テスト"""
+        self.assertEqual(get_chat_key(make_event("a", user_id="U1", group_id="G1")), "group:G1")
+        self.assertEqual(get_chat_key(make_event("b", user_id="U1", room_id="R1")), "room:R1")
+        self.assertEqual(get_chat_key(make_event("c", user_id="U1")), "user:U1")
+
+    def test_same_chat_runs_in_order(self):
+        """同じチャットのイベントは順番に処理されるテスト"""
+        events = [make_event(f"e{i}", user_id="U1", group_id="G1") for i in range(5)]
+        handled = []
+
+        def handle(event):
+            # 後のイベントほど早く終わるようにして、追い越しが起きないことを確認
+            time.sleep(0.01 * (5 - len(handled)))
+            handled.append(event.name)
+
+        result = self.dispatcher.dispatch(events, handle, timeout=5)
+
+        self.assertEqual(handled, ["e0", "e1", "e2", "e3", "e4"])
+        self.assertEqual(result["pending"], 0)
+
+    def test_different_chats_run_in_parallel(self):
+        """異なるチャットのイベントは並列に処理されるテスト"""
+        events = [make_event(f"e{i}", group_id=f"G{i}") for i in range(4)]
+        barrier = threading.Barrier(4, timeout=2)
+
+        # 4件が同時に実行されていなければバリアがタイムアウトする
+        result = self.dispatcher.dispatch(events, lambda event: barrier.wait(), timeout=5)
+
+        self.assertEqual(result, {"chats": 4, "completed": 4, "pending": 0})
+
+    def test_concurrency_limit(self):
+        """同時実行数が上限を超えないテスト"""
+        dispatcher = EventDispatcher(max_workers=2)
+        events = [make_event(f"e{i}", user_id=f"U{i}") for i in range(6)]
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def handle(event):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.02)
+            with lock:
+                state["running"] -= 1
+
+        dispatcher.dispatch(events, handle, timeout=5)
+
+        self.assertLessEqual(state["peak"], 2)
+
+    def test_timeout_returns_before_completion(self):
+        """期限に達したら完了を待たずに戻るテスト"""
+        events = [make_event("slow", user_id="U1"), make_event("fast", user_id="U2")]
+        release = threading.Event()
+
+        def handle(event):
+            if event.name == "slow":
+                release.wait(2)
+
+        started = time.monotonic()
+        result = self.dispatcher.dispatch(events, handle, timeout=0.1)
+        elapsed = time.monotonic() - started
+        release.set()
+
+        self.assertLess(elapsed, 1)
+        self.assertEqual(result["pending"], 1)
+        self.assertEqual(result["completed"], 1)
+
+    def test_error_does_not_stop_chat(self):
+        """1件の例外で同じチャットの後続イベントが止まらないテスト"""
+        events = [make_event(f"e{i}", user_id="U1") for i in range(3)]
+        handled = []
+
+        def handle(event):
+            if event.name == "e0":
+                raise Exception("handler error")
+            handled.append(event.name)
+
+        self.dispatcher.dispatch(events, handle)
+
+        self.assertEqual(handled, ["e1", "e2"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# line_client はLINEの認証情報を読み込み時に取り込む
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from line_client import LineClient
+from utils.event_dedup import EventDeduplicator, DONE, FAILED, IN_PROGRESS
+from utils.kv_store import LocalKVStore
+
+def make_event(event_id="ev-1", redelivery=False):
+    """テスト用のイベントを作成する"""
+    event = MagicMock(spec=["webhook_event_id", "delivery_context", "message"])
+    event.webhook_event_id = event_id
+    event.delivery_context.is_redelivery = redelivery
+    return event
+
+class TestEventDeduplicator(unittest.TestCase):
+    """webhookEventId による重複防止のテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.kv_store = LocalKVStore()
+        self.deduplicator = EventDeduplicator(self.kv_store, maxsize=100, ttl=60, in_progress_ttl=10)
+
+    def test_processed_event_is_skipped(self):
+        """処理済みのイベントの再送は処理しないテスト"""
+        func = MagicMock()
+
+        self.assertEqual(self.deduplicator.run(make_event(), func), DONE)
+        self.assertEqual(self.deduplicator.run(make_event(redelivery=True), func), DONE)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(self.kv_store.get("event:ev-1"), DONE)
+
+    def test_in_progress_event_is_skipped(self):
+        """処理中のイベントの再送は処理しないテスト"""
+        self.assertTrue(self.deduplicator.begin("ev-1"))
+        self.assertFalse(self.deduplicator.begin("ev-1"))
+
+        func = MagicMock()
+        self.assertEqual(self.deduplicator.run(make_event(redelivery=True), func), IN_PROGRESS)
+        func.assert_not_called()
+
+    def test_failed_event_is_retried(self):
+        """失敗したイベントの再送はもう一度処理するテスト"""
+        with self.assertRaises(RuntimeError):
+            self.deduplicator.run(make_event(), MagicMock(side_effect=RuntimeError("boom")))
+        self.assertEqual(self.kv_store.get("event:ev-1"), FAILED)
+
+        func = MagicMock()
+        self.assertEqual(self.deduplicator.run(make_event(redelivery=True), func), DONE)
+        func.assert_called_once()
+
+    def test_handler_reporting_failure_is_retried(self):
+        """処理関数がFalseを返したイベントの再送はもう一度処理するテスト"""
+        self.assertEqual(self.deduplicator.run(make_event(), MagicMock(return_value=False)), FAILED)
+        self.assertEqual(self.kv_store.get("event:ev-1"), FAILED)
+
+        func = MagicMock(return_value=True)
+        self.assertEqual(self.deduplicator.run(make_event(redelivery=True), func), DONE)
+        func.assert_called_once()
+        self.assertEqual(self.kv_store.get("event:ev-1"), DONE)
+
+    def test_shared_store_across_containers(self):
+        """別のコンテナ（インスタンス）が処理したイベントも見分けるテスト"""
+        other = EventDeduplicator(self.kv_store, maxsize=100, ttl=60, in_progress_ttl=10)
+        self.assertTrue(self.deduplicator.begin("ev-1"))
+        self.assertFalse(other.begin("ev-1"))
+
+        self.deduplicator.finish("ev-1", True)
+        self.assertFalse(other.begin("ev-1"))
+
+    def test_event_without_id_is_processed(self):
+        """webhookEventId のないイベントはそのまま処理するテスト"""
+        func = MagicMock()
+        self.deduplicator.run(make_event(event_id=None), func)
+        self.deduplicator.run(make_event(event_id=None), func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_store_error_does_not_drop_event(self):
+        """保存先に届かない場合も処理するテスト"""
+        kv_store = MagicMock()
+        kv_store.put_if_absent.side_effect = ConnectionError("down")
+        deduplicator = EventDeduplicator(kv_store, maxsize=100, ttl=60, in_progress_ttl=10)
+        func = MagicMock()
+
+        self.assertEqual(deduplicator.run(make_event(), func), DONE)
+        func.assert_called_once()
+
+    def test_run_async(self):
+        """asyncio版でも処理済みのイベントを処理しないテスト"""
+        calls = []
+
+        async def handle():
+            calls.append(1)
+            return True
+
+        async def main():
+            first = await self.deduplicator.run_async(make_event(), handle)
+            second = await self.deduplicator.run_async(make_event(redelivery=True), handle)
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), (DONE, DONE))
+        self.assertEqual(len(calls), 1)
+
+class TestLineClientDedup(unittest.TestCase):
+    """LineClient のイベント処理での重複防止のテストクラス"""
+
+    def test_redelivered_event_is_handled_once(self):
+        """同じ webhookEventId のイベントはハンドラが1回だけ呼ばれるテスト"""
+        client = LineClient()
+        handler = MagicMock()
+        client.add("MagicMock")(handler)
+        deduplicator = EventDeduplicator(LocalKVStore(), maxsize=100, ttl=60, in_progress_ttl=10)
+
+        with patch("line_client.get_event_deduplicator", return_value=deduplicator):
+            client._handle_event(make_event())
+            client._handle_event(make_event(redelivery=True))
+
+        handler.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lambda_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from utils.event_queue import InMemoryEventQueue, SQLiteEventQueue, SQSEventQueue, encode_event
+import lambda_function
+import worker_function
+
+def make_event_dict(text, user_id="U1", reply_token="reply-token-1", timestamp=None):
+    """テスト用のWebhookイベントを作成する"""
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": timestamp or int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        # webhookEventId はイベントごとに一意（同じIDは再送として重複防止の対象になる）
+        "webhookEventId": uuid.uuid4().hex,
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": reply_token,
+        "message": {"id": "1", "type": "text", "text": text},
+    }
+
+class TestEventQueue(unittest.TestCase):
+    """イベントキューのテストクラス"""
+
+    def test_in_memory_queue_visibility(self):
+        """受信したメッセージは削除されるまで再受信されないテスト"""
+        queue = InMemoryEventQueue(visibility_timeout=60)
+        queue.send(["a", "b", "c"])
+
+        first = queue.receive(2)
+        second = queue.receive(2)
+        queue.ack(first[0])
+
+        self.assertEqual([m.body for m in first], ["a", "b"])
+        self.assertEqual([m.body for m in second], ["c"])
+        self.assertEqual(len(queue), 2)
+
+    def test_sqlite_queue(self):
+        """SQLiteのキューで送信・受信・削除ができるテスト"""
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = SQLiteEventQueue(os.path.join(tmp, "queue.sqlite3"), visibility_timeout=0)
+            queue.send(["a", "b"])
+
+            messages = queue.receive(10)
+            queue.ack(messages[0])
+
+            self.assertEqual([m.body for m in messages], ["a", "b"])
+            # 可視性タイムアウトが0なので、削除していないメッセージはすぐに再受信される
+            self.assertEqual([m.body for m in queue.receive(10)], ["b"])
+
+    def test_sqs_fifo_deduplication_id(self):
+        """FIFOキューには webhookEventId（ない場合は本文のハッシュ）を重複排除IDとして送るテスト"""
+        queue = SQSEventQueue("https://sqs.example.com/123/events.fifo")
+        queue._client = MagicMock()
+        queue._client.send_message_batch.return_value = {}
+        event_dict = make_event_dict("/tesla")
+        without_id = encode_event({"type": "follow"})
+
+        queue.send([encode_event(event_dict), without_id], group_ids=["user:U1", None])
+
+        entries = queue._client.send_message_batch.call_args[1]["Entries"]
+        self.assertEqual(entries[0]["MessageDeduplicationId"], event_dict["webhookEventId"])
+        self.assertEqual(entries[0]["MessageGroupId"], "user:U1")
+        self.assertEqual(len(entries[1]["MessageDeduplicationId"]), 64)
+        self.assertEqual(entries[1]["MessageGroupId"], "default")
+
+class TestAckFirstWebhook(unittest.TestCase):
+    """キューを使うWebhook処理のテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.queue = InMemoryEventQueue()
+        self.line_client = lambda_function.line_client
+        patcher = patch.object(self.line_client, "validate_signature", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("lambda_function.WEBHOOK_MODE", "queue")
+    @patch("lambda_function.command_handler")
+    def test_webhook_enqueues_without_processing(self, mock_command_handler):
+        """キューモードではイベントを処理せずに即時応答するテスト"""
+        body = json.dumps({"destination": "Ubot", "events": [make_event_dict("/tesla")]})
+
+        with patch("lambda_function.get_event_queue", return_value=self.queue):
+            response = lambda_function.lambda_handler(
+                {"body": body, "headers": {"x-line-signature": "sig"}}, None
+            )
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(len(self.queue), 1)
+        mock_command_handler.process_command.assert_not_called()
+
+    @patch("lambda_function.WEBHOOK_MODE", "queue")
+    def test_webhook_returns_error_when_enqueue_fails(self):
+        """キューへの送信に失敗した場合はLINEに再送させるテスト"""
+        queue = MagicMock()
+        queue.send.side_effect = Exception("queue unavailable")
+        body = json.dumps({"events": [make_event_dict("/tesla")]})
+
+        with patch("lambda_function.get_event_queue", return_value=queue):
+            response = lambda_function.lambda_handler(
+                {"body": body, "headers": {"x-line-signature": "sig"}}, None
+            )
+
+        self.assertEqual(response["statusCode"], 500)
+
+    @patch("lambda_function.command_handler")
+    def test_worker_reports_partial_batch_failures(self, mock_command_handler):
+        """SQSトリガーで失敗したメッセージだけが batchItemFailures に入るテスト"""
+        mock_command_handler.process_command.side_effect = [True, Exception("boom")]
+        records = [
+            {"messageId": "m1", "body": encode_event(make_event_dict("/tesla", user_id="U1"))},
+            {"messageId": "m2", "body": encode_event(make_event_dict("/tesla", user_id="U2"))},
+            {"messageId": "m3", "body": "not json"},
+        ]
+
+        result = worker_function.lambda_handler({"Records": records}, None)
+
+        failed_ids = sorted(item["itemIdentifier"] for item in result["batchItemFailures"])
+        self.assertEqual(len(failed_ids), 2)
+        self.assertIn("m3", failed_ids)
+        self.assertEqual(mock_command_handler.process_command.call_count, 2)
+
+    def test_worker_keeps_message_when_reply_fails(self):
+        """返信もプッシュもできなかったイベントは削除せず、再処理で返信するテスト"""
+        self.queue.send([encode_event(make_event_dict("/help", user_id="U8"))])
+
+        with patch.object(self.line_client, "reply_message", return_value=False), \
+                patch.object(self.line_client, "push_message", return_value=False):
+            failed = worker_function.process_messages(self.queue.receive(10))
+
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(len(self.queue), 1)
+
+        # 失敗として記録されているため、再処理では処理し直す
+        with patch.object(self.line_client, "reply_message", return_value=True) as mock_reply:
+            self.assertEqual(worker_function.process_messages([failed[0]]), [])
+        mock_reply.assert_called_once()
+
+    def test_worker_drains_local_queue_and_pushes_late_replies(self):
+        """古いイベントには返信トークンではなくプッシュで応答するテスト"""
+        old = int((time.time() - 120) * 1000)
+        self.queue.send([encode_event(make_event_dict("/tesla", user_id="U9", timestamp=old))])
+
+        with patch.object(self.line_client, "line_bot_api") as mock_api:
+            result = worker_function.drain_queue(self.queue)
+
+        self.assertEqual(result, {"processed": 1, "failed": 0})
+        self.assertEqual(len(self.queue), 0)
+        mock_api.reply_message.assert_not_called()
+        self.assertEqual(mock_api.push_message.call_args[0][0], "U9")
+
+    def test_reply_falls_back_to_push(self):
+        """返信トークンでの返信に失敗した場合にプッシュするテスト"""
+        with patch.object(self.line_client, "line_bot_api") as mock_api:
+            mock_api.reply_message.side_effect = Exception("Invalid reply token")
+            self.line_client.set_push_fallback("token-x", "C1")
+
+            result = self.line_client.reply_message("token-x", "hello")
+
+        self.assertTrue(result)
+        self.assertEqual(mock_api.push_message.call_args[0][0], "C1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_client import HttpClient
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Keep-Aliveに対応したテスト用のHTTPハンドラ"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status = 500 if self.path.startswith("/error") else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHttpClient(unittest.TestCase):
+    """HttpClientのテストクラス"""
+
+    @classmethod
+    def setUpClass(cls):
+        """テスト用のHTTPサーバーを起動する"""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        """テスト用のHTTPサーバーを停止する"""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.client = HttpClient(host_timeouts={"127.0.0.1": (1.0, 2.0)})
+
+    def test_connection_reused(self):
+        """同じホストへの呼び出しで接続が再利用されるテスト"""
+        for _ in range(3):
+            response = self.client.request("GET", f"{self.base_url}/ok")
+            self.assertEqual(response.status_code, 200)
+
+        stats = self.client.get_stats()["127.0.0.1"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 2)
+
+    def test_http_error_counted(self):
+        """エラーステータスが集計されるテスト"""
+        self.client.request("GET", f"{self.base_url}/error")
+
+        stats = self.client.get_stats()["127.0.0.1"]
+        self.assertEqual(stats["http_errors"], 1)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_exception_counted(self):
+        """接続エラーが集計され、例外が呼び出し元に伝わるテスト"""
+        with self.assertRaises(Exception):
+            self.client.request("GET", "http://127.0.0.1:9/unreachable")
+
+        stats = self.client.get_stats()["127.0.0.1"]
+        self.assertEqual(stats["errors"], 1)
+
+    def test_host_timeout_applied(self):
+        """ホストごとのタイムアウトが使われるテスト"""
+        with patch("requests.Session.request") as mock_request:
+            mock_request.return_value.status_code = 200
+            self.client.request("GET", f"{self.base_url}/ok")
+            self.client.request("GET", f"{self.base_url}/ok", timeout=0.5)
+
+        self.assertEqual(mock_request.call_args_list[0][1]["timeout"], (1.0, 2.0))
+        self.assertEqual(mock_request.call_args_list[1][1]["timeout"], 0.5)
+
+    def test_reset_stats(self):
+        """統計のリセット後は新しい接続数も0から数え直すテスト"""
+        self.client.request("GET", f"{self.base_url}/ok")
+        self.client.reset_stats()
+        self.client.request("GET", f"{self.base_url}/ok")
+
+        stats = self.client.get_stats()["127.0.0.1"]
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["new_connections"], 0)
+        self.assertEqual(stats["reused_connections"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.keyword_router import KeywordRouter
+from data.responses import KEYWORD_RULES, TESLA_FACTS, ELON_RESPONSES
+from handlers.conversation_handler import ConversationHandler
+
+class TestKeywordRouter(unittest.TestCase):
+    """キーワードルーターのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.router = KeywordRouter(KEYWORD_RULES)
+
+    def intent(self, text):
+        """テキストに一致したルールのintentを返す"""
+        rule = self.router.match(text)
+        return rule["intent"] if rule else None
+
+    def test_word_boundaries(self):
+        """英単語が他の単語の一部に一致しないテスト"""
+        self.assertIsNone(self.intent("this is what he said"))
+        self.assertEqual(self.intent("hi there"), "greeting")
+        self.assertEqual(self.intent("AIについて教えて"), "ai")
+        self.assertEqual(self.intent("Thanks!"), "thanks")
+        self.assertEqual(self.intent("tell me a joke"), "joke")
+
+    def test_japanese_and_width_insensitive(self):
+        """日本語のキーワードと全角英字に一致するテスト"""
+        self.assertEqual(self.intent("今日の火星は寒い"), "mars")
+        self.assertEqual(self.intent("ＳｐａｃｅＸの打ち上げ"), "spacex")
+        self.assertEqual(self.intent("スペースXすごい"), "spacex")
+
+    def test_priority(self):
+        """複数のルールに一致した場合は優先度の高いルールが選ばれるテスト"""
+        self.assertEqual(self.intent("こんにちは、火星とテスラの話をしよう"), "tesla")
+        self.assertEqual(self.intent("おやすみ、ありがとう"), "thanks")
+
+    def test_overlapping_keywords(self):
+        """重なり合うキーワードと同じ優先度の場合は先に現れた方が選ばれるテスト"""
+        router = KeywordRouter([
+            {"intent": "he", "priority": 1, "keywords": ["he"], "responses": ["he"]},
+            {"intent": "she", "priority": 1, "keywords": ["she"], "responses": ["she"]},
+            {"intent": "hers", "priority": 2, "keywords": ["hers"], "responses": ["hers"]},
+        ])
+
+        self.assertEqual(router.match("she")["intent"], "she")
+        self.assertIsNone(router.match("ushers"))
+        self.assertEqual(router.match("it is hers")["intent"], "hers")
+        self.assertEqual(router.match("he and she")["intent"], "he")
+
+    def test_respond(self):
+        """応答の組み立てと、一致しない場合の既定の応答のテスト"""
+        response = self.router.respond("Teslaに乗りたい")
+        self.assertTrue(response.startswith("テスラについて話しているのか？素晴らしい。"))
+        self.assertIn(response[len("テスラについて話しているのか？素晴らしい。"):], TESLA_FACTS)
+
+        self.assertIn(self.router.respond("ふむふむ", default=ELON_RESPONSES), ELON_RESPONSES)
+        self.assertIsNone(self.router.respond("ふむふむ"))
+
+    def test_conversation_fallback(self):
+        """ConversationHandlerの定型応答がルーターを使うテスト"""
+        handler = ConversationHandler(MagicMock())
+
+        self.assertEqual(
+            handler._fallback_response("Good night!"),
+            "良い休息を。明日はさらに革新的なアイデアで世界を変えよう。"
+        )
+        self.assertIn(handler._fallback_response("this is what he said"), ELON_RESPONSES)
+
+if __name__ == '__main__':
+    unittest.main()
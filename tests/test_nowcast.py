@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.nowcast import RainfallSeries, analyze, describe
+
+def weather_list(start, rainfall, observations=1):
+    """テスト用の WeatherList を作成する（start は "HHMM"、10分ごと）"""
+    hour, minute = int(start[:2]), int(start[2:])
+    items = []
+    for index, value in enumerate(rainfall):
+        total = hour * 60 + minute + index * 10
+        day = 16 + total // 1440
+        clock = total % 1440
+        items.append({
+            "Type": "observation" if index < observations else "forecast",
+            "Date": f"202503{day:02d}{clock // 60:02d}{clock % 60:02d}",
+            "Rainfall": f"{value:.2f}",
+        })
+    return items
+
+class TestNowcast(unittest.TestCase):
+    """降水短時間予報の分析のテストクラス"""
+
+    def test_series(self):
+        """WeatherList が時刻と降水量の数値列になるテスト"""
+        series = RainfallSeries.from_weather_list(weather_list("2350", [0, 1.5, 3], observations=2))
+
+        self.assertEqual(list(series.minutes), [0, 10, 20])
+        self.assertEqual(list(series.rainfall), [0, 1.5, 3])
+        self.assertEqual(series.current, 1)
+        # 日付をまたいだ時刻
+        self.assertEqual(series.clock(2), "00:10")
+        self.assertIsNone(RainfallSeries.from_weather_list([]))
+
+    def test_rain_onset(self):
+        """降り始めの時刻、ピーク、雨量の見込みを求めるテスト"""
+        nowcast = analyze(RainfallSeries.from_weather_list(
+            weather_list("1400", [0, 0, 2, 8, 4, 0, 0])
+        ))
+
+        self.assertFalse(nowcast.raining)
+        self.assertEqual(nowcast.onset, "14:20")
+        self.assertIsNone(nowcast.stop)
+        self.assertEqual((nowcast.peak, nowcast.peak_at), (8, "14:30"))
+        # 直線で補った雨量: (0+2)/2 + (2+8)/2 + (8+4)/2 + (4+0)/2 = 14 (mm/h x 10分)
+        self.assertAlmostEqual(nowcast.total, 14 / 6)
+        self.assertEqual(nowcast.horizon, 60)
+        self.assertEqual(describe(nowcast), "雨は14:20から、ピーク 8mm/h（予想雨量 約2.3mm）")
+
+    def test_rain_stop(self):
+        """降っている雨がやむ時刻を求めるテスト"""
+        nowcast = analyze(RainfallSeries.from_weather_list(weather_list("0900", [3.5, 1.25, 0, 0])))
+
+        self.assertTrue(nowcast.raining)
+        self.assertEqual(nowcast.stop, "09:20")
+        self.assertEqual(nowcast.peak, 3.5)
+        self.assertTrue(describe(nowcast).startswith("雨は09:20ごろにやむ見込み、ピーク 3.5mm/h"))
+
+    def test_continuous_and_dry(self):
+        """雨が続く場合と、雨の予報がない場合の文のテスト"""
+        raining = analyze(RainfallSeries.from_weather_list(weather_list("1200", [1, 2, 1])))
+        dry = analyze(RainfallSeries.from_weather_list(weather_list("1200", [0, 0, 0])))
+
+        self.assertTrue(describe(raining).startswith("20分後まで雨が続く、ピーク 2mm/h"))
+        self.assertEqual(describe(dry), "20分後まで雨の予報なし")
+
+    def test_without_forecast(self):
+        """予報がない場合は分析しないテスト"""
+        self.assertIsNone(analyze(RainfallSeries.from_weather_list(weather_list("1200", [1]))))
+        self.assertIsNone(describe(None))
+
+if __name__ == '__main__':
+    unittest.main()
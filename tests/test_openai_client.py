@@ -0,0 +1,177 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.openai_client import OpenAIClient, LatencyWindow, DEFAULT_TIMEOUT
+
+URL = "https://api.openai.com/v1/chat/completions"
+
+def response(status_code=200, name="primary"):
+    """テスト用のレスポンスを作成する"""
+    return MagicMock(status_code=status_code, name=name)
+
+def make_client(**kwargs):
+    """計測済みのクライアントを作成する（所要時間 0.01〜0.20 秒）"""
+    options = {
+        "window": 100, "min_samples": 20, "timeout_percentile": 99, "timeout_multiplier": 1.5,
+        "timeout_min": 0.05, "timeout_max": 20, "hedge_enabled": True, "hedge_percentile": 95,
+        "hedge_max_ratio": 1.0,
+    }
+    options.update(kwargs)
+    client = OpenAIClient(**options)
+    for i in range(1, 21):
+        client.latencies.record(i / 100)
+    return client
+
+class TestLatencyWindow(unittest.TestCase):
+    """所要時間のパーセンタイルのテストクラス"""
+
+    def test_percentile(self):
+        """nearest-rank 法でパーセンタイルを求め、古い計測は捨てるテスト"""
+        window = LatencyWindow(10)
+        self.assertIsNone(window.percentile(99))
+        for i in range(1, 21):
+            window.record(i)
+
+        self.assertEqual(len(window), 10)
+        self.assertEqual(window.percentile(50), 15)
+        self.assertEqual(window.percentile(99), 20)
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    """所要時間に合わせたタイムアウトのテストクラス"""
+
+    def test_default_timeout_until_enough_samples(self):
+        """計測が足りない間は固定のタイムアウトを使うテスト"""
+        client = OpenAIClient(min_samples=20, hedge_enabled=True)
+        client.latencies.record(0.5)
+
+        self.assertEqual(client.timeout(), DEFAULT_TIMEOUT)
+        self.assertIsNone(client.hedge_delay())
+
+    def test_timeout_follows_percentile(self):
+        """p99 に余裕を掛けた値を上限・下限に収めるテスト"""
+        client = make_client()
+        self.assertEqual(client.timeout(), (DEFAULT_TIMEOUT[0], 0.2 * 1.5))
+        self.assertEqual(client.hedge_delay(), 0.19)
+
+        self.assertEqual(make_client(timeout_max=0.1).timeout()[1], 0.1)
+        self.assertEqual(make_client(timeout_min=1).timeout()[1], 1)
+
+    @patch("utils.http_client.post")
+    def test_timeout_is_passed_and_recorded(self, mock_post):
+        """タイムアウトを渡し、タイムアウトした呼び出しも記録するテスト"""
+        client = OpenAIClient(window=10, min_samples=1, timeout_min=0, hedge_enabled=False)
+        mock_post.return_value = response()
+
+        client.post(URL, json={})
+        self.assertEqual(mock_post.call_args[1]["timeout"], DEFAULT_TIMEOUT)
+        self.assertEqual(len(client.latencies), 1)
+
+        client.latencies.record(1.0)
+        mock_post.side_effect = TimeoutError()
+        with patch("utils.openai_client.time.monotonic", side_effect=[0.0, 100.0]):
+            with self.assertRaises(TimeoutError):
+                client.post(URL, json={})
+        self.assertEqual(client.latencies.percentile(100), 100.0)
+
+class TestHedgedRequests(unittest.TestCase):
+    """ヘッジした呼び出しのテストクラス"""
+
+    @patch("utils.http_client.post")
+    def test_fast_primary_is_not_hedged(self, mock_post):
+        """p95 までに返った場合はヘッジしないテスト"""
+        client = make_client()
+        mock_post.return_value = response()
+
+        client.post(URL, json={})
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(client.stats()["hedged"], 0)
+
+    @patch("utils.http_client.post")
+    def test_slow_primary_is_hedged(self, mock_post):
+        """p95 を過ぎても返らない場合は先に返ったヘッジの結果を使うテスト"""
+        client = make_client()
+        hedged = response(name="hedge")
+
+        def post(url, **kwargs):
+            if mock_post.call_count == 1:
+                time.sleep(0.5)
+                return response()
+            return hedged
+
+        mock_post.side_effect = post
+        self.assertIs(client.post(URL, json={}), hedged)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(client.stats()["hedged"], 1)
+
+    @patch("utils.http_client.post")
+    def test_hedge_ratio_is_capped(self, mock_post):
+        """ヘッジの割合が上限に達している場合は最初の呼び出しを待つテスト"""
+        client = make_client(hedge_max_ratio=0)
+        slow = response()
+
+        def post(url, **kwargs):
+            time.sleep(0.3)
+            return slow
+
+        mock_post.side_effect = post
+        self.assertIs(client.post(URL, json={}), slow)
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_concurrent_hedge_claims_respect_cap(self):
+        """同時にヘッジを求めても、ヘッジの割合が上限を超えないテスト"""
+        client = make_client(hedge_max_ratio=0.1)
+        for _ in range(50):
+            client._note_request(False)
+        barrier = threading.Barrier(20)
+
+        def claim():
+            barrier.wait()
+            client._claim_hedge()
+
+        threads = [threading.Thread(target=claim) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(client._hedged), 70)
+        self.assertLessEqual(client._hedged_count, 0.1 * 70)
+        self.assertEqual(client._hedged_count, sum(client._hedged))
+
+    @patch("utils.async_http_client.post")
+    def test_post_async_cancels_slow_call(self, mock_post):
+        """asyncio版では先に返った方を使い、遅い方をキャンセルするテスト"""
+        client = make_client()
+        hedged = response(name="hedge")
+        cancelled = []
+
+        async def post(url, **kwargs):
+            if mock_post.call_count == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(1)
+                    raise
+            return hedged
+
+        mock_post.side_effect = post
+
+        async def main():
+            result = await client.post_async(URL, json={})
+            await asyncio.sleep(0)
+            return result
+
+        self.assertIs(asyncio.run(main()), hedged)
+        self.assertEqual(cancelled, [1])
+
+if __name__ == '__main__':
+    unittest.main()
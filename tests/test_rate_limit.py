@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lambda_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from utils.rate_limit import TokenBucketLimiter, LLMRateLimiter, check_llm_rate_limit
+from utils.kv_store import LocalKVStore
+from data.responses import RATE_LIMIT_RESPONSES
+import lambda_function
+
+def make_source(user_id="U1", group_id=None):
+    """テスト用のメッセージソースを作成する"""
+    if group_id:
+        return MagicMock(spec=["user_id", "group_id"], user_id=user_id, group_id=group_id)
+    return MagicMock(spec=["user_id"], user_id=user_id)
+
+class TestTokenBucket(unittest.TestCase):
+    """トークンバケットのテストクラス"""
+
+    @patch("utils.rate_limit.time.monotonic")
+    def test_burst_and_refill(self, mock_monotonic):
+        """容量まで使えて、時間の経過でトークンが回復するテスト"""
+        mock_monotonic.return_value = 1000.0
+        limiter = TokenBucketLimiter(capacity=2, per_minute=6)
+
+        self.assertTrue(limiter.allow("U1"))
+        self.assertTrue(limiter.allow("U1"))
+        self.assertFalse(limiter.allow("U1"))
+        # 他のキーには影響しない
+        self.assertTrue(limiter.allow("U2"))
+
+        # 1分に6回 = 10秒で1トークン回復する
+        mock_monotonic.return_value = 1010.0
+        self.assertTrue(limiter.allow("U1"))
+        self.assertFalse(limiter.allow("U1"))
+
+    def test_shared_backend(self):
+        """共有の保存先を使うと別のインスタンスとバケットを共有するテスト"""
+        kv_store = LocalKVStore()
+        first = TokenBucketLimiter(capacity=1, per_minute=1, kv_store=kv_store, name="user")
+        second = TokenBucketLimiter(capacity=1, per_minute=1, kv_store=kv_store, name="user")
+
+        self.assertTrue(first.allow("U1"))
+        self.assertFalse(second.allow("U1"))
+
+    def test_user_limit_does_not_consume_group(self):
+        """ユーザーの上限で止まったメッセージはグループのトークンを消費しないテスト"""
+        limiter = LLMRateLimiter(TokenBucketLimiter(1, 1), TokenBucketLimiter(2, 1))
+
+        self.assertIsNone(limiter.check(make_source("U1", "C1")))
+        self.assertEqual(limiter.check(make_source("U1", "C1")), "user")
+        self.assertIsNone(limiter.check(make_source("U2", "C1")))
+        self.assertEqual(limiter.check(make_source("U3", "C1")), "group")
+
+    @patch("utils.rate_limit.OPENAI_API_KEY", "dummy_key")
+    def test_commands_without_llm_are_not_limited(self):
+        """OpenAIを呼ばないコマンドは制限の対象外になるテスト"""
+        registry = lambda_function.command_handler.registry
+        limiter = LLMRateLimiter(TokenBucketLimiter(1, 1), TokenBucketLimiter(1, 1))
+
+        with patch("utils.rate_limit.get_rate_limiter", return_value=limiter):
+            for _ in range(3):
+                self.assertIsNone(check_llm_rate_limit(make_source(), registry.parse("/tesla")))
+            self.assertIsNone(check_llm_rate_limit(make_source(), registry.parse("/advice 起業")))
+            self.assertEqual(check_llm_rate_limit(make_source(), registry.parse("/advice 起業")), "user")
+
+class TestRateLimitedMessage(unittest.TestCase):
+    """レート制限を超えたメッセージの処理のテストクラス"""
+
+    @patch("lambda_function.check_llm_rate_limit", return_value="user")
+    @patch("lambda_function.conversation_handler")
+    @patch("lambda_function.line_client")
+    def test_over_limit_gets_canned_reply(self, mock_line_client, mock_conversation_handler, mock_check):
+        """制限を超えた会話はOpenAIを呼ばずに定型応答が返るテスト"""
+        mock_conversation_handler.is_group_or_room.return_value = False
+        mock_conversation_handler.is_mentioned.return_value = False
+        event = MagicMock()
+        event.message.text = "火星に行きたい"
+        event.reply_token = "reply-token-1"
+
+        lambda_function.handle_message(event)
+
+        mock_conversation_handler.process_conversation.assert_not_called()
+        token, text = mock_line_client.reply_message.call_args[0]
+        self.assertEqual(token, "reply-token-1")
+        self.assertIn(text, RATE_LIMIT_RESPONSES)
+
+if __name__ == '__main__':
+    unittest.main()
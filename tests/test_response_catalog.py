@@ -0,0 +1,98 @@
+import unittest
+from collections import Counter
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.response_catalog import ResponseCatalog, get_catalog
+from data import responses
+
+CATALOG = """# test response catalog v1
+# コメント
+
+[PLAIN]
+a
+b
+c
+d
+e
+
+[WEIGHTED]
+3\theavy
+light
+0\tnever
+"""
+
+class TestResponseCatalog(unittest.TestCase):
+    """応答カタログのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.catalog = self.make_catalog(CATALOG)
+
+    def make_catalog(self, text):
+        """テスト用のカタログファイルを作成する"""
+        handle, path = tempfile.mkstemp(suffix=".catalog")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return ResponseCatalog(path, bag_size=10, bag_ttl=None)
+
+    def test_lines_and_weights(self):
+        """セクションごとに行を取り出し、重みの指定を本文に含めないテスト"""
+        self.assertEqual(self.catalog.names(), ["PLAIN", "WEIGHTED"])
+        self.assertEqual(self.catalog.lines("PLAIN"), ["a", "b", "c", "d", "e"])
+        self.assertEqual(self.catalog.lines("WEIGHTED"), ["heavy", "light"])
+        with self.assertRaises(KeyError):
+            self.catalog.lines("MISSING")
+
+    def test_unsupported_version(self):
+        """対応していない形式のファイルを拒否するテスト"""
+        catalog = self.make_catalog("# test response catalog v2\n[PLAIN]\na\n")
+        with self.assertRaises(ValueError):
+            catalog.names()
+
+    def test_bag_does_not_repeat_within_cycle(self):
+        """一巡するまで同じ応答を選ばず、巡の境目でも続けて選ばないテスト"""
+        picks = [self.catalog.sample("PLAIN", "user:U1") for _ in range(50)]
+
+        for start in range(0, 50, 5):
+            self.assertEqual(sorted(picks[start:start + 5]), ["a", "b", "c", "d", "e"])
+        self.assertTrue(all(first != second for first, second in zip(picks, picks[1:])))
+
+    def test_bags_are_per_chat(self):
+        """チャットごとに別のシャッフルバッグを使うテスト"""
+        for _ in range(3):
+            self.catalog.sample("PLAIN", "user:U1")
+        picks = [self.catalog.sample("PLAIN", "group:G1") for _ in range(5)]
+
+        self.assertEqual(sorted(picks), ["a", "b", "c", "d", "e"])
+
+    def test_weighted_bag(self):
+        """重みの数だけ選ばれ、重み0の行は選ばれないテスト"""
+        picks = Counter(self.catalog.sample("WEIGHTED", "user:U1") for _ in range(40))
+        self.assertEqual(picks, {"heavy": 30, "light": 10})
+
+        counts = Counter(self.catalog.choice("WEIGHTED") for _ in range(400))
+        self.assertEqual(set(counts), {"heavy", "light"})
+        self.assertGreater(counts["heavy"], counts["light"])
+
+class TestShippedCatalog(unittest.TestCase):
+    """同梱の応答カタログのテストクラス"""
+
+    def test_sections_are_available(self):
+        """各セクションが data.responses からリストとして取り込めるテスト"""
+        for name in ("ELON_RESPONSES", "TESLA_FACTS", "SPACEX_FACTS", "ELON_QUOTES",
+                     "ADVICE_LIST", "JOKES", "FAKE_NEWS", "RATE_LIMIT_RESPONSES"):
+            lines = getattr(responses, name)
+            self.assertTrue(lines, name)
+            self.assertIn(get_catalog().sample(name), lines)
+
+        with self.assertRaises(AttributeError):
+            responses.NOT_A_CATALOG
+
+if __name__ == '__main__':
+    unittest.main()
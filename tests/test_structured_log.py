@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+import json
+import logging
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lambda_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from utils.structured_log import JsonFormatter, ModuleLevelFilter, parse_levels, redact, should_sample
+import lambda_function
+
+def make_record(module, level=logging.INFO, msg="テスト %s", args=("値",), **extra):
+    """テスト用のログレコードを作成する"""
+    record = logging.LogRecord("root", level, f"/app/{module}.py", 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+class TestStructuredLog(unittest.TestCase):
+    """構造化ログのテストクラス"""
+
+    def test_json_formatter(self):
+        """1レコードが1行のJSONになり、extraの項目がフィールドになるテスト"""
+        record = make_record("lambda_function", route="command", elapsed_ms=1.5)
+
+        data = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(data["message"], "テスト 値")
+        self.assertEqual(data["module"], "lambda_function")
+        self.assertEqual(data["route"], "command")
+        self.assertEqual(data["elapsed_ms"], 1.5)
+
+    def test_redact(self):
+        """署名などの秘密情報が伏せ字になるテスト"""
+        event = {"headers": {"X-Line-Signature": "abc", "content-type": "application/json"}, "body": "{}"}
+
+        redacted = redact(event)
+
+        self.assertEqual(redacted["headers"]["X-Line-Signature"], "***")
+        self.assertEqual(redacted["headers"]["content-type"], "application/json")
+        self.assertEqual(event["headers"]["X-Line-Signature"], "abc")
+
+    def test_module_level_filter(self):
+        """モジュールごとのログレベルが適用されるテスト"""
+        levels = parse_levels("services.weather_service=DEBUG, line_client=WARNING, bad=NOPE")
+        log_filter = ModuleLevelFilter(logging.INFO, levels)
+
+        self.assertNotIn("bad", levels)
+        self.assertTrue(log_filter.filter(make_record("weather_service", logging.DEBUG)))
+        self.assertFalse(log_filter.filter(make_record("line_client", logging.INFO)))
+        self.assertFalse(log_filter.filter(make_record("lambda_function", logging.DEBUG)))
+        self.assertTrue(log_filter.filter(make_record("lambda_function", logging.INFO)))
+
+    def test_should_sample(self):
+        """サンプリング率の両端のテスト"""
+        self.assertTrue(should_sample(1))
+        self.assertFalse(should_sample(0))
+
+    @patch("lambda_function.LOG_PAYLOAD_SAMPLE_RATE", 1)
+    def test_lambda_handler_redacts_signature(self):
+        """ペイロードを記録しても署名が出力されないテスト"""
+        event = {"body": json.dumps({"events": []}), "headers": {"x-line-signature": "secret-signature"}}
+
+        with self.assertLogs(level="INFO") as logs:
+            response = lambda_function.lambda_handler(event, None)
+
+        self.assertEqual(response["statusCode"], 400)
+        output = "\n".join(JsonFormatter().format(record) for record in logs.records)
+        self.assertNotIn("secret-signature", output)
+        summary = [record for record in logs.records if getattr(record, "status", None) == 400]
+        self.assertEqual(len(summary), 1)
+
+if __name__ == '__main__':
+    unittest.main()
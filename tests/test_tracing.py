@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import VariantCache
+from utils.tracing import Tracer, StageStats
+from handlers.command_handler import CommandHandler
+
+class TestTracing(unittest.TestCase):
+    """ステージごとの計測のテストクラス"""
+
+    def test_percentiles(self):
+        """パーセンタイルの計算テスト"""
+        stats = StageStats(window=100)
+        for value in range(1, 101):
+            stats.record("openai", float(value))
+
+        summary = stats.percentiles()["openai"]
+
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["p50"], 50.0)
+        self.assertEqual(summary["p95"], 95.0)
+        self.assertEqual(summary["p99"], 99.0)
+
+    def test_flush_emits_embedded_metric_format(self):
+        """呼び出しごとに埋め込みメトリクス形式の1行が出力されるテスト"""
+        stream = io.StringIO()
+        tracer = Tracer(stats=StageStats(), namespace="Test", enabled=True, stream=stream)
+
+        tracer.start()
+        with tracer.span("geocode"):
+            pass
+        tracer.record("reply_message", 12.5)
+        tracer.record("reply_message", 7.5)
+        tracer.flush()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        metrics = record["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(metrics["Namespace"], "Test")
+        self.assertEqual({m["Name"] for m in metrics["Metrics"]}, {"geocode", "reply_message"})
+        self.assertEqual(record["reply_message"], [12.5, 7.5])
+        self.assertIn("Function", record)
+
+        # 次の呼び出しでは前の計測は出力されない
+        tracer.start()
+        self.assertIsNone(tracer.flush())
+
+class TestStatsCommand(unittest.TestCase):
+    """statsコマンドのテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.mock_line_client = MagicMock()
+        self.handler = CommandHandler(self.mock_line_client)
+        self.event = MagicMock()
+        self.event.reply_token = "reply-token-123"
+
+    @patch("handlers.command_handler.ADMIN_USER_IDS", frozenset({"Uadmin"}))
+    def test_stats_for_admin(self):
+        """管理者にはステージごとのパーセンタイルが返るテスト"""
+        self.event.source.user_id = "Uadmin"
+        tracer = Tracer(stats=StageStats(), enabled=False)
+        tracer.record("openai", 100.0)
+
+        with patch("handlers.command_handler.get_tracer", return_value=tracer):
+            self.handler.process_command(self.event, "/stats")
+
+        text = self.mock_line_client.reply_message.call_args[0][1]
+        self.assertIn("openai: n=1 p50=100.0", text)
+
+    @patch("handlers.command_handler.ADMIN_USER_IDS", frozenset({"Uadmin"}))
+    def test_stats_include_advice_cache(self):
+        """管理者にはアドバイスのキャッシュのヒット数・ミス数・件数も返るテスト"""
+        self.event.source.user_id = "Uadmin"
+        advice_cache = VariantCache(variants=1)
+        advice_cache.get("起業")
+        advice_cache.add("起業", "火星を目指せ。")
+        advice_cache.get("起業")
+        tracer = Tracer(stats=StageStats(), enabled=False)
+
+        with patch("handlers.command_handler.get_tracer", return_value=tracer), \
+                patch("handlers.command_handler.get_advice_cache", return_value=advice_cache):
+            self.handler.process_command(self.event, "/stats")
+
+        text = self.mock_line_client.reply_message.call_args[0][1]
+        self.assertIn("アドバイスのキャッシュ: hits=1 misses=1 hit_rate=50% keys=1", text)
+
+    @patch("handlers.command_handler.ADMIN_USER_IDS", frozenset({"Uadmin"}))
+    def test_stats_for_other_users(self):
+        """管理者以外には未知のコマンドとして応答するテスト"""
+        self.event.source.user_id = "Uguest"
+
+        self.handler.process_command(self.event, "/stats")
+
+        text = self.mock_line_client.reply_message.call_args[0][1]
+        self.assertTrue(text.startswith("未知のコマンドだ。"))
+
+if __name__ == '__main__':
+    unittest.main()
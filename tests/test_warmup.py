@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import subprocess
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lambda_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from services.weather_service import WeatherService
+from utils.cache import LRUCache, TieredCache
+from utils.warmup import is_warmup_event, run_warmup
+from line_client import _pooled_http_client
+import lambda_function
+
+class TestWarmupEvent(unittest.TestCase):
+    """ウォームアップイベントの判定と実行のテストクラス"""
+
+    def test_is_warmup_event(self):
+        """定期実行のイベントだけがウォームアップとみなされるテスト"""
+        self.assertTrue(is_warmup_event({"source": "aws.events", "detail-type": "Scheduled Event"}))
+        self.assertTrue(is_warmup_event({"source": "serverless-plugin-warmup"}))
+        self.assertTrue(is_warmup_event({"warmup": True}))
+        self.assertFalse(is_warmup_event({"body": "{}", "headers": {}}))
+        self.assertFalse(is_warmup_event({"warmup": True, "body": "{}"}))
+        self.assertFalse(is_warmup_event(None))
+
+    def test_run_warmup_continues_after_failure(self):
+        """失敗したステップを記録して次のステップに進むテスト"""
+        def broken():
+            raise RuntimeError("boom")
+
+        report = run_warmup([("broken", broken), ("ok", lambda: 3)])
+
+        self.assertEqual(report["primed"]["broken"]["ok"], False)
+        self.assertEqual(report["primed"]["broken"]["result"], "boom")
+        self.assertEqual(report["primed"]["ok"]["result"], 3)
+
+    def test_run_warmup_skips_after_deadline(self):
+        """期限を過ぎた後のステップは実行しないテスト"""
+        deadline = MagicMock()
+        deadline.expired.return_value = True
+        step = MagicMock()
+
+        report = run_warmup([("late", step)], deadline=deadline)
+
+        step.assert_not_called()
+        self.assertEqual(report["primed"]["late"]["result"], "skipped")
+
+    @patch("lambda_function.http_client.get_client")
+    @patch("lambda_function.line_client")
+    def test_lambda_handler_primes_container(self, mock_line_client, mock_get_client):
+        """ウォームアップは署名検証に回さず、準備した内容を返すテスト"""
+        mock_line_client.get_bot_user_id.return_value = "Ubot"
+        mock_get_client.return_value.preconnect.return_value = True
+        weather_service = MagicMock()
+        weather_service.prime_locations.return_value = 5
+
+        with patch.object(lambda_function.command_handler, "weather_service", weather_service, create=True):
+            response = lambda_function.lambda_handler({"source": "aws.events"}, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        primed = json.loads(response["body"])["primed"]
+        self.assertEqual(primed["bot_user_id"]["result"], "Ubot")
+        self.assertEqual(primed["geocodes"]["result"], 5)
+        self.assertTrue(primed["connections"]["result"][config.LINE_API_BASE])
+        self.assertTrue(all(step["ok"] for step in primed.values()))
+        mock_line_client.verify_signature.assert_not_called()
+
+class TestWarmupPriming(unittest.TestCase):
+    """ウォームアップで使う準備処理のテストクラス"""
+
+    @patch.dict(os.environ, {"YAHOO_APP_ID": "test_app_id"})
+    @patch("utils.http_client.get")
+    def test_prime_locations(self, mock_get):
+        """よく使われる場所名の座標がキャッシュに入り、2回目は呼ばれないテスト"""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            "Feature": [{"Geometry": {"Coordinates": "139.7,35.6"}}]
+        }
+        service = WeatherService(geocode_cache=TieredCache(LRUCache()), weather_cache=LRUCache())
+
+        self.assertEqual(service.prime_locations(["東京", "大阪"]), 2)
+        self.assertEqual(service.prime_locations(["東京", "大阪"]), 2)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("utils.http_client.get_client")
+    def test_line_api_uses_shared_pool(self, mock_get_client):
+        """LINE APIの呼び出しが共有の接続プールを通るテスト"""
+        mock_get_client.return_value.request.return_value.status_code = 200
+        client = _pooled_http_client()(timeout=5)
+
+        response = client.post("https://api.line.me/v2/bot/message/reply", headers={"a": "b"}, data="{}")
+
+        self.assertEqual(response.status_code, 200)
+        mock_get_client.return_value.request.assert_called_once_with(
+            "POST", "https://api.line.me/v2/bot/message/reply", timeout=5, headers={"a": "b"}, data="{}"
+        )
+
+class TestColdStartImports(unittest.TestCase):
+    """起動時に読み込むモジュールのテストクラス"""
+
+    def test_lambda_function_does_not_import_asyncio(self):
+        """同期版の lambda_function を読み込んでも asyncio・aiohttp を読み込まないテスト"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, LINE_CHANNEL_SECRET="test_secret", LINE_CHANNEL_ACCESS_TOKEN="test_token")
+        output = subprocess.run(
+            [sys.executable, "-c", "import sys, lambda_function; print('asyncio' in sys.modules, 'aiohttp' in sys.modules)"],
+            cwd=root, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.split(), ["False", "False"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,21 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import asyncio
 import os
 import json
 import sys
 import random
+import tempfile
+import threading
+import time
 
 # Add the parent directory to the Python path to import the modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.weather_service import WeatherService
+from services.weather_service import (
+    WeatherService, normalize_location, get_mesh_key, seconds_until_next_update, unique_locations
+)
+from utils.cache import LRUCache, FileCache, TieredCache
 
 class TestWeatherService(unittest.TestCase):
     """WeatherServiceのテストクラス"""
@@ -21,8 +28,11 @@ class TestWeatherService(unittest.TestCase):
         # テスト用のYahoo APP IDを設定
         os.environ['YAHOO_APP_ID'] = 'test_app_id'
         
-        # WeatherServiceのインスタンスを作成
-        self.weather_service = WeatherService()
+        # WeatherServiceのインスタンスを作成（テストごとに独立したキャッシュを使う）
+        self.weather_service = WeatherService(
+            geocode_cache=TieredCache(LRUCache()),
+            weather_cache=LRUCache()
+        )
         
         # randomのseedを固定して、テストの再現性を確保
         random.seed(42)
@@ -48,7 +58,7 @@ class TestWeatherService(unittest.TestCase):
         self.assertIn(32, self.weather_service.weather_codes)
         self.assertEqual(self.weather_service.weather_codes[32], "晴れ")
     
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_get_coordinates_from_location_success(self, mock_get):
         """場所名から緯度経度を取得するテスト（成功）"""
         # モックレスポンスの設定
@@ -72,7 +82,7 @@ class TestWeatherService(unittest.TestCase):
         # 検証
         self.assertEqual(result, "139.73359259,35.66288632")
         
-        # requestsのget関数が正しいパラメータで呼ばれたことを確認
+        # http_clientのget関数が正しいパラメータで呼ばれたことを確認
         mock_get.assert_called_once()
         args, kwargs = mock_get.call_args
         self.assertEqual(args[0], "https://map.yahooapis.jp/geocode/V1/geoCoder")
@@ -80,7 +90,7 @@ class TestWeatherService(unittest.TestCase):
         self.assertEqual(kwargs["params"]["appid"], "test_app_id")
         self.assertEqual(kwargs["params"]["output"], "json")
     
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_get_coordinates_from_location_no_results(self, mock_get):
         """場所名から緯度経度を取得するテスト（結果なし）"""
         # モックレスポンスの設定
@@ -95,7 +105,7 @@ class TestWeatherService(unittest.TestCase):
         # 検証（デフォルト座標が返されることを確認）
         self.assertEqual(result, "139.732293,35.663613")
     
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_get_coordinates_from_location_error(self, mock_get):
         """場所名から緯度経度を取得するテスト（エラー）"""
         # モックレスポンスの設定
@@ -110,7 +120,7 @@ class TestWeatherService(unittest.TestCase):
         # 検証（デフォルト座標が返されることを確認）
         self.assertEqual(result, "139.732293,35.663613")
     
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_get_coordinates_from_location_exception(self, mock_get):
         """場所名から緯度経度を取得するテスト（例外）"""
         # モックレスポンスの設定
@@ -122,8 +132,79 @@ class TestWeatherService(unittest.TestCase):
         # 検証（デフォルト座標が返されることを確認）
         self.assertEqual(result, "139.732293,35.663613")
     
+    def test_normalize_location(self):
+        """場所名の正規化テスト"""
+        self.assertEqual(normalize_location(" 大阪 "), "大阪")
+        self.assertEqual(normalize_location("東京　都"), "東京都")
+        self.assertEqual(normalize_location("Ｏｓａｋａ"), "osaka")
+    
+    @patch('utils.http_client.get')
+    def test_get_coordinates_from_location_cached(self, mock_get):
+        """同じ場所名の2回目はジオコーダーを呼ばないテスト"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "Feature": [{"Geometry": {"Coordinates": "135.50,34.69"}}]
+        }
+        mock_get.return_value = mock_response
+        
+        first = self.weather_service._get_coordinates_from_location("大阪")
+        second = self.weather_service._get_coordinates_from_location(" 大阪　")
+        
+        self.assertEqual(first, "135.50,34.69")
+        self.assertEqual(second, "135.50,34.69")
+        mock_get.assert_called_once()
+    
+    @patch('utils.http_client.get')
+    def test_get_coordinates_from_location_negative_cached(self, mock_get):
+        """見つからなかった場所名もキャッシュされるテスト"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"Feature": []}
+        mock_get.return_value = mock_response
+        
+        self.weather_service._get_coordinates_from_location("存在しない場所")
+        result = self.weather_service._get_coordinates_from_location("存在しない場所")
+        
+        self.assertEqual(result, "139.732293,35.663613")
+        mock_get.assert_called_once()
+    
+    @patch('utils.http_client.get')
+    def test_get_coordinates_from_location_error_not_cached(self, mock_get):
+        """APIエラーはキャッシュされないテスト"""
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_response.text = "Internal Server Error"
+        mock_get.return_value = mock_response
+        
+        self.weather_service._get_coordinates_from_location("東京")
+        self.weather_service._get_coordinates_from_location("東京")
+        
+        self.assertEqual(mock_get.call_count, 2)
+    
+    @patch('utils.http_client.get')
+    def test_get_coordinates_from_location_file_cache(self, mock_get):
+        """ファイルキャッシュが別インスタンス（コールドスタート）でも使われるテスト"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "Feature": [{"Geometry": {"Coordinates": "141.35,43.06"}}]
+        }
+        mock_get.return_value = mock_response
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "geocode.json")
+            first_service = WeatherService(geocode_cache=TieredCache(LRUCache(), FileCache(path)))
+            first_service._get_coordinates_from_location("札幌")
+            
+            second_service = WeatherService(geocode_cache=TieredCache(LRUCache(), FileCache(path)))
+            result = second_service._get_coordinates_from_location("札幌")
+        
+        self.assertEqual(result, "141.35,43.06")
+        mock_get.assert_called_once()
+    
     @patch('services.weather_service.WeatherService._get_coordinates_from_location')
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_fetch_yahoo_weather_success(self, mock_get, mock_get_coordinates):
         """Yahoo Weather APIからのデータ取得成功のテスト"""
         # 座標取得のモック
@@ -164,7 +245,7 @@ class TestWeatherService(unittest.TestCase):
         self.assertIn("Feature", result)
         self.assertEqual(result["Feature"][0]["Property"]["WeatherList"]["Weather"][0]["Rainfall"], "0.00")
         
-        # requestsのget関数が正しいパラメータで呼ばれたことを確認
+        # http_clientのget関数が正しいパラメータで呼ばれたことを確認
         mock_get.assert_called_once()
         args, kwargs = mock_get.call_args
         self.assertEqual(args[0], "https://map.yahooapis.jp/weather/V1/place")
@@ -172,7 +253,86 @@ class TestWeatherService(unittest.TestCase):
         self.assertEqual(kwargs["params"]["appid"], "test_app_id")
         self.assertEqual(kwargs["params"]["output"], "json")
     
-    @patch('requests.get')
+    def test_get_mesh_key(self):
+        """約1kmメッシュへの丸めのテスト"""
+        # 同じ3次メッシュ内の座標は同じキーになる
+        self.assertEqual(
+            get_mesh_key("139.7335,35.6628"),
+            get_mesh_key("139.7340,35.6630")
+        )
+        # 離れた座標は別のキーになる
+        self.assertNotEqual(
+            get_mesh_key("139.7335,35.6628"),
+            get_mesh_key("135.5000,34.6900")
+        )
+    
+    def test_seconds_until_next_update(self):
+        """次の10分区切りまでの秒数のテスト"""
+        self.assertEqual(seconds_until_next_update(1200), 600)
+        self.assertEqual(seconds_until_next_update(1200 + 45), 555)
+        self.assertEqual(seconds_until_next_update(1799.5), 0.5)
+    
+    @patch('services.weather_service.WeatherService._get_coordinates_from_location')
+    @patch('utils.http_client.get')
+    def test_fetch_yahoo_weather_cached_by_mesh(self, mock_get, mock_get_coordinates):
+        """同じメッシュの天気情報はキャッシュから返されるテスト"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"Feature": []}
+        mock_get.return_value = mock_response
+        
+        mock_get_coordinates.return_value = "139.7335,35.6628"
+        first = self.weather_service._fetch_yahoo_weather("六本木")
+        mock_get_coordinates.return_value = "139.7340,35.6630"
+        second = self.weather_service._fetch_yahoo_weather("六本木駅")
+        
+        self.assertEqual(first, second)
+        mock_get.assert_called_once()
+    
+    @patch('services.weather_service.WeatherService._get_coordinates_from_location')
+    @patch('utils.http_client.get')
+    def test_fetch_yahoo_weather_single_flight(self, mock_get, mock_get_coordinates):
+        """同じメッシュへの同時リクエストが1回のAPI呼び出しにまとめられるテスト"""
+        mock_get_coordinates.return_value = "139.7335,35.6628"
+        release = threading.Event()
+        
+        def slow_get(*args, **kwargs):
+            release.wait(2)
+            mock_response = MagicMock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"Feature": []}
+            return mock_response
+        
+        mock_get.side_effect = slow_get
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.weather_service._fetch_yahoo_weather("東京")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(results, [{"Feature": []}] * 5)
+        mock_get.assert_called_once()
+    
+    @patch('utils.async_http_client.get')
+    def test_request_yahoo_weather_async_rechecks_cache(self, mock_get):
+        """single-flight に加わる前に他のリクエストが取得済みなら、APIを呼ばずにそれを使うテスト"""
+        mesh_key = get_mesh_key("139.7335,35.6628")
+        self.weather_service.weather_cache.set(mesh_key, {"Feature": []}, 60)
+        
+        result = asyncio.run(
+            self.weather_service._request_yahoo_weather_async("139.7335,35.6628", mesh_key)
+        )
+        
+        self.assertEqual(result, {"Feature": []})
+        mock_get.assert_not_called()
+    
+    @patch('utils.http_client.get')
     def test_fetch_yahoo_weather_error(self, mock_get):
         """Yahoo Weather APIからのデータ取得エラーのテスト"""
         # モックレスポンスの設定
@@ -187,7 +347,7 @@ class TestWeatherService(unittest.TestCase):
         # 検証
         self.assertIsNone(result)
     
-    @patch('requests.get')
+    @patch('utils.http_client.get')
     def test_fetch_yahoo_weather_exception(self, mock_get):
         """Yahoo Weather APIからのデータ取得例外のテスト"""
         # モックレスポンスの設定
@@ -252,7 +412,7 @@ class TestWeatherService(unittest.TestCase):
         self.assertIn("東京の天気", result)
         self.assertIn("晴れ", result)
         self.assertIn("現在の降水量 0.00mm/h", result)
-        self.assertIn("15時30分の予測: 降水量 1.25mm/h", result)
+        self.assertIn("雨は15:30から、ピーク 1.25mm/h", result)
         self.assertIn("火星の気温はマイナス60℃だぞ", result)
     
     @patch('services.weather_service.WeatherService._fetch_yahoo_weather')
@@ -281,5 +441,152 @@ class TestWeatherService(unittest.TestCase):
         # 検証
         self.assertEqual(result, "天気情報を取得できませんでした。火星からの通信障害かもしれない。")
 
+# 場所名 -> 座標（テスト用のジオコーダー）
+COORDINATES = {
+    "東京": "139.73,35.66",
+    "大阪": "135.50,34.69",
+    "札幌": "141.35,43.06",
+    "新宿": "139.70,35.69",
+}
+
+def weather_feature(coordinates, rainfall):
+    """テスト用の気象情報の地点を作成する"""
+    return {
+        "Geometry": {"Coordinates": coordinates},
+        "Property": {
+            "WeatherAreaCode": "4410",
+            "WeatherList": {"Weather": [
+                {"Type": "observation", "Date": "202503161430", "Rainfall": rainfall}
+            ]}
+        }
+    }
+
+def batch_response(url, params=None, deadline=None):
+    """ジオコーダーと、空白区切りの座標をまとめて受け取る気象情報APIの応答を返す"""
+    response = MagicMock(status_code=200)
+    if "geoCoder" in url:
+        coordinates = COORDINATES[params["query"]]
+        response.json.return_value = {"Feature": [{"Geometry": {"Coordinates": coordinates}}]}
+    else:
+        features = [weather_feature(c, f"{i}.00") for i, c in enumerate(params["coordinates"].split(" "))]
+        response.json.return_value = {"Feature": features}
+    return response
+
+class TestWeatherBatch(unittest.TestCase):
+    """複数の場所の天気情報をまとめて取得するテストクラス"""
+    
+    def setUp(self):
+        """各テスト実行前の準備"""
+        with patch.dict(os.environ, {"YAHOO_APP_ID": "test_app_id"}):
+            self.weather_service = WeatherService(
+                geocode_cache=TieredCache(LRUCache()),
+                weather_cache=LRUCache()
+            )
+    
+    def weather_calls(self, mock_get):
+        """気象情報APIの呼び出しだけを取り出す"""
+        return [c for c in mock_get.call_args_list if "weather" in c[0][0]]
+    
+    def test_unique_locations(self):
+        """表記の違う同じ場所をまとめ、上限までに絞るテスト"""
+        self.assertEqual(unique_locations(["東京", "大阪", "東京 ", "札幌"], limit=2), ["東京", "大阪"])
+    
+    @patch('utils.http_client.get', side_effect=batch_response)
+    def test_get_weather_multi_single_weather_call(self, mock_get):
+        """複数の場所の降水量を1回の呼び出しで取得し、1つの返信にまとめるテスト"""
+        result = self.weather_service.get_weather_multi(["東京", "大阪", "札幌"])
+        
+        weather_calls = self.weather_calls(mock_get)
+        self.assertEqual(len(weather_calls), 1)
+        self.assertEqual(
+            weather_calls[0][1]["params"]["coordinates"], "139.73,35.66 135.50,34.69 141.35,43.06"
+        )
+        self.assertIn("東京の天気:\n晴れ、現在の降水量 0.00mm/h", result)
+        self.assertIn("大阪の天気:\n雨、現在の降水量 1.00mm/h", result)
+        self.assertIn("札幌の天気:\n雨、現在の降水量 2.00mm/h", result)
+        self.assertEqual(result.count("火星の気温"), 1)
+    
+    @patch('utils.http_client.get', side_effect=batch_response)
+    def test_cached_meshes_are_not_fetched(self, mock_get):
+        """キャッシュ済みのメッシュは取得せず、残りだけをまとめて取得するテスト"""
+        self.weather_service.get_weather_multi(["東京"])
+        mock_get.reset_mock()
+        
+        self.weather_service.get_weather_multi(["東京", "大阪"])
+        
+        weather_calls = self.weather_calls(mock_get)
+        self.assertEqual(len(weather_calls), 1)
+        self.assertEqual(weather_calls[0][1]["params"]["coordinates"], "135.50,34.69")
+    
+    @patch('services.weather_service.WEATHER_BATCH_SIZE', 2)
+    @patch('utils.http_client.get', side_effect=batch_response)
+    def test_get_weather_many_splits_batches(self, mock_get):
+        """上限を超える地点は複数回に分けて取得し、場所ごとのテキストを返すテスト"""
+        result = self.weather_service.get_weather_many(["東京", "大阪", "札幌"])
+        
+        self.assertEqual(len(self.weather_calls(mock_get)), 2)
+        self.assertEqual(list(result), ["東京", "大阪", "札幌"])
+        self.assertTrue(result["札幌"].startswith("札幌の天気:\n"))
+        self.assertTrue(result["札幌"].endswith("地球は恵まれている。"))
+    
+    @patch('utils.http_client.get')
+    def test_batch_features_are_matched_by_coordinates(self, mock_get):
+        """順序が違い、地点が欠けた応答でも座標で場所に対応させるテスト"""
+        def response(url, params=None, deadline=None):
+            if "geoCoder" in url:
+                return batch_response(url, params)
+            # 札幌が欠け、大阪と東京が逆順で、大阪は座標の桁数が違う
+            result = MagicMock(status_code=200)
+            result.json.return_value = {"Feature": [
+                weather_feature("135.5001,34.6901", "3.00"),
+                weather_feature("139.73,35.66", "0.00"),
+            ]}
+            return result
+        mock_get.side_effect = response
+        
+        result = self.weather_service.get_weather_many(["東京", "大阪", "札幌"])
+        
+        self.assertIn("晴れ、現在の降水量 0.00mm/h", result["東京"])
+        self.assertIn("雨、現在の降水量 3.00mm/h", result["大阪"])
+        self.assertIsNone(result["札幌"])
+    
+    @patch('utils.http_client.get')
+    def test_get_weather_many_without_data(self, mock_get):
+        """取得できなかった場所はランダムな天気情報で代用せず None にするテスト"""
+        mock_get.side_effect = lambda url, params=None, deadline=None: (
+            batch_response(url, params) if "geoCoder" in url else MagicMock(status_code=500, text="error")
+        )
+        
+        result = self.weather_service.get_weather_many(["東京", "大阪"])
+        
+        self.assertEqual(result, {"東京": None, "大阪": None})
+    
+    @patch('utils.http_client.get', side_effect=batch_response)
+    def test_geocoding_is_concurrent(self, mock_get):
+        """キャッシュにない場所のジオコーディングを並行して行うテスト"""
+        def slow_geocode(location, deadline=None):
+            time.sleep(0.2)
+            return COORDINATES[location]
+        
+        started = time.monotonic()
+        with patch.object(self.weather_service, "_get_coordinates_from_location", side_effect=slow_geocode):
+            self.weather_service.get_weather_multi(["東京", "大阪", "札幌", "新宿"])
+        
+        self.assertLess(time.monotonic() - started, 0.6)
+    
+    def test_get_weather_multi_async(self):
+        """非同期版でも降水量を1回の呼び出しで取得するテスト"""
+        calls = []
+        
+        async def fake_get(url, params=None, deadline=None):
+            calls.append(url)
+            return batch_response(url, params)
+        
+        with patch('utils.async_http_client.get', side_effect=fake_get):
+            result = asyncio.run(self.weather_service.get_weather_multi_async(["東京", "大阪"]))
+        
+        self.assertEqual(len([url for url in calls if "weather" in url]), 1)
+        self.assertIn("大阪の天気:\n雨、現在の降水量 1.00mm/h", result)
+
 if __name__ == '__main__':
     unittest.main()
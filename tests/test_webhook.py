@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# lambda_function の読み込みにはLINEの認証情報が必要
+import config
+config.LINE_CHANNEL_SECRET = config.LINE_CHANNEL_SECRET or "test_secret"
+config.LINE_CHANNEL_ACCESS_TOKEN = config.LINE_CHANNEL_ACCESS_TOKEN or "test_token"
+
+from line_client import LineClient
+from utils.signature import compute_signature
+from utils.webhook import get_body, get_header, parse_events
+import lambda_function
+
+def make_body(texts):
+    """テスト用のWebhookボディを作成する"""
+    events = [
+        {
+            "type": "message",
+            "replyToken": f"token-{i}",
+            "timestamp": 0,
+            "source": {"type": "user", "userId": f"U{i}"},
+            "message": {"type": "text", "id": str(i), "text": text},
+        }
+        for i, text in enumerate(texts)
+    ]
+    return json.dumps({"destination": "Ubot", "events": events}, ensure_ascii=False).encode("utf-8")
+
+class TestWebhookBody(unittest.TestCase):
+    """Webhookボディの取り出しと解析のテストクラス"""
+
+    def test_get_body_decodes_base64(self):
+        """Base64のボディが元のバイト列に戻るテスト"""
+        raw = make_body(["火星"])
+        event = {"body": base64.b64encode(raw).decode("ascii"), "isBase64Encoded": True}
+
+        self.assertEqual(get_body(event), raw)
+        self.assertEqual(get_body({"body": "{}"}), "{}")
+        self.assertEqual(get_body({"body": None}), "")
+
+    def test_get_header_ignores_case(self):
+        """ヘッダー名の大文字小文字を区別しないテスト"""
+        self.assertEqual(get_header({"headers": {"x-line-signature": "a"}}, "X-Line-Signature"), "a")
+        self.assertEqual(get_header({"headers": {"X-LINE-SIGNATURE": "b"}}, "X-Line-Signature"), "b")
+        self.assertEqual(get_header({"headers": None}, "X-Line-Signature"), "")
+
+    def test_parse_events(self):
+        """バイト列のボディからイベントが取り出されるテスト"""
+        events = parse_events(make_body(["こんにちは", "/tesla"]))
+
+        self.assertEqual([event.message.text for event in events], ["こんにちは", "/tesla"])
+        self.assertEqual(events[0].source.user_id, "U0")
+
+class TestSingleParseWebhook(unittest.TestCase):
+    """署名の検証とボディの解析を1回だけ行うWebhook処理のテストクラス"""
+
+    def setUp(self):
+        """各テスト実行前の準備"""
+        self.client = LineClient()
+        self.handled = []
+        self.client.add("MessageEvent", message="TextMessage")(
+            lambda event, deadline=None: self.handled.append(event.message.text)
+        )
+
+    @patch("line_client.LINE_CHANNEL_SECRET", "test_secret")
+    def test_verify_signature_dispatches_without_parser(self):
+        """WebhookParserを使わずにイベントが振り分けられるテスト"""
+        body = make_body(["a", "b"])
+
+        self.assertTrue(self.client.verify_signature(body, compute_signature(body, "test_secret")))
+
+        self.assertEqual(sorted(self.handled), ["a", "b"])
+        self.assertNotIn("handler", self.client.__dict__)
+
+    @patch("line_client.LINE_CHANNEL_SECRET", "test_secret")
+    def test_invalid_signature_and_body(self):
+        """署名が不正なボディ、JSONとして不正なボディが拒否されるテスト"""
+        body = make_body(["a"])
+        self.assertFalse(self.client.verify_signature(body, compute_signature(body + b" ", "test_secret")))
+
+        broken = b"{not json"
+        self.assertFalse(self.client.verify_signature(broken, compute_signature(broken, "test_secret")))
+        self.assertEqual(self.handled, [])
+
+    @patch("lambda_function.line_client")
+    def test_lambda_handler_passes_raw_bytes(self, mock_line_client):
+        """Base64のボディが元のバイト列のまま署名の検証に渡されるテスト"""
+        mock_line_client.verify_signature.return_value = True
+        raw = make_body(["火星"])
+
+        response = lambda_function.lambda_handler({
+            "body": base64.b64encode(raw).decode("ascii"),
+            "isBase64Encoded": True,
+            "headers": {"X-Line-Signature": "sig"},
+        }, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        args = mock_line_client.verify_signature.call_args[0]
+        self.assertEqual(args[:2], (raw, "sig"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import json
+import time
+from urllib.parse import urlsplit
+from config import logger, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+from utils.http_client import HOST_TIMEOUTS, HttpStats
+
+
+class AsyncResponse:
+    """requests.Response と同じ使い方ができる非同期HTTPレスポンス"""
+
+    def __init__(self, status_code, text, headers=None):
+        """
+        レスポンスを初期化する
+
+        Parameters:
+        status_code (int): HTTPステータスコード
+        text (str): レスポンスボディ
+        headers (dict): レスポンスヘッダー
+        """
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        """
+        レスポンスボディをJSONとして解釈する
+
+        Returns:
+        dict: JSON
+        """
+        return json.loads(self.text)
+
+
+class AsyncHttpClient:
+    """aiohttpの接続プールをウォームコンテナ間で使い回す非同期HTTPクライアント"""
+
+    def __init__(self, host_timeouts=None, pool_maxsize=None):
+        """
+        HTTPクライアントを初期化する
+
+        Parameters:
+        host_timeouts (dict): ホスト名 -> (接続タイムアウト, 読み込みタイムアウト)
+        pool_maxsize (int): ホストごとの同時接続数の上限
+        """
+        self.host_timeouts = dict(HOST_TIMEOUTS if host_timeouts is None else host_timeouts)
+        self.default_timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.pool_maxsize = pool_maxsize or HTTP_POOL_MAXSIZE
+        self.stats = HttpStats()
+        self._session = None
+        self._loop = None
+
+    def _get_session(self):
+        """
+        実行中のイベントループ用のセッションを取得する（初回のみ生成）
+
+        Returns:
+        aiohttp.ClientSession: 接続プール付きのセッション
+        """
+        # aiohttpは起動時にしか使わないので、初回の呼び出しまで読み込まない
+        import asyncio
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_maxsize, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+        return self._session
+
+    def _make_timeout(self, timeout):
+        """
+        requests形式のタイムアウトをaiohttpの形式に変換する
+
+        Parameters:
+        timeout (float | tuple): 秒数、または (接続タイムアウト, 読み込みタイムアウト)
+
+        Returns:
+        aiohttp.ClientTimeout: タイムアウト設定
+        """
+        import aiohttp
+
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def request(self, method, url, params=None, headers=None, json=None, timeout=None, deadline=None):
+        """
+        HTTPリクエストを送信する
+
+        Parameters:
+        method (str): HTTPメソッド
+        url (str): URL
+        params (dict): クエリパラメータ
+        headers (dict): リクエストヘッダー
+        json (dict): JSONボディ
+        timeout (float | tuple): タイムアウト（省略時はホストごとの設定を使う）
+        deadline (Deadline): リクエストの期限（タイムアウトを残り時間に収める）
+
+        Returns:
+        AsyncResponse: レスポンス
+
+        Raises:
+        DeadlineExceeded: 期限までに呼び出す時間が残っていない場合
+        """
+        host = urlsplit(url).hostname or ""
+        if timeout is None:
+            timeout = self.host_timeouts.get(host, self.default_timeout)
+        if deadline is not None:
+            timeout = deadline.cap(timeout)
+        session = self._get_session()
+        started = time.monotonic()
+        try:
+            async with session.request(
+                method, url, params=params, headers=headers, json=json,
+                timeout=self._make_timeout(timeout)
+            ) as response:
+                text = await response.text()
+                result = AsyncResponse(response.status, text, dict(response.headers))
+        except Exception:
+            self.stats.record(host, time.monotonic() - started, error=True)
+            raise
+        elapsed = time.monotonic() - started
+        self.stats.record(host, elapsed, status_code=result.status_code)
+        logger.debug(f"HTTP {method} {host} {result.status_code} {elapsed * 1000:.1f}ms (async)")
+        return result
+
+    async def close(self):
+        """セッションを閉じる"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# ウォームコンテナ間で使い回す共有クライアント
+_client = AsyncHttpClient()
+
+
+def get_client():
+    """
+    共有の非同期HTTPクライアントを取得する
+
+    Returns:
+    AsyncHttpClient: 共有クライアント
+    """
+    return _client
+
+
+async def get(url, **kwargs):
+    """
+    共有クライアントでGETリクエストを送信する
+
+    Parameters:
+    url (str): URL
+    **kwargs: AsyncHttpClient.request に渡す引数
+
+    Returns:
+    AsyncResponse: レスポンス
+    """
+    return await _client.request("GET", url, **kwargs)
+
+
+async def post(url, **kwargs):
+    """
+    共有クライアントでPOSTリクエストを送信する
+
+    Parameters:
+    url (str): URL
+    **kwargs: AsyncHttpClient.request に渡す引数
+
+    Returns:
+    AsyncResponse: レスポンス
+    """
+    return await _client.request("POST", url, **kwargs)
@@ -0,0 +1,420 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from config import logger
+
+# キャッシュに値が存在しないことを表す番兵（Noneもキャッシュ可能にするため）
+MISSING = object()
+
+
+class LRUCache:
+    """TTL付きのスレッドセーフなLRUキャッシュ"""
+
+    def __init__(self, maxsize=256, ttl=None):
+        """
+        キャッシュを初期化する
+
+        Parameters:
+        maxsize (int): 保持する最大件数
+        ttl (float): デフォルトの有効期間（秒）。Noneの場合は無期限
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        """
+        値を取得する
+
+        Parameters:
+        key (str): キー
+        default: 値が存在しない、または期限切れの場合に返す値
+
+        Returns:
+        キャッシュされた値、または default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=MISSING):
+        """
+        値を保存する
+
+        Parameters:
+        key (str): キー
+        value: 保存する値
+        ttl (float): この値の有効期間（秒）。省略時はデフォルトのTTL
+        """
+        if ttl is MISSING:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def remaining_ttl(self, key):
+        """
+        値の残り有効期間を返す
+
+        Parameters:
+        key (str): キー
+
+        Returns:
+        float: 残り秒数（無期限の場合や値がない場合は None）
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            return max(0.0, entry[1] - time.monotonic())
+
+    def delete(self, key):
+        """値を削除する"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """全ての値を削除する"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileCache:
+    """/tmp などのローカルファイルにJSONで永続化するキャッシュ"""
+
+    def __init__(self, path, maxsize=1024, ttl=None):
+        """
+        キャッシュを初期化する
+
+        Parameters:
+        path (str): 保存先のファイルパス
+        maxsize (int): 保持する最大件数
+        ttl (float): デフォルトの有効期間（秒）。Noneの場合は無期限
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """ファイルから初回のみ読み込む（ロック取得済みで呼ぶこと）"""
+        if self._data is not None:
+            return
+        self._data = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                now = time.time()
+                self._data = {
+                    key: entry for key, entry in loaded.items()
+                    if entry[1] is None or entry[1] > now
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"キャッシュファイルの読み込みに失敗しました ({self.path}): {str(e)}")
+
+    def _save(self):
+        """一時ファイルに書いてから置き換える（ロック取得済みで呼ぶこと）"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"キャッシュファイルの書き込みに失敗しました ({self.path}): {str(e)}")
+
+    def get(self, key, default=MISSING):
+        """
+        値を取得する
+
+        Parameters:
+        key (str): キー
+        default: 値が存在しない、または期限切れの場合に返す値
+
+        Returns:
+        キャッシュされた値、または default
+        """
+        with self._lock:
+            self._load()
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=MISSING):
+        """
+        値を保存する
+
+        Parameters:
+        key (str): キー
+        value: 保存する値（JSONに変換できること）
+        ttl (float): この値の有効期間（秒）。省略時はデフォルトのTTL
+        """
+        if ttl is MISSING:
+            ttl = self.ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._load()
+            self._data.pop(key, None)
+            self._data[key] = [value, expires_at]
+            # 上限を超えたら古く登録されたものから削除する
+            while len(self._data) > self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._save()
+
+    def remaining_ttl(self, key):
+        """
+        値の残り有効期間を返す
+
+        Parameters:
+        key (str): キー
+
+        Returns:
+        float: 残り秒数（無期限の場合や値がない場合は None）
+        """
+        with self._lock:
+            self._load()
+            entry = self._data.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            return max(0.0, entry[1] - time.time())
+
+
+class TieredCache:
+    """メモリ上のLRUとファイルの2段構成のキャッシュ"""
+
+    def __init__(self, memory, file=None):
+        """
+        キャッシュを初期化する
+
+        Parameters:
+        memory (LRUCache): 1段目のメモリキャッシュ
+        file (FileCache): 2段目のファイルキャッシュ（Noneの場合はメモリのみ）
+        """
+        self.memory = memory
+        self.file = file
+
+    def get(self, key, default=MISSING):
+        """
+        メモリ、ファイルの順に値を探す
+
+        Parameters:
+        key (str): キー
+        default: 値が存在しない場合に返す値
+
+        Returns:
+        キャッシュされた値、または default
+        """
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+        if self.file is None:
+            return default
+        value = self.file.get(key)
+        if value is MISSING:
+            return default
+        # ファイルから見つかった値は残りの有効期間だけメモリにも載せておく
+        self.memory.set(key, value, self.file.remaining_ttl(key))
+        return value
+
+    def set(self, key, value, ttl=MISSING):
+        """
+        両方の段に値を保存する
+
+        Parameters:
+        key (str): キー
+        value: 保存する値
+        ttl (float): この値の有効期間（秒）。省略時は各段のデフォルトのTTL
+        """
+        self.memory.set(key, value, ttl)
+        if self.file is not None:
+            self.file.set(key, value, ttl)
+
+
+class VariantCache:
+    """キーごとに複数の応答を貯めておき、その中から選んで返すキャッシュ"""
+
+    def __init__(self, maxsize=128, ttl=None, variants=3):
+        """
+        キャッシュを初期化する
+
+        Parameters:
+        maxsize (int): 保持する最大キー数
+        ttl (float): 最初の応答を保存してからの有効期間（秒）。Noneの場合は無期限
+        variants (int): キーごとに貯める応答の数
+        """
+        self.variants = max(1, variants)
+        self._cache = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        """
+        応答を取得する（貯まった数が上限に届くまではミスとして扱い、新しい応答を作らせる）
+
+        Parameters:
+        key (str): キー
+        default: 応答がまだ揃っていない場合に返す値
+
+        Returns:
+        貯めた応答のうちランダムな1つ、または default
+        """
+        pool = self._cache.get(key, ())
+        with self._lock:
+            if len(pool) < self.variants:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return random.choice(pool)
+
+    def add(self, key, value):
+        """
+        応答を追加する（有効期間は最初の応答を保存したときから数える）
+
+        Parameters:
+        key (str): キー
+        value: 追加する応答
+        """
+        with self._lock:
+            pool = self._cache.get(key, ())
+            if value in pool or len(pool) >= self.variants:
+                return
+            ttl = self._cache.remaining_ttl(key) if pool else MISSING
+            self._cache.set(key, pool + (value,), ttl)
+
+    def stats(self):
+        """
+        ヒット数・ミス数を返す
+
+        Returns:
+        dict: hits、misses、hit_rate、keys（保持しているキー数）
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "keys": len(self._cache),
+            }
+
+    def clear(self):
+        """全ての応答と集計を削除する"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class SingleFlight:
+    """同じキーの処理が同時に走らないよう、実行中の結果を共有する仕組み"""
+
+    class _Call:
+        """実行中の呼び出し"""
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        """SingleFlightを初期化する"""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        """
+        キーごとに1回だけ関数を実行し、同時に来た呼び出しには同じ結果を返す
+
+        Parameters:
+        key (str): 重複をまとめるキー
+        func (callable): 実行する関数
+        timeout (float): 他の呼び出しの結果を待つ最大秒数（Noneの場合は無制限）
+
+        Returns:
+        関数の戻り値（関数が例外を出した場合は全ての呼び出し元で同じ例外を送出）
+
+        Raises:
+        TimeoutError: 待機中にタイムアウトした場合
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._Call()
+                self._calls[key] = call
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"'{key}' の処理待ちがタイムアウトしました")
+        else:
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    """SingleFlightのasyncio版（同じキーのコルーチンを1回だけ実行する）"""
+
+    def __init__(self):
+        """AsyncSingleFlightを初期化する"""
+        self._tasks = {}
+
+    async def do(self, key, coro_func, timeout=None):
+        """
+        キーごとに1回だけコルーチンを実行し、同時に来た呼び出しには同じ結果を返す
+
+        Parameters:
+        key (str): 重複をまとめるキー
+        coro_func (callable): コルーチンを返す関数
+        timeout (float): 結果を待つ最大秒数（Noneの場合は無制限）
+
+        Returns:
+        コルーチンの戻り値
+
+        Raises:
+        asyncio.TimeoutError: 待機中にタイムアウトした場合
+        """
+        import asyncio
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # 呼び出し元がキャンセルされても共有中の処理は止めない
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
@@ -0,0 +1,334 @@
+import json
+import threading
+import time
+from config import (
+    logger, CIRCUIT_BREAKER_ENABLED, CIRCUIT_BREAKER_BACKEND, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_SLOW_CALL_MS_OPENAI, CIRCUIT_SLOW_CALL_MS_YAHOO, CIRCUIT_SYNC_SECONDS
+)
+from utils.deadline import DeadlineExceeded
+from utils.tracing import get_tracer, span
+
+# サーキットの状態
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# メトリクスに出す状態の値
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# 外部APIごとの設定（計測するステージ名、遅い応答とみなすミリ秒）
+UPSTREAMS = {
+    "openai": {"stage": "openai", "slow_call_ms": CIRCUIT_SLOW_CALL_MS_OPENAI},
+    "yahoo_geocoder": {"stage": "geocode", "slow_call_ms": CIRCUIT_SLOW_CALL_MS_YAHOO},
+    "yahoo_weather": {"stage": "weather_fetch", "slow_call_ms": CIRCUIT_SLOW_CALL_MS_YAHOO},
+}
+
+
+class CircuitOpenError(Exception):
+    """サーキットが開いているため外部APIを呼ばなかった場合の例外"""
+
+
+def is_failure_response(response):
+    """
+    レスポンスが外部APIの障害を表すかどうかを判定する
+
+    Parameters:
+    response (requests.Response | AsyncResponse): APIレスポンス
+
+    Returns:
+    bool: 5xx または 429 の場合はTrue
+    """
+    status_code = getattr(response, "status_code", None)
+    return isinstance(status_code, int) and (status_code >= 500 or status_code == 429)
+
+
+class CircuitBreaker:
+    """外部APIごとのサーキットブレーカー
+
+    連続した失敗（遅い応答を含む）が閾値に達すると開き、その間の呼び出しは CircuitOpenError で
+    すぐに失敗させる（呼び出し側は既存の定型応答に切り替える）。一定時間後に半開になり、
+    1件だけ試しに呼び出して、成功すれば閉じ、失敗すれば再び開く。
+    共有の保存先を指定すると、開いた・閉じたという状態を他のコンテナと共有する。
+    """
+
+    def __init__(self, name, stage=None, failure_threshold=None, open_seconds=None, slow_call_ms=None,
+                 kv_store=None, sync_seconds=None, enabled=True):
+        """
+        サーキットブレーカーを初期化する
+
+        Parameters:
+        name (str): 外部APIの名前
+        stage (str): 呼び出しの所要時間を記録するステージ名（省略時は記録しない）
+        failure_threshold (int): 開くまでの連続した失敗の回数
+        open_seconds (float): 開いてから半開にするまでの秒数
+        slow_call_ms (float): これより遅い応答は失敗とみなす（ミリ秒、0の場合は見ない）
+        kv_store (LocalKVStore | DynamoDBKVStore): 状態の共有先（省略時はコンテナ内のみ）
+        sync_seconds (float): 共有の状態を読み直す間隔（秒）
+        enabled (bool): Falseの場合は常に呼び出す
+        """
+        self.name = name
+        self.stage = stage
+        self.failure_threshold = failure_threshold or CIRCUIT_FAILURE_THRESHOLD
+        self.open_seconds = CIRCUIT_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.slow_call_ms = slow_call_ms or 0
+        self.kv_store = kv_store
+        self.sync_seconds = CIRCUIT_SYNC_SECONDS if sync_seconds is None else sync_seconds
+        self.enabled = enabled
+        self._state = CLOSED
+        self._failures = 0
+        # 開いた時刻と状態を変えた時刻は、コンテナ間で比べられるよう time.time() 基準にする
+        self._opened_at = 0.0
+        self._changed_at = 0.0
+        self._probing = False
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def _current_state(self, now):
+        """開いてから一定時間が過ぎていれば半開とみなした状態を返す"""
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def state(self):
+        """現在の状態（closed / open / half_open）"""
+        with self._lock:
+            return self._current_state(time.time())
+
+    def allow(self):
+        """
+        呼び出してよいかどうかを判定する（半開の場合は1件だけ試しに通す）
+
+        Returns:
+        bool: 呼び出してよい場合はTrue
+        """
+        if not self.enabled:
+            return True
+        self._sync()
+        with self._lock:
+            state = self._current_state(time.time())
+            if state == CLOSED:
+                allowed = True
+            elif state == HALF_OPEN and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                allowed = True
+            else:
+                allowed = False
+        get_tracer().gauge(f"circuit_{self.name}", STATE_CODES[state])
+        return allowed
+
+    def record_success(self, elapsed_ms=0.0):
+        """
+        呼び出しの成功を記録する（遅い応答は失敗として記録する）
+
+        Parameters:
+        elapsed_ms (float): 所要時間（ミリ秒）
+        """
+        if not self.enabled:
+            return
+        if self.slow_call_ms and elapsed_ms > self.slow_call_ms:
+            logger.warning(f"{self.name} の応答が遅いため失敗として記録: {elapsed_ms:.0f}ms")
+            self.record_failure()
+            return
+        with self._lock:
+            changed = self._state != CLOSED
+            self._failures = 0
+            self._probing = False
+            if changed:
+                self._set_state(CLOSED)
+        if changed:
+            self._publish()
+
+    def record_failure(self):
+        """呼び出しの失敗を記録する（閾値に達した場合、または試しの呼び出しが失敗した場合は開く）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._failures += 1
+            opened = self._state == HALF_OPEN or (
+                self._state == CLOSED and self._failures >= self.failure_threshold
+            )
+            self._probing = False
+            if opened:
+                self._opened_at = time.time()
+                self._set_state(OPEN)
+        if opened:
+            self._publish()
+
+    def _release(self):
+        """結果を判断できなかった試しの呼び出しを取り消す"""
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state):
+        """状態を変えて記録する（ロックを取った状態で呼ぶ）"""
+        self._state = state
+        self._changed_at = time.time()
+        logger.warning("サーキットブレーカーの状態が変化", extra={"circuit": self.name, "state": state})
+
+    def _key(self):
+        """共有の保存先のキー"""
+        return f"circuit:{self.name}"
+
+    def _publish(self):
+        """状態を共有の保存先に書き込む"""
+        if self.kv_store is None:
+            return
+        with self._lock:
+            shared = {"state": self._state, "opened_at": self._opened_at, "changed_at": self._changed_at}
+        try:
+            self.kv_store.put(self._key(), json.dumps(shared), ttl=max(self.open_seconds * 10, 60))
+        except Exception as e:
+            logger.warning(f"サーキットブレーカーの状態を共有できませんでした: {str(e)}")
+
+    def _sync(self):
+        """他のコンテナが書き込んだ、より新しい状態を取り込む（一定間隔ごと）"""
+        if self.kv_store is None:
+            return
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+            return
+        self._synced_at = now
+        try:
+            value = self.kv_store.get(self._key())
+        except Exception as e:
+            logger.warning(f"サーキットブレーカーの状態を読み込めませんでした: {str(e)}")
+            return
+        if not value:
+            return
+        shared = json.loads(value)
+        with self._lock:
+            if shared["changed_at"] <= self._changed_at:
+                return
+            if shared["state"] == OPEN:
+                self._opened_at = shared["opened_at"]
+                self._probing = False
+            elif shared["state"] == CLOSED:
+                self._failures = 0
+                self._probing = False
+            else:
+                return
+            self._state = shared["state"]
+            self._changed_at = shared["changed_at"]
+        logger.info("サーキットブレーカーの状態を共有から取り込み", extra={"circuit": self.name, "state": shared["state"]})
+
+    def _before_call(self):
+        """呼び出せない場合は CircuitOpenError を送出する"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} のサーキットが開いています")
+
+    def _after_call(self, result, elapsed_ms):
+        """呼び出し結果を記録する"""
+        if is_failure_response(result):
+            self.record_failure()
+        else:
+            self.record_success(elapsed_ms)
+
+    def call(self, func, *args, **kwargs):
+        """
+        サーキットブレーカーを通して外部APIを呼び出す
+
+        Parameters:
+        func (callable): 外部APIを呼び出す関数
+        *args, **kwargs: func に渡す引数
+
+        Returns:
+        object: func の戻り値
+
+        Raises:
+        CircuitOpenError: サーキットが開いている場合（func は呼ばない）
+        """
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            if self.stage:
+                with span(self.stage):
+                    result = func(*args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        except DeadlineExceeded:
+            # 期限が足りずに呼ばなかった場合は外部APIの失敗ではない
+            self._release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self._after_call(result, (time.perf_counter() - started) * 1000)
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """
+        call の非同期版
+
+        Parameters:
+        func (callable): 外部APIを呼び出すコルーチン関数
+        *args, **kwargs: func に渡す引数
+
+        Returns:
+        object: func の戻り値
+
+        Raises:
+        CircuitOpenError: サーキットが開いている場合（func は呼ばない）
+        """
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            if self.stage:
+                with span(self.stage):
+                    result = await func(*args, **kwargs)
+            else:
+                result = await func(*args, **kwargs)
+        except DeadlineExceeded:
+            self._release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self._after_call(result, (time.perf_counter() - started) * 1000)
+        return result
+
+
+# ウォームコンテナ間で使い回すサーキットブレーカー
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """
+    外部APIのサーキットブレーカーを取得する（初回のみ生成）
+
+    Parameters:
+    name (str): 外部APIの名前（UPSTREAMS のキー）
+
+    Returns:
+    CircuitBreaker: サーキットブレーカー
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                kv_store = None
+                if CIRCUIT_BREAKER_BACKEND == "kv":
+                    from utils.kv_store import get_kv_store
+                    kv_store = get_kv_store()
+                settings = UPSTREAMS.get(name, {})
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    stage=settings.get("stage"),
+                    slow_call_ms=settings.get("slow_call_ms"),
+                    kv_store=kv_store,
+                    enabled=CIRCUIT_BREAKER_ENABLED,
+                )
+    return breaker
+
+
+def circuit_states():
+    """
+    生成済みのサーキットブレーカーの状態を返す
+
+    Returns:
+    dict: 外部APIの名前 -> 状態
+    """
+    return {name: breaker.state for name, breaker in sorted(_breakers.items())}
@@ -0,0 +1,214 @@
+class Argument:
+    """コマンドの引数の定義"""
+
+    def __init__(self, name, label=None, default=None, rest=False, many=False):
+        """
+        引数の定義を初期化する
+
+        Parameters:
+        name (str): 引数名
+        label (str): ヘルプに表示する名前（省略時は引数名）
+        default: 省略時の値
+        rest (bool): Trueの場合は残りの語を空白区切りでまとめて1つの値にする
+        many (bool): Trueの場合は残りの語をリストにする（省略時は [default]）
+        """
+        self.name = name
+        self.label = label or name
+        self.default = default
+        self.rest = rest
+        self.many = many
+
+    def usage(self):
+        """ヘルプに表示する書式（例: [場所]、複数指定できる場合は [場所...]）"""
+        return f"[{self.label}...]" if self.many else f"[{self.label}]"
+
+
+class Command:
+    """コマンドの定義（名前・別名・引数・ヘルプ）"""
+
+    def __init__(self, name, handler, help, aliases=(), args=(), async_handler=None, hidden=False,
+                 uses_llm=False):
+        """
+        コマンドの定義を初期化する
+
+        Parameters:
+        name (str): コマンド名（/ を除く）
+        handler (str): 処理するメソッド名
+        help (str): ヘルプに表示する説明
+        aliases (tuple): 別名
+        args (tuple): 引数の定義（Argument）
+        async_handler (str): 非同期版のメソッド名（I/Oのあるコマンドのみ）
+        hidden (bool): ヘルプに表示せず、前方一致の対象にもしない
+        uses_llm (bool | function): OpenAIを呼ぶかどうか（引数のdictを受け取る関数も指定できる）
+        """
+        self.name = name
+        self.handler = handler
+        self.help = help
+        self.aliases = tuple(aliases)
+        self.args = tuple(args)
+        self.async_handler = async_handler
+        self.hidden = hidden
+        self.uses_llm = uses_llm
+
+    def calls_llm(self, args):
+        """
+        この呼び出しでOpenAIを呼ぶかどうか
+
+        Parameters:
+        args (dict): 引数名 -> 値
+
+        Returns:
+        bool: OpenAIを呼ぶ場合はTrue
+        """
+        return bool(self.uses_llm(args) if callable(self.uses_llm) else self.uses_llm)
+
+    def usage(self):
+        """ヘルプの1行（例: /weather [場所] - 天気情報）"""
+        parts = [f"/{self.name}"] + [arg.usage() for arg in self.args]
+        return f"{' '.join(parts)} - {self.help}"
+
+    def parse_args(self, rest):
+        """
+        引数部分の文字列を引数の定義に従って解釈する
+
+        Parameters:
+        rest (str): コマンド名より後の文字列
+
+        Returns:
+        dict: 引数名 -> 値
+        """
+        words = rest.split()
+        values = {}
+        for index, arg in enumerate(self.args):
+            if arg.rest:
+                values[arg.name] = " ".join(words[index:]) or arg.default
+                break
+            if arg.many:
+                values[arg.name] = words[index:] or ([] if arg.default is None else [arg.default])
+                break
+            values[arg.name] = words[index] if index < len(words) else arg.default
+        return values
+
+
+class Invocation:
+    """1回のコマンド呼び出しを解釈した結果"""
+
+    def __init__(self, text, word, command=None, args=None):
+        """
+        呼び出しを初期化する
+
+        Parameters:
+        text (str): メッセージテキスト
+        word (str): 入力されたコマンド名（/ を除く）
+        command (Command): 一致したコマンド（未知のコマンドの場合は None）
+        args (dict): 引数名 -> 値
+        """
+        self.text = text
+        self.word = word
+        self.command = command
+        self.args = args or {}
+
+    @property
+    def name(self):
+        """正式なコマンド名（未知のコマンドの場合は None）"""
+        return self.command.name if self.command else None
+
+
+class CommandRegistry:
+    """コマンドの定義を集め、メッセージを1回の走査で呼び出しに解釈する"""
+
+    def __init__(self, commands=(), header=""):
+        """
+        レジストリを初期化する
+
+        Parameters:
+        commands (list): コマンドの定義
+        header (str): ヘルプの先頭行
+        """
+        self.header = header
+        self.commands = []
+        # 名前・別名・一意な前方一致 -> コマンド
+        self._index = {}
+        self._prefixes = {}
+        for command in commands:
+            self.register(command)
+
+    def register(self, command):
+        """
+        コマンドを登録する
+
+        Parameters:
+        command (Command): コマンドの定義
+
+        Returns:
+        Command: 登録したコマンド
+        """
+        for word in (command.name,) + command.aliases:
+            word = word.lower()
+            if word in self._index:
+                raise ValueError(f"コマンド名が重複しています: {word}")
+            self._index[word] = command
+        self.commands.append(command)
+        self._build_prefixes()
+        return command
+
+    def _build_prefixes(self):
+        """どれか1つのコマンドにだけ一致する前方一致の表を作る"""
+        candidates = {}
+        for command in self.commands:
+            if command.hidden:
+                continue
+            for word in (command.name,) + command.aliases:
+                word = word.lower()
+                for end in range(1, len(word)):
+                    candidates.setdefault(word[:end], set()).add(command.name)
+        by_name = {command.name: command for command in self.commands}
+        self._prefixes = {
+            prefix: by_name[next(iter(names))]
+            for prefix, names in candidates.items()
+            if len(names) == 1 and prefix not in self._index
+        }
+
+    def resolve(self, word):
+        """
+        入力されたコマンド名に一致するコマンドを探す（完全一致・別名・一意な前方一致の順）
+
+        Parameters:
+        word (str): コマンド名（/ を除く）
+
+        Returns:
+        Command: 一致したコマンド（ない場合は None）
+        """
+        word = word.lower()
+        return self._index.get(word) or self._prefixes.get(word)
+
+    def parse(self, text):
+        """
+        メッセージを呼び出しに解釈する
+
+        Parameters:
+        text (str): メッセージテキスト（/ で始まる）
+
+        Returns:
+        Invocation: 呼び出し（"/" だけの場合などはコマンドが None）
+        """
+        parts = text[1:].split(None, 1)
+        if not parts:
+            return Invocation(text, "")
+        word = parts[0]
+        rest = parts[1] if len(parts) > 1 else ""
+        command = self.resolve(word)
+        if command is None:
+            return Invocation(text, word)
+        return Invocation(text, word, command, command.parse_args(rest))
+
+    def help_text(self):
+        """
+        登録されたコマンドからヘルプを作る
+
+        Returns:
+        str: ヘルプ
+        """
+        lines = [self.header] if self.header else []
+        lines += [command.usage() for command in self.commands if not command.hidden]
+        return "\n".join(lines)
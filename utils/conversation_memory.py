@@ -0,0 +1,295 @@
+import json
+import threading
+import time
+from collections import deque
+from config import (
+    logger, CONVERSATION_MEMORY_BACKEND, CONVERSATION_MEMORY_PATH, CONVERSATION_MEMORY_TURNS,
+    CONVERSATION_MEMORY_TOKENS, CONVERSATION_MEMORY_TTL, CONVERSATION_MEMORY_MAX_CHATS
+)
+from utils.cache import LRUCache
+
+
+def estimate_tokens(text):
+    """
+    テキストのトークン数を概算する（英数字は約4文字で1トークン、それ以外は1文字で1トークン）
+
+    Parameters:
+    text (str): テキスト
+
+    Returns:
+    int: トークン数の概算
+    """
+    ascii_length = len(text.encode("ascii", "ignore"))
+    return (ascii_length + 3) // 4 + (len(text) - ascii_length)
+
+
+def source_key(source):
+    """
+    メッセージソースから履歴のキーを作る（グループ・ルームは全員で1つの履歴を共有する）
+
+    Parameters:
+    source: メッセージソース
+
+    Returns:
+    str: 履歴のキー（特定できない場合は None）
+    """
+    for kind in ("group", "room", "user"):
+        source_id = getattr(source, f"{kind}_id", None)
+        if isinstance(source_id, str) and source_id:
+            return f"{kind}:{source_id}"
+    return None
+
+
+class ConversationHistory:
+    """往復数とトークン数で上限を設けた会話履歴のリングバッファ"""
+
+    def __init__(self, max_turns=None, max_tokens=None, messages=None):
+        """
+        履歴を初期化する
+
+        Parameters:
+        max_turns (int): 保持する往復（ユーザーの発言とBotの返答の組）の数
+        max_tokens (int): 保持するトークン数の上限
+        messages (list): 初期状態のメッセージ（{"role": ..., "content": ...} のリスト）
+        """
+        self.max_turns = max_turns or CONVERSATION_MEMORY_TURNS
+        self.max_tokens = max_tokens or CONVERSATION_MEMORY_TOKENS
+        # (役割, 本文, トークン数)
+        self._messages = deque(maxlen=self.max_turns * 2)
+        self.tokens = 0
+        self.extend(messages or [])
+
+    def extend(self, messages):
+        """
+        メッセージを追加し、上限を超えた分を古い方から捨てる
+
+        Parameters:
+        messages (list): {"role": ..., "content": ...} のリスト
+        """
+        for message in messages:
+            if len(self._messages) == self._messages.maxlen:
+                self.tokens -= self._messages.popleft()[2]
+            tokens = estimate_tokens(message["content"])
+            self._messages.append((message["role"], message["content"], tokens))
+            self.tokens += tokens
+        while self._messages and (self.tokens > self.max_tokens or self._messages[0][0] != "user"):
+            # 履歴がBotの返答から始まらないようにする
+            self.tokens -= self._messages.popleft()[2]
+
+    def to_list(self):
+        """
+        OpenAI APIに渡す形式のリストにする
+
+        Returns:
+        list: {"role": ..., "content": ...} のリスト
+        """
+        return [{"role": role, "content": content} for role, content, _ in self._messages]
+
+    def __len__(self):
+        return len(self._messages)
+
+
+class InMemoryConversationStore:
+    """プロセス内に会話履歴を保持するストア（ウォームコンテナの間だけ有効）"""
+
+    def __init__(self, max_chats=None, ttl=None, max_turns=None, max_tokens=None):
+        """
+        ストアを初期化する
+
+        Parameters:
+        max_chats (int): 履歴を保持するチャット数の上限
+        ttl (float): 最後の発言から履歴を捨てるまでの秒数
+        max_turns (int): チャットごとに保持する往復数
+        max_tokens (int): チャットごとに保持するトークン数の上限
+        """
+        self.ttl = ttl or CONVERSATION_MEMORY_TTL
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self._histories = LRUCache(maxsize=max_chats or CONVERSATION_MEMORY_MAX_CHATS, ttl=self.ttl)
+
+    def messages(self, key):
+        """
+        チャットの会話履歴を取得する
+
+        Parameters:
+        key (str): 履歴のキー
+
+        Returns:
+        list: {"role": ..., "content": ...} のリスト
+        """
+        history = self._histories.get(key, None)
+        return history.to_list() if history else []
+
+    def append(self, key, messages):
+        """
+        チャットの会話履歴にメッセージを追加する
+
+        Parameters:
+        key (str): 履歴のキー
+        messages (list): {"role": ..., "content": ...} のリスト
+        """
+        history = self._histories.get(key, None)
+        if history is None:
+            history = ConversationHistory(self.max_turns, self.max_tokens)
+        history.extend(messages)
+        # 保存し直して有効期限を延ばす
+        self._histories.set(key, history)
+
+
+class SQLiteConversationStore:
+    """SQLiteファイル（/tmp）に会話履歴を保存するストア"""
+
+    # 期限切れ・上限超過の履歴を削除する間隔（追加の回数）
+    EVICT_INTERVAL = 100
+
+    def __init__(self, path=None, max_chats=None, ttl=None, max_turns=None, max_tokens=None):
+        """
+        ストアを初期化する
+
+        Parameters:
+        path (str): SQLiteファイルのパス
+        max_chats (int): 履歴を保持するチャット数の上限
+        ttl (float): 最後の発言から履歴を捨てるまでの秒数
+        max_turns (int): チャットごとに保持する往復数
+        max_tokens (int): チャットごとに保持するトークン数の上限
+        """
+        # sqlite3 は使うときだけ読み込む
+        import sqlite3
+        self.path = path or CONVERSATION_MEMORY_PATH
+        self.max_chats = max_chats or CONVERSATION_MEMORY_MAX_CHATS
+        self.ttl = ttl or CONVERSATION_MEMORY_TTL
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._appends = 0
+        # 呼び出しごとに接続し直すと遅いため、接続を使い回す
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "key TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _load(self, key):
+        """保存されている履歴を読み込む（ロックを取得した状態で呼ぶ）"""
+        row = self._conn.execute(
+            "SELECT messages FROM conversations WHERE key = ? AND updated_at > ?",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def messages(self, key):
+        """
+        チャットの会話履歴を取得する
+
+        Parameters:
+        key (str): 履歴のキー
+
+        Returns:
+        list: {"role": ..., "content": ...} のリスト
+        """
+        with self._lock:
+            return self._load(key)
+
+    def append(self, key, messages):
+        """
+        チャットの会話履歴にメッセージを追加する
+
+        Parameters:
+        key (str): 履歴のキー
+        messages (list): {"role": ..., "content": ...} のリスト
+        """
+        with self._lock, self._conn:
+            history = ConversationHistory(self.max_turns, self.max_tokens, self._load(key))
+            history.extend(messages)
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO conversations (key, messages, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at",
+                (key, json.dumps(history.to_list(), ensure_ascii=False), now)
+            )
+            self._appends += 1
+            if self._appends % self.EVICT_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        """期限切れの履歴と、上限を超えた古い履歴を削除する（ロックを取得した状態で呼ぶ）"""
+        self._conn.execute("DELETE FROM conversations WHERE updated_at <= ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM conversations WHERE key NOT IN "
+            "(SELECT key FROM conversations ORDER BY updated_at DESC LIMIT ?)",
+            (self.max_chats,)
+        )
+
+
+class KVConversationStore:
+    """キーバリューストア（DynamoDBなど）に会話履歴を保存するストア"""
+
+    def __init__(self, kv_store=None, ttl=None, max_turns=None, max_tokens=None):
+        """
+        ストアを初期化する
+
+        Parameters:
+        kv_store (LocalKVStore | DynamoDBKVStore): 保存先（省略時は設定に応じたストア）
+        ttl (float): 最後の発言から履歴を捨てるまでの秒数
+        max_turns (int): チャットごとに保持する往復数
+        max_tokens (int): チャットごとに保持するトークン数の上限
+        """
+        if kv_store is None:
+            from utils.kv_store import get_kv_store
+            kv_store = get_kv_store()
+        self.kv_store = kv_store
+        self.ttl = ttl or CONVERSATION_MEMORY_TTL
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+
+    def messages(self, key):
+        """
+        チャットの会話履歴を取得する
+
+        Parameters:
+        key (str): 履歴のキー
+
+        Returns:
+        list: {"role": ..., "content": ...} のリスト
+        """
+        value = self.kv_store.get(f"conversation:{key}")
+        return json.loads(value) if value else []
+
+    def append(self, key, messages):
+        """
+        チャットの会話履歴にメッセージを追加する（有効期限は保存し直すたびに延びる）
+
+        Parameters:
+        key (str): 履歴のキー
+        messages (list): {"role": ..., "content": ...} のリスト
+        """
+        history = ConversationHistory(self.max_turns, self.max_tokens, self.messages(key))
+        history.extend(messages)
+        self.kv_store.put(
+            f"conversation:{key}", json.dumps(history.to_list(), ensure_ascii=False), ttl=self.ttl
+        )
+
+
+# ウォームコンテナ間で使い回すストア
+_store = None
+
+
+def get_conversation_store():
+    """
+    設定に応じた会話履歴のストアを取得する（初回のみ生成）
+
+    Returns:
+    InMemoryConversationStore | SQLiteConversationStore | KVConversationStore: 会話履歴のストア
+    （CONVERSATION_MEMORY_BACKEND=none の場合は None）
+    """
+    global _store
+    if _store is None and CONVERSATION_MEMORY_BACKEND != "none":
+        if CONVERSATION_MEMORY_BACKEND == "sqlite":
+            _store = SQLiteConversationStore()
+        elif CONVERSATION_MEMORY_BACKEND == "kv":
+            _store = KVConversationStore()
+        else:
+            _store = InMemoryConversationStore()
+        logger.info(f"会話履歴のストア: {type(_store).__name__}")
+    return _store
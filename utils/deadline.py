@@ -0,0 +1,92 @@
+import time
+from config import LAMBDA_DEADLINE_MARGIN_MS, REPLY_RESERVE_MS, MIN_UPSTREAM_TIMEOUT_MS
+
+
+class DeadlineExceeded(Exception):
+    """外部APIを呼ぶだけの残り時間がない場合の例外"""
+
+
+class Deadline:
+    """1回のLambda呼び出しに残された時間を表すリクエストスコープの期限"""
+
+    def __init__(self, expires_at, reserve=None):
+        """
+        期限を初期化する
+
+        Parameters:
+        expires_at (float): 期限（time.monotonic() 基準の秒）
+        reserve (float): 返信を送るために残しておく秒数
+        """
+        self.expires_at = expires_at
+        self.reserve = REPLY_RESERVE_MS / 1000 if reserve is None else reserve
+
+    @classmethod
+    def from_timeout(cls, seconds, reserve=None):
+        """
+        今から指定秒数後を期限にする
+
+        Parameters:
+        seconds (float): 残り秒数
+        reserve (float): 返信を送るために残しておく秒数
+
+        Returns:
+        Deadline: 期限
+        """
+        return cls(time.monotonic() + seconds, reserve)
+
+    @classmethod
+    def from_context(cls, context):
+        """
+        Lambda実行コンテキストの残り時間から期限を作る
+
+        Parameters:
+        context (LambdaContext): Lambda実行コンテキスト
+
+        Returns:
+        Deadline: 期限（コンテキストがない場合は None）
+        """
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return None
+        remaining_ms = context.get_remaining_time_in_millis() - LAMBDA_DEADLINE_MARGIN_MS
+        return cls.from_timeout(remaining_ms / 1000)
+
+    def remaining(self):
+        """
+        期限までの残り秒数を返す
+
+        Returns:
+        float: 残り秒数（期限切れの場合は0）
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """
+        期限を過ぎたかどうか
+
+        Returns:
+        bool: 期限を過ぎていればTrue
+        """
+        return self.remaining() <= 0
+
+    def cap(self, timeout):
+        """
+        外部API呼び出しのタイムアウトを、返信分を残した残り時間に収める
+
+        Parameters:
+        timeout (float | tuple): 本来のタイムアウト（秒数、または (接続, 読み込み)）
+
+        Returns:
+        float | tuple: 残り時間に収めたタイムアウト
+
+        Raises:
+        DeadlineExceeded: 呼び出しに使える時間が残っていない場合
+        """
+        budget = self.remaining() - self.reserve
+        if budget < MIN_UPSTREAM_TIMEOUT_MS / 1000:
+            raise DeadlineExceeded(f"残り時間が不足しています ({self.remaining():.2f}秒)")
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return (min(connect, budget), min(read, budget))
+        if timeout is None:
+            return budget
+        return min(timeout, budget)
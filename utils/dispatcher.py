@@ -0,0 +1,140 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import logger, EVENT_DISPATCH_MAX_WORKERS
+
+# ウォームコンテナ間で使い回すワーカープール（同時実行数ごと）
+_executors = {}
+
+
+def _get_executor(max_workers):
+    """
+    共有ワーカープールを取得する（初回のみ生成）
+
+    Parameters:
+    max_workers (int): 同時実行数の上限
+
+    Returns:
+    ThreadPoolExecutor: ワーカープール
+    """
+    executor = _executors.get(max_workers)
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="event-dispatch"
+        )
+        _executors[max_workers] = executor
+    return executor
+
+
+def get_chat_key(event):
+    """
+    イベントの送信元チャットを識別するキーを返す
+
+    Parameters:
+    event (Event): LINEのイベント
+
+    Returns:
+    str: "group:<id>" / "room:<id>" / "user:<id>"、送信元が不明な場合は None
+    """
+    source = getattr(event, "source", None)
+    if source is None:
+        return None
+    for attr, prefix in (("group_id", "group"), ("room_id", "room"), ("user_id", "user")):
+        value = getattr(source, attr, None)
+        if value:
+            return f"{prefix}:{value}"
+    return None
+
+
+class EventDispatcher:
+    """Webhookイベントをチャット単位の順序を保ったまま並列処理するディスパッチャ"""
+
+    def __init__(self, max_workers=None):
+        """
+        ディスパッチャを初期化する
+
+        Parameters:
+        max_workers (int): 同時に処理するチャット数の上限
+        """
+        self.max_workers = max(1, max_workers or EVENT_DISPATCH_MAX_WORKERS)
+
+    def group_by_chat(self, events):
+        """
+        イベントをチャットごとにまとめる（チャット内の順序は維持）
+
+        Parameters:
+        events (list): LINEのイベントのリスト
+
+        Returns:
+        OrderedDict: チャットキー -> イベントのリスト
+        """
+        groups = OrderedDict()
+        for index, event in enumerate(events):
+            key = get_chat_key(event)
+            if key is None:
+                # 送信元が分からないイベントは他と独立して処理する
+                key = f"unknown:{index}"
+            groups.setdefault(key, []).append(event)
+        return groups
+
+    def _run_chat(self, chat_key, events, handle_event):
+        """
+        1つのチャットのイベントを順番に処理する
+
+        Parameters:
+        chat_key (str): チャットキー
+        events (list): このチャットのイベント
+        handle_event (callable): イベント1件を処理する関数
+
+        Returns:
+        int: 処理できたイベント数
+        """
+        handled = 0
+        for event in events:
+            try:
+                handle_event(event)
+                handled += 1
+            except Exception as e:
+                # 1件の失敗で同じチャットの後続イベントを止めない
+                logger.error(f"イベント処理中にエラー発生 ({chat_key}): {str(e)}")
+        return handled
+
+    def dispatch(self, events, handle_event, timeout=None):
+        """
+        イベントを並列に処理し、全件完了または期限到達まで待つ
+
+        Parameters:
+        events (list): LINEのイベントのリスト
+        handle_event (callable): イベント1件を処理する関数
+        timeout (float): 待機する最大秒数（Noneの場合は無制限）
+
+        Returns:
+        dict: chats（チャット数）、completed（完了したチャット数）、pending（未完了のチャット数）
+        """
+        groups = self.group_by_chat(events)
+        if not groups:
+            return {"chats": 0, "completed": 0, "pending": 0}
+
+        # 期限がなくチャットが1つだけならスレッドを使わずにその場で処理する
+        if len(groups) == 1 and timeout is None:
+            chat_key, chat_events = next(iter(groups.items()))
+            self._run_chat(chat_key, chat_events, handle_event)
+            return {"chats": 1, "completed": 1, "pending": 0}
+
+        executor = _get_executor(self.max_workers)
+        started = time.monotonic()
+        futures = [
+            executor.submit(self._run_chat, chat_key, chat_events, handle_event)
+            for chat_key, chat_events in groups.items()
+        ]
+        if timeout is not None:
+            timeout = max(0.0, timeout)
+        done, not_done = wait(futures, timeout=timeout)
+
+        if not_done:
+            logger.warning(
+                f"期限までに完了しなかったチャットがあります: {len(not_done)}/{len(futures)} "
+                f"({time.monotonic() - started:.2f}秒経過)"
+            )
+        return {"chats": len(futures), "completed": len(done), "pending": len(not_done)}
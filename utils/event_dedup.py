@@ -0,0 +1,207 @@
+from config import (
+    logger, EVENT_DEDUP_ENABLED, EVENT_DEDUP_SIZE, EVENT_DEDUP_TTL, EVENT_DEDUP_IN_PROGRESS_TTL
+)
+from utils.cache import LRUCache
+
+# イベントの処理状態
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+
+def get_event_id(event):
+    """
+    イベントの webhookEventId を返す
+
+    Parameters:
+    event (Event): LINEのイベント
+
+    Returns:
+    str: webhookEventId（ない場合は None）
+    """
+    event_id = getattr(event, "webhook_event_id", None)
+    return event_id if isinstance(event_id, str) and event_id else None
+
+
+def is_redelivery(event):
+    """
+    LINEが再送したイベントかどうかを返す
+
+    Parameters:
+    event (Event): LINEのイベント
+
+    Returns:
+    bool: 再送の場合はTrue
+    """
+    return getattr(getattr(event, "delivery_context", None), "is_redelivery", None) is True
+
+
+class EventDeduplicator:
+    """webhookEventId 単位でイベントの重複処理を防ぐ
+
+    プロセス内の上限付きの記録で同じコンテナへの再送をすぐに見分け、
+    共有の保存先への条件付き書き込みでコンテナをまたいだ再送を見分ける。
+    失敗したイベントの再送はもう一度処理する。
+    """
+
+    def __init__(self, kv_store=None, maxsize=None, ttl=None, in_progress_ttl=None):
+        """
+        重複防止を初期化する
+
+        Parameters:
+        kv_store (LocalKVStore | DynamoDBKVStore): 共有の保存先（省略時は設定に応じたストア）
+        maxsize (int): プロセス内で覚えておくイベント数
+        ttl (float): 処理結果を覚えておく秒数
+        in_progress_ttl (float): 処理中の印を残す秒数
+        """
+        if kv_store is None:
+            from utils.kv_store import get_kv_store
+            kv_store = get_kv_store()
+        self.kv_store = kv_store
+        self.ttl = ttl or EVENT_DEDUP_TTL
+        self.in_progress_ttl = in_progress_ttl or EVENT_DEDUP_IN_PROGRESS_TTL
+        self._seen = LRUCache(maxsize=maxsize or EVENT_DEDUP_SIZE, ttl=self.ttl)
+
+    def _key(self, event_id):
+        """共有の保存先のキー"""
+        return f"event:{event_id}"
+
+    def begin(self, event_id):
+        """
+        イベントの処理を始めてよいかどうかを判定し、よい場合は処理中として記録する
+
+        Parameters:
+        event_id (str): webhookEventId
+
+        Returns:
+        bool: 未処理、または前回失敗したイベントの場合はTrue
+        """
+        return self._claim(event_id) is None
+
+    def _claim(self, event_id):
+        """
+        イベントを処理中として記録する
+
+        Parameters:
+        event_id (str): webhookEventId
+
+        Returns:
+        str: 記録できた場合は None、できなかった場合はイベントの状態（DONE / IN_PROGRESS）
+        """
+        seen = self._seen.get(event_id, None)
+        if seen in (IN_PROGRESS, DONE):
+            return seen
+        claimed = self.kv_store.put_if_absent(
+            self._key(event_id), IN_PROGRESS, ttl=self.in_progress_ttl, replaceable=(FAILED,)
+        )
+        if not claimed:
+            # 他のコンテナが処理中、または処理済み
+            state = self.kv_store.get(self._key(event_id))
+            if state == DONE:
+                self._seen.set(event_id, DONE)
+                return DONE
+            return IN_PROGRESS
+        self._seen.set(event_id, IN_PROGRESS, ttl=self.in_progress_ttl)
+        return None
+
+    def finish(self, event_id, succeeded):
+        """
+        イベントの処理結果を記録する
+
+        Parameters:
+        event_id (str): webhookEventId
+        succeeded (bool): 処理に成功した場合はTrue（失敗したイベントは再送で処理し直す）
+        """
+        state = DONE if succeeded else FAILED
+        self._seen.set(event_id, state)
+        try:
+            self.kv_store.put(self._key(event_id), state, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"イベントの処理結果を保存できませんでした: {str(e)}")
+
+    def run(self, event, func):
+        """
+        重複していなければイベントを処理し、結果を記録する
+
+        Parameters:
+        event (Event): LINEのイベント
+        func (callable): イベントを処理する関数（引数なし、成功した場合はTrueを返す）
+
+        Returns:
+        str: 呼び出し後のイベントの状態（DONE: 処理に成功した、または処理済み /
+        FAILED: 処理に失敗した / IN_PROGRESS: 他で処理中のため処理しなかった）
+        """
+        event_id = get_event_id(event)
+        if event_id is None:
+            return DONE if func() else FAILED
+        state = self._begin_or_skip(event, event_id)
+        if state is not None:
+            return state
+        try:
+            result = func()
+        except Exception:
+            self.finish(event_id, False)
+            raise
+        # 失敗を返した場合は再送で処理し直せるようにする
+        self.finish(event_id, bool(result))
+        return DONE if result else FAILED
+
+    async def run_async(self, event, func):
+        """
+        重複していなければイベントを処理し、結果を記録する（asyncio版）
+
+        Parameters:
+        event (Event): LINEのイベント
+        func (callable): イベントを処理するコルーチン関数（引数なし、成功した場合はTrueを返す）
+
+        Returns:
+        str: 呼び出し後のイベントの状態（DONE: 処理に成功した、または処理済み /
+        FAILED: 処理に失敗した / IN_PROGRESS: 他で処理中のため処理しなかった）
+        """
+        event_id = get_event_id(event)
+        if event_id is None:
+            return DONE if await func() else FAILED
+        state = self._begin_or_skip(event, event_id)
+        if state is not None:
+            return state
+        try:
+            result = await func()
+        except Exception:
+            self.finish(event_id, False)
+            raise
+        self.finish(event_id, bool(result))
+        return DONE if result else FAILED
+
+    def _begin_or_skip(self, event, event_id):
+        """処理を始めてよいかを判定し、重複の場合は記録を残す（処理してよい場合は None、重複の場合は状態を返す）"""
+        try:
+            state = self._claim(event_id)
+        except Exception as e:
+            # 保存先に届かない場合は、重複の可能性よりも応答しないことを避ける
+            logger.warning(f"イベントの重複確認に失敗したため処理します: {str(e)}")
+            return None
+        if state is None:
+            return None
+        logger.info("重複イベントをスキップ", extra={
+            "webhook_event_id": event_id,
+            "redelivery": is_redelivery(event),
+            "state": state,
+        })
+        return state
+
+
+# ウォームコンテナ間で使い回す重複防止
+_deduplicator = None
+
+
+def get_event_deduplicator():
+    """
+    設定に応じた重複防止を取得する（初回のみ生成）
+
+    Returns:
+    EventDeduplicator: 重複防止（EVENT_DEDUP_ENABLED=false の場合は None）
+    """
+    global _deduplicator
+    if _deduplicator is None and EVENT_DEDUP_ENABLED:
+        _deduplicator = EventDeduplicator()
+    return _deduplicator
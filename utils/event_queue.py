@@ -0,0 +1,277 @@
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    logger, EVENT_QUEUE_BACKEND, EVENT_QUEUE_URL, EVENT_QUEUE_PATH, EVENT_QUEUE_VISIBILITY_TIMEOUT
+)
+
+
+class QueueMessage:
+    """キューから受け取ったメッセージ"""
+
+    def __init__(self, message_id, body, receipt=None):
+        """
+        メッセージを初期化する
+
+        Parameters:
+        message_id (str): メッセージID
+        body (str): 本文（JSON文字列）
+        receipt: 削除・再表示に使う受領情報
+        """
+        self.message_id = message_id
+        self.body = body
+        self.receipt = receipt if receipt is not None else message_id
+
+
+class InMemoryEventQueue:
+    """プロセス内だけで使うイベントキュー（ローカルテスト用）
+
+    処理に失敗したメッセージは削除されず、可視性タイムアウトの経過後に再び受信される
+    """
+
+    def __init__(self, visibility_timeout=None):
+        """
+        キューを初期化する
+
+        Parameters:
+        visibility_timeout (float): 受信後に他の受信者から見えなくする秒数
+        """
+        self.visibility_timeout = EVENT_QUEUE_VISIBILITY_TIMEOUT if visibility_timeout is None else visibility_timeout
+        self._messages = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def send(self, bodies, group_ids=None):
+        """
+        メッセージを送信する
+
+        Parameters:
+        bodies (list): 本文（JSON文字列）のリスト
+        group_ids (list): 順序を保つグループのキー（このキューでは送信順に処理される）
+        """
+        with self._lock:
+            for body in bodies:
+                self._messages[str(next(self._ids))] = [body, 0.0]
+
+    def receive(self, max_messages=10):
+        """
+        表示可能なメッセージを受信する
+
+        Parameters:
+        max_messages (int): 受信する最大件数
+
+        Returns:
+        list: QueueMessage のリスト
+        """
+        now = time.monotonic()
+        received = []
+        with self._lock:
+            for message_id, entry in self._messages.items():
+                if len(received) >= max_messages:
+                    break
+                if entry[1] <= now:
+                    entry[1] = now + self.visibility_timeout
+                    received.append(QueueMessage(message_id, entry[0]))
+        return received
+
+    def ack(self, message):
+        """処理が終わったメッセージを削除する"""
+        with self._lock:
+            self._messages.pop(message.receipt, None)
+
+    def __len__(self):
+        return len(self._messages)
+
+
+class SQLiteEventQueue:
+    """SQLiteファイルに保存するイベントキュー（/tmp でのローカル実行用）"""
+
+    def __init__(self, path=None, visibility_timeout=None):
+        """
+        キューを初期化する
+
+        Parameters:
+        path (str): SQLiteファイルのパス
+        visibility_timeout (float): 受信後に他の受信者から見えなくする秒数
+        """
+        self.path = path or EVENT_QUEUE_PATH
+        self.visibility_timeout = EVENT_QUEUE_VISIBILITY_TIMEOUT if visibility_timeout is None else visibility_timeout
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL, visible_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        """SQLiteに接続する"""
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=5)
+
+    def send(self, bodies, group_ids=None):
+        """
+        メッセージを送信する
+
+        Parameters:
+        bodies (list): 本文（JSON文字列）のリスト
+        group_ids (list): 順序を保つグループのキー（このキューでは送信順に処理される）
+        """
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO events (body, visible_at) VALUES (?, 0)",
+                [(body,) for body in bodies]
+            )
+
+    def receive(self, max_messages=10):
+        """
+        表示可能なメッセージを受信する
+
+        Parameters:
+        max_messages (int): 受信する最大件数
+
+        Returns:
+        list: QueueMessage のリスト
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, body FROM events WHERE visible_at <= ? ORDER BY id LIMIT ?",
+                (now, max_messages)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE events SET visible_at = ? WHERE id = ?",
+                [(now + self.visibility_timeout, row[0]) for row in rows]
+            )
+        return [QueueMessage(str(row[0]), row[1]) for row in rows]
+
+    def ack(self, message):
+        """処理が終わったメッセージを削除する"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM events WHERE id = ?", (int(message.receipt),))
+
+    def __len__(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+class SQSEventQueue:
+    """Amazon SQS を使うイベントキュー（送信のみ。受信はLambdaのイベントソースマッピングが行う）"""
+
+    # SQSの SendMessageBatch で一度に送れる件数
+    BATCH_SIZE = 10
+
+    def __init__(self, queue_url=None):
+        """
+        キューを初期化する
+
+        Parameters:
+        queue_url (str): SQSキューのURL
+        """
+        self.queue_url = queue_url or EVENT_QUEUE_URL
+        self.fifo = self.queue_url.endswith(".fifo")
+        self._client = None
+
+    def _get_client(self):
+        """boto3のSQSクライアントを取得する（初回のみ生成）"""
+        if self._client is None:
+            # boto3はLambdaランタイムに同梱されているが、キューを使うときだけ読み込む
+            import boto3
+            self._client = boto3.client("sqs")
+        return self._client
+
+    def send(self, bodies, group_ids=None):
+        """
+        メッセージを送信する
+
+        Parameters:
+        bodies (list): 本文（JSON文字列）のリスト
+        group_ids (list): 順序を保つグループのキー（FIFOキューの MessageGroupId に使う）
+
+        Raises:
+        RuntimeError: 送信に失敗したメッセージがある場合
+        """
+        group_ids = group_ids or [None] * len(bodies)
+        for start in range(0, len(bodies), self.BATCH_SIZE):
+            entries = []
+            for index in range(start, min(start + self.BATCH_SIZE, len(bodies))):
+                entry = {"Id": str(index), "MessageBody": bodies[index]}
+                if self.fifo:
+                    entry["MessageGroupId"] = group_ids[index] or "default"
+                    entry["MessageDeduplicationId"] = self._deduplication_id(bodies[index])
+                entries.append(entry)
+            response = self._get_client().send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            if response.get("Failed"):
+                raise RuntimeError(f"SQSへの送信に失敗しました: {response['Failed']}")
+
+    @staticmethod
+    def _deduplication_id(body):
+        """
+        FIFOキューの MessageDeduplicationId を決める（LINEの再送も同じIDになる）
+
+        Parameters:
+        body (str): 本文（encode_event の値）
+
+        Returns:
+        str: イベントの webhookEventId（ない場合は本文のSHA-256）
+        """
+        try:
+            event_id = json.loads(body)["event"].get("webhookEventId")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            event_id = None
+        if isinstance(event_id, str) and event_id:
+            return event_id
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+# ウォームコンテナ間で使い回すキュー
+_queue = None
+
+
+def get_event_queue():
+    """
+    設定に応じたイベントキューを取得する（初回のみ生成）
+
+    Returns:
+    InMemoryEventQueue | SQLiteEventQueue | SQSEventQueue: イベントキュー
+    """
+    global _queue
+    if _queue is None:
+        if EVENT_QUEUE_BACKEND == "sqs":
+            _queue = SQSEventQueue()
+        elif EVENT_QUEUE_BACKEND == "sqlite":
+            _queue = SQLiteEventQueue()
+        else:
+            _queue = InMemoryEventQueue()
+        logger.info(f"イベントキュー: {type(_queue).__name__}")
+    return _queue
+
+
+def encode_event(event_dict, destination=None):
+    """
+    Webhookのイベント1件をキューのメッセージ本文にする
+
+    Parameters:
+    event_dict (dict): Webhookボディ中のイベント
+    destination (str): Webhookの宛先となったBotのuserId
+
+    Returns:
+    str: JSON文字列
+    """
+    return json.dumps({"destination": destination, "event": event_dict}, ensure_ascii=False)
+
+
+def decode_event(body):
+    """
+    キューのメッセージ本文からイベントを取り出す
+
+    Parameters:
+    body (str): JSON文字列
+
+    Returns:
+    tuple: (イベントのdict, destination)
+    """
+    data = json.loads(body)
+    return data["event"], data.get("destination")
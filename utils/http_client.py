@@ -0,0 +1,264 @@
+import threading
+import time
+from urllib.parse import urlsplit
+from config import logger, HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# ホストごとの (接続タイムアウト, 読み込みタイムアウト) 秒
+HOST_TIMEOUTS = {
+    "api.openai.com": (HTTP_CONNECT_TIMEOUT, 10.0),
+    "map.yahooapis.jp": (HTTP_CONNECT_TIMEOUT, 5.0),
+}
+
+
+class HttpStats:
+    """ホストごとの呼び出し回数・所要時間・エラー数の集計"""
+
+    def __init__(self):
+        """集計を初期化する"""
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, elapsed, status_code=None, error=False):
+        """
+        1回の呼び出し結果を集計する
+
+        Parameters:
+        host (str): ホスト名
+        elapsed (float): 所要時間（秒）
+        status_code (int): HTTPステータスコード
+        error (bool): 例外で失敗した場合はTrue
+        """
+        with self._lock:
+            stats = self._stats.setdefault(host, {
+                "calls": 0,
+                "errors": 0,
+                "http_errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            })
+            elapsed_ms = elapsed * 1000
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if error:
+                stats["errors"] += 1
+            elif status_code is not None and status_code >= 400:
+                stats["http_errors"] += 1
+
+    def snapshot(self):
+        """
+        集計結果を返す
+
+        Returns:
+        dict: ホスト名 -> calls, errors, http_errors, avg_ms, max_ms
+        """
+        with self._lock:
+            return {
+                host: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "http_errors": stats["http_errors"],
+                    "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0,
+                    "max_ms": stats["max_ms"],
+                }
+                for host, stats in self._stats.items()
+            }
+
+    def reset(self):
+        """集計をリセットする"""
+        with self._lock:
+            self._stats.clear()
+
+
+class HttpClient:
+    """ホストごとにKeep-Aliveの接続プールを持つ共有HTTPクライアント"""
+
+    def __init__(self, host_timeouts=None, pool_maxsize=None):
+        """
+        HTTPクライアントを初期化する
+
+        Parameters:
+        host_timeouts (dict): ホスト名 -> (接続タイムアウト, 読み込みタイムアウト)
+        pool_maxsize (int): ホストごとに保持する接続数の上限
+        """
+        self.host_timeouts = dict(HOST_TIMEOUTS if host_timeouts is None else host_timeouts)
+        self.default_timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.pool_maxsize = pool_maxsize or HTTP_POOL_MAXSIZE
+        self.stats = HttpStats()
+        self._sessions = {}
+        self._connection_baseline = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self, host):
+        """
+        ホスト用のセッションを取得する（初回のみ生成）
+
+        Parameters:
+        host (str): ホスト名
+
+        Returns:
+        requests.Session: 接続プール付きのセッション
+        """
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    # requestsの読み込みは起動時間に響くため、最初の通信まで遅らせる
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    # リトライは呼び出し側の判断に任せる
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=0
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[host] = session
+        return session
+
+    def get_timeout(self, host):
+        """
+        ホストに設定されたタイムアウトを返す
+
+        Parameters:
+        host (str): ホスト名
+
+        Returns:
+        tuple: (接続タイムアウト, 読み込みタイムアウト)
+        """
+        return self.host_timeouts.get(host, self.default_timeout)
+
+    def request(self, method, url, **kwargs):
+        """
+        HTTPリクエストを送信する
+
+        Parameters:
+        method (str): HTTPメソッド
+        url (str): URL
+        deadline (Deadline): リクエストの期限（タイムアウトを残り時間に収める）
+        **kwargs: requestsに渡す引数（timeout省略時はホストごとの設定を使う）
+
+        Returns:
+        requests.Response: レスポンス
+
+        Raises:
+        DeadlineExceeded: 期限までに呼び出す時間が残っていない場合
+        """
+        host = urlsplit(url).hostname or ""
+        deadline = kwargs.pop("deadline", None)
+        kwargs.setdefault("timeout", self.get_timeout(host))
+        if deadline is not None:
+            kwargs["timeout"] = deadline.cap(kwargs["timeout"])
+        session = self._get_session(host)
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            self.stats.record(host, time.monotonic() - started, error=True)
+            raise
+        elapsed = time.monotonic() - started
+        self.stats.record(host, elapsed, status_code=response.status_code)
+        logger.debug(f"HTTP {method} {host} {response.status_code} {elapsed * 1000:.1f}ms")
+        return response
+
+    def preconnect(self, url, deadline=None):
+        """
+        ホストへの接続を張って接続プールに入れておく（ウォームアップ用）
+
+        応答のステータスは問わない（認証なしの HEAD で401が返っても接続は使い回せる）
+
+        Parameters:
+        url (str): 接続先のURL
+        deadline (Deadline): 処理の期限
+
+        Returns:
+        bool: 接続できた場合はTrue
+        """
+        try:
+            self.request("HEAD", url, deadline=deadline)
+            return True
+        except Exception as e:
+            logger.warning(f"事前接続に失敗: {urlsplit(url).hostname} {str(e)}")
+            return False
+
+    def _count_connections(self, host):
+        """ホストのセッションがこれまでに張った接続数を返す"""
+        session = self._sessions.get(host)
+        if session is None:
+            return 0
+        count = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    count += pool.num_connections
+        return count
+
+    def get_stats(self):
+        """
+        ホストごとの呼び出し統計を返す
+
+        Returns:
+        dict: ホスト名 -> calls, errors, http_errors, avg_ms, max_ms, new_connections, reused_connections
+        """
+        result = self.stats.snapshot()
+        with self._lock:
+            for host, stats in result.items():
+                new_connections = self._count_connections(host) - self._connection_baseline.get(host, 0)
+                stats["new_connections"] = new_connections
+                stats["reused_connections"] = max(0, stats["calls"] - stats["errors"] - new_connections)
+        return result
+
+    def reset_stats(self):
+        """呼び出し統計をリセットする"""
+        self.stats.reset()
+        with self._lock:
+            self._connection_baseline = {
+                host: self._count_connections(host) for host in self._sessions
+            }
+
+
+# ウォームコンテナ間で使い回す共有クライアント
+_client = HttpClient()
+
+
+def get_client():
+    """
+    共有HTTPクライアントを取得する
+
+    Returns:
+    HttpClient: 共有HTTPクライアント
+    """
+    return _client
+
+
+def get(url, **kwargs):
+    """
+    共有クライアントでGETリクエストを送信する
+
+    Parameters:
+    url (str): URL
+    **kwargs: requestsに渡す引数
+
+    Returns:
+    requests.Response: レスポンス
+    """
+    return _client.request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    共有クライアントでPOSTリクエストを送信する
+
+    Parameters:
+    url (str): URL
+    **kwargs: requestsに渡す引数
+
+    Returns:
+    requests.Response: レスポンス
+    """
+    return _client.request("POST", url, **kwargs)
@@ -0,0 +1,162 @@
+import random
+import unicodedata
+from collections import deque
+from utils.response_catalog import sample_response
+
+
+def normalize_text(text):
+    """
+    キーワード照合用にテキストを正規化する（全角英数字を半角に、大文字を小文字に）
+
+    Parameters:
+    text (str): テキスト
+
+    Returns:
+    str: 正規化したテキスト
+    """
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _is_word_char(ch):
+    """英数字（単語の境界を判定する対象の文字）かどうか"""
+    return ch.isascii() and ch.isalnum()
+
+
+class KeywordRouter:
+    """
+    キーワード -> 応答のルールを Aho-Corasick 法のオートマトンにまとめ、
+    メッセージを1回走査するだけで一致するルールを選ぶルーター
+    """
+
+    def __init__(self, rules):
+        """
+        ルールをオートマトンにコンパイルする
+
+        Parameters:
+        rules (list): ルールのリスト（data.responses.KEYWORD_RULES の形式）
+        """
+        self.rules = list(rules)
+        # 状態ごとの遷移・失敗遷移・一致するパターン
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        # パターン: (ルール番号, 長さ, 先頭で境界を確認するか, 末尾で境界を確認するか)
+        self._patterns = []
+        for index, rule in enumerate(self.rules):
+            for keyword in rule["keywords"]:
+                self._add_keyword(index, keyword)
+        self._build_failure_links()
+        self._max_priority = max((rule.get("priority", 0) for rule in self.rules), default=0)
+
+    def _add_keyword(self, rule_index, keyword):
+        """
+        キーワードをトライ木に追加する
+
+        Parameters:
+        rule_index (int): ルール番号
+        keyword (str): キーワード（末尾の "*" は前方一致）
+        """
+        prefix_only = keyword.endswith("*")
+        keyword = normalize_text(keyword.rstrip("*"))
+        if not keyword:
+            return
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._output[state].append(len(self._patterns))
+        self._patterns.append((
+            rule_index,
+            len(keyword),
+            _is_word_char(keyword[0]),
+            _is_word_char(keyword[-1]) and not prefix_only,
+        ))
+
+    def _build_failure_links(self):
+        """幅優先で失敗遷移を作り、失敗先で一致するパターンも引き継ぐ"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = fail
+                self._output[next_state] = self._output[next_state] + self._output[fail]
+
+    def match(self, text):
+        """
+        テキストに一致するルールを選ぶ
+
+        Parameters:
+        text (str): メッセージテキスト
+
+        Returns:
+        dict: 優先度が最も高いルール（一致しない場合は None）
+        """
+        text = normalize_text(text)
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self._patterns
+        best = None
+        best_key = None
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern in output[state]:
+                rule_index, length, check_start, check_end = patterns[pattern]
+                start = end - length + 1
+                if check_start and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if check_end and end + 1 < len(text) and _is_word_char(text[end + 1]):
+                    continue
+                priority = self.rules[rule_index].get("priority", 0)
+                # 優先度が高い方、同じなら先に現れた方
+                key = (priority, -start)
+                if best_key is None or key > best_key:
+                    best, best_key = self.rules[rule_index], key
+            if best_key is not None and best_key[0] == self._max_priority:
+                # これ以上優先されるルールはない
+                break
+        return best
+
+    def respond(self, text, default=None, chat_key=None):
+        """
+        一致したルールから応答を1つ選ぶ
+
+        Parameters:
+        text (str): メッセージテキスト
+        default (list | str): どのルールにも一致しない場合の応答の候補、または応答カタログのセクション名
+        chat_key (str): チャットのキー（カタログから選ぶ場合に同じ応答が続かないようにする）
+
+        Returns:
+        str: 応答（一致せず default もない場合は None）
+        """
+        rule = self.match(text)
+        if rule is None:
+            return _choose(default, chat_key) if default else None
+        return rule.get("prefix", "") + _choose(rule["responses"], chat_key)
+
+
+def _choose(responses, chat_key):
+    """
+    応答の候補から1つ選ぶ
+
+    Parameters:
+    responses (list | str): 応答の候補、または応答カタログのセクション名
+    chat_key (str): チャットのキー
+
+    Returns:
+    str: 応答
+    """
+    if isinstance(responses, str):
+        return sample_response(responses, chat_key)
+    return random.choice(responses)
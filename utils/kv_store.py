@@ -0,0 +1,276 @@
+import threading
+import time
+from config import logger, KV_STORE_TABLE, KV_STORE_GROUP_INDEX, DIGEST_STORE_TABLE
+from utils.cache import LRUCache
+
+
+class KVStoreUnavailableError(Exception):
+    """コンテナをまたいで共有できる保存先が設定されていない場合の例外"""
+
+
+class LocalKVStore:
+    """プロセス内で使うキーバリューストア（DynamoDBの代用品。ローカル実行・テスト用）"""
+
+    def __init__(self, maxsize=10000):
+        """
+        ストアを初期化する
+
+        Parameters:
+        maxsize (int): 保持する最大件数（超えた場合は最も長く使われていないキーから捨てる）
+        """
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        # グループ -> キーの集合
+        self._groups = {}
+
+    def get(self, key):
+        """
+        値を取得する
+
+        Parameters:
+        key (str): キー
+
+        Returns:
+        str: 値（存在しない、または期限切れの場合は None）
+        """
+        return self._cache.get(key, None)
+
+    def put(self, key, value, ttl=None, group=None):
+        """
+        値を保存する
+
+        Parameters:
+        key (str): キー
+        value (str): 値
+        ttl (float): 有効期間（秒）。Noneの場合は無期限
+        group (str): list_group で一覧するためのグループ
+        """
+        with self._lock:
+            self._cache.set(key, value, ttl=ttl)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+
+    def put_if_absent(self, key, value, ttl=None, replaceable=()):
+        """
+        キーがない（または期限切れの）場合だけ値を保存する
+
+        Parameters:
+        key (str): キー
+        value (str): 値
+        ttl (float): 有効期間（秒）。Noneの場合は無期限
+        replaceable (tuple): 既にあっても上書きしてよい値
+
+        Returns:
+        bool: 保存した場合はTrue
+        """
+        with self._lock:
+            current = self._cache.get(key, None)
+            if current is not None and current not in replaceable:
+                return False
+            self._cache.set(key, value, ttl=ttl)
+            return True
+
+    def delete(self, key):
+        """値を削除する"""
+        with self._lock:
+            self._cache.delete(key)
+            for keys in self._groups.values():
+                keys.discard(key)
+
+    def list_group(self, group):
+        """
+        グループの値をすべて取得する
+
+        Parameters:
+        group (str): グループ
+
+        Returns:
+        dict: キー -> 値（期限切れの値は含まない）
+        """
+        items = {}
+        with self._lock:
+            keys = self._groups.get(group, set())
+            for key in sorted(keys):
+                value = self._cache.get(key, None)
+                if value is None:
+                    # 期限切れ、または件数の上限で捨てられたキーはグループからも外す
+                    keys.discard(key)
+                else:
+                    items[key] = value
+            if not keys:
+                self._groups.pop(group, None)
+        return items
+
+
+class DynamoDBKVStore:
+    """Amazon DynamoDB を使うキーバリューストア
+
+    テーブルはパーティションキー "k"（文字列）で作成し、"expires_at" をTTL属性に設定する。
+    list_group を使う場合は、パーティションキー "g"・ソートキー "k"（射影はすべての属性）の
+    グローバルセカンダリインデックスも作成する。
+    DynamoDBのTTLによる削除は遅れることがあるため、読み込み時にも期限を確認する。
+    """
+
+    def __init__(self, table_name=None, group_index=None):
+        """
+        ストアを初期化する
+
+        Parameters:
+        table_name (str): テーブル名
+        group_index (str): グループごとに一覧するインデックス名
+        """
+        self.table_name = table_name or KV_STORE_TABLE
+        self.group_index = group_index or KV_STORE_GROUP_INDEX
+        self._client = None
+
+    def _get_client(self):
+        """boto3のDynamoDBクライアントを取得する（初回のみ生成）"""
+        if self._client is None:
+            # boto3はLambdaランタイムに同梱されているが、ストアを使うときだけ読み込む
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def get(self, key):
+        """
+        値を取得する
+
+        Parameters:
+        key (str): キー
+
+        Returns:
+        str: 値（存在しない、または期限切れの場合は None）
+        """
+        response = self._get_client().get_item(TableName=self.table_name, Key={"k": {"S": key}})
+        item = response.get("Item")
+        if not item:
+            return None
+        expires_at = item.get("expires_at")
+        if expires_at and int(expires_at["N"]) <= time.time():
+            return None
+        return item["v"]["S"]
+
+    def put(self, key, value, ttl=None, group=None):
+        """
+        値を保存する
+
+        Parameters:
+        key (str): キー
+        value (str): 値
+        ttl (float): 有効期間（秒）。Noneの場合は無期限
+        group (str): list_group で一覧するためのグループ
+        """
+        item = {"k": {"S": key}, "v": {"S": value}}
+        if ttl is not None:
+            item["expires_at"] = {"N": str(int(time.time() + ttl))}
+        if group is not None:
+            item["g"] = {"S": group}
+        self._get_client().put_item(TableName=self.table_name, Item=item)
+
+    def put_if_absent(self, key, value, ttl=None, replaceable=()):
+        """
+        キーがない（または期限切れの）場合だけ値を保存する（条件付き書き込み）
+
+        Parameters:
+        key (str): キー
+        value (str): 値
+        ttl (float): 有効期間（秒）。Noneの場合は無期限
+        replaceable (tuple): 既にあっても上書きしてよい値
+
+        Returns:
+        bool: 保存した場合はTrue
+        """
+        now = int(time.time())
+        item = {"k": {"S": key}, "v": {"S": value}}
+        if ttl is not None:
+            item["expires_at"] = {"N": str(int(now + ttl))}
+        # TTLによる削除が遅れている項目も、期限切れならないものとして扱う
+        condition = "attribute_not_exists(k) OR expires_at <= :now"
+        values = {":now": {"N": str(now)}}
+        for index, replaceable_value in enumerate(replaceable):
+            condition += f" OR v = :r{index}"
+            values[f":r{index}"] = {"S": replaceable_value}
+        client = self._get_client()
+        try:
+            client.put_item(
+                TableName=self.table_name, Item=item,
+                ConditionExpression=condition, ExpressionAttributeValues=values
+            )
+            return True
+        except client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def delete(self, key):
+        """値を削除する"""
+        self._get_client().delete_item(TableName=self.table_name, Key={"k": {"S": key}})
+
+    def list_group(self, group):
+        """
+        グループの値をすべて取得する（インデックスへのクエリ。ページをたどる）
+
+        Parameters:
+        group (str): グループ
+
+        Returns:
+        dict: キー -> 値（期限切れの値は含まない）
+        """
+        client = self._get_client()
+        now = time.time()
+        items = {}
+        request = {
+            "TableName": self.table_name,
+            "IndexName": self.group_index,
+            "KeyConditionExpression": "g = :g",
+            "ExpressionAttributeValues": {":g": {"S": group}},
+        }
+        while True:
+            response = client.query(**request)
+            for item in response.get("Items", []):
+                expires_at = item.get("expires_at")
+                if expires_at and int(expires_at["N"]) <= now:
+                    continue
+                items[item["k"]["S"]] = item["v"]["S"]
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return items
+            request["ExclusiveStartKey"] = last_key
+
+
+# ウォームコンテナ間で使い回すストア
+_store = None
+_digest_store = None
+
+
+def get_kv_store():
+    """
+    設定に応じたキーバリューストアを取得する（初回のみ生成）
+
+    Returns:
+    LocalKVStore | DynamoDBKVStore: キーバリューストア
+    """
+    global _store
+    if _store is None:
+        _store = DynamoDBKVStore() if KV_STORE_TABLE else LocalKVStore()
+        logger.info(f"キーバリューストア: {type(_store).__name__}")
+    return _store
+
+
+def get_digest_store():
+    """
+    購読者と配信の進捗の保存先を取得する（初回のみ生成）
+
+    プロセス内の代用品では、別のコンテナで動くダイジェストの配信から購読者が見えず、
+    重複防止やレート制限のキーに押し出されて消えることもあるため、DynamoDBのテーブルがない場合は使えない
+
+    Returns:
+    DynamoDBKVStore: キーバリューストア
+
+    Raises:
+    KVStoreUnavailableError: DIGEST_STORE_TABLE・KV_STORE_TABLE のどちらも設定されていない場合
+    """
+    global _digest_store
+    if _digest_store is None:
+        if not DIGEST_STORE_TABLE:
+            raise KVStoreUnavailableError("DIGEST_STORE_TABLE（または KV_STORE_TABLE）が設定されていません")
+        _digest_store = DynamoDBKVStore(DIGEST_STORE_TABLE)
+    return _digest_store
@@ -0,0 +1,158 @@
+from array import array
+
+# これより強い降水量（mm/h）を「雨」とみなす
+RAIN_THRESHOLD = 0.0
+
+
+class RainfallSeries:
+    """気象情報APIの WeatherList を1回だけ解釈した、時刻と降水量の数値列"""
+
+    __slots__ = ("start", "minutes", "rainfall", "current")
+
+    def __init__(self, start, minutes, rainfall, current=0):
+        """
+        数値列を初期化する
+
+        Parameters:
+        start (int): 最初の地点の時刻（0時からの分）
+        minutes (array): 最初の地点からの経過分
+        rainfall (array): 降水量（mm/h）
+        current (int): 現在（最新の観測値）の位置
+        """
+        self.start = start
+        self.minutes = minutes
+        self.rainfall = rainfall
+        self.current = current
+
+    @classmethod
+    def from_weather_list(cls, weather_list):
+        """
+        WeatherList を数値列にする
+
+        Parameters:
+        weather_list (list): Weather の要素（Type / Date "YYYYMMDDHHMM" / Rainfall）のリスト
+
+        Returns:
+        RainfallSeries: 数値列（要素がない場合は None）
+        """
+        if not weather_list:
+            return None
+        minutes = array("H")
+        rainfall = array("f")
+        start = None
+        current = 0
+        for index, weather in enumerate(weather_list):
+            date = weather["Date"]
+            clock = int(date[8:10]) * 60 + int(date[10:12])
+            if start is None:
+                start = clock
+            # 日付をまたいでも経過分が増え続けるようにする
+            minutes.append((clock - start) % 1440)
+            rainfall.append(float(weather["Rainfall"]))
+            if weather.get("Type") == "observation":
+                current = index
+        return cls(start, minutes, rainfall, current)
+
+    def __len__(self):
+        return len(self.rainfall)
+
+    def clock(self, index):
+        """
+        位置の時刻を返す
+
+        Parameters:
+        index (int): 位置
+
+        Returns:
+        str: "HH:MM"
+        """
+        hour, minute = divmod((self.start + self.minutes[index]) % 1440, 60)
+        return f"{hour:02d}:{minute:02d}"
+
+
+class Nowcast:
+    """降水短時間予報の分析結果"""
+
+    __slots__ = ("raining", "onset", "stop", "peak", "peak_at", "total", "horizon")
+
+    def __init__(self, raining, onset, stop, peak, peak_at, total, horizon):
+        """
+        分析結果を初期化する
+
+        Parameters:
+        raining (bool): 現在雨が降っているかどうか
+        onset (str): 雨が降り始める時刻（"HH:MM"、降り始めない場合は None）
+        stop (str): 雨がやむ時刻（"HH:MM"、やまない場合は None）
+        peak (float): 予報期間中の最大の降水量（mm/h）
+        peak_at (str): 最大になる時刻（"HH:MM"）
+        total (float): 予報期間中の雨量の見込み（mm）
+        horizon (int): 予報期間（分）
+        """
+        self.raining = raining
+        self.onset = onset
+        self.stop = stop
+        self.peak = peak
+        self.peak_at = peak_at
+        self.total = total
+        self.horizon = horizon
+
+
+def analyze(series):
+    """
+    現在から予報の終わりまでの降り始め・やむ時刻、ピーク、雨量の見込みを求める
+
+    Parameters:
+    series (RainfallSeries): 数値列
+
+    Returns:
+    Nowcast: 分析結果（予報がない場合は None）
+    """
+    if series is None or series.current >= len(series) - 1:
+        return None
+    minutes, rainfall, current = series.minutes, series.rainfall, series.current
+    raining = rainfall[current] > RAIN_THRESHOLD
+    onset = stop = None
+    peak_index = current
+    total = 0.0
+    for index in range(current + 1, len(series)):
+        value = rainfall[index]
+        if value > rainfall[peak_index]:
+            peak_index = index
+        wet = value > RAIN_THRESHOLD
+        if raining and not wet and stop is None:
+            stop = index
+        elif not raining and wet and onset is None:
+            onset = index
+        # 10分ごとの地点の間は直線で補い、mm/h を分で積む
+        total += (rainfall[index - 1] + value) / 2 * (minutes[index] - minutes[index - 1]) / 60
+    return Nowcast(
+        raining=raining,
+        onset=series.clock(onset) if onset is not None else None,
+        stop=series.clock(stop) if stop is not None else None,
+        peak=rainfall[peak_index],
+        peak_at=series.clock(peak_index),
+        total=total,
+        horizon=minutes[-1] - minutes[current],
+    )
+
+
+def describe(nowcast):
+    """
+    分析結果を1行の文にする（例: 雨は14:20から、ピーク 8mm/h（予想雨量 約1.5mm））
+
+    Parameters:
+    nowcast (Nowcast): 分析結果
+
+    Returns:
+    str: 文（分析結果がない場合は None）
+    """
+    if nowcast is None:
+        return None
+    amount = f"ピーク {nowcast.peak:g}mm/h（予想雨量 約{nowcast.total:.1f}mm）"
+    if nowcast.onset:
+        return f"雨は{nowcast.onset}から、{amount}"
+    if nowcast.stop:
+        return f"雨は{nowcast.stop}ごろにやむ見込み、{amount}"
+    if nowcast.raining:
+        return f"{nowcast.horizon}分後まで雨が続く、{amount}"
+    return f"{nowcast.horizon}分後まで雨の予報なし"
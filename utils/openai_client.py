@@ -0,0 +1,327 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import (
+    logger, OPENAI_LATENCY_WINDOW, OPENAI_LATENCY_MIN_SAMPLES, OPENAI_TIMEOUT_PERCENTILE,
+    OPENAI_TIMEOUT_MULTIPLIER, OPENAI_TIMEOUT_MIN, OPENAI_TIMEOUT_MAX, OPENAI_HEDGE_ENABLED,
+    OPENAI_HEDGE_PERCENTILE, OPENAI_HEDGE_MAX_RATIO, OPENAI_HEDGE_WORKERS
+)
+from utils import http_client, async_http_client
+from utils.http_client import HOST_TIMEOUTS
+
+# 計測が貯まるまで使う固定のタイムアウト
+DEFAULT_TIMEOUT = HOST_TIMEOUTS["api.openai.com"]
+
+
+def is_usable_response(response):
+    """
+    ヘッジした呼び出しの結果として採用できるレスポンスかどうか
+
+    Parameters:
+    response (requests.Response | AsyncResponse): APIレスポンス
+
+    Returns:
+    bool: 5xx・429 以外の場合はTrue
+    """
+    status_code = getattr(response, "status_code", None)
+    return not (isinstance(status_code, int) and (status_code >= 500 or status_code == 429))
+
+
+class LatencyWindow:
+    """直近の一定件数の所要時間からパーセンタイルを求める"""
+
+    def __init__(self, window):
+        """
+        計測の窓を初期化する
+
+        Parameters:
+        window (int): 保持する件数
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        """
+        所要時間を記録する
+
+        Parameters:
+        seconds (float): 所要時間（秒）
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """
+        パーセンタイルを求める（nearest-rank 法）
+
+        Parameters:
+        q (float): パーセンタイル（0-100）
+
+        Returns:
+        float: 所要時間（秒）。計測がない場合は None
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(1, -(-q * len(samples) // 100))
+        return samples[int(rank) - 1]
+
+
+class OpenAIClient:
+    """所要時間の分布に合わせてタイムアウトを決め、遅い呼び出しをヘッジするOpenAI用クライアント
+
+    読み込みタイムアウトは直近の高いパーセンタイル（既定 p99）に余裕を掛けた値にする。
+    ヘッジを有効にすると、最初の呼び出しが p95 を過ぎても返らない場合に同じリクエストを
+    もう1本だけ送り、先に返った方を使う。ヘッジは直近のリクエストの一定割合までに抑える。
+    """
+
+    def __init__(self, window=None, min_samples=None, timeout_percentile=None, timeout_multiplier=None,
+                 timeout_min=None, timeout_max=None, hedge_enabled=None, hedge_percentile=None,
+                 hedge_max_ratio=None):
+        """
+        クライアントを初期化する
+
+        Parameters:
+        window (int): 所要時間を保持する件数
+        min_samples (int): 適応タイムアウトとヘッジを使い始める計測数
+        timeout_percentile (float): タイムアウトの基準にするパーセンタイル
+        timeout_multiplier (float): 基準の所要時間に掛ける余裕
+        timeout_min (float): 読み込みタイムアウトの下限（秒）
+        timeout_max (float): 読み込みタイムアウトの上限（秒）
+        hedge_enabled (bool): ヘッジするかどうか
+        hedge_percentile (float): ヘッジを送るまで待つパーセンタイル
+        hedge_max_ratio (float): 直近のリクエストのうちヘッジしてよい割合
+        """
+        window = window or OPENAI_LATENCY_WINDOW
+        self.latencies = LatencyWindow(window)
+        self.min_samples = OPENAI_LATENCY_MIN_SAMPLES if min_samples is None else min_samples
+        self.timeout_percentile = timeout_percentile or OPENAI_TIMEOUT_PERCENTILE
+        self.timeout_multiplier = timeout_multiplier or OPENAI_TIMEOUT_MULTIPLIER
+        self.timeout_min = OPENAI_TIMEOUT_MIN if timeout_min is None else timeout_min
+        self.timeout_max = timeout_max or OPENAI_TIMEOUT_MAX
+        self.hedge_enabled = OPENAI_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_percentile = hedge_percentile or OPENAI_HEDGE_PERCENTILE
+        self.hedge_max_ratio = OPENAI_HEDGE_MAX_RATIO if hedge_max_ratio is None else hedge_max_ratio
+        # 直近のリクエストごとにヘッジしたかどうか
+        self._hedged = deque(maxlen=window)
+        self._hedged_count = 0
+        self._lock = threading.Lock()
+
+    def timeout(self):
+        """
+        次の呼び出しに使うタイムアウトを返す
+
+        Returns:
+        tuple: (接続タイムアウト, 読み込みタイムアウト)
+        """
+        connect, default_read = DEFAULT_TIMEOUT
+        if len(self.latencies) < self.min_samples:
+            return (connect, default_read)
+        read = self.latencies.percentile(self.timeout_percentile) * self.timeout_multiplier
+        return (connect, min(self.timeout_max, max(self.timeout_min, read)))
+
+    def hedge_delay(self):
+        """
+        ヘッジを送るまで待つ秒数を返す
+
+        Returns:
+        float: 秒数（ヘッジしない場合は None）
+        """
+        if not self.hedge_enabled or len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def _note_request(self, hedged):
+        """リクエストごとにヘッジしたかどうかを記録する"""
+        with self._lock:
+            self._append_hedged(hedged)
+
+    def _append_hedged(self, hedged):
+        """ヘッジしたかどうかを記録する（_lock を取得してから呼ぶ）"""
+        if len(self._hedged) == self._hedged.maxlen and self._hedged[0]:
+            self._hedged_count -= 1
+        self._hedged.append(hedged)
+        self._hedged_count += hedged
+
+    def _claim_hedge(self):
+        """
+        ヘッジの上限に余裕があれば、このリクエストをヘッジしたものとして記録する
+
+        上限の確認と記録を1つのロックの中で行うため、同時に呼ばれても上限を超えない
+
+        Returns:
+        bool: ヘッジしてよい場合はTrue
+        """
+        with self._lock:
+            allowed = self._hedged_count + 1 <= self.hedge_max_ratio * max(len(self._hedged), 1)
+            self._append_hedged(allowed)
+        return allowed
+
+    def _record(self, started, timeout, response=None):
+        """
+        所要時間を記録する
+
+        成功した呼び出しの所要時間に加えて、タイムアウトした呼び出しもタイムアウトの値で記録する
+        （成功だけを記録するとタイムアウトが縮み続けるため）
+        """
+        elapsed = time.monotonic() - started
+        if response is not None:
+            if is_usable_response(response):
+                self.latencies.record(elapsed)
+        elif elapsed >= timeout[1]:
+            self.latencies.record(elapsed)
+
+    def _post_once(self, url, timeout, **kwargs):
+        """1回だけ呼び出して所要時間を記録する"""
+        started = time.monotonic()
+        try:
+            response = http_client.post(url, timeout=timeout, **kwargs)
+        except Exception:
+            self._record(started, timeout)
+            raise
+        self._record(started, timeout, response)
+        return response
+
+    async def _post_once_async(self, url, timeout, **kwargs):
+        """_post_once の非同期版"""
+        started = time.monotonic()
+        try:
+            response = await async_http_client.post(url, timeout=timeout, **kwargs)
+        except Exception:
+            self._record(started, timeout)
+            raise
+        self._record(started, timeout, response)
+        return response
+
+    def post(self, url, **kwargs):
+        """
+        Chat Completions APIを呼び出す
+
+        Parameters:
+        url (str): URL
+        **kwargs: http_client.post に渡す引数（headers / json / deadline）
+
+        Returns:
+        requests.Response: 先に返ったレスポンス
+        """
+        timeout = self.timeout()
+        delay = self.hedge_delay()
+        if delay is None:
+            self._note_request(False)
+            return self._post_once(url, timeout, **kwargs)
+
+        executor = _get_executor()
+        primary = executor.submit(self._post_once, url, timeout, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            self._note_request(False)
+            return primary.result()
+        if not self._claim_hedge():
+            return primary.result()
+
+        logger.info(f"OpenAIの応答が p{self.hedge_percentile:g} ({delay:.2f}秒) を過ぎたためヘッジします")
+        hedge = executor.submit(self._post_once, url, timeout, **kwargs)
+        pending = {primary, hedge}
+        last = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                last = future
+                if future.exception() is None and is_usable_response(future.result()):
+                    # 遅い方の呼び出しは止められないため、結果を捨てる
+                    return future.result()
+        return last.result()
+
+    async def post_async(self, url, **kwargs):
+        """
+        post の非同期版（遅い方の呼び出しはキャンセルする）
+
+        Parameters:
+        url (str): URL
+        **kwargs: async_http_client.post に渡す引数（headers / json / deadline）
+
+        Returns:
+        AsyncResponse: 先に返ったレスポンス
+        """
+        # asyncioは非同期版でしか使わないので、起動時には読み込まない
+        import asyncio
+        timeout = self.timeout()
+        delay = self.hedge_delay()
+        if delay is None:
+            self._note_request(False)
+            return await self._post_once_async(url, timeout, **kwargs)
+
+        primary = asyncio.ensure_future(self._post_once_async(url, timeout, **kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            self._note_request(False)
+            return await primary
+        if not self._claim_hedge():
+            return await primary
+
+        logger.info(f"OpenAIの応答が p{self.hedge_percentile:g} ({delay:.2f}秒) を過ぎたためヘッジします")
+        hedge = asyncio.ensure_future(self._post_once_async(url, timeout, **kwargs))
+        pending = {primary, hedge}
+        last = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and is_usable_response(task.result()):
+                        return task.result()
+            return last.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """
+        現在のタイムアウトとヘッジの状況を返す
+
+        Returns:
+        dict: samples / timeout / hedge_delay / hedged / requests
+        """
+        with self._lock:
+            hedged, requests = self._hedged_count, len(self._hedged)
+        return {
+            "samples": len(self.latencies),
+            "timeout": self.timeout()[1],
+            "hedge_delay": self.hedge_delay(),
+            "hedged": hedged,
+            "requests": requests,
+        }
+
+
+# ヘッジで同時に呼び出すためのスレッドプール（初回のヘッジまで作らない）
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """ヘッジ用のスレッドプールを取得する（初回のみ生成）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=OPENAI_HEDGE_WORKERS, thread_name_prefix="openai-hedge")
+    return _executor
+
+
+# ConversationHandler と AdviceService で共有するクライアント
+_client = OpenAIClient()
+
+
+def get_openai_client():
+    """
+    共有のOpenAIクライアントを取得する
+
+    Returns:
+    OpenAIClient: 共有クライアント
+    """
+    return _client
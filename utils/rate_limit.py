@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from config import (
+    logger, OPENAI_API_KEY, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_USER_BURST,
+    RATE_LIMIT_USER_PER_MINUTE, RATE_LIMIT_GROUP_BURST, RATE_LIMIT_GROUP_PER_MINUTE
+)
+from utils.cache import LRUCache
+
+
+class TokenBucketLimiter:
+    """キーごとのトークンバケットによるレート制限"""
+
+    def __init__(self, capacity, per_minute, kv_store=None, maxsize=10000, name="bucket"):
+        """
+        レート制限を初期化する
+
+        Parameters:
+        capacity (float): バケットの容量（連続で使える回数）
+        per_minute (float): 1分あたりに回復するトークン数
+        kv_store (LocalKVStore | DynamoDBKVStore): 共有の保存先（省略時はプロセス内のみ）
+        maxsize (int): プロセス内で保持するバケット数の上限
+        name (str): キーの接頭辞
+        """
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.kv_store = kv_store
+        self.name = name
+        # 満タンに戻るまでの時間が過ぎたバケットは捨てても結果が変わらない
+        self.refill_seconds = capacity / self.rate if self.rate > 0 else None
+        self._buckets = LRUCache(maxsize=maxsize, ttl=self.refill_seconds)
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens, updated_at, now):
+        """経過時間に応じてトークンを回復する"""
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def allow(self, key, cost=1):
+        """
+        トークンを消費できるかどうかを判定し、できる場合は消費する
+
+        Parameters:
+        key (str): バケットのキー
+        cost (float): 消費するトークン数
+
+        Returns:
+        bool: 制限内の場合はTrue
+        """
+        if self.kv_store is not None:
+            return self._allow_shared(key, cost)
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.get(key, None)
+            tokens = self.capacity if bucket is None else self._refill(bucket[0], bucket[1], now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets.set(key, (tokens, now))
+            return allowed
+
+    def _allow_shared(self, key, cost):
+        """
+        共有の保存先にあるバケットで判定する
+
+        読み込みと書き込みの間に他のコンテナが更新すると、制限がわずかに緩くなることがある
+        （レート制限の目的には十分なため、条件付き書き込みは使わない）
+        """
+        kv_key = f"ratelimit:{self.name}:{key}"
+        now = time.time()
+        value = self.kv_store.get(kv_key)
+        if value:
+            state = json.loads(value)
+            tokens = self._refill(state["tokens"], state["updated_at"], now)
+        else:
+            tokens = self.capacity
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.kv_store.put(kv_key, json.dumps({"tokens": tokens, "updated_at": now}), ttl=self.refill_seconds)
+        return allowed
+
+
+class LLMRateLimiter:
+    """OpenAIを呼ぶメッセージをユーザーごと・グループごとに制限する"""
+
+    def __init__(self, user_limiter, group_limiter):
+        """
+        レート制限を初期化する
+
+        Parameters:
+        user_limiter (TokenBucketLimiter): ユーザーごとのバケット
+        group_limiter (TokenBucketLimiter): グループ・ルームごとのバケット
+        """
+        self.user_limiter = user_limiter
+        self.group_limiter = group_limiter
+
+    def check(self, source):
+        """
+        メッセージソースが制限内かどうかを判定する（制限内の場合はトークンを消費する）
+
+        Parameters:
+        source: メッセージソース
+
+        Returns:
+        str: 制限を超えた単位（"user" / "group"）。制限内の場合は None
+        """
+        user_id = getattr(source, "user_id", None)
+        group_id = getattr(source, "group_id", None) or getattr(source, "room_id", None)
+        # ユーザーのバケットで止まったメッセージはグループのトークンを消費しない
+        if isinstance(user_id, str) and user_id and not self.user_limiter.allow(user_id):
+            return "user"
+        if isinstance(group_id, str) and group_id and not self.group_limiter.allow(group_id):
+            return "group"
+        return None
+
+
+# ウォームコンテナ間で使い回すレート制限
+_limiter = None
+
+
+def get_rate_limiter():
+    """
+    設定に応じたレート制限を取得する（初回のみ生成）
+
+    Returns:
+    LLMRateLimiter: レート制限（RATE_LIMIT_ENABLED=false の場合は None）
+    """
+    global _limiter
+    if _limiter is None and RATE_LIMIT_ENABLED:
+        kv_store = None
+        if RATE_LIMIT_BACKEND == "kv":
+            from utils.kv_store import get_kv_store
+            kv_store = get_kv_store()
+        _limiter = LLMRateLimiter(
+            TokenBucketLimiter(RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_MINUTE, kv_store, name="user"),
+            TokenBucketLimiter(RATE_LIMIT_GROUP_BURST, RATE_LIMIT_GROUP_PER_MINUTE, kv_store, name="group"),
+        )
+        logger.info(f"レート制限: {RATE_LIMIT_BACKEND}")
+    return _limiter
+
+
+def check_llm_rate_limit(source, invocation=None):
+    """
+    OpenAIを呼ぶメッセージについてレート制限を確認する
+
+    Parameters:
+    source: メッセージソース
+    invocation (Invocation): コマンドの場合は解釈済みの呼び出し（会話の場合は None）
+
+    Returns:
+    str: 制限を超えた単位（"user" / "group"）。制限内、またはOpenAIを呼ばない場合は None
+    """
+    if not OPENAI_API_KEY:
+        # OpenAIを使わない場合は定型応答だけなので制限しない
+        return None
+    if invocation is not None and not (invocation.command and invocation.command.calls_llm(invocation.args)):
+        return None
+    limiter = get_rate_limiter()
+    return limiter.check(source) if limiter else None
@@ -0,0 +1,270 @@
+import mmap
+import random
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from math import gcd
+from config import logger, RESPONSE_CATALOG_PATH, RESPONSE_BAG_SIZE, RESPONSE_BAG_TTL
+from utils.cache import LRUCache
+
+# 読み込めるカタログ形式のバージョン
+CATALOG_VERSION = 1
+
+_HEADER_PATTERN = re.compile(rb"^# .*response catalog v(\d+)\s*$")
+_WEIGHT_PATTERN = re.compile(rb"(\d+)\t")
+
+
+class _Section:
+    """カタログの1セクション（各行の開始位置と、重みの累積）"""
+
+    __slots__ = ("starts", "cumulative")
+
+    def __init__(self):
+        # 応答の本文が始まるバイト位置
+        self.starts = array("I")
+        # 重みの累積（すべての重みが1の場合は None）
+        self.cumulative = None
+
+    def add(self, start, weight):
+        """応答を1行追加する"""
+        if weight != 1 and self.cumulative is None:
+            self.cumulative = array("Q", range(1, len(self.starts) + 1))
+        self.starts.append(start)
+        if self.cumulative is not None:
+            self.cumulative.append((self.cumulative[-1] if self.cumulative else 0) + weight)
+
+    @property
+    def total(self):
+        """重みの合計（シャッフルバッグの大きさ）"""
+        return self.cumulative[-1] if self.cumulative else len(self.starts)
+
+    def line_at(self, slot):
+        """
+        バッグの位置（0 〜 total-1）に当たる行番号を返す
+
+        Parameters:
+        slot (int): バッグの位置
+
+        Returns:
+        int: 行番号
+        """
+        if self.cumulative is None:
+            return slot
+        return bisect_right(self.cumulative, slot)
+
+
+class ResponseCatalog:
+    """メモリマップしたカタログファイルから定型応答を取り出す
+
+    カタログは「[名前]」で始まるセクションごとに1行1応答を並べたテキストファイル。
+    初めて使うときに1回だけ走査して各行の開始位置を記録し、以降は必要な行だけをデコードする。
+    チャットごとのシャッフルバッグで、同じ応答が一巡するまで繰り返されないように選ぶ。
+    """
+
+    def __init__(self, path=None, bag_size=None, bag_ttl=None):
+        """
+        カタログを初期化する（ファイルは最初に使うときに開く）
+
+        Parameters:
+        path (str): カタログファイルのパス
+        bag_size (int): シャッフルバッグを保持する（カタログ, チャット）の数
+        bag_ttl (float): 使われないシャッフルバッグを捨てるまでの秒数
+        """
+        self.path = path or RESPONSE_CATALOG_PATH
+        self._map = None
+        self._sections = None
+        self._lock = threading.Lock()
+        self._bags = LRUCache(bag_size or RESPONSE_BAG_SIZE, RESPONSE_BAG_TTL if bag_ttl is None else bag_ttl)
+
+    def _load(self):
+        """カタログファイルをメモリマップして索引を作る（初回のみ）"""
+        if self._sections is not None:
+            return self._sections
+        with self._lock:
+            if self._sections is None:
+                with open(self.path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                sections = self._index(data)
+                self._map = data
+                self._sections = sections
+                logger.debug(f"応答カタログを読み込み: {self.path} ({len(sections)}セクション)")
+        return self._sections
+
+    def _index(self, data):
+        """
+        各セクションの行の開始位置と重みを記録する
+
+        Parameters:
+        data (mmap.mmap): カタログファイル
+
+        Returns:
+        dict: セクション名 -> _Section
+        """
+        end = data.find(b"\n")
+        header = data[:end if end >= 0 else len(data)]
+        match = _HEADER_PATTERN.match(header)
+        if not match or int(match.group(1)) != CATALOG_VERSION:
+            raise ValueError(f"未対応の応答カタログです: {self.path}")
+
+        sections = {}
+        section = None
+        position = end + 1
+        size = len(data)
+        while 0 < position < size:
+            end = data.find(b"\n", position)
+            if end < 0:
+                end = size
+            first = data[position:position + 1]
+            if first == b"[":
+                name = data[position + 1:end].rstrip().rstrip(b"]").decode("utf-8")
+                section = sections.setdefault(name, _Section())
+            elif first not in (b"#", b"\n", b"\r", b"") and section is not None:
+                weight, start = 1, position
+                match = _WEIGHT_PATTERN.match(data, position, end)
+                if match:
+                    weight, start = int(match.group(1)), match.end()
+                if weight > 0:
+                    section.add(start, weight)
+            position = end + 1
+        return sections
+
+    def _section(self, name):
+        """セクションを取得する（存在しない場合は KeyError）"""
+        section = self._load().get(name)
+        if section is None:
+            raise KeyError(f"応答カタログに {name} がありません")
+        return section
+
+    def _line(self, section, index):
+        """行番号の応答をデコードする"""
+        start = section.starts[index]
+        end = self._map.find(b"\n", start)
+        if end < 0:
+            end = len(self._map)
+        return self._map[start:end].rstrip(b"\r").decode("utf-8")
+
+    def names(self):
+        """
+        セクション名の一覧を返す
+
+        Returns:
+        list: セクション名
+        """
+        return list(self._load())
+
+    def lines(self, name):
+        """
+        セクションの応答をすべて返す
+
+        Parameters:
+        name (str): セクション名
+
+        Returns:
+        list: 応答（重みは含まない）
+        """
+        section = self._section(name)
+        return [self._line(section, i) for i in range(len(section.starts))]
+
+    def choice(self, name):
+        """
+        重みに従って応答をランダムに1つ選ぶ
+
+        Parameters:
+        name (str): セクション名
+
+        Returns:
+        str: 応答
+        """
+        section = self._section(name)
+        return self._line(section, section.line_at(random.randrange(section.total)))
+
+    def sample(self, name, chat_key=None):
+        """
+        チャットごとのシャッフルバッグから応答を1つ選ぶ
+
+        バッグは重みの数だけ各応答を入れたものとみなし、その並べ替えを
+        (a * 位置 + b) mod 大きさ で表すため、チャットごとに
+        整数5つ（大きさ, a, b, 位置, 直前に選んだ行番号）しか覚えない。
+
+        Parameters:
+        name (str): セクション名
+        chat_key (str): チャットのキー（省略時は重みに従ってランダムに選ぶ）
+
+        Returns:
+        str: 応答
+        """
+        if chat_key is None:
+            return self.choice(name)
+        section = self._section(name)
+        total = section.total
+        key = (name, chat_key)
+        state = self._bags.get(key, None)
+        if state is None or state[0] != total or state[3] >= total:
+            last = state[4] if state is not None and state[0] == total else None
+            multiplier, offset = self._new_cycle(section, last)
+            position = 0
+        else:
+            _, multiplier, offset, position, _ = state
+        index = section.line_at((multiplier * position + offset) % total)
+        self._bags.set(key, (total, multiplier, offset, position + 1, index))
+        return self._line(section, index)
+
+    def _new_cycle(self, section, last):
+        """
+        バッグの新しい並べ替えを選ぶ（前の巡の最後と同じ応答から始めない）
+
+        Parameters:
+        section (_Section): セクション
+        last (int): 前の巡で最後に選んだ行番号
+
+        Returns:
+        tuple: (a, b)
+        """
+        total = section.total
+        if total <= 1:
+            return 1, 0
+        while True:
+            multiplier = random.randrange(1, total)
+            if gcd(multiplier, total) == 1:
+                break
+        offset = random.randrange(total)
+        for _ in range(total):
+            if section.line_at(offset) != last:
+                break
+            offset = (offset + 1) % total
+        return multiplier, offset
+
+
+# ウォームコンテナ間で使い回すカタログ
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    共有の応答カタログを取得する（初回のみ生成）
+
+    Returns:
+    ResponseCatalog: 応答カタログ
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ResponseCatalog()
+    return _catalog
+
+
+def sample_response(name, chat_key=None):
+    """
+    共有の応答カタログから応答を1つ選ぶ
+
+    Parameters:
+    name (str): セクション名（例: "TESLA_FACTS"）
+    chat_key (str): チャットのキー（utils.dispatcher.get_chat_key の値）
+
+    Returns:
+    str: 応答
+    """
+    return get_catalog().sample(name, chat_key)
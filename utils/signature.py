@@ -0,0 +1,38 @@
+import base64
+import hashlib
+import hmac
+
+
+def compute_signature(body, channel_secret):
+    """
+    WebhookボディのHMAC-SHA256署名を計算する
+
+    Parameters:
+    body (str | bytes): リクエストボディ
+    channel_secret (str): チャネルシークレット
+
+    Returns:
+    str: Base64エンコードした署名
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hmac.new(channel_secret.encode('utf-8'), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+def validate_signature(body, signature, channel_secret):
+    """
+    X-Line-Signature を検証する（linebot を読み込まずに済むよう標準ライブラリだけで行う）
+
+    Parameters:
+    body (str | bytes): リクエストボディ
+    signature (str): X-Line-Signature ヘッダー値
+    channel_secret (str): チャネルシークレット
+
+    Returns:
+    bool: 署名が一致する場合はTrue
+    """
+    if not signature or not channel_secret:
+        return False
+    expected = compute_signature(body, channel_secret)
+    return hmac.compare_digest(expected.encode('utf-8'), signature.encode('utf-8'))
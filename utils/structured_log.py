@@ -0,0 +1,161 @@
+import json
+import logging
+import random
+
+# 値を伏せ字にするキー（小文字で比較する）
+REDACTED_KEYS = frozenset({
+    "x-line-signature",
+    "authorization",
+    "signature",
+    "channel_secret",
+    "channel_access_token",
+    "api_key",
+})
+REDACTED = "***"
+
+# LogRecord が標準で持つ属性（extra で渡された項目と区別するため）
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def redact(value):
+    """
+    秘密情報を伏せ字にしたコピーを返す
+
+    Parameters:
+    value: dict / list / その他の値
+
+    Returns:
+    伏せ字にした値（元の値は変更しない）
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def parse_levels(spec):
+    """
+    モジュールごとのログレベル指定を解釈する
+
+    Parameters:
+    spec (str): "lambda_function=DEBUG,urllib3=WARNING" の形式
+
+    Returns:
+    dict: モジュール名 -> ログレベル（数値）
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        name = name.strip()
+        level = logging.getLevelName(level.strip().upper())
+        if name and isinstance(level, int):
+            levels[name] = level
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONにするフォーマッタ（メッセージの組み立ては出力時にだけ行う）"""
+
+    def format(self, record):
+        """
+        ログレコードをJSON文字列にする
+
+        Parameters:
+        record (logging.LogRecord): ログレコード
+
+        Returns:
+        str: JSON文字列
+        """
+        data = {
+            "level": record.levelname,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "aws_request_id", None)
+        if request_id:
+            data["request_id"] = request_id
+        # extra で渡された項目はそのままフィールドにする
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "aws_request_id":
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """ログを出したモジュールごとに出力レベルを変えるフィルタ"""
+
+    def __init__(self, default_level, levels=None):
+        """
+        フィルタを初期化する
+
+        Parameters:
+        default_level (int): 指定のないモジュールのレベル
+        levels (dict): モジュール名 -> レベル（"services.weather_service" と "weather_service" のどちらでも可）
+        """
+        super().__init__()
+        self.default_level = default_level
+        self.levels = {name.rsplit(".", 1)[-1]: level for name, level in (levels or {}).items()}
+
+    def filter(self, record):
+        """
+        レコードを出力するかどうかを判定する
+
+        Parameters:
+        record (logging.LogRecord): ログレコード
+
+        Returns:
+        bool: 出力する場合はTrue
+        """
+        return record.levelno >= self.levels.get(record.module, self.default_level)
+
+
+def should_sample(rate):
+    """
+    ペイロード全体をログに出すかどうかを抽選する
+
+    Parameters:
+    rate (float): 出力する割合（0〜1）
+
+    Returns:
+    bool: 出力する場合はTrue
+    """
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def setup_logging(logger, level="INFO", levels_spec="", fmt="json"):
+    """
+    ルートロガーにJSON出力とモジュールごとのレベルを設定する
+
+    Lambdaのランタイムが用意したハンドラにフォーマッタを差し替える。
+    ハンドラがない環境（ローカル実行など）ではフォーマッタの設定は行わない。
+
+    Parameters:
+    logger (logging.Logger): ルートロガー
+    level (str): デフォルトのログレベル
+    levels_spec (str): モジュールごとのレベル指定（parse_levels の形式）
+    fmt (str): "json" の場合はJSON、それ以外は従来のテキスト形式
+    """
+    default_level = logging.getLevelName(level.upper())
+    if not isinstance(default_level, int):
+        default_level = logging.INFO
+    levels = parse_levels(levels_spec)
+
+    # 名前付きロガーを使うライブラリ（urllib3 など）は、そのロガー自体のレベルを変える
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    # アプリのモジュールはルートロガーを使うので、フィルタでモジュールごとに絞る
+    logger.setLevel(min([default_level] + list(levels.values())))
+    for existing in [f for f in logger.filters if isinstance(f, ModuleLevelFilter)]:
+        logger.removeFilter(existing)
+    logger.addFilter(ModuleLevelFilter(default_level, levels))
+
+    if fmt == "json":
+        for handler in logger.handlers:
+            handler.setFormatter(JsonFormatter())
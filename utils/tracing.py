@@ -0,0 +1,283 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from config import logger, METRICS_ENABLED, METRICS_NAMESPACE, STAGE_STATS_WINDOW
+
+
+class Trace:
+    """1回の呼び出しの中で計測したステージごとの所要時間"""
+
+    def __init__(self):
+        """トレースを初期化する"""
+        self.started = time.time()
+        self.durations = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, elapsed_ms):
+        """
+        ステージの所要時間を追加する
+
+        Parameters:
+        stage (str): ステージ名
+        elapsed_ms (float): 所要時間（ミリ秒）
+        """
+        with self._lock:
+            self.durations.setdefault(stage, []).append(elapsed_ms)
+
+    def set_gauge(self, name, value):
+        """
+        呼び出しの終わり時点の値を記録する（同じ名前は最後の値で上書きする）
+
+        Parameters:
+        name (str): メトリクス名
+        value (float): 値
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+
+class StageStats:
+    """プロセス内でステージごとの所要時間を直近の一定件数だけ保持する統計"""
+
+    def __init__(self, window=None):
+        """
+        統計を初期化する
+
+        Parameters:
+        window (int): ステージごとに保持する件数
+        """
+        self.window = window or STAGE_STATS_WINDOW
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, elapsed_ms):
+        """
+        所要時間を記録する
+
+        Parameters:
+        stage (str): ステージ名
+        elapsed_ms (float): 所要時間（ミリ秒）
+        """
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(elapsed_ms)
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        """
+        ステージごとのパーセンタイルを計算する
+
+        Parameters:
+        quantiles (tuple): 計算するパーセンタイル
+
+        Returns:
+        dict: ステージ名 -> {"count": 件数, "p50": ミリ秒, ...}
+        """
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        result = {}
+        for stage, samples in snapshot.items():
+            if not samples:
+                continue
+            summary = {"count": len(samples)}
+            for q in quantiles:
+                # nearest-rank 法
+                rank = max(1, -(-q * len(samples) // 100))
+                summary[f"p{q}"] = samples[rank - 1]
+            result[stage] = summary
+        return result
+
+    def reset(self):
+        """記録を全て削除する"""
+        with self._lock:
+            self._samples.clear()
+
+
+class Tracer:
+    """ステージごとの所要時間を計測し、呼び出しごとに埋め込みメトリクス形式で出力する"""
+
+    def __init__(self, stats=None, namespace=None, enabled=None, stream=None):
+        """
+        トレーサーを初期化する
+
+        Parameters:
+        stats (StageStats): プロセス内の統計（/stats コマンド用）
+        namespace (str): CloudWatchメトリクスの名前空間
+        enabled (bool): メトリクスを出力するかどうか
+        stream: 出力先（省略時は標準出力）
+        """
+        self.stats = stats or StageStats()
+        self.namespace = namespace or METRICS_NAMESPACE
+        self.enabled = METRICS_ENABLED if enabled is None else enabled
+        self.stream = stream
+        self._current = Trace()
+
+    def start(self):
+        """
+        新しい呼び出しの計測を始める
+
+        Returns:
+        Trace: この呼び出しのトレース
+        """
+        self._current = Trace()
+        return self._current
+
+    def record(self, stage, elapsed_ms, trace=None):
+        """
+        ステージの所要時間を記録する
+
+        Parameters:
+        stage (str): ステージ名
+        elapsed_ms (float): 所要時間（ミリ秒）
+        trace (Trace): 記録先のトレース（省略時は現在の呼び出し）
+        """
+        (trace or self._current).add(stage, elapsed_ms)
+        self.stats.record(stage, elapsed_ms)
+
+    def gauge(self, name, value, trace=None):
+        """
+        状態を表す値（サーキットブレーカーの状態など）を記録する
+
+        Parameters:
+        name (str): メトリクス名
+        value (float): 値
+        trace (Trace): 記録先のトレース（省略時は現在の呼び出し）
+        """
+        (trace or self._current).set_gauge(name, value)
+
+    def span(self, stage):
+        """
+        with文で囲んだ区間の所要時間を記録する
+
+        Parameters:
+        stage (str): ステージ名
+
+        Returns:
+        contextmanager: 計測用のコンテキストマネージャ
+        """
+        return _Span(self, stage)
+
+    def flush(self, **dimensions):
+        """
+        現在の呼び出しの所要時間を埋め込みメトリクス形式（EMF）の1行で出力する
+
+        Parameters:
+        **dimensions: メトリクスに付けるディメンション（値は文字列）
+
+        Returns:
+        dict: 出力したレコード（計測がない、または無効な場合は None）
+        """
+        trace = self._current
+        with trace._lock:
+            durations = {stage: list(values) for stage, values in trace.durations.items()}
+            gauges = dict(trace.gauges)
+        if not self.enabled or not (durations or gauges):
+            return None
+
+        dimensions = {"Function": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local"), **dimensions}
+        record = {
+            "_aws": {
+                "Timestamp": int(trace.started * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [
+                        *({"Name": stage, "Unit": "Milliseconds"} for stage in durations),
+                        *({"Name": name, "Unit": "None"} for name in gauges),
+                    ],
+                }],
+            },
+            **dimensions,
+        }
+        for stage, values in durations.items():
+            rounded = [round(value, 2) for value in values]
+            record[stage] = rounded[0] if len(rounded) == 1 else rounded
+        record.update(gauges)
+        try:
+            # EMFはログの1行がそのままJSONである必要があるため、ロガーを通さずに書き出す
+            stream = self.stream or sys.stdout
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stream.flush()
+        except Exception as e:
+            logger.warning(f"メトリクスの出力に失敗しました: {str(e)}")
+        return record
+
+
+class _Span:
+    """Tracer.span が返すコンテキストマネージャ"""
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        # 開始時点の呼び出しに記録する（期限後に終わった処理が次の呼び出しに混ざらないように）
+        self.trace = self.tracer._current
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.tracer.record(self.stage, elapsed_ms, self.trace)
+        return False
+
+
+# プロセス全体で共有するトレーサー
+_tracer = Tracer()
+
+
+def get_tracer():
+    """
+    共有のトレーサーを取得する
+
+    Returns:
+    Tracer: 共有トレーサー
+    """
+    return _tracer
+
+
+def span(stage):
+    """
+    共有トレーサーで区間の所要時間を記録する
+
+    Parameters:
+    stage (str): ステージ名
+
+    Returns:
+    contextmanager: 計測用のコンテキストマネージャ
+    """
+    return _tracer.span(stage)
+
+
+def traced(stage):
+    """
+    関数全体の所要時間を記録するデコレータ（コルーチン関数にも使える）
+
+    Parameters:
+    stage (str): ステージ名
+
+    Returns:
+    function: デコレータ
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
@@ -0,0 +1,58 @@
+import time
+from config import logger
+
+# ウォームアップ用の定期実行イベントの発生元
+WARMUP_SOURCES = frozenset({"aws.events", "serverless-plugin-warmup"})
+
+
+def is_warmup_event(event):
+    """
+    コンテナを温めるための定期実行イベントかどうかを判定する
+
+    EventBridgeのスケジュール（source が aws.events）、serverless-plugin-warmup、
+    または {"warmup": true} をウォームアップとみなす。Webhookの場合は body を持つ
+
+    Parameters:
+    event (dict): Lambdaに渡されたイベント
+
+    Returns:
+    bool: ウォームアップの場合はTrue
+    """
+    if not isinstance(event, dict) or "body" in event:
+        return False
+    return bool(event.get("warmup")) or event.get("source") in WARMUP_SOURCES
+
+
+def run_warmup(steps, deadline=None):
+    """
+    ウォームアップの各ステップを順に実行し、結果と所要時間をまとめる
+
+    失敗したステップは記録して次に進み、期限を過ぎた後のステップは実行しない
+
+    Parameters:
+    steps (list): (ステップ名, 引数なしの関数) のリスト
+    deadline (Deadline): 処理の期限
+
+    Returns:
+    dict: primed（ステップ名 -> ok / elapsed_ms / result）と elapsed_ms
+    """
+    started = time.perf_counter()
+    primed = {}
+    for name, step in steps:
+        if deadline is not None and deadline.expired():
+            primed[name] = {"ok": False, "elapsed_ms": 0.0, "result": "skipped"}
+            continue
+        step_started = time.perf_counter()
+        try:
+            result, ok = step(), True
+        except Exception as e:
+            logger.warning(f"ウォームアップの {name} に失敗: {str(e)}")
+            result, ok = str(e), False
+        primed[name] = {
+            "ok": ok,
+            "elapsed_ms": round((time.perf_counter() - step_started) * 1000, 1),
+            "result": result,
+        }
+    report = {"primed": primed, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    logger.info("ウォームアップ完了", extra=report)
+    return report
@@ -0,0 +1,94 @@
+import base64
+import json
+
+# Webhookのイベント種別 -> linebot.models のイベントクラス名（WebhookParser と同じ対応）
+EVENT_TYPES = {
+    "message": "MessageEvent",
+    "follow": "FollowEvent",
+    "unfollow": "UnfollowEvent",
+    "join": "JoinEvent",
+    "leave": "LeaveEvent",
+    "postback": "PostbackEvent",
+    "beacon": "BeaconEvent",
+    "accountLink": "AccountLinkEvent",
+    "memberJoined": "MemberJoinedEvent",
+    "memberLeft": "MemberLeftEvent",
+    "things": "ThingsEvent",
+    "unsend": "UnsendEvent",
+    "videoPlayComplete": "VideoPlayCompleteEvent",
+}
+
+
+def get_body(event):
+    """
+    API Gatewayのイベントからリクエストボディを取り出す
+
+    Base64でエンコードされたボディ（isBase64Encoded）は、署名の計算に使う元のバイト列に戻す
+
+    Parameters:
+    event (dict): API Gatewayから渡されるイベントデータ
+
+    Returns:
+    str | bytes: リクエストボディ
+    """
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    return body
+
+
+def get_header(event, name):
+    """
+    ヘッダー値を大文字小文字を区別せずに取り出す
+
+    Parameters:
+    event (dict): API Gatewayから渡されるイベントデータ
+    name (str): ヘッダー名
+
+    Returns:
+    str: ヘッダー値（ない場合は空文字列）
+    """
+    headers = event.get('headers') or {}
+    # API Gateway経由だと小文字になる場合が多いため先に試す
+    value = headers.get(name.lower()) or headers.get(name)
+    if value:
+        return value
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return ''
+
+
+def event_from_dict(event_dict):
+    """
+    Webhookボディ中のイベント1件をイベントオブジェクトにする
+
+    Parameters:
+    event_dict (dict): イベントのdict
+
+    Returns:
+    Event: LINEのイベント
+    """
+    from linebot import models
+    event_class = getattr(models, EVENT_TYPES.get(event_dict.get("type"), "UnknownEvent"))
+    return event_class.new_from_json_dict(event_dict)
+
+
+def parse_events(body):
+    """
+    署名を検証済みのボディを1回だけ解析してイベントを取り出す
+
+    WebhookParser と違い、署名の再検証や文字列への再変換をしない
+
+    Parameters:
+    body (str | bytes): 署名を検証済みのリクエストボディ
+
+    Returns:
+    list: LINEのイベント
+
+    Raises:
+    ValueError: ボディがJSONとして不正な場合
+    """
+    data = json.loads(body)
+    return [event_from_dict(event_dict) for event_dict in data.get("events", [])]
@@ -0,0 +1,135 @@
+import time
+from config import logger, EVENT_QUEUE_BATCH_SIZE, REPLY_TOKEN_MAX_AGE
+from lambda_function import line_client
+from utils.deadline import Deadline
+from utils.event_dedup import DONE
+from utils.event_queue import QueueMessage, get_event_queue, decode_event
+from utils.tracing import get_tracer
+
+def lambda_handler(event, context):
+    """
+    キューに積まれたWebhookイベントを処理するワーカー用のLambdaハンドラ関数
+
+    SQSトリガーから呼ばれた場合は Records のメッセージを処理し、失敗したものを
+    batchItemFailures で返す（ReportBatchItemFailures を有効にしたイベントソースマッピング用）。
+    Records がない場合は設定されたキューからバッチ単位で取り出して処理する。
+
+    Parameters:
+    event (dict): SQSイベント、またはスケジュール実行などの任意のイベント
+    context (LambdaContext): Lambda実行コンテキスト
+
+    Returns:
+    dict: SQSトリガーの場合は batchItemFailures、それ以外は処理件数
+    """
+    deadline = Deadline.from_context(context)
+    tracer = get_tracer()
+    tracer.start()
+
+    try:
+        with tracer.span('worker'):
+            records = event.get('Records') if isinstance(event, dict) else None
+            if records is None:
+                return drain_queue(get_event_queue(), deadline=deadline)
+
+            messages = [QueueMessage(record['messageId'], record['body']) for record in records]
+            failed = process_messages(messages, deadline=deadline)
+            return {'batchItemFailures': [{'itemIdentifier': message.message_id} for message in failed]}
+    finally:
+        tracer.flush()
+
+def drain_queue(queue, deadline=None, batch_size=None):
+    """
+    キューが空になるか期限に達するまで、バッチ単位でイベントを処理する
+
+    失敗したメッセージは削除せず、可視性タイムアウトの経過後に再処理させる
+
+    Parameters:
+    queue: イベントキュー（receive / ack を持つもの）
+    deadline (Deadline): 処理の期限
+    batch_size (int): 1回に受信する件数
+
+    Returns:
+    dict: processed（処理できた件数）、failed（失敗した件数）
+    """
+    batch_size = batch_size or EVENT_QUEUE_BATCH_SIZE
+    processed = 0
+    failed_count = 0
+    while deadline is None or not deadline.expired():
+        messages = queue.receive(batch_size)
+        if not messages:
+            break
+        failed = process_messages(messages, deadline=deadline)
+        failed_ids = {message.message_id for message in failed}
+        for message in messages:
+            if message.message_id not in failed_ids:
+                queue.ack(message)
+        processed += len(messages) - len(failed_ids)
+        failed_count += len(failed_ids)
+    logger.info(f"キューの処理結果: 成功 {processed}件 / 失敗 {failed_count}件")
+    return {'processed': processed, 'failed': failed_count}
+
+def process_messages(messages, deadline=None):
+    """
+    キューのメッセージをチャット単位の順序を保ったまま処理する
+
+    Parameters:
+    messages (list): QueueMessage のリスト
+    deadline (Deadline): 処理の期限
+
+    Returns:
+    list: 処理に失敗した、他で処理中だった、または期限までに処理できなかった QueueMessage のリスト
+    """
+    failed = []
+    events = []
+    owners = {}
+    now_ms = time.time() * 1000
+    for message in messages:
+        try:
+            event_dict, _ = decode_event(message.body)
+            event = line_client.event_from_dict(event_dict)
+        except Exception as e:
+            logger.error(f"メッセージの読み込みに失敗 ({message.message_id}): {str(e)}")
+            failed.append(message)
+            continue
+        _register_push_fallback(event, now_ms)
+        events.append(event)
+        owners[id(event)] = message
+
+    handled = set()
+    finished = []
+
+    def handle(event):
+        try:
+            # 失敗を返したイベントと、他で処理中のため処理しなかったイベントは削除せず再処理させる
+            if line_client._handle_event(event, deadline) == DONE:
+                handled.add(id(event))
+        finally:
+            finished.append(event)
+
+    line_client.dispatcher.dispatch(
+        events, handle,
+        timeout=deadline.remaining() if deadline is not None else None
+    )
+    failed.extend(owners[id(event)] for event in events if id(event) not in handled)
+    # 期限後も処理が続いているイベントは、返信時にプッシュ先を使えるよう登録を残す
+    line_client.discard_push_fallbacks(getattr(event, 'reply_token', None) for event in finished)
+    return failed
+
+def _register_push_fallback(event, now_ms):
+    """
+    返信トークンが使えない場合に備えて、送信元チャットへのプッシュ先を登録する
+
+    Parameters:
+    event (Event): LINEのイベント
+    now_ms (float): 現在時刻（UNIXミリ秒）
+    """
+    reply_token = getattr(event, 'reply_token', None)
+    source = getattr(event, 'source', None)
+    if not reply_token or source is None:
+        return
+    to = getattr(source, 'group_id', None) or getattr(source, 'room_id', None) or getattr(source, 'user_id', None)
+    if not to:
+        return
+    timestamp = getattr(event, 'timestamp', None) or now_ms
+    expired = (now_ms - timestamp) / 1000 > REPLY_TOKEN_MAX_AGE
+    line_client.set_push_fallback(reply_token, to, expired=expired)